@@ -5,19 +5,21 @@ COMPLET: Toutes les routes attendues par le frontend sont implémentées
 """
 import json
 from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_database, get_current_active_user, get_current_verified_user
-from app.models.game import Game
 from app.models.user import User
 from app.schemas.multiplayer import *
+from app.services.auth_cache import auth_cache
 from app.services.multiplayer import multiplayer_service
+from app.services.room_snapshot_cache import etag_matches
 from app.utils.exceptions import *
 
-from app.core.security import decode_access_token
+from app.core.cluster import cluster_node
+from app.core.config import settings
 
 # Import conditionnel pour WebSocket
 try:
@@ -45,13 +47,14 @@ async def get_public_rooms_endpoint(
         page: int = Query(1, ge=1, description="Page"),
         limit: int = Query(20, ge=1, le=100, description="Limite par page"),
         filters: Optional[str] = Query(None, description="Filtres JSON"),
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor)"),
         current_user: User = Depends(get_current_active_user),
         db: AsyncSession = Depends(get_database)
 ) -> Dict[str, Any]:
     """Route publique pour les parties - correspond aux attentes du frontend"""
     try:
         result = await multiplayer_service.get_public_rooms(
-            db, page=page, limit=limit, filters=filters
+            db, page=page, limit=limit, filters=filters, cursor=cursor
         )
         return {
             "success": True,
@@ -209,16 +212,20 @@ async def join_multiplayer_room(
 )
 async def get_multiplayer_room(
         room_code: str,
+        request: Request,
         current_user: User = Depends(get_current_active_user),
         db: AsyncSession = Depends(get_database)
-) -> Dict[str, Any]:
-    """Route pour récupérer les détails d'une room avec correction participants"""
+) -> Response:
+    """
+    Route pour récupérer les détails d'une room avec correction participants
+    NOUVEAU: Corps pré-sérialisé du cache, ETag et 304 si If-None-Match correspond
+    """
     try:
-        result = await multiplayer_service.get_room_details(db, room_code, current_user.id)
-        return {
-            "success": True,
-            "data": result
-        }
+        snapshot = await multiplayer_service.get_room_snapshot(db, room_code)
+        headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
     except EntityNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -253,6 +260,7 @@ async def get_public_multiplayer_rooms(
         search_term: Optional[str] = Query(None, description="Terme de recherche"),
         # Garder aussi l'ancien paramètre pour compatibilité
         filters: Optional[str] = Query(None, description="Filtres JSON (legacy)"),
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor)"),
         current_user: User = Depends(get_current_active_user),
         db: AsyncSession = Depends(get_database)
 ) -> Dict[str, Any]:
@@ -288,7 +296,7 @@ async def get_public_multiplayer_rooms(
         filters_json = json.dumps(constructed_filters) if constructed_filters else None
 
         result = await multiplayer_service.get_public_rooms(
-            db, page=page, limit=limit, filters=filters_json
+            db, page=page, limit=limit, filters=filters_json, cursor=cursor
         )
         return {
             "success": True,
@@ -745,19 +753,32 @@ async def websocket_multiplayer_endpoint(
         websocket: WebSocket,
         room_code: str,
         token: str = Query(..., description="Token JWT pour l'authentification"),
+        resume_token: Optional[str] = Query(None, description="Jeton de reprise d'une connexion précédente"),
+        last_event_seq: Optional[int] = Query(None, ge=0, description="Dernier event_seq reçu avant la coupure"),
         db: AsyncSession = Depends(get_database)
 ):
     """
     Endpoint WebSocket pour la communication en temps réel - COMPLET
+
+    Après une coupure, le client se reconnecte avec `resume_token` et `last_event_seq`
+    pour ne recevoir que les événements manqués (ou un snapshot si le trou est trop ancien).
     """
     user_id = None
     username = None
 
+    # NOUVEAU: La room appartient à un autre worker : le client s'y reconnecte
+    if cluster_node is not None and not cluster_node.is_local(room_code):
+        await multiplayer_ws_manager.redirect_connection(
+            websocket, room_code, cluster_node.websocket_url(room_code, websocket.url.path)
+        )
+        return
+
     try:
         # Authentification via le token
+        # NOUVEAU: Claims, identité et room servis par le cache (aucune requête lors d'une reconnexion)
         try:
-            payload = decode_access_token(token)
-            user_id = payload.get("sub")
+            payload = auth_cache.verify_token(token)
+            user_id = payload.get("sub") if payload else None
             if not user_id:
                 await websocket.close(code=4001, reason="Token invalide")
                 return
@@ -768,15 +789,13 @@ async def websocket_multiplayer_endpoint(
 
         # Récupérer les informations utilisateur
         try:
-            user_query = select(User).where(User.id == user_id)
-            user_result = await db.execute(user_query)
-            user_obj = user_result.scalar_one_or_none()
+            identity = await auth_cache.get_user(db, user_id)
 
-            if not user_obj:
+            if not identity:
                 await websocket.close(code=4002, reason="Utilisateur non trouvé")
                 return
 
-            username = user_obj.username
+            username = identity.username
 
         except Exception as user_error:
             logger.warning(f"❌ Erreur récupération utilisateur: {user_error}")
@@ -785,9 +804,7 @@ async def websocket_multiplayer_endpoint(
 
         # Vérifier que la room existe
         try:
-            room_query = select(Game).where(Game.room_code == room_code)
-            room_result = await db.execute(room_query)
-            room = room_result.scalar_one_or_none()
+            room = await auth_cache.get_room(db, room_code)
 
             if not room:
                 await websocket.close(code=4004, reason="Room non trouvée")
@@ -800,7 +817,8 @@ async def websocket_multiplayer_endpoint(
 
         # Connecter l'utilisateur
         connection_success = await multiplayer_ws_manager.connect(
-            websocket, room_code, user_id, username
+            websocket, room_code, user_id, username,
+            game_id=room.id, resume_token=resume_token, last_event_seq=last_event_seq
         )
 
         if not connection_success:
@@ -809,29 +827,39 @@ async def websocket_multiplayer_endpoint(
 
         logger.info(f"✅ WebSocket connecté: {username} dans {room_code}")
 
+        # NOUVEAU: Diffusion groupée par tick si la room l'a demandée
+        broadcast_batching = (room.settings or {}).get("broadcast_batching")
+        if broadcast_batching is None:
+            broadcast_batching = settings.WS_BROADCAST_BATCHING_DEFAULT
+        if broadcast_batching:
+            multiplayer_ws_manager.enable_room_batching(room_code)
+
         # Boucle d'écoute des messages
         try:
             while True:
-                # Attendre un message du client
-                message_raw = await websocket.receive_text()
+                # Attendre un message du client (texte JSON ou trame binaire selon le codec négocié)
+                received = await websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(received.get("code", 1000))
+
+                message_raw = received.get("bytes")
+                if message_raw is None:
+                    message_raw = received.get("text", "")
 
                 try:
-                    message_data = json.loads(message_raw)
-                    await multiplayer_ws_manager.handle_message(websocket, message_data)
+                    # NOUVEAU: Lecture et validation en une passe, avant tout traitement
+                    message = multiplayer_ws_manager.decode_message(websocket, message_raw)
+                    await multiplayer_ws_manager.handle_message(websocket, message)
 
-                except json.JSONDecodeError:
-                    logger.warning(f"⚠️ Message JSON invalide de {username}: {message_raw[:100]}")
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "data": {"message": "Format de message invalide"}
-                    }))
+                except WebSocketMessageError as invalid_message:
+                    logger.warning(f"⚠️ Message invalide de {username}: {message_raw[:100]!r}")
+                    await multiplayer_ws_manager.send_error(
+                        websocket, invalid_message.details.get("reason", "Format de message invalide")
+                    )
 
                 except Exception as handler_error:
                     logger.error(f"❌ Erreur traitement message de {username}: {handler_error}")
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "data": {"message": "Erreur traitement message"}
-                    }))
+                    await multiplayer_ws_manager.send_error(websocket, "Erreur traitement message")
 
         except WebSocketDisconnect:
             logger.info(f"🔌 WebSocket déconnecté: {username} de {room_code}")
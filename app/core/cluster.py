@@ -0,0 +1,423 @@
+"""
+Affinité des rooms : chaque room appartient à un seul worker
+NOUVEAU: Un anneau de hachage cohérent associe chaque room_code à un worker du cluster.
+Les connexions WebSocket et les mutations REST d'une room sont dirigées vers ce worker,
+dont l'état en mémoire fait foi et dont les diffusions restent locales. Quand un worker
+rejoint ou quitte le cluster, seules les rooms dont le propriétaire change sont transférées.
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# En-tête posé sur une requête relayée : le destinataire la traite sans la relayer à nouveau
+FORWARDED_HEADER = "X-Room-Owner-Forwarded"
+
+# En-têtes propres à une connexion HTTP, jamais recopiés par le relais
+_HOP_BY_HOP_HEADERS = frozenset({
+    "host", "content-length", "connection", "keep-alive", "transfer-encoding",
+    "content-encoding", "upgrade", "proxy-connection", "te", "trailer"
+})
+
+
+# === ANNEAU DE HACHAGE COHÉRENT ===
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Anneau de hachage cohérent avec nœuds virtuels
+
+    Ajouter ou retirer un worker ne déplace qu'environ 1/N des clés.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128):
+        self.vnodes = max(1, int(vnodes))
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Worker propriétaire d'une clé (None si l'anneau est vide)"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+# === APPARTENANCE AU CLUSTER ===
+
+class ClusterMembership(ABC):
+    """Registre des workers vivants (heartbeat + expiration)"""
+
+    backend = "base"
+
+    @abstractmethod
+    async def heartbeat(self, worker_id: str, url: str) -> Dict[str, str]:
+        """
+        Signale que le worker est vivant
+
+        Returns:
+            Workers vivants : worker_id -> URL annoncée
+        """
+
+    @abstractmethod
+    async def leave(self, worker_id: str) -> None:
+        """Retire le worker du registre (arrêt propre)"""
+
+    async def close(self) -> None:
+        pass
+
+
+class FileMembership(ClusterMembership):
+    """
+    Registre dans un répertoire partagé (harness local, plusieurs processus d'une machine)
+
+    Un fichier par worker, réécrit à chaque heartbeat ; un fichier plus ancien que
+    le TTL désigne un worker disparu.
+    """
+
+    backend = "file"
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    async def heartbeat(self, worker_id: str, url: str) -> Dict[str, str]:
+        now = time.time()
+        entry = self.directory / f"{worker_id}.json"
+        temporary = self.directory / f".{worker_id}.tmp"
+        temporary.write_text(json.dumps({"url": url, "seen": now}))
+        os.replace(temporary, entry)
+
+        members: Dict[str, str] = {}
+        for path in self.directory.glob("*.json"):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if now - data.get("seen", 0) <= self.ttl:
+                members[path.stem] = data["url"]
+        return members
+
+    async def leave(self, worker_id: str) -> None:
+        try:
+            (self.directory / f"{worker_id}.json").unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RedisMembership(ClusterMembership):
+    """Registre Redis : ensemble trié (dernier heartbeat) + hash des URLs"""
+
+    backend = "redis"
+
+    def __init__(self, url: str, password: Optional[str], prefix: str, ttl: float):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis n'est pas installé")
+        self.client = redis_asyncio.from_url(url, password=password, decode_responses=True)
+        self.members_key = f"{prefix}members"
+        self.urls_key = f"{prefix}urls"
+        self.ttl = ttl
+
+    async def heartbeat(self, worker_id: str, url: str) -> Dict[str, str]:
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.members_key, {worker_id: now})
+            pipe.hset(self.urls_key, worker_id, url)
+            pipe.zremrangebyscore(self.members_key, "-inf", now - self.ttl)
+            pipe.zrange(self.members_key, 0, -1)
+            pipe.hgetall(self.urls_key)
+            results = await pipe.execute()
+
+        alive, urls = results[3], results[4]
+        stale = [worker for worker in urls if worker not in alive]
+        if stale:
+            await self.client.hdel(self.urls_key, *stale)
+        return {worker: urls[worker] for worker in alive if worker in urls}
+
+    async def leave(self, worker_id: str) -> None:
+        await self.client.zrem(self.members_key, worker_id)
+        await self.client.hdel(self.urls_key, worker_id)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+# === NŒUD DU CLUSTER ===
+
+# Callback de changement de topologie : reçoit le nœud après reconstruction de l'anneau
+TopologyListener = Callable[["ClusterNode"], Awaitable[None]]
+
+
+class ClusterNode:
+    """Worker courant : appartenance, anneau et propriété des rooms"""
+
+    def __init__(
+            self,
+            worker_id: str,
+            advertise_url: str,
+            membership: ClusterMembership,
+            vnodes: int = 128,
+            heartbeat_interval: float = 2.0
+    ):
+        self.worker_id = worker_id
+        self.advertise_url = advertise_url.rstrip("/")
+        self.membership = membership
+        self.vnodes = vnodes
+        self.heartbeat_interval = heartbeat_interval
+
+        # Tant que le registre n'a pas répondu, le worker se considère seul
+        self.members: Dict[str, str] = {worker_id: self.advertise_url}
+        self.ring = ConsistentHashRing([worker_id], vnodes)
+
+        self._listeners: List[TopologyListener] = []
+        self._task: Optional[asyncio.Task] = None
+        self._http = None
+
+        # Statistiques
+        self.topology_changes = 0
+        self.heartbeat_errors = 0
+        self.proxied_requests = 0
+        self.proxy_errors = 0
+
+    # === CYCLE DE VIE ===
+
+    def add_listener(self, listener: TopologyListener) -> None:
+        self._listeners.append(listener)
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"🧭 Nœud cluster {self.worker_id} démarré ({self.membership.backend}, {len(self.members)} workers)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.membership.leave(self.worker_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Erreur retrait du cluster: {e}")
+        await self.membership.close()
+
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.heartbeat_errors += 1
+                logger.error(f"❌ Erreur heartbeat cluster: {e}")
+
+    async def refresh(self) -> bool:
+        """
+        Heartbeat + mise à jour de l'anneau
+
+        Returns:
+            True si la topologie a changé
+        """
+        members = await self.membership.heartbeat(self.worker_id, self.advertise_url)
+        members.setdefault(self.worker_id, self.advertise_url)
+
+        if members == self.members:
+            return False
+
+        joined = sorted(set(members) - set(self.members))
+        left = sorted(set(self.members) - set(members))
+        self.members = members
+        self.ring = ConsistentHashRing(sorted(members), self.vnodes)
+        self.topology_changes += 1
+        logger.info(f"🧭 Topologie du cluster: +{joined} -{left} ({len(members)} workers)")
+
+        for listener in self._listeners:
+            try:
+                await listener(self)
+            except Exception as e:
+                logger.error(f"❌ Erreur transfert des rooms: {e}")
+        return True
+
+    # === PROPRIÉTÉ DES ROOMS ===
+
+    def owner_of(self, room_code: str) -> str:
+        return self.ring.owner(room_code) or self.worker_id
+
+    def is_local(self, room_code: str) -> bool:
+        return self.owner_of(room_code) == self.worker_id
+
+    def owner_url(self, room_code: str) -> str:
+        return self.members.get(self.owner_of(room_code), self.advertise_url)
+
+    def websocket_url(self, room_code: str, path: str, query: str = "") -> str:
+        """URL WebSocket équivalente chez le propriétaire de la room"""
+        base = self.owner_url(room_code)
+        if base.startswith("https://"):
+            base = "wss://" + base[len("https://"):]
+        elif base.startswith("http://"):
+            base = "ws://" + base[len("http://"):]
+        return f"{base}{path}" + (f"?{query}" if query else "")
+
+    # === RELAIS HTTP ===
+
+    async def forward(
+            self,
+            room_code: str,
+            method: str,
+            path: str,
+            query: str,
+            headers: Iterable[Tuple[str, str]],
+            body: bytes
+    ) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """
+        Relaie une requête REST au propriétaire de la room
+
+        Returns:
+            (statut, en-têtes, corps) de la réponse du propriétaire, ou None si le
+            relais est impossible (l'appelant traite alors la requête localement)
+        """
+        if not HTTPX_AVAILABLE:
+            return None
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=settings.CLUSTER_PROXY_TIMEOUT_SECONDS)
+
+        forwarded_headers = {
+            name: value for name, value in headers
+            if name.lower() not in _HOP_BY_HOP_HEADERS
+        }
+        forwarded_headers[FORWARDED_HEADER] = self.worker_id
+
+        url = f"{self.owner_url(room_code)}{path}" + (f"?{query}" if query else "")
+        try:
+            response = await self._http.request(method, url, headers=forwarded_headers, content=body)
+        except Exception as e:
+            self.proxy_errors += 1
+            logger.warning(f"⚠️ Relais vers le propriétaire de {room_code} impossible: {e}")
+            return None
+
+        self.proxied_requests += 1
+        response_headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in _HOP_BY_HOP_HEADERS
+        }
+        return response.status_code, response_headers, response.content
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "backend": self.membership.backend,
+            "members": dict(self.members),
+            "topology_changes": self.topology_changes,
+            "heartbeat_errors": self.heartbeat_errors,
+            "proxied_requests": self.proxied_requests,
+            "proxy_errors": self.proxy_errors
+        }
+
+
+# === FABRIQUE ===
+
+def create_cluster_node() -> Optional[ClusterNode]:
+    """Nœud du worker courant, ou None si l'affinité des rooms est désactivée"""
+    if not settings.CLUSTER_ENABLED:
+        return None
+
+    ttl = settings.CLUSTER_MEMBER_TTL_SECONDS
+    backend = settings.CLUSTER_BACKEND.strip().lower()
+
+    if backend == "redis":
+        if not REDIS_AVAILABLE:
+            logger.warning("⚠️ redis non installé : affinité des rooms désactivée")
+            return None
+        membership: ClusterMembership = RedisMembership(
+            settings.REDIS_URL, settings.REDIS_PASSWORD, settings.CLUSTER_KEY_PREFIX, ttl
+        )
+    elif backend == "file":
+        membership = FileMembership(settings.CLUSTER_MEMBERSHIP_DIR, ttl)
+    else:
+        logger.warning(f"⚠️ Registre de cluster inconnu '{backend}' : affinité des rooms désactivée")
+        return None
+
+    return ClusterNode(
+        worker_id=settings.CLUSTER_WORKER_ID or f"{socket.gethostname()}-{os.getpid()}",
+        advertise_url=settings.CLUSTER_ADVERTISE_URL,
+        membership=membership,
+        vnodes=settings.CLUSTER_VNODES,
+        heartbeat_interval=settings.CLUSTER_HEARTBEAT_SECONDS
+    )
+
+
+# Instance globale du worker (None hors mode cluster)
+cluster_node = create_cluster_node()
+
+__all__ = [
+    "ConsistentHashRing",
+    "ClusterMembership",
+    "FileMembership",
+    "RedisMembership",
+    "ClusterNode",
+    "create_cluster_node",
+    "cluster_node",
+    "FORWARDED_HEADER"
+]
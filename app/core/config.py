@@ -30,7 +30,9 @@ class Settings(BaseSettings):
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     API_PREFIX: str = "/api/v1"
-    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    # Processus uvicorn : WEB_CONCURRENCY (lu par uvicorn, le Dockerfile ne passe pas --workers),
+    # WORKERS en repli ; l'état en mémoire des rooms en dépend
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY") or os.getenv("WORKERS", "1"))
     MAX_REQUESTS: int = int(os.getenv("MAX_REQUESTS", "1000"))
     MAX_REQUESTS_JITTER: int = int(os.getenv("MAX_REQUESTS_JITTER", "100"))
 
@@ -195,6 +197,75 @@ class Settings(BaseSettings):
     WS_MAX_CONNECTIONS: int = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))
     WS_HEARTBEAT_INTERVAL: int = int(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
     WS_CONNECTION_TIMEOUT: int = int(os.getenv("WS_CONNECTION_TIMEOUT", "60"))
+    WS_OUTBOUND_QUEUE_SIZE: int = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "256"))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")  # drop_oldest | coalesce | disconnect
+    WS_BROADCAST_TICK_MS: int = int(os.getenv("WS_BROADCAST_TICK_MS", "50"))
+    WS_BROADCAST_BATCHING_DEFAULT: bool = os.getenv("WS_BROADCAST_BATCHING_DEFAULT", "false").lower() == "true"
+    WS_BROKER_BACKEND: str = os.getenv("WS_BROKER_BACKEND", "none")  # none | memory | redis (plusieurs workers)
+    WS_BROKER_CHANNEL_PREFIX: str = os.getenv("WS_BROKER_CHANNEL_PREFIX", "mastermind:ws:")
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "256"))  # événements rejouables par room
+    WS_RESUME_WINDOW_SECONDS: int = int(os.getenv("WS_RESUME_WINDOW_SECONDS", "120"))
+    WS_SESSION_PERSISTENCE: bool = os.getenv("WS_SESSION_PERSISTENCE", "true").lower() == "true"
+    WS_SESSION_FLUSH_SECONDS: float = float(os.getenv("WS_SESSION_FLUSH_SECONDS", "2"))
+    WS_SESSION_FLUSH_BATCH: int = int(os.getenv("WS_SESSION_FLUSH_BATCH", "500"))
+    # Cache d'authentification des connexions WebSocket (claims, identités, rooms ; 0 = désactivé)
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+    AUTH_CACHE_NEGATIVE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    # Limitation de débit des messages entrants (seaux à jetons : débit/s et rafale, 0 = pas de limite)
+    WS_RATE_LIMIT_ENABLED: bool = os.getenv("WS_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    WS_RATE_CHAT_PER_SECOND: float = float(os.getenv("WS_RATE_CHAT_PER_SECOND", "1"))
+    WS_RATE_CHAT_BURST: int = int(os.getenv("WS_RATE_CHAT_BURST", "5"))
+    WS_RATE_CHAT_ROOM_PER_SECOND: float = float(os.getenv("WS_RATE_CHAT_ROOM_PER_SECOND", "5"))
+    WS_RATE_CHAT_ROOM_BURST: int = int(os.getenv("WS_RATE_CHAT_ROOM_BURST", "20"))
+    WS_RATE_PING_PER_SECOND: float = float(os.getenv("WS_RATE_PING_PER_SECOND", "2"))
+    WS_RATE_PING_BURST: int = int(os.getenv("WS_RATE_PING_BURST", "10"))
+    WS_RATE_ATTEMPT_PER_SECOND: float = float(os.getenv("WS_RATE_ATTEMPT_PER_SECOND", "2"))
+    WS_RATE_ATTEMPT_BURST: int = int(os.getenv("WS_RATE_ATTEMPT_BURST", "5"))
+    WS_RATE_ATTEMPT_ROOM_PER_SECOND: float = float(os.getenv("WS_RATE_ATTEMPT_ROOM_PER_SECOND", "10"))
+    WS_RATE_ATTEMPT_ROOM_BURST: int = int(os.getenv("WS_RATE_ATTEMPT_ROOM_BURST", "30"))
+    WS_RATE_DEFAULT_PER_SECOND: float = float(os.getenv("WS_RATE_DEFAULT_PER_SECOND", "5"))
+    WS_RATE_DEFAULT_BURST: int = int(os.getenv("WS_RATE_DEFAULT_BURST", "20"))
+    # File des notifications (NotificationService) : capacité, tâches de livraison, taille des lots
+    WS_NOTIFY_QUEUE_SIZE: int = int(os.getenv("WS_NOTIFY_QUEUE_SIZE", "10000"))
+    WS_NOTIFY_WORKERS: int = int(os.getenv("WS_NOTIFY_WORKERS", "4"))
+    WS_NOTIFY_MAX_BATCH: int = int(os.getenv("WS_NOTIFY_MAX_BATCH", "50"))
+    WS_NOTIFY_OVERFLOW_POLICY: str = os.getenv("WS_NOTIFY_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest | drop_new
+    # Outbox des événements de jeu (relais après commit)
+    OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+    OUTBOX_RETENTION_HOURS: int = int(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+    # État des rooms actives en mémoire (conservé seulement avec un seul processus ou CLUSTER_ENABLED)
+    ROOM_STATE_CACHE_ENABLED: bool = os.getenv("ROOM_STATE_CACHE_ENABLED", "true").lower() == "true"
+    ROOM_STATE_IDLE_SECONDS: float = float(os.getenv("ROOM_STATE_IDLE_SECONDS", "600"))
+    ROOM_STATE_FLUSH_SECONDS: float = float(os.getenv("ROOM_STATE_FLUSH_SECONDS", "5"))
+    # File de commandes par room (mutations multijoueur appliquées une à une)
+    ROOM_COMMANDS_ENABLED: bool = os.getenv("ROOM_COMMANDS_ENABLED", "true").lower() == "true"
+    ROOM_COMMAND_QUEUE_SIZE: int = int(os.getenv("ROOM_COMMAND_QUEUE_SIZE", "256"))
+    ROOM_COMMAND_IDLE_SECONDS: float = float(os.getenv("ROOM_COMMAND_IDLE_SECONDS", "30"))
+    # Pré-génération du mastermind suivant (générations simultanées, période du rattrapage)
+    PREGEN_ENABLED: bool = os.getenv("PREGEN_ENABLED", "true").lower() == "true"
+    PREGEN_CONCURRENCY: int = int(os.getenv("PREGEN_CONCURRENCY", "4"))
+    PREGEN_SWEEP_SECONDS: float = float(os.getenv("PREGEN_SWEEP_SECONDS", "30"))
+    # Index du lobby : reconstruction complète périodique (changements des autres workers)
+    LOBBY_REFRESH_SECONDS: float = float(os.getenv("LOBBY_REFRESH_SECONDS", "10"))
+    # Détails de room en cache : durée de vie (mutations des autres workers)
+    ROOM_SNAPSHOT_TTL_SECONDS: float = float(os.getenv("ROOM_SNAPSHOT_TTL_SECONDS", "5"))
+    # Réparation périodique des statuts de room (rooms vides annulées, rooms annulées réoccupées)
+    ROOM_STATUS_REPAIR_SECONDS: float = float(os.getenv("ROOM_STATUS_REPAIR_SECONDS", "60"))
+
+    # === AFFINITÉ DES ROOMS (CLUSTER) ===
+    # Un processus par port : chaque worker doit être joignable à CLUSTER_ADVERTISE_URL
+    CLUSTER_ENABLED: bool = os.getenv("CLUSTER_ENABLED", "false").lower() == "true"
+    CLUSTER_BACKEND: str = os.getenv("CLUSTER_BACKEND", "redis")  # redis | file
+    CLUSTER_WORKER_ID: str = os.getenv("CLUSTER_WORKER_ID", "")
+    CLUSTER_ADVERTISE_URL: str = os.getenv("CLUSTER_ADVERTISE_URL", "http://localhost:8000")
+    CLUSTER_KEY_PREFIX: str = os.getenv("CLUSTER_KEY_PREFIX", "mastermind:cluster:")
+    CLUSTER_MEMBERSHIP_DIR: str = os.getenv("CLUSTER_MEMBERSHIP_DIR", "/tmp/mastermind-cluster")
+    CLUSTER_HEARTBEAT_SECONDS: float = float(os.getenv("CLUSTER_HEARTBEAT_SECONDS", "2"))
+    CLUSTER_MEMBER_TTL_SECONDS: float = float(os.getenv("CLUSTER_MEMBER_TTL_SECONDS", "6"))
+    CLUSTER_VNODES: int = int(os.getenv("CLUSTER_VNODES", "128"))
+    CLUSTER_PROXY_TIMEOUT_SECONDS: float = float(os.getenv("CLUSTER_PROXY_TIMEOUT_SECONDS", "10"))
 
     # === LOGGING ===
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
@@ -237,6 +308,14 @@ class Settings(BaseSettings):
             raise ValueError("QUANTUM_TIMEOUT doit être entre 5 et 300 secondes")
         return v
 
+    @field_validator('WORKERS')
+    @classmethod
+    def resolve_workers(cls, v):
+        # NOUVEAU: WEB_CONCURRENCY fixe le nombre réel de processus uvicorn, même si WORKERS
+        # (variable d'environnement ou .env) indique autre chose
+        web_concurrency = os.getenv("WEB_CONCURRENCY")
+        return int(web_concurrency) if web_concurrency else v
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -446,6 +525,70 @@ class WebSocketConfig:
     HEARTBEAT_INTERVAL = 30
     RECONNECT_ATTEMPTS = 5
 
+    # Coalescence des diffusions par tick (rooms volontaires)
+    BROADCAST_BYPASS_TYPES = ["chat_broadcast", "error"]
+    BROADCAST_FLUSH_TYPES = ["game_started", "game_finished", "mastermind_regenerated"]
+    BROADCAST_SUPERSEDED_TYPES = ["game_state_update", "game_state_snapshot", "game_state_delta"]
+
+    # Expiration des heartbeats (roue temporelle)
+    HEARTBEAT_WHEEL_RESOLUTION = 1.0  # secondes
+    HEARTBEAT_TIMEOUT_CLOSE_CODE = 4008
+    ROOM_REDIRECT_CLOSE_CODE = 4010  # Room possédée par un autre worker : se reconnecter à l'URL fournie
+
+    # Files d'envoi par connexion (backpressure)
+    OUTBOUND_SEND_TIMEOUT = 10  # secondes avant de considérer un client bloqué comme mort
+    OUTBOUND_DRAIN_TIMEOUT = 1.0  # secondes laissées au writer à la fermeture
+    SLOW_CONSUMER_CLOSE_CODE = 1013  # "Try Again Later"
+    COALESCIBLE_MESSAGE_TYPES = [
+        "game_state_update",
+        "game_state_snapshot",
+        "heartbeat_ack",
+        "pong"
+    ]
+
+    # Limitation de débit : catégorie de chaque type de message entrant (les autres : "default")
+    RATE_LIMIT_CATEGORIES = {
+        "chat_message": "chat",
+        "ping": "ping",
+        "heartbeat": "ping",
+        "make_attempt": "attempt",
+        "get_quantum_hint": "attempt"
+    }
+    # Catégories dont le dépassement est ignoré sans réponse (une erreur amplifierait le flot)
+    RATE_LIMIT_SILENT_CATEGORIES = ["ping"]
+    CONNECTION_LIMIT_CLOSE_CODE = 1008  # "Policy Violation" : trop de connexions pour cet utilisateur
+
+    # Voies de priorité des notifications, de la plus prioritaire à la moins prioritaire :
+    # poids du tourniquet, remplissage de la file à partir duquel la voie est échantillonnée
+    # (None = jamais) et latence visée de mise en file à livraison
+    NOTIFICATION_LANES = {
+        "critical": {"weight": 8, "shed_at": None, "slo_ms": 100},
+        "gameplay": {"weight": 4, "shed_at": 0.9, "slo_ms": 250},
+        "chat": {"weight": 2, "shed_at": 0.6, "slo_ms": 500},
+        "info": {"weight": 1, "shed_at": 0.4, "slo_ms": 2000}
+    }
+    NOTIFICATION_DEFAULT_LANE = "gameplay"
+    NOTIFICATION_LANE_TYPES = {
+        "game_started": "critical",
+        "game_finished": "critical",
+        "mastermind_completed": "critical",
+        "mastermind_transition": "critical",
+        "player_joined": "gameplay",
+        "player_left": "gameplay",
+        "welcome_message": "gameplay",
+        "attempt_submitted": "gameplay",
+        "item_used": "gameplay",
+        "effect_applied": "gameplay",
+        "effect_expired": "gameplay",
+        "quantum_hint_used": "gameplay",
+        "score_updated": "gameplay",
+        "chat_message": "chat",
+        "leaderboard_updated": "info",
+        "connection_status": "info",
+        "system_message": "info",
+        "server_maintenance": "info"
+    }
+
     # Messages autorisés
     ALLOWED_MESSAGE_TYPES = [
         "authenticate", "join_room", "leave_room",
@@ -5,13 +5,14 @@ CORRECTION: Ajout de l'initialisation de la base de données dans le cycle de vi
 NOUVEAU: Ajout du support multijoueur complet
 """
 import asyncio
+import re
 import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
 from app.api import auth, users, games
@@ -19,18 +20,28 @@ from app.api import auth, users, games
 # NOUVEAU: Import conditionnel du multiplayer
 try:
     from app.api import multiplayer
+    from app.services.multiplayer import multiplayer_service
     MULTIPLAYER_AVAILABLE = True
 except ImportError:
     MULTIPLAYER_AVAILABLE = False
     print("⚠️  Module multiplayer non trouvé, fonctionnalités multijoueur désactivées")
 
+from app.core.cluster import FORWARDED_HEADER, cluster_node
 from app.core.config import settings
 from app.core.database import init_db, close_db
 from app.services.quantum import quantum_service
+from app.services.lobby_index import lobby_index
+from app.services.room_snapshot_cache import room_snapshots
+from app.services.room_commands import room_commands
+from app.services.room_state_cache import room_state_cache
+from app.services.solution_pregen import solution_pregen
 
 # CORRECTION: Import conditionnel des WebSockets multiplayer
 try:
     from app.websocket.multiplayer import multiplayer_ws_manager, initialize_multiplayer_websocket, cleanup_multiplayer_websocket
+    from app.websocket.manager import initialize_websocket_manager, cleanup_websocket_manager
+    from app.services.notification import notification_service
+    from app.services.event_outbox import event_outbox
     WEBSOCKET_MULTIPLAYER_AVAILABLE = True
 except ImportError:
     WEBSOCKET_MULTIPLAYER_AVAILABLE = False
@@ -40,6 +51,10 @@ except ImportError:
         pass
     async def cleanup_multiplayer_websocket():
         pass
+    async def initialize_websocket_manager():
+        pass
+    async def cleanup_websocket_manager():
+        pass
 
 from app.utils.exceptions import (
     BaseQuantumMastermindError, get_http_status_code,
@@ -75,6 +90,13 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         logger.info("✅ Base de données initialisée avec succès")
+        # NOUVEAU: Écriture différée de l'état des rooms actives
+        room_state_cache.start()
+        solution_pregen.start()
+        lobby_index.start()
+        # NOUVEAU: Réparation des statuts et nettoyage des rooms abandonnées hors des lectures
+        if MULTIPLAYER_AVAILABLE:
+            multiplayer_service.start_maintenance(settings.ROOM_STATUS_REPAIR_SECONDS)
     except Exception as e:
         logger.error(f"❌ Erreur lors de l'initialisation de la base de données: {e}")
         raise
@@ -85,6 +107,9 @@ async def lifespan(app: FastAPI):
         logger.info("🔌 Initialisation des WebSockets multijoueur...")
         try:
             await initialize_multiplayer_websocket()
+            await initialize_websocket_manager()
+            notification_service.start()
+            event_outbox.start()
             websocket_initialized = True
             logger.info("✅ WebSockets multijoueur initialisés")
         except Exception as e:
@@ -92,6 +117,16 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("⚠️  WebSockets multijoueur non disponibles")
 
+    # NOUVEAU: Affinité des rooms (un worker propriétaire par room)
+    if cluster_node is not None:
+        cluster_node.add_listener(room_state_cache.release_foreign_rooms)
+        if WEBSOCKET_MULTIPLAYER_AVAILABLE:
+            cluster_node.add_listener(multiplayer_ws_manager.release_foreign_rooms)
+        try:
+            await cluster_node.start()
+        except Exception as e:
+            logger.error(f"❌ Erreur démarrage du nœud cluster: {e}")
+
     # Test du système quantique au démarrage
     try:
         quantum_status = await quantum_service.test_quantum_backend()
@@ -119,10 +154,21 @@ async def lifespan(app: FastAPI):
     # =====================================================
     logger.info("🔌 Arrêt de l'application...")
 
+    # NOUVEAU: Quitter le cluster avant de fermer les connexions
+    if cluster_node is not None:
+        await cluster_node.stop()
+
+    # NOUVEAU: Terminer les commandes de room en attente (leurs événements partent avec l'outbox)
+    await solution_pregen.stop()
+    await room_commands.stop()
+
     # CORRECTION: Fermeture des WebSockets seulement à l'arrêt
     if websocket_initialized and WEBSOCKET_MULTIPLAYER_AVAILABLE:
         logger.info("🔌 Fermeture des WebSockets multijoueur...")
         try:
+            await event_outbox.stop()
+            await notification_service.stop()
+            await cleanup_websocket_manager()
             await cleanup_multiplayer_websocket()
             logger.info("✅ WebSockets fermés proprement")
         except Exception as e:
@@ -131,6 +177,10 @@ async def lifespan(app: FastAPI):
     # Fermeture de la base de données
     logger.info("🗃️  Fermeture de la base de données...")
     try:
+        if MULTIPLAYER_AVAILABLE:
+            await multiplayer_service.stop_maintenance()
+        await lobby_index.stop()
+        await room_state_cache.stop()
         await close_db()
         logger.info("✅ Base de données fermée proprement")
     except Exception as e:
@@ -344,6 +394,39 @@ async def log_quantum_operations(request: Request, call_next):
 
     return response
 
+# NOUVEAU: Relais des mutations d'une room vers son worker propriétaire (mode cluster)
+ROOM_MUTATION_PATH = re.compile(r"^/api/v1/multiplayer/rooms/(?P<room_code>[^/]+)/[^/]+$")
+
+
+@app.middleware("http")
+async def route_room_to_owner(request: Request, call_next):
+    """Les mutations REST d'une room sont traitées par le worker qui la possède"""
+    if (
+            cluster_node is None
+            or request.method not in ("POST", "PUT", "PATCH", "DELETE")
+            or request.headers.get(FORWARDED_HEADER)
+    ):
+        return await call_next(request)
+
+    match = ROOM_MUTATION_PATH.match(request.url.path)
+    if not match or cluster_node.is_local(match["room_code"]):
+        return await call_next(request)
+
+    forwarded = await cluster_node.forward(
+        match["room_code"],
+        request.method,
+        request.url.path,
+        request.url.query,
+        request.headers.items(),
+        await request.body()
+    )
+    if forwarded is None:
+        # Propriétaire injoignable (transfert en cours) : traitement local
+        return await call_next(request)
+
+    status_code, headers, content = forwarded
+    return Response(content=content, status_code=status_code, headers=headers)
+
 # NOUVEAU: Middleware pour log des opérations multijoueur
 @app.middleware("http")
 async def log_multiplayer_operations(request: Request, call_next):
@@ -414,20 +497,31 @@ async def get_metrics():
                 "status": "unavailable"
             }
 
+        # NOUVEAU: État des rooms actives en mémoire
+        metrics["room_state_cache"] = room_state_cache.get_stats()
+        metrics["room_commands"] = room_commands.get_stats()
+        metrics["solution_pregen"] = solution_pregen.get_stats()
+        metrics["lobby_index"] = lobby_index.get_stats()
+        metrics["room_snapshots"] = room_snapshots.get_stats()
+
         # NOUVEAU: Métriques WebSocket multijoueur (si disponible)
         if WEBSOCKET_MULTIPLAYER_AVAILABLE:
             try:
+                from app.websocket.manager import websocket_manager
                 from app.websocket.multiplayer import multiplayer_ws_manager
+                # CORRECTION: Compteurs maintenus au fil des événements (lecture O(1)) ;
+                # l'attribut active_effects n'existait pas
+                ws_metrics = multiplayer_ws_manager.get_metrics()
+                generic_metrics = websocket_manager.get_metrics()
+                metrics["active_connections"] = ws_metrics["connections"] + generic_metrics["connections"]
                 metrics["websockets"] = {
                     "status": "operational",
-                    "total_rooms": len(multiplayer_ws_manager.multiplayer_rooms),
-                    "total_connections": sum(
-                        len(conns) for conns in multiplayer_ws_manager.room_connections.values()
-                    ),
-                    "active_effects": sum(
-                        len(effects) for effects in multiplayer_ws_manager.active_effects.values()
-                    )
+                    "total_rooms": ws_metrics["rooms"],
+                    "total_connections": ws_metrics["connections"],
+                    "multiplayer": ws_metrics,
+                    "generic": generic_metrics
                 }
+                metrics["event_outbox"] = event_outbox.get_stats()
             except Exception as e:
                 metrics["websockets"] = {
                     "status": "error",
@@ -9,8 +9,8 @@ from typing import List, Optional, Dict, Any
 from uuid import UUID, uuid4
 
 from sqlalchemy import (
-    Boolean, DateTime, Float, Integer, String, Text,
-    ForeignKey, Index, UniqueConstraint, CheckConstraint
+    BigInteger, Boolean, DateTime, Float, Integer, String, Text,
+    ForeignKey, Index, UniqueConstraint, CheckConstraint, text
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -535,6 +535,95 @@ class WebSocketSession(Base):
         return f"<WebSocketSession(id={self.session_id}, user_id={self.user_id}, status={self.status})>"
 
 
+# =====================================================
+# OUTBOX DES ÉVÉNEMENTS DE JEU
+# =====================================================
+
+class GameEventOutbox(Base):
+    """
+    Événements de jeu à diffuser, écrits dans la transaction du changement d'état
+    NOUVEAU: Relayés après commit par app/services/event_outbox.py (ordre = id)
+    """
+    __tablename__ = "game_event_outbox"
+
+    # === CLÉS ===
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+
+    # === ÉVÉNEMENT ===
+    room_code: Mapped[str] = mapped_column(String(10), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSONB, default=dict, nullable=False)
+
+    # === MÉTADONNÉES TEMPORELLES ===
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    # === CONTRAINTES ===
+    __table_args__ = (
+        # Le relais ne lit que les événements en attente, dans l'ordre
+        Index("idx_outbox_pending", "id", postgresql_where=text("delivered_at IS NULL")),
+        Index("idx_outbox_delivered_at", "delivered_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GameEventOutbox(id={self.id}, room={self.room_code}, type={self.event_type})>"
+
+
+# =====================================================
+# SOLUTIONS PAR JOUEUR
+# =====================================================
+
+class GamePlayerSolution(Base):
+    """
+    Mastermind en cours d'un joueur (solution secrète et compteur de tentatives)
+    NOUVEAU: Remplace settings["player_solutions"] de games : une ligne étroite par
+    joueur, modifiée par un UPDATE ciblé au lieu de réécrire tout le document JSONB
+    """
+    __tablename__ = "game_player_solutions"
+
+    # === CLÉS (une ligne par joueur et par partie) ===
+    game_id: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("games.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    player_id: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    # === PROGRESSION ===
+    mastermind_number: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    solution: Mapped[List[int]] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Solution du mastermind suivant, pré-générée en tâche de fond (app/services/solution_pregen.py)
+    next_solution: Mapped[Optional[List[int]]] = mapped_column(JSONB)
+
+    # === MÉTADONNÉES TEMPORELLES ===
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+
+    # === CONTRAINTES ===
+    __table_args__ = (
+        CheckConstraint("mastermind_number >= 1", name="ck_player_solutions_mastermind_positive"),
+        CheckConstraint("attempts >= 0", name="ck_player_solutions_attempts_positive"),
+        # La clé primaire (game_id, player_id) sert les lectures par partie ; suppression des users
+        Index("idx_player_solutions_player", "player_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<GamePlayerSolution(game_id={self.game_id}, player_id={self.player_id}, mastermind={self.mastermind_number})>"
+
+
 # =====================================================
 # FONCTIONS UTILITAIRES POUR LES MODÈLES
 # =====================================================
@@ -576,6 +665,8 @@ __all__ = [
     "PlayerLeaderboard",
     "GameItem",
     "WebSocketSession",
+    "GameEventOutbox",
+    "GamePlayerSolution",
 
     # Fonctions utilitaires
     "get_active_multiplayer_games_count",
@@ -35,6 +35,9 @@ class MultiplayerGameCreateRequest(BaseModel):
     items_enabled: bool = Field(default=True, description="Activer les objets")
     items_per_mastermind: int = Field(default=1, ge=0, le=3, description="Objets par mastermind")
 
+    # NOUVEAU: Diffusion groupée par tick (utile pour les rooms chargées)
+    broadcast_batching: Optional[bool] = Field(default=None, description="Grouper les événements temps réel par tick (~50 ms)")
+
     # Solution personnalisée (optionnelle, stockée dans settings)
     solution: Optional[List[int]] = Field(None, description="Solution personnalisée")
 
@@ -0,0 +1,112 @@
+"""
+Schémas des messages WebSocket entrants (client → serveur)
+NOUVEAU: Chaque type de message déclare la forme de son champ `data`. Les schémas sont
+des TypedDict : la validation (TypeAdapter, compilée une fois au démarrage) produit
+directement un dict typé, sans instancier de modèle par message.
+"""
+from typing import List, Union
+from uuid import UUID
+
+from pydantic import AfterValidator, Field
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+# Longueur maximale d'un message de chat (au-delà, le texte est tronqué)
+CHAT_MESSAGE_MAX_LENGTH = 500
+
+
+def _canonical_uuid(value: str) -> str:
+    """UUID textuel normalisé (les handlers l'utilisent aussi comme nom de room)"""
+    return str(UUID(value))
+
+
+def _chat_text(value: str) -> str:
+    text = value.strip()[:CHAT_MESSAGE_MAX_LENGTH]
+    if not text:
+        raise ValueError("Message vide")
+    return text
+
+
+# === TYPES DE CHAMPS ===
+
+UuidStr = Annotated[str, Field(max_length=64), AfterValidator(_canonical_uuid)]
+Identifier = Annotated[str, Field(min_length=1, max_length=100)]
+ChatText = Annotated[str, Field(max_length=4 * CHAT_MESSAGE_MAX_LENGTH), AfterValidator(_chat_text)]
+
+
+# === MESSAGES COMMUNS ===
+
+class EmptyPayload(TypedDict):
+    """Message sans données (les clés supplémentaires sont ignorées)"""
+
+
+class PingPayload(TypedDict, total=False):
+    """Ping / heartbeat : l'horodatage du client est renvoyé tel quel"""
+    timestamp: Union[float, str]
+
+
+# === MULTIJOUEUR (app/websocket/multiplayer.py) ===
+
+class ChatMessagePayload(TypedDict):
+    """Message de chat dans la room de la connexion"""
+    message: ChatText
+    is_creator: NotRequired[bool]
+
+
+# === GESTIONNAIRE GÉNÉRIQUE (app/websocket/handlers.py) ===
+
+class AuthenticatePayload(TypedDict):
+    token: Annotated[str, Field(min_length=1, max_length=4096)]
+
+
+class RoomPayload(TypedDict):
+    room_id: Identifier
+
+
+class RoomChatPayload(TypedDict):
+    room_code: Identifier
+    message: ChatText
+
+
+class GamePayload(TypedDict):
+    """Action sur une partie (démarrage, pause, état, spectateur...)"""
+    game_id: UuidStr
+
+
+class MakeAttemptPayload(TypedDict):
+    game_id: UuidStr
+    combination: Annotated[List[int], Field(min_length=1, max_length=20)]
+
+
+class QuantumHintPayload(TypedDict):
+    game_id: UuidStr
+    hint_type: NotRequired[Annotated[str, Field(max_length=50)]]
+
+
+class InvitePlayerPayload(TypedDict):
+    username: Identifier
+    game_id: UuidStr
+    message: NotRequired[Annotated[str, Field(max_length=CHAT_MESSAGE_MAX_LENGTH)]]
+
+
+class InvitationReplyPayload(TypedDict):
+    """Acceptation ou refus d'une invitation"""
+    game_id: UuidStr
+    inviter_id: UuidStr
+    username: NotRequired[Annotated[str, Field(max_length=100)]]
+    reason: NotRequired[Annotated[str, Field(max_length=CHAT_MESSAGE_MAX_LENGTH)]]
+
+
+__all__ = [
+    "CHAT_MESSAGE_MAX_LENGTH",
+    "EmptyPayload",
+    "PingPayload",
+    "ChatMessagePayload",
+    "AuthenticatePayload",
+    "RoomPayload",
+    "RoomChatPayload",
+    "GamePayload",
+    "MakeAttemptPayload",
+    "QuantumHintPayload",
+    "InvitePlayerPayload",
+    "InvitationReplyPayload"
+]
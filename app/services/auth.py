@@ -16,6 +16,7 @@ from app.core.security import (
 from app.core.config import settings
 from app.models.user import User
 from app.repositories.user import UserRepository
+from app.services.auth_cache import auth_cache
 from app.schemas.auth import (
     LoginRequest, LoginResponse, RegisterRequest, RegisterResponse,
     PasswordResetRequest, PasswordResetConfirm, PasswordChangeRequest,
@@ -305,6 +306,9 @@ class AuthService:
         """
         # TODO: Ajouter le token à une blacklist Redis
 
+        # Claims et identité en cache oubliés (connexions WebSocket)
+        auth_cache.invalidate_user(user_id)
+
         # Log de déconnexion
         security_auditor.log_security_event(
             "user_logout",
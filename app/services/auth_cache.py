@@ -0,0 +1,291 @@
+"""
+Cache d'authentification des connexions WebSocket
+NOUVEAU: Une vague de reconnexions (redéploiement, coupure réseau) ne doit pas
+solliciter la base de données à chaque connexion. Ce cache conserve pour une
+courte durée les claims des tokens déjà vérifiés, l'identité des utilisateurs
+actifs et le résultat de la recherche des rooms (y compris les codes inconnus).
+
+Les entrées sont invalidées localement lors d'une déconnexion, d'une désactivation,
+d'une suppression de compte, d'un changement de profil et de l'annulation ou de la
+création d'une room ; sur les autres workers, elles expirent au plus après le TTL.
+"""
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar, Union
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import jwt_manager
+from app.models.game import Game
+from app.models.user import User
+from app.utils.exceptions import AuthenticationError
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+# Marqueur d'une room connue comme inexistante
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """Dictionnaire borné à expiration (le plus ancien est évincé quand il est plein)"""
+
+    def __init__(self, ttl: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self.clock = clock
+        self._entries: Dict[Hashable, Tuple[float, V]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        # Réinsertion en fin : l'ordre du dict reste celui des écritures
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (self.clock() + ttl, value)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+class CachedIdentity:
+    """Identité d'un utilisateur actif (jamais l'objet ORM : il est lié à sa session)"""
+
+    __slots__ = ("user_id", "username")
+
+    def __init__(self, user_id: UUID, username: str):
+        self.user_id = user_id
+        self.username = username
+
+    @property
+    def id(self) -> UUID:
+        return self.user_id
+
+
+class CachedRoom:
+    """Informations d'une room nécessaires à la connexion WebSocket"""
+
+    __slots__ = ("id", "room_code", "settings")
+
+    def __init__(self, game_id: UUID, room_code: str, room_settings: Optional[Dict[str, Any]]):
+        self.id = game_id
+        self.room_code = room_code
+        self.settings = dict(room_settings or {})
+
+
+class AuthCache:
+    """Claims de tokens, identités et rooms mis en cache pour les connexions WebSocket"""
+
+    def __init__(
+            self,
+            ttl: float,
+            negative_ttl: float,
+            max_entries: int,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            ttl: Durée de vie des claims, identités et rooms trouvées (secondes, 0 = désactivé)
+            negative_ttl: Durée de vie d'un code de room inconnu (secondes)
+            max_entries: Taille maximale de chaque cache
+        """
+        # empreinte du token -> (claims, instant de mise en cache)
+        self.claims: TTLCache[Tuple[Dict[str, Any], float]] = TTLCache(ttl, max_entries, clock)
+        self.users: TTLCache[CachedIdentity] = TTLCache(ttl, max_entries, clock)
+        self.rooms: TTLCache[Union[CachedRoom, object]] = TTLCache(ttl, max_entries, clock)
+        self.negative_ttl = float(negative_ttl)
+        self.clock = clock
+
+        # Utilisateurs invalidés -> instant de l'invalidation : les claims mis en cache
+        # avant cet instant sont ignorés (aucun index token par utilisateur à maintenir)
+        self._revoked: TTLCache[float] = TTLCache(ttl, max_entries, clock)
+
+    # === TOKENS ===
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        """Empreinte du token : le secret lui-même n'est pas conservé en mémoire"""
+        return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+    def verify_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Vérifie un token JWT (claims en cache jusqu'au TTL, sans dépasser `exp`)
+
+        Returns:
+            Claims du token si valide, None sinon
+        """
+        key = self._token_key(token)
+        cached = self.claims.get(key)
+        if cached is not None:
+            claims, cached_at = cached
+            exp = claims.get("exp")
+            revoked_at = self._revoked.get(str(claims["sub"])) if len(self._revoked) else None
+            if (exp is None or exp > time.time()) and (revoked_at is None or cached_at > revoked_at):
+                return claims
+            self.claims.pop(key)
+
+        claims = jwt_manager.verify_token(token)
+        if not claims or not claims.get("sub"):
+            return None
+
+        exp = claims.get("exp")
+        self.claims.set(key, (claims, self.clock()), ttl=(exp - time.time()) if exp is not None else None)
+        return claims
+
+    # === UTILISATEURS ===
+
+    async def get_user(self, db: AsyncSession, user_id: Union[str, UUID]) -> Optional[CachedIdentity]:
+        """
+        Identité d'un utilisateur actif
+
+        Returns:
+            L'identité, ou None si l'utilisateur n'existe pas ou est désactivé
+        """
+        user_uuid = user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+        identity = self.users.get(user_uuid)
+        if identity is not None:
+            return identity
+
+        result = await db.execute(
+            select(User.id, User.username, User.is_active).where(User.id == user_uuid)
+        )
+        row = result.one_or_none()
+        if row is None or not row.is_active:
+            return None
+
+        identity = CachedIdentity(row.id, row.username)
+        self.users.set(user_uuid, identity)
+        return identity
+
+    async def authenticate(self, db: AsyncSession, token: str) -> CachedIdentity:
+        """
+        Équivalent de auth_service.get_current_user() servi depuis le cache
+
+        Raises:
+            AuthenticationError: Token invalide, utilisateur introuvable ou désactivé
+        """
+        claims = self.verify_token(token)
+        if not claims:
+            raise AuthenticationError("Token invalide")
+
+        try:
+            identity = await self.get_user(db, claims["sub"])
+        except ValueError:
+            raise AuthenticationError("Token invalide")
+
+        if identity is None:
+            raise AuthenticationError("Utilisateur introuvable ou désactivé")
+        return identity
+
+    def invalidate_user(self, user_id: Union[str, UUID]) -> None:
+        """Oublie l'identité et les tokens d'un utilisateur (déconnexion, désactivation, profil)"""
+        try:
+            self.users.pop(user_id if isinstance(user_id, UUID) else UUID(str(user_id)))
+        except ValueError:
+            pass
+        self._revoked.set(str(user_id), self.clock())
+
+    def invalidate_token(self, token: str) -> None:
+        self.claims.pop(self._token_key(token))
+
+    # === ROOMS ===
+
+    async def get_room(self, db: AsyncSession, room_code: str) -> Optional[CachedRoom]:
+        """
+        Room par code ; les codes inconnus sont mémorisés `negative_ttl` secondes
+
+        Returns:
+            La room, ou None si aucune partie ne porte ce code
+        """
+        cached = self.rooms.get(room_code)
+        if cached is _MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        result = await db.execute(
+            select(Game.id, Game.room_code, Game.settings).where(Game.room_code == room_code)
+        )
+        row = result.first()
+        if row is None:
+            self.rooms.set(room_code, _MISSING, ttl=self.negative_ttl)
+            return None
+
+        room = CachedRoom(row.id, row.room_code, row.settings)
+        self.rooms.set(room_code, room)
+        return room
+
+    def invalidate_room(self, room_code: Optional[str]) -> None:
+        """Oublie une room (création, annulation, changement de paramètres)"""
+        if room_code:
+            self.rooms.pop(room_code)
+
+    # === MAINTENANCE ===
+
+    def clear(self) -> None:
+        self.claims.clear()
+        self.users.clear()
+        self.rooms.clear()
+        self._revoked.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "claims": self.claims.get_stats(),
+            "users": self.users.get_stats(),
+            "rooms": self.rooms.get_stats()
+        }
+
+
+# Instance globale
+auth_cache = AuthCache(
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    negative_ttl=settings.AUTH_CACHE_NEGATIVE_TTL_SECONDS,
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
+
+__all__ = [
+    "TTLCache",
+    "CachedIdentity",
+    "CachedRoom",
+    "AuthCache",
+    "auth_cache"
+]
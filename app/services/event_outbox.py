@@ -0,0 +1,289 @@
+"""
+Outbox transactionnelle des événements de jeu
+NOUVEAU: Les événements (tentative, fin de partie, état de la room...) sont écrits
+dans la table game_event_outbox par la transaction qui modifie l'état : ils sont
+validés ou annulés avec elle. La requête HTTP se termine au commit ; un relais en
+tâche de fond lit les événements en attente, les diffuse par lots (dans l'ordre de
+leur id pour une même room) puis les marque livrés en un seul UPDATE.
+
+Le relais est réveillé dès le commit d'une transaction qui a écrit des événements
+(même processus) et interroge la table toutes les OUTBOX_POLL_SECONDS secondes
+(événements des autres workers, reprise après un arrêt). Un verrou consultatif
+PostgreSQL garantit qu'un seul worker relaie à la fois : l'ordre par room tient
+même avec plusieurs workers. La livraison est « au moins une fois ».
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.models.multijoueur import GameEventOutbox
+
+# Import conditionnel pour WebSocket
+try:
+    from app.websocket.multiplayer import multiplayer_ws_manager
+
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    multiplayer_ws_manager = None
+    WEBSOCKET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Événement recalculé par le relais (état public de la room) au lieu d'être diffusé tel quel
+ROOM_STATE_EVENT = "room_state"
+
+# Verrou consultatif du relais (un seul worker relaie à la fois)
+_RELAY_LOCK_KEY = 0x6F7574626F78
+
+# Marqueur posé sur la session quand elle a écrit des événements
+_PENDING_KEY = "event_outbox_pending"
+
+# Cycles du relais entre deux purges des événements livrés
+_PURGE_EVERY = 600
+
+EventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class EventOutbox:
+    """Écriture des événements dans la transaction courante et relais après commit"""
+
+    def __init__(self, poll_interval: float = 1.0, batch_size: int = 200, retention_hours: int = 24):
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.retention = timedelta(hours=retention_hours)
+
+        # Types d'événements traités par un handler plutôt que diffusés tels quels
+        self.handlers: Dict[str, EventHandler] = {}
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._cycles = 0
+
+        # Statistiques
+        self.written = 0
+        self.delivered = 0
+        self.batches = 0
+        self.delivery_errors = 0
+        self.lock_contended = 0
+        self.purged = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    # === ÉCRITURE (dans la transaction de l'appelant) ===
+
+    def add(self, db: AsyncSession, room_code: str, message: Dict[str, Any]) -> None:
+        """
+        Ajoute un message WebSocket à diffuser dans la room après le commit
+
+        Args:
+            db: Session de la transaction qui modifie l'état
+            room_code: Room cible
+            message: Message complet ({"type": ..., "data": ...})
+        """
+        self._add(db, room_code, message.get("type", "event"), message)
+
+    def add_room_state(self, db: AsyncSession, room_code: str) -> None:
+        """Demande la diffusion de l'état de la room après le commit (un seul par lot et par room)"""
+        self._add(db, room_code, ROOM_STATE_EVENT, {})
+
+    def _add(self, db: AsyncSession, room_code: str, event_type: str, payload: Dict[str, Any]) -> None:
+        db.add(GameEventOutbox(room_code=room_code, event_type=event_type, payload=payload))
+        db.info[_PENDING_KEY] = True
+        self.written += 1
+
+    def register_handler(self, event_type: str, handler: EventHandler) -> None:
+        """Traite les événements `event_type` par `handler(room_code, payload)` (sa propre session)"""
+        self.handlers[event_type] = handler
+
+    def wake(self) -> None:
+        """Réveille le relais (appelé après le commit d'une transaction qui a écrit des événements)"""
+        self._wakeup.set()
+
+    # === RELAIS ===
+
+    async def relay_once(self) -> int:
+        """
+        Relaie un lot d'événements en attente
+
+        Returns:
+            Nombre d'événements lus (0 si rien en attente ou si un autre worker relaie)
+        """
+        async with get_db_context() as db:
+            # Verrou libéré à la fin de la transaction
+            locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_RELAY_LOCK_KEY)))).scalar()
+            if not locked:
+                self.lock_contended += 1
+                return 0
+
+            self._cycles += 1
+            if self._cycles % _PURGE_EVERY == 0:
+                await self._purge(db)
+
+            rows = (await db.execute(
+                select(
+                    GameEventOutbox.id,
+                    GameEventOutbox.room_code,
+                    GameEventOutbox.event_type,
+                    GameEventOutbox.payload,
+                    GameEventOutbox.created_at
+                )
+                .where(GameEventOutbox.delivered_at.is_(None))
+                .order_by(GameEventOutbox.id)
+                .limit(self.batch_size)
+            )).all()
+            if not rows:
+                return 0
+
+            # Regroupement par room (ordre des id conservé dans chaque room)
+            by_room: Dict[str, List[Any]] = {}
+            for row in rows:
+                by_room.setdefault(row.room_code, []).append(row)
+
+            delivered_ids: List[int] = []
+            for room_code, events in by_room.items():
+                try:
+                    await self._deliver_room(room_code, events)
+                except Exception as e:
+                    # Les événements de la room restent en attente : l'ordre est préservé au prochain cycle
+                    self.delivery_errors += 1
+                    logger.warning(f"⚠️ Échec relais outbox {room_code} ({len(events)} événements): {e}")
+                    continue
+                delivered_ids.extend(row.id for row in events)
+                self._record_latency(events)
+
+            if delivered_ids:
+                await db.execute(
+                    update(GameEventOutbox)
+                    .where(GameEventOutbox.id.in_(delivered_ids))
+                    .values(delivered_at=func.now())
+                )
+
+            self.batches += 1
+            self.delivered += len(delivered_ids)
+            return len(rows)
+
+    async def _deliver_room(self, room_code: str, events: List[Any]) -> None:
+        """Diffuse les événements d'une room ; les messages consécutifs partent en une trame groupée"""
+        # Seul le dernier événement d'un type traité par handler est utile (ex. état de la room)
+        last_handled = {row.event_type: index for index, row in enumerate(events) if row.event_type in self.handlers}
+
+        messages: List[Dict[str, Any]] = []
+        for index, row in enumerate(events):
+            handler = self.handlers.get(row.event_type)
+            if handler is None:
+                messages.append(row.payload)
+                continue
+            if last_handled[row.event_type] != index:
+                continue
+
+            await self._broadcast(room_code, messages)
+            messages = []
+            await handler(room_code, row.payload)
+
+        await self._broadcast(room_code, messages)
+
+    def _record_latency(self, events: List[Any]) -> None:
+        """Délai entre l'écriture (horloge de l'application) et la diffusion"""
+        now = datetime.now(timezone.utc)
+        for row in events:
+            latency = (now - row.created_at).total_seconds()
+            self.total_latency += latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+
+    @staticmethod
+    async def _broadcast(room_code: str, messages: List[Dict[str, Any]]) -> None:
+        if not messages:
+            return
+        if len(messages) == 1:
+            await multiplayer_ws_manager.broadcast_to_room(room_code, messages[0])
+        else:
+            await multiplayer_ws_manager.notify_room_batch(room_code, [(message, None) for message in messages])
+
+    async def _purge(self, db: AsyncSession) -> None:
+        """Supprime les événements livrés depuis plus de OUTBOX_RETENTION_HOURS"""
+        cutoff = datetime.now(timezone.utc) - self.retention
+        result = await db.execute(delete(GameEventOutbox).where(GameEventOutbox.delivered_at < cutoff))
+        self.purged += result.rowcount or 0
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await self.relay_once()
+            except Exception as e:
+                logger.error(f"❌ Erreur relais outbox: {e}")
+                processed = 0
+
+            # Lot plein : d'autres événements attendent, on enchaîne sans attendre
+            if processed >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # === CYCLE DE VIE ===
+
+    def start(self) -> None:
+        if WEBSOCKET_AVAILABLE and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+            logger.info("📤 Relais outbox des événements de jeu démarré")
+
+    async def stop(self) -> None:
+        """Arrête le relais après un dernier lot (les événements restants partiront au redémarrage)"""
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            try:
+                await self.relay_once()
+            except Exception as e:
+                logger.warning(f"⚠️ Dernier relais outbox impossible: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "written": self.written,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "delivery_errors": self.delivery_errors,
+            "lock_contended": self.lock_contended,
+            "purged": self.purged,
+            "avg_latency_ms": round(self.total_latency / self.delivered * 1000, 3) if self.delivered else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3)
+        }
+
+
+# Instance globale
+event_outbox = EventOutbox(
+    poll_interval=settings.OUTBOX_POLL_SECONDS,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    retention_hours=settings.OUTBOX_RETENTION_HOURS
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_relay_after_commit(session: Session) -> None:
+    """Les événements écrits sont visibles : le relais peut les diffuser sans attendre le prochain cycle"""
+    if session.info.pop(_PENDING_KEY, False):
+        event_outbox.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+__all__ = ["ROOM_STATE_EVENT", "EventOutbox", "event_outbox"]
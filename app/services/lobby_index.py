@@ -0,0 +1,328 @@
+"""
+Index en mémoire du lobby (parties publiques en attente)
+NOUVEAU: get_public_rooms chargeait chaque partie listée avec toutes ses
+participations et leurs joueurs pour compter les joueurs actifs, annulait les
+rooms vides par un commit au milieu d'une lecture, paginait par OFFSET et lançait
+un COUNT à chaque appel. C'est l'endpoint le plus interrogé de l'application.
+
+L'index conserve les rooms publiques waiting/starting avec leur nombre de joueurs
+actifs déjà calculé, triées par date de création décroissante. Il est tenu à jour
+par les mutations (création, arrivée, départ, démarrage, annulation) et reconstruit
+périodiquement en une requête agrégée (changements faits par les autres workers).
+Le lobby devient une lecture mémoire avec filtres (difficulté, mode quantique) et
+curseurs de pagination stables (keyset).
+"""
+import asyncio
+import base64
+import binascii
+import bisect
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.models.game import Game, GameParticipation
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Statuts listés dans le lobby
+LOBBY_STATUSES = ("waiting", "starting")
+
+# Statuts de participation qui ne comptent plus comme joueur actif
+INACTIVE_PARTICIPATION_STATUSES = ("left", "disconnected", "eliminated")
+
+# Clé de tri : (-horodatage de création, room_code) → plus récente d'abord, ordre total
+SortKey = Tuple[float, str]
+
+
+class LobbyEntry:
+    """Room publique listée dans le lobby"""
+
+    __slots__ = (
+        "game_id", "room_code", "game_type", "difficulty", "status", "max_players", "current_players",
+        "allow_spectators", "enable_chat", "quantum_enabled", "created_at", "creator_id", "creator_username"
+    )
+
+    def __init__(self, row: Any):
+        self.game_id: UUID = row.id
+        self.room_code: str = row.room_code
+        self.game_type: str = row.game_type
+        self.difficulty: str = row.difficulty
+        self.status: str = row.status
+        self.max_players: int = row.max_players
+        self.current_players: int = row.current_players
+        self.allow_spectators: bool = row.allow_spectators
+        self.enable_chat: bool = row.enable_chat
+        self.quantum_enabled: bool = row.quantum_enabled
+        self.created_at: datetime = row.created_at
+        self.creator_id: UUID = row.creator_id
+        self.creator_username: Optional[str] = row.creator_username
+
+    @property
+    def sort_key(self) -> SortKey:
+        return -self.created_at.timestamp(), self.room_code
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Format historique de get_public_rooms"""
+        return {
+            "id": str(self.game_id),
+            "room_code": self.room_code,
+            "name": f"Partie {self.room_code}",
+            "game_type": self.game_type,
+            "difficulty": self.difficulty,
+            "status": self.status,
+            "max_players": self.max_players,
+            "current_players": self.current_players,
+            "is_private": False,
+            "password_protected": False,
+            "allow_spectators": self.allow_spectators,
+            "enable_chat": self.enable_chat,
+            "quantum_enabled": self.quantum_enabled,
+            "created_at": self.created_at.isoformat(),
+            "creator": {
+                "id": str(self.creator_id),
+                "username": self.creator_username
+            }
+        }
+
+
+def encode_cursor(key: SortKey) -> str:
+    """Curseur opaque : position après la dernière room renvoyée"""
+    raw = f"{-key[0]!r}|{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[SortKey]:
+    """None si le curseur est invalide (la pagination repart du début)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, room_code = raw.split("|", 1)
+        return -float(timestamp), room_code
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class LobbyIndex:
+    """Rooms publiques en attente, triées, avec compteurs par filtre"""
+
+    def __init__(self, refresh_interval: float = 10.0):
+        """
+        Args:
+            refresh_interval: Période de reconstruction complète depuis la base (secondes)
+        """
+        self.refresh_interval = refresh_interval
+
+        self.entries: Dict[str, LobbyEntry] = {}
+        self._keys: List[SortKey] = []
+        # (difficulté, quantique) -> rooms listables (au moins un joueur actif)
+        self._counts: Dict[Tuple[str, bool], int] = {}
+
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistiques
+        self.queries = 0
+        self.room_refreshes = 0
+        self.rebuilds = 0
+        self.refresh_errors = 0
+
+    # === REQUÊTES ===
+
+    @staticmethod
+    def _build_query():
+        """Rooms publiques en attente avec créateur et nombre de joueurs actifs (une requête agrégée)"""
+        active_players = (
+            select(func.count(GameParticipation.id))
+            .join(User, User.id == GameParticipation.player_id)
+            .where(and_(
+                GameParticipation.game_id == Game.id,
+                GameParticipation.status.notin_(INACTIVE_PARTICIPATION_STATUSES)
+            ))
+            .correlate(Game)
+            .scalar_subquery()
+        )
+        return (
+            select(
+                Game.id, Game.room_code, Game.game_type, Game.difficulty, Game.status, Game.max_players,
+                Game.allow_spectators, Game.enable_chat, Game.quantum_enabled, Game.created_at,
+                Game.creator_id, User.username.label("creator_username"),
+                active_players.label("current_players")
+            )
+            .outerjoin(User, User.id == Game.creator_id)
+            .where(and_(
+                Game.is_private == False,  # noqa: E712
+                Game.status.in_(LOBBY_STATUSES)
+            ))
+        )
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """Recharge tout l'index ; retourne le nombre de rooms"""
+        rows = (await db.execute(self._build_query())).all()
+
+        self.entries = {row.room_code: LobbyEntry(row) for row in rows}
+        self._keys = sorted(entry.sort_key for entry in self.entries.values())
+        self._counts = {}
+        for entry in self.entries.values():
+            self._count(entry, 1)
+
+        self._loaded = True
+        self.rebuilds += 1
+        return len(self.entries)
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self._loaded:
+            await self.rebuild(db)
+
+    # === MISES À JOUR (après le commit des mutations) ===
+
+    async def refresh_room(self, db: AsyncSession, room_code: str) -> None:
+        """Relit une room (création, arrivée, départ) : ajoutée, mise à jour ou retirée"""
+        if not self._loaded:
+            return
+
+        self.room_refreshes += 1
+        try:
+            row = (await db.execute(self._build_query().where(Game.room_code == room_code))).one_or_none()
+        except Exception as e:
+            # La reconstruction périodique corrigera l'index
+            self.refresh_errors += 1
+            logger.warning(f"⚠️ Lobby: relecture de {room_code} impossible: {e}")
+            return
+
+        self.remove(room_code)
+        if row is not None:
+            self._insert(LobbyEntry(row))
+
+    def remove(self, room_code: str) -> None:
+        """Retire une room (démarrée, annulée, supprimée)"""
+        entry = self.entries.pop(room_code, None)
+        if entry is None:
+            return
+        index = bisect.bisect_left(self._keys, entry.sort_key)
+        if index < len(self._keys) and self._keys[index] == entry.sort_key:
+            del self._keys[index]
+        self._count(entry, -1)
+
+    def _insert(self, entry: LobbyEntry) -> None:
+        self.entries[entry.room_code] = entry
+        bisect.insort(self._keys, entry.sort_key)
+        self._count(entry, 1)
+
+    def _count(self, entry: LobbyEntry, delta: int) -> None:
+        # Les rooms sans joueur actif ne sont pas listées (nettoyées par cleanup_abandoned_games)
+        if entry.current_players > 0:
+            key = (entry.difficulty, entry.quantum_enabled)
+            self._counts[key] = self._counts.get(key, 0) + delta
+
+    # === LECTURE ===
+
+    def query(
+            self,
+            limit: int = 20,
+            cursor: Optional[str] = None,
+            offset: int = 0,
+            difficulty: Optional[str] = None,
+            quantum_enabled: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Page du lobby
+
+        Args:
+            limit: Rooms par page
+            cursor: Curseur renvoyé par la page précédente (prioritaire sur offset)
+            offset: Rooms à sauter (pagination par numéro de page)
+            difficulty: Filtre de difficulté
+            quantum_enabled: Filtre du mode quantique
+
+        Returns:
+            rooms, total, has_more et next_cursor
+        """
+        self.queries += 1
+
+        start = 0
+        if cursor:
+            key = decode_cursor(cursor)
+            if key is not None:
+                start = bisect.bisect_right(self._keys, key)
+                offset = 0
+
+        rooms: List[Dict[str, Any]] = []
+        last_key: Optional[SortKey] = None
+        has_more = False
+        for key in self._keys[start:]:
+            entry = self.entries[key[1]]
+            if entry.current_players <= 0:
+                continue
+            if difficulty and entry.difficulty != difficulty:
+                continue
+            if quantum_enabled is not None and entry.quantum_enabled != quantum_enabled:
+                continue
+            if offset > 0:
+                offset -= 1
+                continue
+            if len(rooms) == limit:
+                has_more = True
+                break
+            rooms.append(entry.to_dict())
+            last_key = key
+
+        total = sum(
+            count for (entry_difficulty, entry_quantum), count in self._counts.items()
+            if (not difficulty or entry_difficulty == difficulty)
+            and (quantum_enabled is None or entry_quantum == quantum_enabled)
+        )
+
+        return {
+            "rooms": rooms,
+            "total": total,
+            "has_more": has_more,
+            "next_cursor": encode_cursor(last_key) if has_more and last_key is not None else None
+        }
+
+    # === CYCLE DE VIE ===
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                async with get_db_context() as db:
+                    await self.rebuild(db)
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.error(f"❌ Erreur reconstruction du lobby: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "rooms": len(self.entries),
+            "listed": sum(self._counts.values()),
+            "queries": self.queries,
+            "room_refreshes": self.room_refreshes,
+            "rebuilds": self.rebuilds,
+            "refresh_errors": self.refresh_errors
+        }
+
+
+# Instance globale
+lobby_index = LobbyIndex(refresh_interval=settings.LOBBY_REFRESH_SECONDS)
+
+__all__ = ["LobbyEntry", "LobbyIndex", "lobby_index"]
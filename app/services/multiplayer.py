@@ -3,6 +3,7 @@ Service Multijoueur complet pour cohérence avec le frontend React.js
 Toutes les méthodes attendues par le frontend sont implémentées avec intégration quantique
 COMPLET: Génération de toutes les méthodes manquantes pour le backend
 """
+import asyncio
 import json
 import logging
 import random
@@ -11,7 +12,7 @@ from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from sqlalchemy import select, and_, func, update, text
+from sqlalchemy import select, and_, delete, func, insert, update, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -42,20 +43,35 @@ except ImportError as e:
 from app.models.game import Game, GameStatus, GameParticipation, GameType, ParticipationStatus, \
     generate_room_code, GameAttempt
 from app.models.multijoueur import (
-    MultiplayerGame
+    MultiplayerGame, GamePlayerSolution
 )
 from app.models.user import User
 from app.schemas.multiplayer import (
     MultiplayerGameCreateRequest, MultiplayerAttemptRequest,
     ItemUseRequest, QuantumHintRequest, QuantumHintResponse
 )
+from app.core.database import get_db_context
+from app.services.auth_cache import auth_cache
+from app.services.event_outbox import ROOM_STATE_EVENT, event_outbox
+from app.services.lobby_index import lobby_index
+from app.services.room_commands import room_command
+from app.services.room_snapshot_cache import RoomSnapshot, room_snapshots
+from app.services.room_state_cache import PlayerState, RoomState, room_state_cache
+from app.services.solution_pregen import generate_solution, generate_solutions, solution_pregen
 from app.utils.exceptions import (
     EntityNotFoundError, GameError, AuthorizationError, GameFullError, ValidationError, GameStateError
 )
 
 
 class MultiplayerService:
-    """Service pour le multijoueur avec intégration quantique complète"""
+    """
+    Service pour le multijoueur avec intégration quantique complète
+    NOUVEAU: Les méthodes @room_command d'une même room s'exécutent une à une (room_commands)
+    """
+
+    def __init__(self):
+        # Tâche de maintenance périodique (repair_room_statuses, cleanup_abandoned_games)
+        self._maintenance_task: Optional[asyncio.Task] = None
 
     # =====================================================
     # CRÉATION ET GESTION DES PARTIES
@@ -118,7 +134,7 @@ class MultiplayerService:
                     "items_enabled": game_data.items_enabled,
                     "items_per_mastermind": game_data.items_per_mastermind,
                     "initial_solution": initial_solution,
-                    "player_solutions": {}
+                    "broadcast_batching": game_data.broadcast_batching
                 }
             )
 
@@ -138,9 +154,13 @@ class MultiplayerService:
             )
             db.add(participation)
             await db.commit()
+            await lobby_index.refresh_room(db, room_code)
 
             logger.info(f"✅ Partie {room_code} créée (ID: {game.id}, quantique: {game_data.quantum_enabled})")
 
+            # Le code a pu être mémorisé comme inconnu par le cache des connexions WebSocket
+            auth_cache.invalidate_room(room_code)
+
             return {
                 "success": True,
                 "room_code": room_code,
@@ -155,6 +175,7 @@ class MultiplayerService:
             await db.rollback()
             raise GameError(f"Erreur lors de la création: {str(e)}")
 
+    @room_command
     async def join_room_by_code(
             self,
             db: AsyncSession,
@@ -241,9 +262,14 @@ class MultiplayerService:
                 logger.info(f"✅ Nouvelle participation créée pour {user_id} dans {room_code}")
 
             await db.commit()
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            await lobby_index.refresh_room(db, room_code)
 
             # Retourner les détails de la room mise à jour
-            return await self.get_room_details(db, room_code, user_id)
+            room_details = await self.get_room_details(db, room_code, user_id)
+            await self._publish_room_state(db, room_code, user_id, room_details)
+            return room_details
 
         except (EntityNotFoundError, GameError, GameFullError, AuthorizationError):
             raise
@@ -252,6 +278,7 @@ class MultiplayerService:
             logger.error(f"❌ Erreur rejoindre room {room_code}: {e}")
             raise GameError(f"Erreur lors de la connexion: {str(e)}")
 
+    @room_command
     async def leave_room_by_code(
             self,
             db: AsyncSession,
@@ -314,11 +341,16 @@ class MultiplayerService:
 
                 if age_minutes > 1:  # Seulement après 1 minute d'existence
                     game.status = "cancelled"
+                    auth_cache.invalidate_room(room_code)
                     logger.info(f"🚮 Partie {room_code} marquée cancelled (plus de joueurs)")
                 else:
                     logger.info(f"⏳ Partie {room_code} récente gardée en waiting malgré 0 joueurs")
 
+            event_outbox.add_room_state(db, room_code)
             await db.commit()
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            await lobby_index.refresh_room(db, room_code)
             logger.info(f"✅ Utilisateur {user_id} a quitté la room {room_code}")
 
         except Exception as e:
@@ -367,6 +399,7 @@ class MultiplayerService:
             logger.info(f"🔧 Retour objet fake pour {room_code}")
             return FakeRoom()
 
+    @room_command
     async def make_attempt(
             self,
             db: AsyncSession,
@@ -378,278 +411,228 @@ class MultiplayerService:
         """
         Soumet une tentative pour un mastermind - VERSION CORRIGÉE COMPLÈTE
         Intégration quantique + diffusion WebSocket + régénération
+        NOUVEAU: Participants, solutions et compteurs viennent de room_state_cache (aucun
+        SELECT quand la room est en mémoire). Une tentative ordinaire n'écrit que son
+        INSERT (et ses événements outbox) ; la ligne game_player_solutions du joueur n'est
+        écrite immédiatement que si sa solution change, `attempts` partant en écriture différée.
         """
+        state_modified = False
+
         try:
-            # Récupérer la partie et vérifier l'état
-            game_query = select(Game).where(Game.room_code == room_code)
-            game_result = await db.execute(game_query)
-            game = game_result.scalar_one_or_none()
+            async with room_state_cache.lock(room_code, user_id):
+                state = await room_state_cache.get(db, room_code)
 
-            if not game:
-                raise EntityNotFoundError(f"Room {room_code} non trouvée")
+                if state is None:
+                    raise EntityNotFoundError(f"Room {room_code} non trouvée")
 
-            if game.status != GameStatus.ACTIVE:
-                raise GameStateError(f"La partie n'est pas active (statut: {game.status})")
+                if state.status != GameStatus.ACTIVE:
+                    raise GameStateError(f"La partie n'est pas active (statut: {state.status})")
 
-            # Récupérer la participation du joueur
-            participation_query = select(GameParticipation).where(
-                and_(
-                    GameParticipation.game_id == game.id,
-                    GameParticipation.player_id == user_id
-                )
-            )
-            participation_result = await db.execute(participation_query)
-            participation = participation_result.scalar_one_or_none()
+                # Participation du joueur et nom pour l'affichage
+                player = state.players.get(user_id)
+                if not player:
+                    raise GameError("Vous ne participez pas à cette partie")
 
-            if not participation:
-                raise GameError("Vous ne participez pas à cette partie")
+                username = player.username or f"Joueur {user_id}"
 
-            # Récupérer les informations utilisateur pour l'affichage
-            user_query = select(User).where(User.id == user_id)
-            user_result = await db.execute(user_query)
-            user_obj = user_result.scalar_one_or_none()
-            username = user_obj.username if user_obj else f"Joueur {user_id}"
+                # Récupérer la solution pour ce mastermind
+                settings = state.settings
+                solution_created = False
+                solution_changed = False
 
-            # Récupérer la solution pour ce mastermind
-            settings = game.settings or {}
-            player_solutions = settings.get("player_solutions", {})
-            player_key = str(user_id)
+                # CORRECTION: Générer une solution si elle n'existe pas
+                if player.solution is None:
+                    new_solution = await self._generate_player_solution(state, username)
+                    state_modified = True
+                    player.solution = new_solution
+                    player.mastermind_number = 1
+                    player.attempts = 0
+                    solution_created = True
+                    logger.info(f"🎯 Nouvelle solution générée pour {username}: {len(new_solution)} éléments")
 
-            # CORRECTION: Générer une solution si elle n'existe pas
-            if player_key not in player_solutions:
-                if game.quantum_enabled:
-                    try:
-                        new_solution = await quantum_service.generate_quantum_solution(
-                            combination_length=game.combination_length,
-                            available_colors=game.available_colors
-                        )
-                        logger.info(f"🔮 Solution quantique générée pour {username}")
-                    except Exception as quantum_error:
-                        logger.warning(f"⚠️ Erreur quantique, fallback classique: {quantum_error}")
-                        new_solution = [
-                            random.randint(1, game.available_colors)
-                            for _ in range(game.combination_length)
-                        ]
-                else:
-                    new_solution = [
-                        random.randint(1, game.available_colors)
-                        for _ in range(game.combination_length)
-                    ]
-
-                player_solutions[player_key] = {
-                    "mastermind_number": 1,
-                    "solution": new_solution,
-                    "attempts": 0
-                }
-                settings["player_solutions"] = player_solutions
-                game.settings = settings
-                await db.commit()
-                logger.info(f"🎯 Nouvelle solution générée pour {username}: {len(new_solution)} éléments")
+                current_solution = player.solution
+                current_mastermind = player.mastermind_number
 
-            player_data = player_solutions[player_key]
-            current_solution = player_data["solution"]
-            current_mastermind = player_data.get("mastermind_number", 1)
+                # Vérifier que le joueur travaille sur le bon mastermind
+                if mastermind_number != current_mastermind:
+                    raise GameError(f"Mastermind incorrect. Vous travaillez sur le mastermind {current_mastermind}")
 
-            # Vérifier que le joueur travaille sur le bon mastermind
-            if mastermind_number != current_mastermind:
-                raise GameError(f"Mastermind incorrect. Vous travaillez sur le mastermind {current_mastermind}")
+                # Tentatives existantes pour ce mastermind (compteur en mémoire)
+                attempt_number = player.attempt_counts.get(mastermind_number, 0) + 1
 
-            # Compter les tentatives existantes pour ce mastermind
-            attempt_count_query = select(func.count(GameAttempt.id)).where(
-                and_(
-                    GameAttempt.game_id == game.id,
-                    GameAttempt.player_id == user_id,
-                    GameAttempt.mastermind_number == mastermind_number
-                )
-            )
-            attempt_count_result = await db.execute(attempt_count_query)
-            attempt_number = attempt_count_result.scalar() + 1
+                if attempt_number > state.max_attempts:
+                    raise GameError(f"Nombre maximum de tentatives dépassé pour ce mastermind ({state.max_attempts})")
 
-            if attempt_number > game.max_attempts:
-                raise GameError(f"Nombre maximum de tentatives dépassé pour ce mastermind ({game.max_attempts})")
+                # Valider la combinaison
+                if len(combination) != state.combination_length:
+                    raise ValidationError(f"Combinaison doit contenir {state.combination_length} éléments")
 
-            # Valider la combinaison
-            if len(combination) != game.combination_length:
-                raise ValidationError(f"Combinaison doit contenir {game.combination_length} éléments")
+                if any(c < 1 or c > state.available_colors for c in combination):
+                    raise ValidationError(f"Couleurs doivent être entre 1 et {state.available_colors}")
 
-            if any(c < 1 or c > game.available_colors for c in combination):
-                raise ValidationError(f"Couleurs doivent être entre 1 et {game.available_colors}")
-
-            # Calculer le résultat avec support quantique
-            if game.quantum_enabled:
-                try:
-                    quantum_result = await quantum_service.calculate_quantum_hints_with_probabilities(
-                        solution=current_solution,
-                        attempt=combination
-                    )
-                    exact_matches = quantum_result["exact_matches"]
-                    position_matches = quantum_result["wrong_position"]
-                    is_winning = exact_matches == game.combination_length
-
-                    # Score quantique basé sur les probabilités
-                    base_score = 100 if is_winning else max(0, 50 - (attempt_number * 5))
-                    quantum_bonus = sum(1 for pos in quantum_result.get("position_probabilities", [])
-                                        if pos.get("confidence") == "high") * 5
-                    score = base_score + quantum_bonus
-
-                    result = {
-                        "correct_positions": exact_matches,
-                        "correct_colors": position_matches,
-                        "is_winning": is_winning,
-                        "score": score,
-                        "quantum_data": quantum_result
-                    }
-
-                    logger.info(f"🔮 Résultat quantique calculé pour {username}: {exact_matches}🟢 {position_matches}🟡")
+                # Calculer le résultat avec support quantique
+                if state.quantum_enabled:
+                    try:
+                        quantum_result = await quantum_service.calculate_quantum_hints_with_probabilities(
+                            solution=current_solution,
+                            attempt=combination
+                        )
+                        exact_matches = quantum_result["exact_matches"]
+                        position_matches = quantum_result["wrong_position"]
+                        is_winning = exact_matches == state.combination_length
+
+                        # Score quantique basé sur les probabilités
+                        base_score = self._attempt_base_score(is_winning, attempt_number)
+                        quantum_bonus = sum(1 for pos in quantum_result.get("position_probabilities", [])
+                                            if pos.get("confidence") == "high") * 5
+                        score = base_score + quantum_bonus
+
+                        result = {
+                            "correct_positions": exact_matches,
+                            "correct_colors": position_matches,
+                            "is_winning": is_winning,
+                            "score": score,
+                            "quantum_data": quantum_result
+                        }
 
-                except Exception as quantum_error:
-                    logger.warning(f"⚠️ Erreur calcul quantique, fallback classique: {quantum_error}")
-                    result = self._evaluate_combination(combination, current_solution)
-            else:
-                result = self._evaluate_combination(combination, current_solution)
+                        logger.info(f"🔮 Résultat quantique calculé pour {username}: {exact_matches}🟢 {position_matches}🟡")
 
-            # Créer l'enregistrement de tentative
-            attempt = GameAttempt(
-                game_id=game.id,
-                player_id=user_id,
-                combination=combination,
-                attempt_number=attempt_number,
-                mastermind_number=mastermind_number,
-            )
+                    except Exception as quantum_error:
+                        logger.warning(f"⚠️ Erreur calcul quantique, fallback classique: {quantum_error}")
+                        result = self._classical_attempt_result(combination, current_solution, attempt_number)
+                else:
+                    result = self._classical_attempt_result(combination, current_solution, attempt_number)
 
-            db.add(attempt)
+                # Créer l'enregistrement de tentative
+                attempt = GameAttempt(
+                    game_id=state.game_id,
+                    player_id=user_id,
+                    combination=combination,
+                    attempt_number=attempt_number,
+                    mastermind_number=mastermind_number,
+                )
 
-            # Mettre à jour le nombre de tentatives dans les settings
-            player_data["attempts"] = attempt_number
-            settings["player_solutions"] = player_solutions
-            game.settings = settings
+                db.add(attempt)
 
-            # Variables pour la logique de fin
-            game_finished = False
-            player_eliminated = False
+                # Mettre à jour le nombre de tentatives du joueur
+                state_modified = True
+                player.attempts = attempt_number
 
-            # Si c'est la solution correcte
-            if result["is_winning"]:
-                logger.info(f"🎉 {username} a résolu le mastermind {mastermind_number}!")
+                # Variables pour la logique de fin
+                game_finished = False
+                player_eliminated = False
+                participation_changes: Dict[str, Any] = {}
 
-                # Progression vers le mastermind suivant
-                total_masterminds = settings.get("total_masterminds", 3)
+                # Si c'est la solution correcte
+                if result["is_winning"]:
+                    logger.info(f"🎉 {username} a résolu le mastermind {mastermind_number}!")
 
-                if current_mastermind >= total_masterminds:
-                    # Joueur a terminé tous les masterminds !
-                    participation.status = "finished"
-                    participation.score = (participation.score or 0) + result["score"]
+                    # Progression vers le mastermind suivant
+                    total_masterminds = settings.get("total_masterminds", 3)
 
-                    # Vérifier si c'est le premier à finir (gagnant)
-                    winner_query = select(GameParticipation).where(
-                        and_(
-                            GameParticipation.game_id == game.id,
-                            GameParticipation.status == "finished"
-                        )
-                    )
-                    winner_result = await db.execute(winner_query)
-                    existing_winners = winner_result.scalars().all()
+                    if current_mastermind >= total_masterminds:
+                        # Joueur a terminé tous les masterminds !
+                        player.status = "finished"
+                        player.score = (player.score or 0) + result["score"]
+                        participation_changes = {"status": player.status, "score": player.score}
 
-                    if len(existing_winners) == 0:  # Premier à finir
-                        game.status = GameStatus.FINISHED
-                        game.winner_id = user_id
-                        game_finished = True
-                        logger.info(f"🏆 {username} remporte la partie!")
+                        # Premier à finir (vérifié en mémoire, sans attente entre lecture et écriture)
+                        if state.winner_id is None:
+                            state.status = GameStatus.FINISHED.value
+                            state.winner_id = user_id
+                            game_finished = True
+                            logger.info(f"🏆 {username} remporte la partie!")
 
-                else:
-                    # Générer le mastermind suivant (quantique si activé)
-                    next_mastermind = current_mastermind + 1
-
-                    if game.quantum_enabled:
-                        try:
-                            new_solution = await quantum_service.generate_quantum_solution(
-                                combination_length=game.combination_length,
-                                available_colors=game.available_colors
-                            )
-                            logger.info(f"🔮 Solution quantique suivante générée pour {username}")
-                        except Exception as quantum_error:
-                            logger.warning(f"⚠️ Erreur quantique suivante, fallback: {quantum_error}")
-                            new_solution = [
-                                random.randint(1, game.available_colors)
-                                for _ in range(game.combination_length)
-                            ]
                     else:
-                        new_solution = [
-                            random.randint(1, game.available_colors)
-                            for _ in range(game.combination_length)
-                        ]
-
-                    player_data["mastermind_number"] = next_mastermind
-                    player_data["solution"] = new_solution
-                    player_data["attempts"] = 0
+                        # Générer le mastermind suivant (quantique si activé)
+                        next_mastermind = current_mastermind + 1
+                        new_solution = await self._next_player_solution(state, player, username)
 
-                    settings["player_solutions"] = player_solutions
-                    game.settings = settings
+                        player.mastermind_number = next_mastermind
+                        player.solution = new_solution
+                        player.attempts = 0
+                        solution_changed = True
 
-                    logger.info(f"➡️ {username} passe au mastermind {next_mastermind}")
+                        logger.info(f"➡️ {username} passe au mastermind {next_mastermind}")
 
-            else:
-                # Tentative échouée
-                if attempt_number >= game.max_attempts:
-                    # Maximum de tentatives atteint pour ce mastermind
-                    logger.info(f"❌ {username} a échoué le mastermind {mastermind_number} (max tentatives)")
-
-                    # NOUVELLE LOGIQUE: Régénération automatique (quantique si activé)
-                    total_masterminds = settings.get("total_masterminds", 3)
+                else:
+                    # Tentative échouée
+                    if attempt_number >= state.max_attempts:
+                        # Maximum de tentatives atteint pour ce mastermind
+                        logger.info(f"❌ {username} a échoué le mastermind {mastermind_number} (max tentatives)")
 
-                    if current_mastermind < total_masterminds:
-                        # Régénérer ce mastermind (nouvelle chance)
-                        if game.quantum_enabled:
-                            try:
-                                new_solution = await quantum_service.generate_quantum_solution(
-                                    combination_length=game.combination_length,
-                                    available_colors=game.available_colors
-                                )
-                                logger.info(f"🔮 Solution quantique régénérée pour {username}")
-                            except Exception as quantum_error:
-                                logger.warning(f"⚠️ Erreur quantique régénération: {quantum_error}")
-                                new_solution = [
-                                    random.randint(1, game.available_colors)
-                                    for _ in range(game.combination_length)
-                                ]
-                        else:
-                            new_solution = [
-                                random.randint(1, game.available_colors)
-                                for _ in range(game.combination_length)
-                            ]
+                        # NOUVELLE LOGIQUE: Régénération automatique (quantique si activé)
+                        total_masterminds = settings.get("total_masterminds", 3)
 
-                        player_data["solution"] = new_solution
-                        player_data["attempts"] = 0
-                        # Le numéro de mastermind reste le même (nouvelle tentative)
+                        if current_mastermind < total_masterminds:
+                            # Régénérer ce mastermind (nouvelle chance)
+                            new_solution = await self._next_player_solution(state, player, username)
 
-                        settings["player_solutions"] = player_solutions
-                        game.settings = settings
+                            player.solution = new_solution
+                            player.attempts = 0
+                            solution_changed = True
+                            # Le numéro de mastermind reste le même (nouvelle tentative)
 
-                        logger.info(f"🔄 Nouveau mastermind généré pour {username} (tentative {current_mastermind})")
+                            logger.info(f"🔄 Nouveau mastermind généré pour {username} (tentative {current_mastermind})")
 
-                        # DIFFUSION: Notifier la régénération
-                        try:
-                            await multiplayer_ws_manager.broadcast_mastermind_regenerated(room_code, {
+                            # DIFFUSION: Notifier la régénération (outbox, relayée après commit)
+                            event_outbox.add(db, room_code, self._game_event("mastermind_regenerated", {
                                 "user_id": str(user_id),
                                 "username": username,
                                 "mastermind_number": current_mastermind,
                                 "message": f"{username} a reçu un nouveau mastermind {current_mastermind} !",
                                 "new_solution_length": len(new_solution),
-                                "quantum_enabled": game.quantum_enabled
-                            })
-                        except Exception as ws_error:
-                            logger.warning(f"⚠️ Erreur diffusion régénération: {ws_error}")
+                                "quantum_enabled": state.quantum_enabled
+                            }))
 
-                    else:
-                        # Dernier mastermind échoué = joueur éliminé
-                        participation.status = "eliminated"
-                        player_eliminated = True
-                        logger.info(f"💀 {username} est éliminé")
+                        else:
+                            # Dernier mastermind échoué = joueur éliminé
+                            player.status = "eliminated"
+                            participation_changes = {"status": player.status}
+                            player_eliminated = True
+                            logger.info(f"💀 {username} est éliminé")
+
+                # NOUVEAU: Écritures immédiates seulement quand l'issue change
+                if participation_changes:
+                    await db.execute(
+                        update(GameParticipation)
+                        .where(and_(
+                            GameParticipation.game_id == state.game_id,
+                            GameParticipation.player_id == user_id
+                        ))
+                        .values(**participation_changes)
+                    )
 
-            await db.commit()
+                if game_finished:
+                    await db.execute(
+                        update(Game)
+                        .where(Game.id == state.game_id)
+                        .values(status=state.status, winner_id=user_id)
+                    )
 
-            # DIFFUSION WEBSOCKET: Tentative soumise avec données quantiques
-            try:
+                # NOUVEAU: Ligne étroite du joueur (plus de réécriture du document settings)
+                solution_values = {
+                    "mastermind_number": player.mastermind_number,
+                    "solution": player.solution,
+                    "attempts": player.attempts,
+                    "next_solution": player.next_solution
+                }
+                # Room non conservée en mémoire : pas d'écriture différée possible
+                write_solution = solution_changed or not room_state_cache.holds(state)
+                if solution_created:
+                    db.add(GamePlayerSolution(game_id=state.game_id, player_id=user_id, **solution_values))
+                elif write_solution:
+                    await db.execute(
+                        update(GamePlayerSolution)
+                        .where(and_(
+                            GamePlayerSolution.game_id == state.game_id,
+                            GamePlayerSolution.player_id == user_id
+                        ))
+                        .values(**solution_values)
+                    )
+
+                # DIFFUSION WEBSOCKET: Tentative soumise avec données quantiques
+                # NOUVEAU: Événements écrits dans l'outbox, dans la même transaction que la tentative
                 attempt_data = {
                     "user_id": str(user_id),
                     "username": username,
@@ -662,31 +645,49 @@ class MultiplayerService:
                     "mastermind_number": mastermind_number,
                     "game_finished": game_finished,
                     "player_eliminated": player_eliminated,
-                    "quantum_enabled": game.quantum_enabled
+                    "quantum_enabled": state.quantum_enabled
                 }
 
                 # NOUVEAU: Ajouter les données quantiques si disponibles
-                if game.quantum_enabled and "quantum_data" in result:
+                if state.quantum_enabled and "quantum_data" in result:
                     attempt_data["quantum_data"] = {
                         "quantum_calculated": result["quantum_data"].get("quantum_calculated", False),
                         "shots_used": result["quantum_data"].get("shots_used", 0),
                         "position_probabilities": result["quantum_data"].get("position_probabilities", [])
                     }
 
-                await multiplayer_ws_manager.broadcast_attempt(room_code, attempt_data)
+                event_outbox.add(db, room_code, self._game_event("attempt_submitted", attempt_data))
 
                 # Si la partie est terminée
                 if game_finished:
-                    await multiplayer_ws_manager.broadcast_game_finished(room_code, {
+                    event_outbox.add(db, room_code, self._game_event("game_finished", {
                         "room_code": room_code,
                         "winner_id": str(user_id),
                         "winner_username": username,
-                        "final_status": game.status.value,
-                        "quantum_enabled": game.quantum_enabled
-                    })
+                        "final_status": state.status,
+                        "quantum_enabled": state.quantum_enabled
+                    }))
 
-            except Exception as ws_error:
-                logger.warning(f"⚠️ Erreur diffusion WebSocket: {ws_error}")
+                event_outbox.add_room_state(db, room_code)
+
+                await db.commit()
+
+                # L'état en mémoire suit la base validée
+                player.attempt_counts[mastermind_number] = attempt_number
+                room_snapshots.invalidate(room_code)
+                if game_finished:
+                    room_state_cache.invalidate(room_code)
+                elif solution_created or write_solution:
+                    room_state_cache.mark_clean(state, user_id)
+                else:
+                    room_state_cache.mark_dirty(state, user_id)
+
+                # NOUVEAU: Nouveau mastermind commencé : préparer le suivant en tâche de fond
+                if (solution_created or solution_changed) and player.mastermind_number < settings.get("total_masterminds", 3):
+                    solution_pregen.schedule(
+                        room_code, state.game_id, user_id, state.combination_length,
+                        state.available_colors, state.quantum_enabled
+                    )
 
             return {
                 "success": True,
@@ -695,119 +696,92 @@ class MultiplayerService:
                 "position_matches": result["correct_colors"],
                 "is_solution": result["is_winning"],
                 "attempts_used": attempt_number,
-                "max_attempts": game.max_attempts,
+                "max_attempts": state.max_attempts,
                 "score": result["score"],
                 "game_finished": game_finished,
                 "mastermind_completed": result["is_winning"],
                 "mastermind_number": mastermind_number,
-                "new_mastermind_generated": not result["is_winning"] and attempt_number >= game.max_attempts,
+                "new_mastermind_generated": not result["is_winning"] and attempt_number >= state.max_attempts,
                 "player_eliminated": player_eliminated,
-                "quantum_enabled": game.quantum_enabled,
-                "quantum_data": result.get("quantum_data") if game.quantum_enabled else None
+                "quantum_enabled": state.quantum_enabled,
+                "quantum_data": result.get("quantum_data") if state.quantum_enabled else None
             }
 
         except Exception as e:
             logger.error(f"❌ Erreur tentative {room_code}: {e}")
             await db.rollback()
+            # L'état en mémoire a pu être modifié avant l'échec : il sera relu depuis la base
+            if state_modified:
+                room_state_cache.invalidate(room_code)
             raise GameError(f"Erreur lors de la tentative: {str(e)}")
 
-    async def start_game(
-            self,
-            db: AsyncSession,
-            room_code: str,
-            user_id: UUID
-    ) -> Dict[str, Any]:
+    @staticmethod
+    def _attempt_base_score(is_winning: bool, attempt_number: int) -> int:
+        """Score d'une tentative de make_attempt (hors bonus quantique)"""
+        return 100 if is_winning else max(0, 50 - (attempt_number * 5))
+
+    def _classical_attempt_result(self, combination: List[int], solution: List[int],
+                                  attempt_number: int) -> Dict[str, Any]:
         """
-        Démarre une partie multijoueur - VERSION CORRIGÉE avec WebSocket
+        Résultat classique au format de make_attempt
+        CORRECTION: _evaluate_combination renvoie exact_matches/position_matches, make_attempt
+        lit correct_positions/correct_colors/score (KeyError sur chaque tentative classique)
         """
-        try:
-            # Récupérer la partie
-            game_query = select(Game).where(Game.room_code == room_code)
-            game_result = await db.execute(game_query)
-            game = game_result.scalar_one_or_none()
-
-            if not game:
-                raise EntityNotFoundError(f"Room {room_code} non trouvée")
-
-            # Vérifier que l'utilisateur est le créateur
-            if game.creator_id != user_id:
-                raise GameError("Seul le créateur peut démarrer la partie")
-
-            if game.status != GameStatus.WAITING:
-                raise GameStateError(f"La partie ne peut pas être démarrée (statut: {game.status})")
-
-            # Compter les participants actifs
-            participants_query = select(func.count(GameParticipation.id)).where(
-                and_(
-                    GameParticipation.game_id == game.id,
-                    GameParticipation.status == "active"
-                )
-            )
-            participants_count = await db.execute(participants_query)
-            active_players = participants_count.scalar()
-
-            if active_players < 2:
-                raise GameError("Au moins 2 joueurs sont requis pour démarrer")
-
-            # Démarrer la partie
-            game.status = GameStatus.ACTIVE
-            game.started_at = datetime.now(timezone.utc)
-
-            # Générer les solutions initiales pour tous les joueurs
-            settings = game.settings or {}
-            settings["player_solutions"] = {}
-
-            participants_query = select(GameParticipation).where(
-                and_(
-                    GameParticipation.game_id == game.id,
-                    GameParticipation.status == "active"
-                )
-            )
-            participants_result = await db.execute(participants_query)
-            participants = participants_result.scalars().all()
+        evaluation = self._evaluate_combination(combination, solution)
+        return {
+            "correct_positions": evaluation["exact_matches"],
+            "correct_colors": evaluation["position_matches"],
+            "is_winning": evaluation["is_winning"],
+            "score": self._attempt_base_score(evaluation["is_winning"], attempt_number)
+        }
 
-            for participation in participants:
-                solution = [
-                    random.randint(0, game.available_colors - 1)
-                    for _ in range(game.combination_length)
-                ]
+    async def _generate_player_solution(self, state: RoomState, username: str) -> List[int]:
+        """Nouvelle solution d'un joueur (quantique si activé, repli classique)"""
+        solution = await generate_solution(state.combination_length, state.available_colors, state.quantum_enabled)
+        logger.info(f"🎲 Solution générée pour {username} (quantique: {state.quantum_enabled})")
+        return solution
 
-                settings["player_solutions"][str(participation.player_id)] = {
-                    "mastermind_number": 1,
-                    "solution": solution,
-                    "attempts": 0
-                }
+    async def _seed_player_solutions(self, db: AsyncSession, game: Game, player_ids: List[UUID]) -> int:
+        """
+        Solutions de départ de tous les joueurs : un seul tirage et un seul INSERT groupé
+        NOUVEAU: Mastermind courant et suivant de chaque joueur ; les suivants sont
+        ensuite pré-générés au fil des transitions (solution_pregen)
+        """
+        if not player_ids:
+            return 0
 
-            game.settings = settings
-            await db.commit()
+        total_masterminds = (game.settings or {}).get("total_masterminds", 3)
+        per_player = 2 if total_masterminds > 1 else 1
+        solutions = await generate_solutions(
+            len(player_ids) * per_player, game.combination_length, game.available_colors, game.quantum_enabled
+        )
 
-            logger.info(f"🚀 Partie {room_code} démarrée avec {active_players} joueurs")
+        rows = [
+            {
+                "game_id": game.id,
+                "player_id": player_id,
+                "mastermind_number": 1,
+                "solution": solutions[index * per_player],
+                "attempts": 0,
+                "next_solution": solutions[index * per_player + 1] if per_player > 1 else None
+            }
+            for index, player_id in enumerate(player_ids)
+        ]
 
-            # DIFFUSION WEBSOCKET: Partie démarrée
-            try:
-                await multiplayer_ws_manager.broadcast_game_started(room_code, {
-                    "room_code": room_code,
-                    "status": "active",
-                    "players_count": active_players,
-                    "started_at": game.started_at.isoformat() if hasattr(game.started_at, "isoformat") and game.started_at else None,
-                    "total_masterminds": settings.get("total_masterminds", 3)
-                })
-            except Exception as ws_error:
-                logger.warning(f"⚠️ Erreur diffusion démarrage: {ws_error}")
+        await db.execute(delete(GamePlayerSolution).where(GamePlayerSolution.game_id == game.id))
+        await db.execute(insert(GamePlayerSolution), rows)
 
-            return {
-                "success": True,
-                "message": "Partie démarrée avec succès",
-                "game_status": game.status,
-                "players_count": active_players,
-                "started_at": game.started_at.isoformat() if hasattr(game.started_at, "isoformat") and game.started_at else None
-            }
+        logger.info(f"🎲 {len(solutions)} solutions générées pour {len(rows)} joueurs ({game.room_code})")
+        return len(rows)
 
-        except Exception as e:
-            logger.error(f"❌ Erreur démarrage {room_code}: {e}")
-            await db.rollback()
-            raise GameError(f"Erreur lors du démarrage: {str(e)}")
+    async def _next_player_solution(self, state: RoomState, player: PlayerState, username: str) -> List[int]:
+        """Solution du mastermind suivant : pré-générée si prête, sinon générée immédiatement"""
+        solution = solution_pregen.take(player)
+        if solution is None:
+            solution = await self._generate_player_solution(state, username)
+        return solution
 
+    @room_command
     async def submit_attempt(
             self,
             db: AsyncSession,
@@ -943,9 +917,31 @@ class MultiplayerService:
                         game.finished_at = datetime.now(timezone.utc)
                         game_finished = True
 
-            # === 9. COMMIT EN BASE ===
+            # === 9. ÉVÉNEMENTS (OUTBOX) ET COMMIT EN BASE ===
+
+            # NOUVEAU: Les notifications partent avec la transaction (relayées après commit)
+            event_outbox.add(db, room_code, self._game_event("attempt_submitted", {
+                "user_id": str(user_id),
+                "username": getattr(participation.player, "username", "Joueur") if participation.player else "Joueur",
+                "attempt_number": attempt_number,
+                "exact_matches": result["correct_positions"],
+                "position_matches": result["correct_colors"],
+                "is_solution": result["is_winning"],
+                "score": result["score"],
+                "game_finished": game_finished or player_eliminated
+            }))
+
+            # Si la partie est terminée, envoyer l'état final
+            if game_finished:
+                event_outbox.add(db, room_code, self._game_event("game_finished", {
+                    "room_code": room_code,
+                    "winner_id": str(user_id) if result["is_winning"] else None,
+                    "final_state": game.status
+                }))
 
             await db.commit()
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
             await db.refresh(new_attempt)
 
             # === 10. CALCUL DES INFORMATIONS DE RETOUR ===
@@ -966,46 +962,6 @@ class MultiplayerService:
             if should_reveal_solution:
                 revealed_solution = game.solution
 
-            # === 11. NOTIFICATIONS WEBSOCKET ===
-
-            # Envoyer des notifications WebSocket si disponible (comme dans votre code)
-            if WEBSOCKET_AVAILABLE and multiplayer_ws_manager:
-                try:
-                    await multiplayer_ws_manager.broadcast_to_room(
-                        room_code,
-                        {
-                            "type": "attempt_submitted",
-                            "data": {
-                                "user_id": str(user_id),
-                                "username": getattr(participation.player, "username", "Joueur") if participation.player else "Joueur",
-                                "attempt_number": attempt_number,
-                                "exact_matches": result["correct_positions"],
-                                "position_matches": result["correct_colors"],
-                                "is_solution": result["is_winning"],
-                                "score": result["score"],
-                                "game_finished": game_finished or player_eliminated,
-                                "timestamp": datetime.now(timezone.utc).isoformat()
-                            }
-                        }
-                    )
-
-                    # Si la partie est terminée, envoyer l'état final
-                    if game_finished:
-                        await multiplayer_ws_manager.broadcast_to_room(
-                            room_code,
-                            {
-                                "type": "game_finished",
-                                "data": {
-                                    "room_code": room_code,
-                                    "winner_id": str(user_id) if result["is_winning"] else None,
-                                    "final_state": game.status,
-                                    "timestamp": datetime.now(timezone.utc).isoformat()
-                                }
-                            }
-                        )
-                except Exception as ws_error:
-                    logger.warning(f"⚠️ Erreur WebSocket: {ws_error}")
-
             # === 12. CONSTRUCTION DE LA RÉPONSE ===
 
             # Construire la réponse selon le format attendu par votre frontend
@@ -1304,6 +1260,9 @@ class MultiplayerService:
                     seen_players.add(participation.player_id)
 
             await db.commit()
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            await lobby_index.refresh_room(db, room_code)
 
             logger.info(f"✅ Nettoyage terminé: {cleaned_count} fantômes, {duplicate_count} doublons supprimés")
 
@@ -1326,7 +1285,29 @@ class MultiplayerService:
     ) -> Dict[str, Any]:
         """
         Récupère les détails d'une room avec TOUS les paramètres corrects
+        NOUVEAU: Servis depuis le cache des détails (dict partagé, à ne pas modifier)
+        """
+        return (await self.get_room_snapshot(db, room_code)).data
+
+    async def get_room_snapshot(self, db: AsyncSession, room_code: str) -> RoomSnapshot:
+        """
+        Détails de la room avec leur corps JSON et leur ETag
+        NOUVEAU: Lecture à travers le cache, rechargés seulement après une mutation
+        """
+        snapshot = room_snapshots.get(room_code)
+        if snapshot is not None:
+            return snapshot
+
+        # Version lue avant le chargement : une mutation pendant la lecture empêche la mise en cache
+        version = room_snapshots.version(room_code)
+        room_data = await self._load_room_details(db, room_code)
+        return room_snapshots.put(room_code, version, room_data)
+
+    async def _load_room_details(self, db: AsyncSession, room_code: str) -> Dict[str, Any]:
+        """
+        Charge les détails d'une room depuis la base
         CORRECTION MAJEURE: Affichage complet des paramètres
+        NOUVEAU: Lecture seule, les statuts incohérents sont réparés par repair_room_statuses
         """
         try:
             # Requête avec toutes les relations
@@ -1374,20 +1355,8 @@ class MultiplayerService:
                     "is_winner": participation.is_winner
                 })
 
-            # Logique de status intelligente
             current_status = game.status
 
-            if active_players == 0 and game.status == "waiting":
-                age_minutes = (datetime.now(timezone.utc) - game.created_at).total_seconds() / 60
-                if age_minutes > 10:  # 10 minutes au lieu de 5
-                    game.status = "cancelled"
-                    await db.commit()
-                    current_status = "cancelled"
-            elif active_players > 0 and current_status == "cancelled":
-                game.status = "waiting"
-                await db.commit()
-                current_status = "waiting"
-
             # CORRECTION MAJEURE: Extraire TOUS les settings
             settings = game.settings or {}
 
@@ -1466,6 +1435,47 @@ class MultiplayerService:
             logger.error(f"❌ Erreur récupération room {room_code}: {e}")
             raise GameError(f"Erreur lors de la récupération des détails: {str(e)}")
 
+    async def _publish_room_state(
+            self,
+            db: AsyncSession,
+            room_code: str,
+            user_id: UUID,
+            room_details: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Pousse l'état de la room aux clients WebSocket (delta versionné)
+        NOUVEAU: Le blob "settings" (solutions des joueurs) n'est jamais diffusé
+        """
+        if not WEBSOCKET_AVAILABLE or not multiplayer_ws_manager:
+            return
+
+        try:
+            if room_details is None:
+                room_details = await self.get_room_details(db, room_code, user_id)
+
+            public_state = {key: value for key, value in room_details.items() if key != "settings"}
+            await multiplayer_ws_manager.broadcast_game_state(room_code, public_state)
+        except Exception as ws_error:
+            logger.warning(f"⚠️ Erreur diffusion état {room_code}: {ws_error}")
+
+    @staticmethod
+    def _game_event(event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Message WebSocket d'un événement de jeu (horodaté à sa création, pas à sa diffusion)"""
+        return {
+            "type": event_type,
+            "data": {
+                **data,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+        }
+
+    async def _relay_room_state(self, room_code: str, payload: Dict[str, Any]) -> None:
+        """Handler outbox de ROOM_STATE_EVENT : état public relu dans une session dédiée"""
+        # Le relais peut tourner sur un autre worker que la mutation : état relu depuis la base
+        room_snapshots.invalidate(room_code)
+        async with get_db_context() as db:
+            await self._publish_room_state(db, room_code, None)
+
     # =====================================================
     # LOBBY ET MATCHMAKING
     # =====================================================
@@ -1475,12 +1485,16 @@ class MultiplayerService:
             db: AsyncSession,
             page: int = 1,
             limit: int = 20,
-            filters: Optional[str] = None
+            filters: Optional[str] = None,
+            cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Récupère la liste des parties publiques pour le lobby
+        NOUVEAU: Lecture de lobby_index (aucune requête) ; `cursor` (next_cursor de la page
+        précédente) remplace avantageusement `page`. Les rooms sans joueur actif ne sont pas
+        listées et sont annulées par cleanup_abandoned_games, plus pendant la lecture.
         """
-        logger.info(f"🏛️ Récupération des rooms publiques - Page {page}")
+        logger.debug(f"🏛️ Récupération des rooms publiques - Page {page}")
 
         # Parser les filtres JSON
         filter_dict = {}
@@ -1490,88 +1504,23 @@ class MultiplayerService:
             except json.JSONDecodeError:
                 logger.warning(f"Filtres JSON invalides: {filters}")
 
-        # Construction de la requête de base
-        query = select(Game).options(
-            selectinload(Game.creator),
-            selectinload(Game.participations).selectinload(GameParticipation.player)
-        ).where(
-            and_(
-                Game.is_private == False,
-                Game.status.in_(["waiting", "starting"]),
-            )
-        )
-
-        # Appliquer les filtres
-        if filter_dict.get("difficulty"):
-            query = query.where(Game.difficulty == filter_dict["difficulty"])
-        if filter_dict.get("quantum_enabled") is not None:
-            query = query.where(Game.quantum_enabled == filter_dict["quantum_enabled"])
-
-        # Tri et pagination
-        query = query.order_by(Game.created_at.desc())
-        offset = (page - 1) * limit
-        query = query.offset(offset).limit(limit)
-
-        # Exécuter la requête
-        result = await db.execute(query)
-        games = result.scalars().all()
-
-        # Formater les données des rooms
-        rooms_data = []
-        for game in games:
-            # Calcul du nombre de joueurs actifs
-            active_participants = [
-                p for p in game.participations
-                if p.status not in ["left", "disconnected", "eliminated"]
-            ]
-            current_players = len(active_participants)
-
-            # Si aucun joueur actif, marquer comme cancelled
-            if current_players == 0 and game.status == "waiting":
-                game.status = "cancelled"
-                await db.commit()
-                continue  # Exclure cette partie des résultats
-
-            room_data = {
-                "id": str(game.id),
-                "room_code": game.room_code,
-                "name": f"Partie {game.room_code}",
-                "game_type": game.game_type,
-                "difficulty": game.difficulty,
-                "status": game.status,
-                "max_players": game.max_players,
-                "current_players": current_players,
-                "is_private": game.is_private,
-                "password_protected": False,
-                "allow_spectators": game.allow_spectators,
-                "enable_chat": game.enable_chat,
-                "quantum_enabled": game.quantum_enabled,
-                "created_at": game.created_at.isoformat(),
-                "creator": {
-                    "id": str(game.creator_id),
-                    "username": game.creator.username
-                }
-            }
-            rooms_data.append(room_data)
+        await lobby_index.ensure_loaded(db)
 
-        # Compter le total
-        count_query = select(func.count(Game.id)).where(
-            and_(
-                Game.is_private == False,
-                Game.status.in_(["waiting", "starting"]),
-            )
+        result = lobby_index.query(
+            limit=limit,
+            cursor=cursor,
+            offset=(page - 1) * limit,
+            difficulty=filter_dict.get("difficulty"),
+            quantum_enabled=filter_dict.get("quantum_enabled")
         )
-        count_result = await db.execute(count_query)
-        total_count = count_result.scalar()
-
-        logger.info(f"✅ {len(rooms_data)} rooms publiques récupérées")
 
         return {
-            "rooms": rooms_data,
-            "total": total_count,
+            "rooms": result["rooms"],
+            "total": result["total"],
             "page": page,
             "limit": limit,
-            "has_more": (page * limit) < total_count
+            "has_more": result["has_more"],
+            "next_cursor": result["next_cursor"]
         }
 
     async def cleanup_abandoned_games(self, db: AsyncSession) -> Dict[str, int]:
@@ -1595,7 +1544,7 @@ class MultiplayerService:
         result = await db.execute(abandoned_query)
         games = result.scalars().all()
 
-        cancelled_count = 0
+        cancelled_rooms = []
         for game in games:
             # Compter les joueurs actifs
             active_players = len([
@@ -1606,21 +1555,109 @@ class MultiplayerService:
             # Si aucun joueur actif, marquer comme cancelled
             if active_players == 0:
                 game.status = "cancelled"
-                cancelled_count += 1
+                auth_cache.invalidate_room(game.room_code)
+                room_state_cache.invalidate(game.room_code)
+                lobby_index.remove(game.room_code)
+                cancelled_rooms.append(game.room_code)
                 logger.info(f"🚮 Partie {game.room_code} automatiquement cancelled")
 
-        if cancelled_count > 0:
+        if cancelled_rooms:
             await db.commit()
-            logger.info(f"✅ {cancelled_count} parties abandonnées nettoyées")
+            for room_code in cancelled_rooms:
+                room_snapshots.invalidate(room_code)
+            logger.info(f"✅ {len(cancelled_rooms)} parties abandonnées nettoyées")
 
         return {
             "total_checked": len(games),
-            "cancelled_count": cancelled_count
+            "cancelled_count": len(cancelled_rooms)
+        }
+
+    async def repair_room_statuses(self, db: AsyncSession) -> Dict[str, int]:
+        """
+        Corrige les statuts incohérents en deux UPDATE ensemblistes
+        NOUVEAU: Auparavant fait par get_room_details (commit pendant une lecture)
+        - rooms waiting sans joueur actif depuis plus de 10 minutes → cancelled
+        - rooms cancelled où des joueurs actifs sont présents → waiting
+        """
+        has_active_players = (
+            select(GameParticipation.id)
+            .where(and_(
+                GameParticipation.game_id == Game.id,
+                GameParticipation.status.notin_(["left", "disconnected", "eliminated"])
+            ))
+            .exists()
+        )
+        ten_minutes_ago = datetime.now(timezone.utc) - timedelta(minutes=10)
+
+        cancelled = (await db.execute(
+            update(Game)
+            .where(and_(
+                Game.status == "waiting",
+                Game.created_at < ten_minutes_ago,
+                ~has_active_players
+            ))
+            .values(status="cancelled")
+            .returning(Game.room_code)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+
+        revived = (await db.execute(
+            update(Game)
+            .where(and_(Game.status == "cancelled", has_active_players))
+            .values(status="waiting")
+            .returning(Game.room_code)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+
+        await db.commit()
+
+        for room_code in cancelled:
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            lobby_index.remove(room_code)
+            auth_cache.invalidate_room(room_code)
+        for room_code in revived:
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            await lobby_index.refresh_room(db, room_code)
+
+        if cancelled or revived:
+            logger.info(f"🔧 Statuts réparés: {len(cancelled)} rooms cancelled, {len(revived)} rooms relancées")
+
+        return {
+            "cancelled_count": len(cancelled),
+            "revived_count": len(revived)
         }
+
+    async def _run_maintenance(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with get_db_context() as db:
+                    await self.repair_room_statuses(db)
+                async with get_db_context() as db:
+                    await self.cleanup_abandoned_games(db)
+            except Exception as e:
+                logger.error(f"❌ Erreur maintenance des rooms: {e}")
+
+    def start_maintenance(self, interval: float) -> None:
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._run_maintenance(interval))
+
+    async def stop_maintenance(self) -> None:
+        task, self._maintenance_task = self._maintenance_task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
     # =====================================================
     # GAMEPLAY MULTIJOUEUR
     # =====================================================
 
+    @room_command
     async def start_game(
             self,
             db: AsyncSession,
@@ -1668,11 +1705,21 @@ class MultiplayerService:
             game.started_at = datetime.now(timezone.utc)
 
             # Marquer tous les joueurs actifs comme "playing"
+            player_ids = []
             for participation in game.participations:
                 if participation.status not in ["left", "disconnected", "eliminated"]:
                     participation.status = "active"
+                    player_ids.append(participation.player_id)
+
+            # NOUVEAU: Solutions de tous les joueurs générées ensemble avant la première tentative
+            await self._seed_player_solutions(db, game, player_ids)
 
+            # NOUVEAU: État diffusé par le relais outbox après commit
+            event_outbox.add_room_state(db, room_code)
             await db.commit()
+            room_state_cache.invalidate(room_code)
+            room_snapshots.invalidate(room_code)
+            lobby_index.remove(room_code)
 
             logger.info(f"✅ Partie {room_code} démarrée avec {active_players} joueurs")
 
@@ -1925,6 +1972,7 @@ class MultiplayerService:
 
 # Instance globale du service
 multiplayer_service = MultiplayerService()
+event_outbox.register_handler(ROOM_STATE_EVENT, multiplayer_service._relay_room_state)
 
 # Log de l'état du service
 logger.info(f"🎯 MultiplayerService initialisé - Quantique: {QUANTUM_AVAILABLE}, WebSocket: {WEBSOCKET_AVAILABLE}")
\ No newline at end of file
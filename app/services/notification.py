@@ -1,12 +1,18 @@
 """
 Service de notification en temps réel
 COMPLET: Coordination de toutes les notifications multijoueur
+NOUVEAU: Les notify_* mettent la notification en file et rendent la main ; un pool de
+tâches (NotificationDispatcher) livre les notifications regroupées par room.
 """
 import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Set
 
+from app.core.config import settings, websocket_config
+from app.websocket.broadcast_scheduler import build_batch_frame
+from app.websocket.notification_dispatcher import LaneConfig, NotificationDispatcher, QueuedNotification
+
 # Import conditionnel pour WebSocket
 try:
     from app.websocket.multiplayer import multiplayer_ws_manager
@@ -27,7 +33,22 @@ class NotificationService:
     """Service centralisé pour les notifications temps réel"""
 
     def __init__(self):
-        self.notification_queue: asyncio.Queue = asyncio.Queue()
+        # NOUVEAU: File bornée vidée par WS_NOTIFY_WORKERS tâches
+        self.dispatcher = NotificationDispatcher(
+            deliver_room=self._deliver_room_batch,
+            deliver_user=self._deliver_user_batch,
+            max_size=settings.WS_NOTIFY_QUEUE_SIZE,
+            workers=settings.WS_NOTIFY_WORKERS,
+            max_batch=settings.WS_NOTIFY_MAX_BATCH,
+            policy=settings.WS_NOTIFY_OVERFLOW_POLICY,
+            # NOUVEAU: Voies de priorité (game_finished ne patiente plus derrière le chat)
+            lanes=[
+                LaneConfig(name, **lane)
+                for name, lane in websocket_config.NOTIFICATION_LANES.items()
+            ],
+            lane_types=websocket_config.NOTIFICATION_LANE_TYPES,
+            default_lane=websocket_config.NOTIFICATION_DEFAULT_LANE
+        )
         self.subscribers: Dict[str, Set[str]] = {}  # room_code -> set of user_ids
         self.user_sessions: Dict[str, Dict[str, Any]] = {}  # user_id -> session_info
 
@@ -425,58 +446,85 @@ class NotificationService:
             message: Dict[str, Any],
             exclude_user: Optional[str] = None
     ):
-        """Diffuse un message à tous les abonnés d'une room"""
+        """Met en file un message pour tous les abonnés d'une room (livraison asynchrone)"""
         if not WEBSOCKET_AVAILABLE:
             logger.warning("⚠️ WebSocket indisponible, notification ignorée")
             return
 
-        try:
-            # Ajouter des métadonnées
-            enhanced_message = {
-                **message,
-                "room_code": room_code,
-                "server_timestamp": datetime.now(timezone.utc).isoformat()
-            }
-
-            # Utiliser le gestionnaire WebSocket
-            exclude_websocket = None
-            if exclude_user and hasattr(multiplayer_ws_manager, '_get_user_websocket'):
-                exclude_websocket = multiplayer_ws_manager._get_user_websocket(room_code, exclude_user)
-
-            await multiplayer_ws_manager.notify_room(
-                room_code, enhanced_message, exclude_websocket
-            )
+        # Ajouter des métadonnées (horodatage de l'événement, pas de la livraison)
+        enhanced_message = {
+            **message,
+            "room_code": room_code,
+            "server_timestamp": datetime.now(timezone.utc).isoformat()
+        }
 
-        except Exception as e:
-            logger.error(f"❌ Erreur broadcast vers {room_code}: {e}")
+        if not self.dispatcher.submit_room(room_code, enhanced_message, exclude_user):
+            logger.warning(f"⚠️ File de notifications pleine, message {message.get('type')} vers {room_code} abandonné")
 
     async def _send_to_user(self, user_id: str, message: Dict[str, Any]):
-        """Envoie un message à un utilisateur spécifique"""
+        """Met en file un message pour un utilisateur spécifique"""
         if not WEBSOCKET_AVAILABLE:
             return
 
-        try:
-            # Trouver la room de l'utilisateur
-            user_session = self.user_sessions.get(user_id)
-            if not user_session:
-                logger.warning(f"⚠️ Session utilisateur {user_id} introuvable")
-                return
-
-            room_code = user_session["room_code"]
-
-            # Ajouter des métadonnées
-            enhanced_message = {
-                **message,
-                "target_user_id": user_id,
-                "server_timestamp": datetime.now(timezone.utc).isoformat()
-            }
+        if user_id not in self.user_sessions:
+            logger.warning(f"⚠️ Session utilisateur {user_id} introuvable")
+            return
 
-            await multiplayer_ws_manager.send_personal_message(
-                room_code, user_id, enhanced_message
+        # Ajouter des métadonnées
+        enhanced_message = {
+            **message,
+            "target_user_id": user_id,
+            "server_timestamp": datetime.now(timezone.utc).isoformat()
+        }
+
+        if not self.dispatcher.submit_user(user_id, enhanced_message):
+            logger.warning(f"⚠️ File de notifications pleine, message {message.get('type')} vers {user_id} abandonné")
+
+    async def _deliver_room_batch(self, room_code: str, batch: List[QueuedNotification]):
+        """Livre un lot de notifications d'une room (appelé par le dispatcher)"""
+        events = []
+        for notification in batch:
+            # Résolution à la livraison : le joueur exclu a pu se reconnecter entre-temps
+            exclude_websocket = None
+            if notification.exclude_user:
+                exclude_websocket = multiplayer_ws_manager._get_user_websocket(room_code, notification.exclude_user)
+            events.append((notification.message, exclude_websocket))
+
+        if len(events) == 1:
+            await multiplayer_ws_manager.notify_room(room_code, *events[0])
+        else:
+            await multiplayer_ws_manager.notify_room_batch(room_code, events)
+
+    async def _deliver_user_batch(self, user_id: str, batch: List[QueuedNotification]):
+        """Livre un lot de notifications personnelles (appelé par le dispatcher)"""
+        user_session = self.user_sessions.get(user_id)
+        if not user_session:
+            return  # Désabonné pendant l'attente
+
+        room_code = user_session["room_code"]
+        if len(batch) == 1:
+            message = batch[0].message
+        else:
+            message = build_batch_frame(
+                [notification.message for notification in batch],
+                room_code,
+                datetime.now(timezone.utc).isoformat()
             )
 
-        except Exception as e:
-            logger.error(f"❌ Erreur envoi vers {user_id}: {e}")
+        await multiplayer_ws_manager.send_personal_message(room_code, user_id, message)
+
+    # =====================================================
+    # CYCLE DE VIE DE LA FILE
+    # =====================================================
+
+    def start(self):
+        """Démarre les tâches de livraison (au démarrage de l'application)"""
+        self.dispatcher.start()
+        logger.info(f"📢 File de notifications démarrée ({self.dispatcher.worker_count} tâches)")
+
+    async def stop(self):
+        """Livre ce qui peut l'être puis arrête les tâches de livraison"""
+        await self.dispatcher.stop()
 
     async def _get_room_summary(self, room_code: str) -> Dict[str, Any]:
         """Récupère un résumé de la room"""
@@ -503,6 +551,7 @@ class NotificationService:
             "active_sessions": len(self.user_sessions),
             "notification_types": list(self.notification_types),
             "websocket_available": WEBSOCKET_AVAILABLE,
+            "dispatch_queue": self.dispatcher.get_stats(),
             "rooms_with_subscribers": {
                 room: len(subs) for room, subs in self.subscribers.items()
             }
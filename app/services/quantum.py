@@ -75,32 +75,8 @@ class QuantumService:
         solution = []
 
         try:
-            qubits_per_color = math.ceil(math.log2(available_colors))
-
-            # Cache des circuits par configuration
-            circuit_key = f"gen_{qubits_per_color}_{available_colors}"
-
-            if circuit_key not in self._circuit_cache:
-                circuit = QuantumCircuit(qubits_per_color, qubits_per_color)
-
-                # Superposition + intrication pour meilleure aléatoire
-                for qubit in range(qubits_per_color):
-                    circuit.h(qubit)
-
-                # Intrication pour corrélations quantiques
-                for i in range(qubits_per_color - 1):
-                    circuit.cx(i, i + 1)
-
-                circuit.measure_all()
-
-                # Cache + transpilation optimisée
-                self._circuit_cache[circuit_key] = circuit
-                self._transpiled_cache[circuit_key] = transpile(
-                    circuit, self.backend, optimization_level=3
-                )
-
             # Génération avec circuit optimisé
-            optimized_circuit = self._transpiled_cache[circuit_key]
+            optimized_circuit = self._generation_circuit(available_colors)
 
             #  Batch processing pour performance
             for _ in range(combination_length):
@@ -118,6 +94,78 @@ class QuantumService:
 
         return solution
 
+    async def generate_quantum_solutions_batch(
+        self,
+        count: int,
+        combination_length: int = 4,
+        available_colors: int = 6
+    ) -> List[List[int]]:
+        """
+        Génère `count` solutions en un seul job du simulateur
+        NOUVEAU: Chaque shot mesuré (memory=True) fournit une couleur : count × longueur
+        shots au lieu d'un job par couleur et par solution (démarrage des parties)
+        """
+        if count <= 0:
+            return []
+
+        if not self.backend:
+            return [
+                await _quantum_fallback_generation(combination_length, available_colors)
+                for _ in range(count)
+            ]
+
+        try:
+            optimized_circuit = self._generation_circuit(available_colors)
+
+            job = self.backend.run(optimized_circuit, shots=count * combination_length, memory=True)
+            result = await _wait_for_job_async(job)
+
+            # Registre mesuré en premier dans la chaîne (measure_all ajoute le dernier registre)
+            colors = [
+                int(shot.split(' ')[0], 2) % available_colors + 1
+                for shot in result.get_memory()
+            ]
+
+        except Exception as e:
+            print(f"⚠️ Erreur génération quantique groupée: {e}")
+            return [
+                await _quantum_fallback_generation(combination_length, available_colors)
+                for _ in range(count)
+            ]
+
+        return [
+            colors[index * combination_length:(index + 1) * combination_length]
+            for index in range(count)
+        ]
+
+    def _generation_circuit(self, available_colors: int) -> QuantumCircuit:
+        """Circuit de génération des couleurs (transpilé une fois par configuration)"""
+        qubits_per_color = math.ceil(math.log2(available_colors))
+
+        # Cache des circuits par configuration
+        circuit_key = f"gen_{qubits_per_color}_{available_colors}"
+
+        if circuit_key not in self._circuit_cache:
+            circuit = QuantumCircuit(qubits_per_color, qubits_per_color)
+
+            # Superposition + intrication pour meilleure aléatoire
+            for qubit in range(qubits_per_color):
+                circuit.h(qubit)
+
+            # Intrication pour corrélations quantiques
+            for i in range(qubits_per_color - 1):
+                circuit.cx(i, i + 1)
+
+            circuit.measure_all()
+
+            # Cache + transpilation optimisée
+            self._circuit_cache[circuit_key] = circuit
+            self._transpiled_cache[circuit_key] = transpile(
+                circuit, self.backend, optimization_level=3
+            )
+
+        return self._transpiled_cache[circuit_key]
+
 
     async def calculate_quantum_hints_with_probabilities(
         self,
@@ -0,0 +1,246 @@
+"""
+Exécution sérialisée des commandes multijoueur par room
+NOUVEAU: make_attempt, start_game, join_room_by_code, leave_room_by_code et
+submit_attempt modifient les mêmes lignes (partie, participations, solutions) sans
+verrou de ligne : deux appels simultanés sur une room pouvaient s'écraser.
+
+Chaque room a sa file de commandes et une seule tâche qui les applique dans
+l'ordre d'arrivée (acteur). Les rooms s'exécutent en parallèle entre elles ; la
+tâche d'une room s'arrête après ROOM_COMMAND_IDLE_SECONDS sans commande. Aucun
+verrou PostgreSQL n'est pris : la sérialisation tient dans le processus, ce qui
+suffit quand un seul processus sert la room (WEB_CONCURRENCY=1 ou CLUSTER_ENABLED,
+les mutations REST étant routées vers le worker propriétaire). Avec plusieurs
+processus hors cluster, les commandes d'une même room ne sont sérialisées qu'au
+sein de chaque processus.
+
+La commande s'exécute avec la session de l'appelant : si la requête est annulée
+pendant l'exécution, l'appelant attend la fin de la commande avant de rendre la
+session.
+"""
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.utils.exceptions import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Command:
+    """Commande en file : fonction, arguments, résultat attendu par l'appelant"""
+
+    __slots__ = ("func", "args", "kwargs", "future", "enqueued_at", "started")
+
+    def __init__(self, func: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict, future: asyncio.Future):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started = False
+
+
+class _RoomMailbox:
+    """File d'une room et statistiques de son acteur"""
+
+    __slots__ = ("queue", "task", "executed", "failed", "total_wait", "max_wait", "total_run")
+
+    def __init__(self, max_depth: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_depth)
+        self.task: Optional[asyncio.Task] = None
+        self.executed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.queue.qsize(),
+            "executed": self.executed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / self.executed * 1000, 3) if self.executed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "avg_run_ms": round(self.total_run / self.executed * 1000, 3) if self.executed else 0.0
+        }
+
+
+class RoomCommandExecutor:
+    """Une file et une tâche consommatrice par room active"""
+
+    def __init__(self, enabled: bool = True, max_depth: int = 256, idle_seconds: float = 30.0):
+        """
+        Args:
+            enabled: False = les commandes s'exécutent directement (aucune sérialisation)
+            max_depth: Commandes en attente au-delà desquelles une room refuse les nouvelles
+            idle_seconds: Durée sans commande après laquelle la tâche d'une room s'arrête
+        """
+        self.enabled = enabled
+        self.max_depth = max(1, max_depth)
+        self.idle_seconds = idle_seconds
+
+        self.mailboxes: Dict[str, _RoomMailbox] = {}
+
+        # Statistiques globales (les rooms arrêtées sont conservées dans ces compteurs)
+        self.executed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.nested = 0
+
+    # === SOUMISSION ===
+
+    async def run(self, room_code: str, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """
+        Exécute `func(*args, **kwargs)` dans la file de la room et retourne son résultat
+
+        Raises:
+            ServiceUnavailableError: File de la room pleine
+            Toute exception levée par la commande
+        """
+        if not self.enabled:
+            return await func(*args, **kwargs)
+
+        # Commande appelée depuis une commande de la même room (tâche de l'acteur) : l'ordre est
+        # déjà garanti. Les tâches lancées par une commande ne sont pas l'acteur et passent par la file
+        mailbox = self.mailboxes.get(room_code)
+        if mailbox is not None and mailbox.task is asyncio.current_task():
+            self.nested += 1
+            return await func(*args, **kwargs)
+
+        mailbox = self._mailbox(room_code)
+        command = _Command(func, args, kwargs, asyncio.get_running_loop().create_future())
+        try:
+            mailbox.queue.put_nowait(command)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ServiceUnavailableError(
+                f"Trop d'actions en attente dans la room {room_code}, réessayez",
+                service_name="room_commands"
+            )
+
+        try:
+            return await asyncio.shield(command.future)
+        except asyncio.CancelledError:
+            if not command.started:
+                # Pas encore exécutée : l'acteur l'ignorera
+                command.future.cancel()
+                self.abandoned += 1
+            elif not command.future.done():
+                # La commande utilise la session de l'appelant : elle doit finir avant sa fermeture
+                await asyncio.wait([command.future])
+            raise
+
+    def _mailbox(self, room_code: str) -> _RoomMailbox:
+        mailbox = self.mailboxes.get(room_code)
+        if mailbox is None:
+            mailbox = self.mailboxes[room_code] = _RoomMailbox(self.max_depth)
+        if mailbox.task is None or mailbox.task.done():
+            mailbox.task = asyncio.create_task(self._consume(room_code, mailbox))
+        return mailbox
+
+    # === ACTEUR ===
+
+    async def _consume(self, room_code: str, mailbox: _RoomMailbox) -> None:
+        """Applique les commandes de la room une à une, dans l'ordre d'arrivée"""
+        try:
+            while True:
+                try:
+                    command = await asyncio.wait_for(mailbox.queue.get(), timeout=self.idle_seconds)
+                except asyncio.TimeoutError:
+                    if mailbox.queue.empty():
+                        return
+                    continue
+
+                if command.future.cancelled():
+                    continue
+                await self._execute(mailbox, command)
+        finally:
+            if self.mailboxes.get(room_code) is mailbox and mailbox.queue.empty():
+                del self.mailboxes[room_code]
+
+    async def _execute(self, mailbox: _RoomMailbox, command: _Command) -> None:
+        command.started = True
+        started_at = time.monotonic()
+        wait = started_at - command.enqueued_at
+        mailbox.total_wait += wait
+        if wait > mailbox.max_wait:
+            mailbox.max_wait = wait
+
+        try:
+            result = await command.func(*command.args, **command.kwargs)
+        except asyncio.CancelledError:
+            command.future.cancel()
+            raise
+        except Exception as e:
+            mailbox.failed += 1
+            if not command.future.done():
+                command.future.set_exception(e)
+        else:
+            if not command.future.done():
+                command.future.set_result(result)
+        finally:
+            mailbox.total_run += time.monotonic() - started_at
+            mailbox.executed += 1
+            self.executed += 1
+
+    # === CYCLE DE VIE ===
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Laisse les files se vider (au plus `drain_timeout` secondes) puis arrête les acteurs"""
+        tasks = [mailbox.task for mailbox in self.mailboxes.values() if mailbox.task and not mailbox.task.done()]
+        if not tasks:
+            return
+
+        deadline = time.monotonic() + drain_timeout
+        while any(not mailbox.queue.empty() for mailbox in self.mailboxes.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for mailbox in self.mailboxes.values():
+            while not mailbox.queue.empty():
+                mailbox.queue.get_nowait().future.cancel()
+        self.mailboxes.clear()
+        logger.info(f"🛑 Files de commandes des rooms arrêtées ({len(tasks)} rooms)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "active_rooms": len(self.mailboxes),
+            "pending": sum(mailbox.queue.qsize() for mailbox in self.mailboxes.values()),
+            "executed": self.executed,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "nested": self.nested,
+            "rooms": {room_code: mailbox.get_stats() for room_code, mailbox in self.mailboxes.items()}
+        }
+
+
+# Instance globale
+room_commands = RoomCommandExecutor(
+    enabled=settings.ROOM_COMMANDS_ENABLED,
+    max_depth=settings.ROOM_COMMAND_QUEUE_SIZE,
+    idle_seconds=settings.ROOM_COMMAND_IDLE_SECONDS
+)
+
+
+def room_command(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Décorateur des méthodes `(self, db, room_code, ...)` qui modifient une room :
+    l'appel passe par la file de la room
+    """
+
+    @functools.wraps(method)
+    async def wrapper(self, db, room_code: str, *args, **kwargs) -> T:
+        return await room_commands.run(room_code, method, self, db, room_code, *args, **kwargs)
+
+    return wrapper
+
+
+__all__ = ["RoomCommandExecutor", "room_commands", "room_command"]
@@ -0,0 +1,136 @@
+"""
+Cache des détails de room (lecture à travers, versionné, ETag)
+NOUVEAU: get_room_details chargeait la partie, toutes les participations, leurs
+joueurs et le créateur à chaque appel ; les clients l'interrogent toutes les
+quelques secondes. Le résultat est désormais conservé par room avec :
+- une version locale, relevée par chaque mutation de la room (invalidate) et qui ne
+  redescend jamais : un chargement commencé avant une mutation n'est jamais mis en cache
+- le corps JSON de la réponse déjà sérialisé et son ETag (empreinte du contenu,
+  identique d'un worker à l'autre), pour répondre 304 à If-None-Match
+
+Les mutations faites par un autre worker ne sont vues qu'à l'expiration de
+l'entrée (ROOM_SNAPSHOT_TTL_SECONDS).
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+class RoomSnapshot:
+    """Détails d'une room à une version donnée (à ne pas modifier : partagé entre les requêtes)"""
+
+    __slots__ = ("room_code", "version", "data", "body", "etag", "created_at")
+
+    def __init__(self, room_code: str, version: int, data: Dict[str, Any]):
+        self.room_code = room_code
+        self.version = version
+        self.data = data
+        # Corps de GET /rooms/{room_code}, sérialisé une fois par version
+        self.body = json.dumps({"success": True, "data": data}, default=str, separators=(",", ":")).encode()
+        self.etag = f'W/"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self.created_at = time.monotonic()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible de If-None-Match (liste d'ETags ou *)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    weak_etag = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == weak_etag
+        for candidate in candidates
+    )
+
+
+class RoomSnapshotCache:
+    """Instantanés des détails de room, invalidés par les mutations"""
+
+    def __init__(self, ttl_seconds: float = 5.0, max_rooms: int = 5000):
+        """
+        Args:
+            ttl_seconds: Durée de vie d'un instantané (mutations des autres workers)
+            max_rooms: Nombre maximum de rooms en cache (les plus anciennes sortent d'abord)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_rooms = max_rooms
+
+        self.snapshots: Dict[str, RoomSnapshot] = {}
+        # Versions monotones : valeurs d'une horloge globale, jamais réutilisées
+        self.versions: Dict[str, int] = {}
+        self._clock = 0
+        # Version des rooms non suivies (relevée à chaque purge de `versions`)
+        self._floor = 0
+
+        # Statistiques
+        self.hits = 0
+        self.misses = 0
+        self.stale_stores = 0
+        self.invalidations = 0
+
+    def version(self, room_code: str) -> int:
+        """Version courante, à lire avant de charger la room"""
+        return self.versions.get(room_code, self._floor)
+
+    def get(self, room_code: str) -> Optional[RoomSnapshot]:
+        snapshot = self.snapshots.get(room_code)
+        if (
+            snapshot is not None
+            and snapshot.version == self.version(room_code)
+            and time.monotonic() - snapshot.created_at < self.ttl_seconds
+        ):
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        return None
+
+    def put(self, room_code: str, version: int, data: Dict[str, Any]) -> RoomSnapshot:
+        """Enregistre les détails chargés à `version` (ignorés si la room a changé entre-temps)"""
+        snapshot = RoomSnapshot(room_code, version, data)
+        if version != self.version(room_code):
+            self.stale_stores += 1
+            return snapshot
+
+        self.snapshots.pop(room_code, None)
+        if len(self.snapshots) >= self.max_rooms:
+            # Ordre d'insertion des dict : la plus ancienne entrée d'abord
+            oldest = next(iter(self.snapshots))
+            del self.snapshots[oldest]
+        self.snapshots[room_code] = snapshot
+        return snapshot
+
+    def invalidate(self, room_code: Optional[str]) -> None:
+        """La room a changé (appelé après le commit de la mutation)"""
+        if not room_code:
+            return
+        self._clock += 1
+        self.versions[room_code] = self._clock
+        self.snapshots.pop(room_code, None)
+        self.invalidations += 1
+        if len(self.versions) > self.max_rooms * 2:
+            # On ne suit plus que les rooms en cache ; les autres prennent la valeur courante de
+            # l'horloge, supérieure à toutes leurs versions passées : un chargement commencé
+            # avant la purge ne retrouve jamais sa version et n'est pas mis en cache
+            self.versions = {code: self.version(code) for code in self.snapshots}
+            self._floor = self._clock
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "rooms": len(self.snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "stale_stores": self.stale_stores,
+            "invalidations": self.invalidations
+        }
+
+
+# Instance globale
+room_snapshots = RoomSnapshotCache(ttl_seconds=settings.ROOM_SNAPSHOT_TTL_SECONDS)
+
+__all__ = ["RoomSnapshot", "RoomSnapshotCache", "etag_matches", "room_snapshots"]
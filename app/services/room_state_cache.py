@@ -0,0 +1,323 @@
+"""
+État en mémoire des rooms actives (chemin critique des tentatives)
+NOUVEAU: make_attempt lisait à chaque tentative la partie, la participation, le nom
+du joueur, le nombre de tentatives et parfois les gagnants. Ces informations sont
+désormais tenues en mémoire par room active : participants, noms, solutions par
+joueur (game_player_solutions), compteurs de tentatives par mastermind, statut et
+vainqueur.
+
+L'état est reconstruit depuis PostgreSQL au premier accès (3 requêtes) ou après
+un redémarrage. Les changements qui décident de la partie (solutions, statut,
+vainqueur) sont écrits dans la transaction de la tentative ; le compteur
+informatif `attempts` de game_player_solutions est écrit en différé, par lots.
+
+L'état ne fait foi que si un seul processus sert la room : il n'est conservé entre
+deux requêtes qu'avec un seul worker ou avec l'affinité des rooms (CLUSTER_ENABLED).
+Sinon chaque tentative recharge l'état (toujours en 3 requêtes au lieu de 4 à 5).
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.game import Game, GameAttempt, GameParticipation, GameStatus
+from app.models.multijoueur import GamePlayerSolution
+from app.models.user import User
+from app.websocket.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerState:
+    """Participant d'une room active"""
+
+    __slots__ = ("user_id", "username", "status", "score", "attempt_counts",
+                 "solution", "mastermind_number", "attempts", "next_solution")
+
+    def __init__(self, user_id: UUID, username: Optional[str], status: str, score: Optional[int]):
+        self.user_id = user_id
+        self.username = username
+        self.status = status
+        self.score = score
+        # mastermind_number -> tentatives enregistrées
+        self.attempt_counts: Dict[int, int] = {}
+        # Ligne game_player_solutions (solution None : pas encore générée)
+        self.solution: Optional[List[int]] = None
+        self.mastermind_number = 1
+        self.attempts = 0
+        self.next_solution: Optional[List[int]] = None
+
+
+class RoomState:
+    """État d'une room active ; `settings` est le JSON de la partie (lecture seule ici)"""
+
+    __slots__ = (
+        "game_id", "room_code", "status", "winner_id", "combination_length", "available_colors",
+        "max_attempts", "quantum_enabled", "settings", "players", "last_used"
+    )
+
+    def __init__(self, game_id: UUID, room_code: str, status: str, winner_id: Optional[UUID],
+                 combination_length: int, available_colors: int, max_attempts: Optional[int],
+                 quantum_enabled: bool, game_settings: Optional[Dict[str, Any]]):
+        self.game_id = game_id
+        self.room_code = room_code
+        self.status = status
+        self.winner_id = winner_id
+        self.combination_length = combination_length
+        self.available_colors = available_colors
+        self.max_attempts = max_attempts
+        self.quantum_enabled = quantum_enabled
+        self.settings: Dict[str, Any] = game_settings or {}
+        self.players: Dict[UUID, PlayerState] = {}
+        self.last_used = time.monotonic()
+
+
+class RoomStateCache:
+    """Rooms actives en mémoire, avec écriture différée des compteurs"""
+
+    def __init__(self, enabled: bool = True, retain: bool = True,
+                 idle_seconds: float = 600.0, flush_interval: float = 5.0):
+        """
+        Args:
+            enabled: False = chaque appel recharge l'état (aucune conservation, aucune écriture différée)
+            retain: Conserver l'état entre deux requêtes (un seul processus sert la room)
+            idle_seconds: Une room sans tentative depuis ce délai quitte la mémoire
+            flush_interval: Période d'écriture des compteurs différés (secondes)
+        """
+        self.retain = enabled and retain
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+
+        self.rooms: Dict[str, RoomState] = {}
+        # room_code -> joueurs dont le compteur `attempts` n'est pas encore écrit
+        self.dirty: Dict[str, Set[UUID]] = {}
+        # Un joueur à la fois par room : numéros de tentative et solution restent cohérents
+        self.locks = KeyedLock("room_state")
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistiques
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    # === ACCÈS ===
+
+    @asynccontextmanager
+    async def lock(self, room_code: str, user_id: UUID) -> AsyncIterator[None]:
+        """Sérialise les tentatives d'un même joueur dans une room"""
+        async with self.locks.acquire((room_code, user_id)):
+            yield
+
+    async def get(self, db: AsyncSession, room_code: str) -> Optional[RoomState]:
+        """
+        État de la room (mémoire, sinon base de données)
+
+        Returns:
+            L'état, ou None si la room n'existe pas ; seules les rooms actives sont conservées
+        """
+        state = self.rooms.get(room_code)
+        if state is not None:
+            self.hits += 1
+            state.last_used = time.monotonic()
+            return state
+
+        state = await self._load(db, room_code)
+        if state is not None and self.retain and state.status == GameStatus.ACTIVE:
+            self.rooms[room_code] = state
+        return state
+
+    async def _load(self, db: AsyncSession, room_code: str) -> Optional[RoomState]:
+        """Reconstruit l'état : partie, participants (noms et solutions) et compteurs de tentatives"""
+        self.loads += 1
+
+        game = (await db.execute(
+            select(
+                Game.id, Game.status, Game.winner_id, Game.combination_length, Game.available_colors,
+                Game.max_attempts, Game.quantum_enabled, Game.settings
+            ).where(Game.room_code == room_code)
+        )).one_or_none()
+        if game is None:
+            return None
+
+        state = RoomState(
+            game.id, room_code, game.status, game.winner_id, game.combination_length,
+            game.available_colors, game.max_attempts, game.quantum_enabled, game.settings
+        )
+
+        participants = await db.execute(
+            select(
+                GameParticipation.player_id, GameParticipation.status, GameParticipation.score, User.username,
+                GamePlayerSolution.solution, GamePlayerSolution.mastermind_number, GamePlayerSolution.attempts,
+                GamePlayerSolution.next_solution
+            )
+            .outerjoin(User, User.id == GameParticipation.player_id)
+            .outerjoin(GamePlayerSolution, and_(
+                GamePlayerSolution.game_id == GameParticipation.game_id,
+                GamePlayerSolution.player_id == GameParticipation.player_id
+            ))
+            .where(GameParticipation.game_id == game.id)
+        )
+        for row in participants:
+            player = PlayerState(row.player_id, row.username, row.status, row.score)
+            if row.solution is not None:
+                player.solution = row.solution
+                player.mastermind_number = row.mastermind_number
+                player.attempts = row.attempts
+                player.next_solution = row.next_solution
+            state.players[row.player_id] = player
+
+        counts = await db.execute(
+            select(GameAttempt.player_id, GameAttempt.mastermind_number, func.count(GameAttempt.id))
+            .where(GameAttempt.game_id == game.id)
+            .group_by(GameAttempt.player_id, GameAttempt.mastermind_number)
+        )
+        for player_id, mastermind_number, count in counts:
+            player = state.players.get(player_id)
+            if player is not None:
+                player.attempt_counts[mastermind_number] = count
+
+        return state
+
+    # === MODIFICATIONS ===
+
+    def holds(self, state: RoomState) -> bool:
+        """L'état est conservé en mémoire (sinon `attempts` doit être écrit immédiatement)"""
+        return self.rooms.get(state.room_code) is state
+
+    def mark_dirty(self, state: RoomState, user_id: UUID) -> None:
+        """Le compteur `attempts` du joueur a changé sans être écrit : il partira au prochain lot"""
+        if self.holds(state):
+            self.dirty.setdefault(state.room_code, set()).add(user_id)
+
+    def mark_clean(self, state: RoomState, user_id: UUID) -> None:
+        """La ligne du joueur vient d'être écrite dans la transaction de la tentative"""
+        players = self.dirty.get(state.room_code)
+        if players is not None and self.holds(state):
+            players.discard(user_id)
+            if not players:
+                del self.dirty[state.room_code]
+
+    def invalidate(self, room_code: Optional[str]) -> None:
+        """
+        Oublie une room (modifiée hors de make_attempt, terminée ou transaction annulée)
+
+        Les compteurs différés sont abandonnés : ils sont recalculés depuis game_attempts.
+        """
+        if room_code and self.rooms.pop(room_code, None) is not None:
+            self.dirty.pop(room_code, None)
+            self.invalidations += 1
+
+    async def release_foreign_rooms(self, cluster) -> int:
+        """Listener du cluster : oublie les rooms dont ce worker n'est plus propriétaire"""
+        foreign = [room_code for room_code in self.rooms if not cluster.is_local(room_code)]
+        if foreign:
+            await self.flush()
+        for room_code in foreign:
+            self.invalidate(room_code)
+        return len(foreign)
+
+    # === ÉCRITURE DIFFÉRÉE ===
+
+    async def flush(self) -> int:
+        """Écrit les compteurs différés (un UPDATE par clé primaire, une transaction) ; retourne le nombre de lignes"""
+        if not self.dirty:
+            return 0
+
+        dirty, self.dirty = self.dirty, {}
+        # Valeurs lues maintenant : les tentatives pendant l'écriture partiront au lot suivant
+        rows = []
+        for room_code, players in dirty.items():
+            state = self.rooms.get(room_code)
+            if state is None:
+                continue
+            for user_id in players:
+                player = state.players.get(user_id)
+                if player is not None and player.solution is not None:
+                    rows.append({"game_id": state.game_id, "player_id": user_id, "attempts": player.attempts})
+        if not rows:
+            return 0
+
+        from app.core.database import get_db_context
+
+        try:
+            async with get_db_context() as db:
+                await db.execute(update(GamePlayerSolution), rows)
+        except Exception as e:
+            self.flush_errors += 1
+            for room_code, players in dirty.items():
+                if room_code in self.rooms:
+                    self.dirty.setdefault(room_code, set()).update(players)
+            logger.warning(f"⚠️ Échec écriture différée de {len(rows)} compteurs: {e}")
+            return 0
+
+        self.flushes += 1
+        return len(rows)
+
+    def _evict_idle(self) -> None:
+        """Les rooms inactives quittent la mémoire une fois leurs compteurs écrits"""
+        deadline = time.monotonic() - self.idle_seconds
+        idle = [
+            room_code for room_code, state in self.rooms.items()
+            if state.last_used < deadline and room_code not in self.dirty
+        ]
+        for room_code in idle:
+            del self.rooms[room_code]
+        self.evictions += len(idle)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                self._evict_idle()
+            except Exception as e:
+                logger.error(f"❌ Erreur écriture différée des rooms: {e}")
+
+    def start(self) -> None:
+        if self.retain and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche périodique puis écrit les derniers compteurs"""
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "retain": self.retain,
+            "rooms": len(self.rooms),
+            "dirty_rooms": len(self.dirty),
+            "dirty_players": sum(len(players) for players in self.dirty.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors
+        }
+
+
+# Instance globale
+room_state_cache = RoomStateCache(
+    enabled=settings.ROOM_STATE_CACHE_ENABLED,
+    retain=settings.WORKERS <= 1 or settings.CLUSTER_ENABLED,
+    idle_seconds=settings.ROOM_STATE_IDLE_SECONDS,
+    flush_interval=settings.ROOM_STATE_FLUSH_SECONDS
+)
+
+__all__ = ["PlayerState", "RoomState", "RoomStateCache", "room_state_cache"]
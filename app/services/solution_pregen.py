@@ -0,0 +1,243 @@
+"""
+Pré-génération des masterminds suivants
+NOUVEAU: Quand un joueur résout (ou échoue) son mastermind, make_attempt générait
+la solution suivante avant de valider et de répondre : la tentative gagnante était
+la plus lente (génération quantique). La solution suivante de chaque joueur est
+désormais générée en tâche de fond dès qu'il commence son mastermind courant et
+rangée dans game_player_solutions.next_solution : la transition ne fait plus
+qu'échanger une valeur déjà calculée.
+
+Une solution pré-générée n'est liée à aucun mastermind précis (toutes les solutions
+d'une partie ont la même longueur et les mêmes couleurs) : celle qui arrive après
+une transition servira simplement à la suivante. Un balayage périodique relance la
+pré-génération des joueurs qui n'en ont pas (échec, redémarrage, autre worker).
+"""
+import asyncio
+import logging
+import random
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func, select, update
+
+from app.core.cluster import cluster_node
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.models.game import Game, GameStatus
+from app.models.multijoueur import GamePlayerSolution
+from app.services.room_commands import room_commands
+from app.services.room_state_cache import PlayerState, room_state_cache
+
+# Import conditionnel pour quantum_service
+try:
+    from app.services.quantum import quantum_service
+
+    QUANTUM_AVAILABLE = True
+except ImportError:
+    quantum_service = None
+    QUANTUM_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+async def generate_solutions(count: int, combination_length: int, available_colors: int,
+                             quantum_enabled: bool) -> List[List[int]]:
+    """`count` solutions en un seul tirage (un seul job du simulateur si quantique, repli classique)"""
+    if quantum_enabled and QUANTUM_AVAILABLE:
+        try:
+            return await quantum_service.generate_quantum_solutions_batch(
+                count=count,
+                combination_length=combination_length,
+                available_colors=available_colors
+            )
+        except Exception as quantum_error:
+            logger.warning(f"⚠️ Erreur quantique, fallback classique: {quantum_error}")
+
+    return [
+        [random.randint(1, available_colors) for _ in range(combination_length)]
+        for _ in range(count)
+    ]
+
+
+async def generate_solution(combination_length: int, available_colors: int, quantum_enabled: bool) -> List[int]:
+    """Nouvelle solution (quantique si activé, repli classique)"""
+    return (await generate_solutions(1, combination_length, available_colors, quantum_enabled))[0]
+
+
+class SolutionPregenerator:
+    """Génère en tâche de fond la solution suivante des joueurs actifs"""
+
+    def __init__(self, enabled: bool = True, concurrency: int = 4,
+                 sweep_interval: float = 30.0, sweep_batch: int = 100):
+        """
+        Args:
+            enabled: False = aucune pré-génération (les transitions génèrent immédiatement)
+            concurrency: Générations simultanées au plus
+            sweep_interval: Période du balayage de rattrapage (secondes)
+            sweep_batch: Joueurs traités au plus par balayage
+        """
+        self.enabled = enabled
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = max(1, sweep_batch)
+
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._in_flight: Set[Tuple[UUID, UUID]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._sweeper: Optional[asyncio.Task] = None
+
+        # Statistiques
+        self.scheduled = 0
+        self.stored = 0
+        self.discarded = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+        self.sweeps = 0
+
+    # === TRANSITION (appelée par make_attempt) ===
+
+    def take(self, player: PlayerState) -> Optional[List[int]]:
+        """Retire la solution pré-générée du joueur (None si elle n'est pas prête)"""
+        solution, player.next_solution = player.next_solution, None
+        if solution is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return solution
+
+    def schedule(self, room_code: str, game_id: UUID, user_id: UUID, combination_length: int,
+                 available_colors: int, quantum_enabled: bool) -> None:
+        """Lance la pré-génération de la solution suivante d'un joueur (sans effet si déjà en cours)"""
+        key = (game_id, user_id)
+        if not self.enabled or key in self._in_flight:
+            return
+
+        self._in_flight.add(key)
+        self.scheduled += 1
+        task = asyncio.create_task(self._pregenerate(
+            room_code, game_id, user_id, combination_length, available_colors, quantum_enabled
+        ))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # === GÉNÉRATION ===
+
+    async def _pregenerate(self, room_code: str, game_id: UUID, user_id: UUID, combination_length: int,
+                           available_colors: int, quantum_enabled: bool) -> None:
+        try:
+            async with self._semaphore:
+                solution = await generate_solution(combination_length, available_colors, quantum_enabled)
+            # Rangée par la file de la room (cette tâche n'est pas l'acteur) : jamais au milieu d'une tentative
+            await room_commands.run(room_code, self._store, room_code, game_id, user_id, solution)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"⚠️ Pré-génération impossible pour {user_id} dans {room_code}: {e}")
+        finally:
+            self._in_flight.discard((game_id, user_id))
+
+    async def _store(self, room_code: str, game_id: UUID, user_id: UUID, solution: List[int]) -> None:
+        """Range la solution si le joueur n'en a pas déjà une d'avance"""
+        async with get_db_context() as db:
+            result = await db.execute(
+                update(GamePlayerSolution)
+                .where(and_(
+                    GamePlayerSolution.game_id == game_id,
+                    GamePlayerSolution.player_id == user_id,
+                    GamePlayerSolution.next_solution.is_(None)
+                ))
+                .values(next_solution=solution)
+            )
+
+        if not result.rowcount:
+            self.discarded += 1
+            return
+
+        self.stored += 1
+        state = room_state_cache.rooms.get(room_code)
+        player = state.players.get(user_id) if state is not None else None
+        if player is not None and player.next_solution is None:
+            player.next_solution = solution
+
+    # === RATTRAPAGE ===
+
+    async def sweep(self) -> int:
+        """Planifie les joueurs actifs sans solution d'avance ; retourne le nombre de joueurs planifiés"""
+        total_masterminds = func.coalesce(Game.settings["total_masterminds"].as_integer(), 3)
+        async with get_db_context() as db:
+            rows = (await db.execute(
+                select(
+                    Game.room_code, Game.id, GamePlayerSolution.player_id, Game.combination_length,
+                    Game.available_colors, Game.quantum_enabled
+                )
+                .join(Game, Game.id == GamePlayerSolution.game_id)
+                .where(and_(
+                    Game.status == GameStatus.ACTIVE.value,
+                    GamePlayerSolution.next_solution.is_(None),
+                    # Dernier mastermind : aucune transition ne consommera de solution
+                    GamePlayerSolution.mastermind_number < total_masterminds
+                ))
+                .limit(self.sweep_batch)
+            )).all()
+
+        self.sweeps += 1
+        scheduled = 0
+        for row in rows:
+            # Avec l'affinité des rooms, chaque worker ne rattrape que ses rooms
+            if cluster_node is not None and not cluster_node.is_local(row.room_code):
+                continue
+            if (row.id, row.player_id) in self._in_flight:
+                continue
+            self.schedule(row.room_code, row.id, row.player_id, row.combination_length,
+                          row.available_colors, row.quantum_enabled)
+            scheduled += 1
+        return scheduled
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"❌ Erreur rattrapage des pré-générations: {e}")
+
+    # === CYCLE DE VIE ===
+
+    def start(self) -> None:
+        if self.enabled and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête le balayage et abandonne les générations en cours (rattrapées au redémarrage)"""
+        tasks = list(self._tasks)
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "scheduled": self.scheduled,
+            "stored": self.stored,
+            "discarded": self.discarded,
+            "failures": self.failures,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else 0.0,
+            "sweeps": self.sweeps
+        }
+
+
+# Instance globale
+solution_pregen = SolutionPregenerator(
+    enabled=settings.PREGEN_ENABLED,
+    concurrency=settings.PREGEN_CONCURRENCY,
+    sweep_interval=settings.PREGEN_SWEEP_SECONDS
+)
+
+__all__ = ["SolutionPregenerator", "generate_solution", "generate_solutions", "solution_pregen"]
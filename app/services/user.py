@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
 from app.repositories.user import UserRepository
+from app.services.auth_cache import auth_cache
 from app.schemas.user import (
     UserUpdate, UserPreferences, UserSearch, UserStats,
     UserValidation, UserValidationResult, UserBulkAction
@@ -101,6 +102,9 @@ class UserService:
             updated_by=updated_by
         )
 
+        # Le nom d'utilisateur est conservé par le cache d'authentification WebSocket
+        auth_cache.invalidate_user(user_id)
+
         return updated_user
 
     async def delete_user_account(
@@ -126,12 +130,14 @@ class UserService:
         Raises:
             EntityNotFoundError: Si l'utilisateur n'existe pas
         """
-        return await self.user_repo.delete(
+        deleted = await self.user_repo.delete(
             db,
             id=user_id,
             soft_delete=soft_delete,
             deleted_by=deleted_by
         )
+        auth_cache.invalidate_user(user_id)
+        return deleted
 
     # === MÉTHODES DE PRÉFÉRENCES ===
 
@@ -446,6 +452,10 @@ class UserService:
         except Exception as e:
             errors.append({'action': action, 'error': str(e)})
 
+        # Désactivation / réactivation : plus d'identité en cache pour ces comptes
+        for user_id in user_ids:
+            auth_cache.invalidate_user(user_id)
+
         return {
             'success_count': success_count,
             'error_count': len(errors),
@@ -497,6 +507,7 @@ class UserService:
         for user in inactive_users:
             try:
                 await self.user_repo.delete(db, id=user.id, soft_delete=True)
+                auth_cache.invalidate_user(user.id)
                 cleaned_count += 1
             except Exception:
                 continue
@@ -0,0 +1,227 @@
+"""
+Planificateur de diffusion par room (coalescence par tick)
+NOUVEAU: Pour les rooms qui l'activent, les événements sont accumulés pendant un court
+tick (~50 ms), les mises à jour d'état obsolètes sont fusionnées et une seule trame
+groupée est envoyée par tick. Le chat et les événements sensibles à la latence passent outre.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fonction de clé : retourne la clé de remplacement d'un message, ou None s'il ne remplace rien
+SupersedeKey = Callable[[Dict[str, Any]], Optional[Hashable]]
+# Fonction de fusion : combine un message en attente avec sa version plus récente
+MergeFunction = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+
+class PendingEvent:
+    """Événement en attente dans le tick courant d'une room"""
+
+    __slots__ = ("message", "exclude", "superseded")
+
+    def __init__(self, message: Dict[str, Any], exclude: Any = None):
+        self.message = message
+        self.exclude = exclude
+        self.superseded = False
+
+
+class _RoomBatch:
+    """Tampon d'un tick pour une room"""
+
+    __slots__ = ("events", "by_key", "handle", "opened_at")
+
+    def __init__(self):
+        self.events: List[PendingEvent] = []
+        self.by_key: Dict[Hashable, PendingEvent] = {}
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.opened_at = time.monotonic()
+
+
+class RoomBroadcastScheduler:
+    """
+    Coalescence des diffusions par room, activée room par room
+
+    Le premier événement d'un tick arme un timer ; à son échéance, les
+    événements accumulés sont remis à la fonction de flush du gestionnaire.
+    """
+
+    def __init__(
+            self,
+            flush: Callable[[str, List[PendingEvent]], Awaitable[None]],
+            default_tick: float = 0.05,
+            bypass_types: Optional[Iterable[str]] = None,
+            flush_types: Optional[Iterable[str]] = None,
+            supersede_keys: Optional[Dict[str, SupersedeKey]] = None,
+            merge_functions: Optional[Dict[str, MergeFunction]] = None
+    ):
+        """
+        Args:
+            flush: Coroutine qui envoie les événements d'un tick à une room
+            default_tick: Durée d'un tick en secondes
+            bypass_types: Types envoyés immédiatement, sans attendre le tick (chat)
+            flush_types: Types envoyés immédiatement après avoir vidé le tick en cours,
+                         pour conserver l'ordre (début/fin de partie...)
+            supersede_keys: Par type, fonction donnant la clé de remplacement
+            merge_functions: Par type, fusion optionnelle (sinon la version récente remplace)
+        """
+        self._flush = flush
+        self.default_tick = default_tick
+        self.bypass_types = frozenset(bypass_types or ())
+        self.flush_types = frozenset(flush_types or ())
+        self.supersede_keys = dict(supersede_keys or {})
+        self.merge_functions = dict(merge_functions or {})
+
+        self._room_ticks: Dict[str, float] = {}
+        self._batches: Dict[str, _RoomBatch] = {}
+        self._flush_tasks: set = set()
+
+        # Statistiques
+        self.events_submitted = 0
+        self.events_superseded = 0
+        self.events_bypassed = 0
+        self.frames_flushed = 0
+
+    # === ACTIVATION PAR ROOM ===
+
+    def enable_room(self, room_code: str, tick: Optional[float] = None) -> None:
+        """Active la coalescence pour une room"""
+        self._room_ticks[room_code] = tick or self.default_tick
+
+    async def disable_room(self, room_code: str) -> None:
+        """Désactive la coalescence et envoie immédiatement les événements en attente"""
+        self._room_ticks.pop(room_code, None)
+        await self.flush_room(room_code)
+
+    def is_enabled(self, room_code: str) -> bool:
+        return room_code in self._room_ticks
+
+    # === SOUMISSION ===
+
+    async def submit(self, room_code: str, message: Dict[str, Any], exclude: Any = None) -> bool:
+        """
+        Propose un message au planificateur
+
+        Args:
+            room_code: Room cible
+            message: Message à diffuser
+            exclude: Connexion à exclure pour ce message
+
+        Returns:
+            True si le message est différé au prochain tick, False si l'appelant
+            doit l'envoyer immédiatement (room non activée ou type prioritaire)
+        """
+        tick = self._room_ticks.get(room_code)
+        if tick is None:
+            return False
+
+        message_type = message.get("type")
+        if message_type in self.bypass_types:
+            self.events_bypassed += 1
+            return False
+
+        if message_type in self.flush_types:
+            # Les événements déjà en attente partent d'abord
+            self.events_bypassed += 1
+            await self.flush_room(room_code)
+            return False
+
+        batch = self._batches.get(room_code)
+        if batch is None:
+            batch = self._batches[room_code] = _RoomBatch()
+            batch.handle = asyncio.get_running_loop().call_later(tick, self._on_tick, room_code)
+
+        self.events_submitted += 1
+        event = PendingEvent(message, exclude)
+
+        key_function = self.supersede_keys.get(message_type)
+        key = key_function(message) if key_function else None
+        if key is not None and exclude is None:
+            previous = batch.by_key.get(key)
+            if previous is not None and not previous.superseded:
+                # L'état le plus récent prend la place de l'ancien, en fin de tick pour conserver la causalité
+                merge = self.merge_functions.get(message_type)
+                if merge is not None:
+                    event.message = merge(previous.message, message)
+                previous.superseded = True
+                self.events_superseded += 1
+            batch.by_key[key] = event
+
+        batch.events.append(event)
+        return True
+
+    # === FLUSH ===
+
+    def _on_tick(self, room_code: str) -> None:
+        """Échéance du timer d'une room"""
+        task = asyncio.get_running_loop().create_task(self.flush_room(room_code))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush_room(self, room_code: str) -> int:
+        """
+        Envoie immédiatement les événements en attente d'une room
+
+        Returns:
+            Nombre d'événements envoyés
+        """
+        batch = self._batches.pop(room_code, None)
+        if batch is None:
+            return 0
+
+        if batch.handle is not None:
+            batch.handle.cancel()
+
+        events = [event for event in batch.events if not event.superseded]
+        if not events:
+            return 0
+
+        try:
+            await self._flush(room_code, events)
+            self.frames_flushed += 1
+        except Exception as e:
+            logger.error(f"❌ Erreur flush diffusion groupée {room_code}: {e}")
+
+        return len(events)
+
+    def discard_room(self, room_code: str) -> None:
+        """Oublie une room vide : désactivation et abandon des événements en attente"""
+        self._room_ticks.pop(room_code, None)
+        batch = self._batches.pop(room_code, None)
+        if batch is not None and batch.handle is not None:
+            batch.handle.cancel()
+
+    async def flush_all(self) -> None:
+        """Vide tous les tampons (arrêt du serveur)"""
+        for room_code in list(self._batches.keys()):
+            await self.flush_room(room_code)
+
+    # === STATISTIQUES ===
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled_rooms": len(self._room_ticks),
+            "pending_rooms": len(self._batches),
+            "events_submitted": self.events_submitted,
+            "events_superseded": self.events_superseded,
+            "events_bypassed": self.events_bypassed,
+            "frames_flushed": self.frames_flushed
+        }
+
+
+def build_batch_frame(events: List[Dict[str, Any]], room_code: str, timestamp: str) -> Dict[str, Any]:
+    """Construit la trame groupée envoyée aux clients"""
+    return {
+        "type": "batch",
+        "data": {
+            "room_code": room_code,
+            "events": events,
+            "count": len(events),
+            "timestamp": timestamp
+        }
+    }
+
+
+__all__ = ["RoomBroadcastScheduler", "PendingEvent", "build_batch_frame"]
@@ -0,0 +1,371 @@
+"""
+Courtier pub/sub pour la diffusion WebSocket entre workers
+NOUVEAU: Chaque worker livre ses propres connexions directement et publie l'événement
+sur un canal (room ou utilisateur) ; les autres workers abonnés le livrent à leurs
+connexions locales. L'enveloppe porte l'identifiant du worker d'origine, qui ignore
+son propre écho : chaque socket reçoit l'événement exactement une fois.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from uuid import uuid4
+
+from app.core.config import settings
+from app.websocket.locks import KeyedLock
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Callback de réception : (canal, payload) -> coroutine
+BrokerHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def _default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+
+
+# === INTERFACE ===
+
+class MessageBroker(ABC):
+    """Courtier de messages entre workers (interface commune)"""
+
+    backend = "base"
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or _default_worker_id()
+        self._handlers: Dict[str, BrokerHandler] = {}
+
+        # Statistiques
+        self.published = 0
+        self.received = 0
+        self.own_echoes = 0
+        self.publish_errors = 0
+        self.handler_errors = 0
+
+    async def start(self) -> None:
+        """Ouvre les connexions et démarre la réception"""
+
+    async def stop(self) -> None:
+        """Arrête la réception et ferme les connexions"""
+
+    async def subscribe(self, channel: str, handler: BrokerHandler) -> None:
+        """Abonne le worker à un canal (idempotent)"""
+        first = channel not in self._handlers
+        self._handlers[channel] = handler
+        if first:
+            await self._subscribe(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        """Désabonne le worker d'un canal (idempotent)"""
+        if self._handlers.pop(channel, None) is not None:
+            await self._unsubscribe(channel)
+
+    async def publish(self, channel: str, payload: Dict[str, Any]) -> None:
+        """
+        Publie un payload JSON-sérialisable aux autres workers abonnés au canal
+
+        Args:
+            channel: Canal logique (sans préfixe)
+            payload: Données de l'événement
+        """
+        try:
+            await self._publish(channel, {"origin": self.worker_id, "payload": payload})
+            self.published += 1
+        except Exception as e:
+            self.publish_errors += 1
+            logger.warning(f"⚠️ Échec publication {channel} ({self.backend}): {e}")
+
+    async def _dispatch(self, channel: str, envelope: Dict[str, Any]) -> None:
+        """Remet un message reçu au gestionnaire abonné, sauf s'il vient de ce worker"""
+        if envelope.get("origin") == self.worker_id:
+            self.own_echoes += 1
+            return
+
+        handler = self._handlers.get(channel)
+        if handler is None:
+            return
+
+        self.received += 1
+        try:
+            await handler(channel, envelope.get("payload") or {})
+        except Exception as e:
+            self.handler_errors += 1
+            logger.error(f"❌ Erreur traitement message courtier {channel}: {e}")
+
+    # === IMPLÉMENTATION ===
+
+    @abstractmethod
+    async def _subscribe(self, channel: str) -> None:
+        """Abonne le backend au canal"""
+
+    @abstractmethod
+    async def _unsubscribe(self, channel: str) -> None:
+        """Désabonne le backend du canal"""
+
+    @abstractmethod
+    async def _publish(self, channel: str, envelope: Dict[str, Any]) -> None:
+        """Publie l'enveloppe sur le canal"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "worker_id": self.worker_id,
+            "channels": len(self._handlers),
+            "published": self.published,
+            "received": self.received,
+            "own_echoes": self.own_echoes,
+            "publish_errors": self.publish_errors,
+            "handler_errors": self.handler_errors
+        }
+
+
+# === EN MÉMOIRE (tests, développement) ===
+
+class InMemoryBus:
+    """Bus partagé par plusieurs InMemoryBroker d'un même processus (workers simulés)"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InMemoryBroker"]] = {}
+
+    def deliver(self, channel: str, envelope: Dict[str, Any]) -> None:
+        for broker in tuple(self.subscribers.get(channel, ())):
+            broker._inbox.put_nowait((channel, envelope))
+
+
+class InMemoryBroker(MessageBroker):
+    """
+    Courtier en mémoire : chaque instance joue le rôle d'un worker
+
+    Les messages sont remis dans l'ordre de publication par une tâche de
+    réception propre à chaque instance, comme avec Redis.
+    """
+
+    backend = "memory"
+
+    def __init__(self, bus: Optional[InMemoryBus] = None, worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.bus = bus or InMemoryBus()
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._reader is None:
+            self._reader = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        for channel in list(self._handlers.keys()):
+            await self.unsubscribe(channel)
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+    async def drain(self) -> None:
+        """Attend que tous les messages reçus soient traités (tests)"""
+        await self._inbox.join()
+
+    async def _run(self) -> None:
+        while True:
+            channel, envelope = await self._inbox.get()
+            try:
+                await self._dispatch(channel, envelope)
+            finally:
+                self._inbox.task_done()
+
+    async def _subscribe(self, channel: str) -> None:
+        self.bus.subscribers.setdefault(channel, set()).add(self)
+
+    async def _unsubscribe(self, channel: str) -> None:
+        subscribers = self.bus.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.bus.subscribers[channel]
+
+    async def _publish(self, channel: str, envelope: Dict[str, Any]) -> None:
+        self.bus.deliver(channel, envelope)
+
+
+# === REDIS PUB/SUB (production, docker-compose) ===
+
+class RedisBroker(MessageBroker):
+    """Courtier Redis pub/sub : un canal Redis par room / utilisateur"""
+
+    backend = "redis"
+
+    def __init__(
+            self,
+            url: str,
+            password: Optional[str] = None,
+            prefix: str = "mastermind:ws:",
+            worker_id: Optional[str] = None
+    ):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis n'est pas installé")
+
+        super().__init__(worker_id)
+        self.url = url
+        self.password = password
+        self.prefix = prefix
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+
+        self._client = redis_asyncio.from_url(self.url, password=self.password, decode_responses=True)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"📮 Courtier Redis démarré (worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._handlers.clear()
+
+    async def _run(self) -> None:
+        """Lit les messages Redis et les remet dans l'ordre"""
+        prefix_length = len(self.prefix)
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+
+                channel = message["channel"][prefix_length:]
+                await self._dispatch(channel, json.loads(message["data"]))
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Erreur lecture Redis pub/sub: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _subscribe(self, channel: str) -> None:
+        await self._pubsub.subscribe(self.prefix + channel)
+
+    async def _unsubscribe(self, channel: str) -> None:
+        await self._pubsub.unsubscribe(self.prefix + channel)
+
+    async def _publish(self, channel: str, envelope: Dict[str, Any]) -> None:
+        await self._client.publish(self.prefix + channel, json.dumps(envelope))
+
+
+# === ABONNEMENTS D'UN GESTIONNAIRE ===
+
+class ChannelSubscriptions:
+    """
+    Aligne les abonnements d'un gestionnaire sur ses connexions locales
+
+    Un canal n'est écouté que tant qu'au moins une connexion locale en a besoin
+    (room occupée, utilisateur connecté) ; les changements d'un même canal sont
+    sérialisés pour éviter qu'un désabonnement tardif n'annule un abonnement récent.
+    """
+
+    def __init__(self, broker: MessageBroker, handler: BrokerHandler):
+        self.broker = broker
+        self.handler = handler
+        self.channels: Set[str] = set()
+        self._locks = KeyedLock("broker_channels")
+
+    async def sync(self, channel: str, wanted: Callable[[], bool]) -> None:
+        """
+        Abonne ou désabonne un canal selon l'état local courant
+
+        Args:
+            channel: Canal logique
+            wanted: Évalué sous verrou : True si une connexion locale a besoin du canal
+        """
+        async with self._locks.acquire(channel):
+            if wanted():
+                if channel not in self.channels:
+                    await self.broker.subscribe(channel, self.handler)
+                    self.channels.add(channel)
+            elif channel in self.channels:
+                await self.broker.unsubscribe(channel)
+                self.channels.discard(channel)
+
+    async def clear(self) -> None:
+        for channel in list(self.channels):
+            await self.broker.unsubscribe(channel)
+        self.channels.clear()
+
+
+# === FABRIQUE ===
+
+def create_broker(backend: Optional[str]) -> Optional[MessageBroker]:
+    """
+    Crée le courtier configuré
+
+    Args:
+        backend: "none" (un seul worker), "memory" ou "redis"
+
+    Returns:
+        Courtier, ou None si la diffusion reste locale au processus
+    """
+    backend = (backend or "none").strip().lower()
+
+    if backend in ("none", "local", ""):
+        return None
+
+    if backend == "memory":
+        return InMemoryBroker()
+
+    if backend == "redis":
+        if not REDIS_AVAILABLE:
+            logger.warning("⚠️ redis non installé : diffusion WebSocket limitée au worker courant")
+            return None
+        return RedisBroker(
+            settings.REDIS_URL,
+            password=settings.REDIS_PASSWORD,
+            prefix=settings.WS_BROKER_CHANNEL_PREFIX
+        )
+
+    logger.warning(f"⚠️ Courtier WebSocket inconnu '{backend}' : diffusion locale uniquement")
+    return None
+
+
+# Instance globale partagée par les gestionnaires WebSocket du worker
+ws_broker = create_broker(settings.WS_BROKER_BACKEND)
+
+__all__ = [
+    "MessageBroker",
+    "InMemoryBus",
+    "InMemoryBroker",
+    "RedisBroker",
+    "ChannelSubscriptions",
+    "create_broker",
+    "ws_broker",
+    "REDIS_AVAILABLE"
+]
@@ -0,0 +1,250 @@
+"""
+Codecs de trames WebSocket négociés par sous-protocole
+NOUVEAU: Le client choisit à la poignée de main le format texte JSON historique ou un
+format binaire MessagePack compact (clés courtes entières, horodatages et identifiants
+binaires). Les messages sont construits une seule fois sous forme de dict, quel que soit
+le format.
+"""
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+from uuid import UUID
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+Frame = Union[str, bytes]
+
+SUBPROTOCOL_JSON = "mastermind.json.v1"
+SUBPROTOCOL_MSGPACK = "mastermind.msgpack.v1"
+
+
+# === TABLE DES CLÉS COURTES (mastermind.msgpack.v1) ===
+# L'index de chaque nom est sa clé sur le fil. Les clés d'origine étant toujours des chaînes,
+# une clé entière est sans ambiguïté. Ne jamais réordonner : ajouter en fin de liste
+# (ou passer à une v2).
+KEY_TABLE = (
+    "type", "data", "timestamp", "message_id", "room_code", "user_id", "username",
+    "status", "score", "attempt_number", "combination", "exact_matches", "position_matches",
+    "is_solution", "mastermind_number", "game_finished", "player_eliminated", "quantum_enabled",
+    "quantum_data", "connected_players", "seq", "base_seq", "ops", "op", "path", "value",
+    "state", "events", "count", "message", "participants", "current_players", "joined_at",
+    "created_at", "started_at", "left_at", "attempts_count", "is_ready", "is_creator", "is_winner",
+    "connection_id", "room_id", "winner_id", "winner_username", "final_status"
+)
+
+# Clés dont la valeur est un horodatage ISO 8601 → extension Timestamp MessagePack
+TIMESTAMP_KEYS = frozenset({"timestamp", "joined_at", "created_at", "started_at", "left_at"})
+# Clés dont la valeur est un UUID textuel → 16 octets
+UUID_KEYS = frozenset({"message_id"})
+
+
+# === CODECS ===
+
+class MessageCodec(ABC):
+    """Format de sérialisation d'une connexion"""
+
+    name = "base"
+    subprotocol: Optional[str] = None
+    binary = False
+
+    @abstractmethod
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        """Sérialise un message en trame (texte ou binaire)"""
+
+    @abstractmethod
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        """Désérialise une trame reçue"""
+
+    def describe(self) -> Dict[str, Any]:
+        """Description envoyée au client dans connection_established"""
+        return {"name": self.name, "subprotocol": self.subprotocol, "binary": self.binary}
+
+
+class JsonCodec(MessageCodec):
+    """Format texte historique"""
+
+    name = "json"
+    subprotocol = SUBPROTOCOL_JSON
+    binary = False
+
+    def encode(self, message: Dict[str, Any]) -> str:
+        return json.dumps(message)
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        return json.loads(frame)
+
+
+class MsgpackCodec(MessageCodec):
+    """Format binaire compact : MessagePack + clés courtes"""
+
+    name = "msgpack"
+    subprotocol = SUBPROTOCOL_MSGPACK
+    binary = True
+
+    def __init__(self, key_table: Iterable[str] = KEY_TABLE):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack n'est pas installé")
+
+        self.key_table = tuple(key_table)
+        self._short_keys = {name: index for index, name in enumerate(self.key_table)}
+        self._packer = msgpack.Packer(use_bin_type=True)
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        compacted = self._compact(message)
+        # Seul l'horodatage d'enveloppe est un epoch serveur (WebSocketMessage) ; les valeurs
+        # numériques imbriquées peuvent venir du client (ping en millisecondes) et restent telles quelles
+        envelope_timestamp = message.get("timestamp")
+        if isinstance(envelope_timestamp, float):
+            compacted[self._short_keys["timestamp"]] = msgpack.Timestamp.from_unix(envelope_timestamp)
+        return self._packer.pack(compacted)
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        if isinstance(frame, str):
+            # Tolérance : un client msgpack peut encore envoyer du JSON texte
+            return json.loads(frame)
+        return self._expand(msgpack.unpackb(frame, raw=False, strict_map_key=False))
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "keys": list(self.key_table)}
+
+    # === TRANSFORMATIONS ===
+
+    def _compact(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            short_keys = self._short_keys
+            compacted = {}
+            for key, item in value.items():
+                if key in TIMESTAMP_KEYS:
+                    item = _to_timestamp(item)
+                elif key in UUID_KEYS:
+                    item = _to_uuid_bytes(item)
+                else:
+                    item = self._compact(item)
+                compacted[short_keys.get(key, key)] = item
+            return compacted
+
+        if isinstance(value, (list, tuple)):
+            return [self._compact(item) for item in value]
+
+        return value
+
+    def _expand(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            key_table = self.key_table
+            return {
+                (key_table[key] if isinstance(key, int) and 0 <= key < len(key_table) else key): self._expand(item)
+                for key, item in value.items()
+            }
+
+        if isinstance(value, list):
+            return [self._expand(item) for item in value]
+
+        return value
+
+
+def _to_timestamp(value: Any) -> Any:
+    """ISO 8601 → msgpack.Timestamp (6 à 10 octets au lieu de ~32)"""
+    if isinstance(value, str):
+        try:
+            return msgpack.Timestamp.from_datetime(datetime.fromisoformat(value))
+        except ValueError:
+            pass
+    return value
+
+
+def _to_uuid_bytes(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return UUID(value).bytes
+        except ValueError:
+            return value
+    return value
+
+
+# === NÉGOCIATION ===
+
+json_codec = JsonCodec()
+msgpack_codec: Optional[MsgpackCodec] = MsgpackCodec() if MSGPACK_AVAILABLE else None
+
+_CODECS_BY_SUBPROTOCOL: Dict[str, MessageCodec] = {SUBPROTOCOL_JSON: json_codec}
+if msgpack_codec is not None:
+    _CODECS_BY_SUBPROTOCOL[SUBPROTOCOL_MSGPACK] = msgpack_codec
+
+
+def supported_subprotocols() -> List[str]:
+    return list(_CODECS_BY_SUBPROTOCOL.keys())
+
+
+def negotiate_codec(offered: Optional[Iterable[str]]) -> MessageCodec:
+    """
+    Choisit le codec d'une connexion d'après les sous-protocoles proposés par le client
+
+    Args:
+        offered: Valeurs de l'en-tête Sec-WebSocket-Protocol, par ordre de préférence du client
+
+    Returns:
+        Premier codec supporté, JSON à défaut
+    """
+    for subprotocol in offered or ():
+        codec = _CODECS_BY_SUBPROTOCOL.get(subprotocol)
+        if codec is not None:
+            return codec
+    return json_codec
+
+
+async def accept_with_codec(websocket: Any) -> MessageCodec:
+    """
+    Accepte une connexion WebSocket en confirmant le sous-protocole négocié
+
+    Un client qui ne propose aucun sous-protocole connu reste en JSON texte,
+    sans en-tête Sec-WebSocket-Protocol dans la réponse.
+    """
+    offered = (getattr(websocket, "scope", None) or {}).get("subprotocols") or []
+    codec = negotiate_codec(offered)
+    subprotocol = codec.subprotocol if codec.subprotocol in offered else None
+
+    if subprotocol is not None:
+        await websocket.accept(subprotocol=subprotocol)
+    else:
+        await websocket.accept()
+    return codec
+
+
+class EncodedFrames:
+    """Sérialisation paresseuse d'un message, au plus une fois par codec (diffusions)"""
+
+    __slots__ = ("message", "_frames")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self._frames: Dict[str, Frame] = {}
+
+    def for_codec(self, codec: MessageCodec) -> Frame:
+        frame = self._frames.get(codec.name)
+        if frame is None:
+            frame = self._frames[codec.name] = codec.encode(self.message)
+        return frame
+
+
+__all__ = [
+    "MessageCodec",
+    "JsonCodec",
+    "MsgpackCodec",
+    "EncodedFrames",
+    "Frame",
+    "json_codec",
+    "msgpack_codec",
+    "negotiate_codec",
+    "accept_with_codec",
+    "supported_subprotocols",
+    "KEY_TABLE",
+    "MSGPACK_AVAILABLE",
+    "SUBPROTOCOL_JSON",
+    "SUBPROTOCOL_MSGPACK"
+]
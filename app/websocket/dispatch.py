@@ -0,0 +1,204 @@
+"""
+Table de dispatch des messages WebSocket entrants
+NOUVEAU: Chaque type de message est enregistré avec son handler et le schéma de son
+champ `data`. Les enveloppes de tous les types forment une union discriminée par
+`type`, compilée une seule fois (TypeAdapter) : une trame JSON est lue et validée
+en une seule passe par pydantic-core, avant tout appel de handler ou accès à la
+base de données. Nombre de messages, rejets et latence sont comptés par type.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, Type, Union
+
+from pydantic import ConfigDict, Field, TypeAdapter, ValidationError, create_model
+from typing_extensions import Annotated
+
+from app.schemas.websocket import EmptyPayload
+from app.utils.exceptions import WebSocketMessageError
+from app.websocket.codec import Frame, MessageCodec, json_codec
+
+Handler = Callable[..., Awaitable[Any]]
+
+# Nombre maximal de types signalés dans les statistiques de types inconnus
+_MAX_UNKNOWN_TYPES = 50
+
+
+class MessageRoute:
+    """Type de message enregistré : handler, schéma et compteurs"""
+
+    __slots__ = (
+        "message_type", "handler", "payload_type", "requires_db",
+        "count", "invalid", "errors", "total_seconds", "max_seconds"
+    )
+
+    def __init__(self, message_type: str, handler: Handler, payload_type: Type, requires_db: bool):
+        self.message_type = message_type
+        self.handler = handler
+        self.payload_type = payload_type
+        self.requires_db = requires_db
+        self.count = 0
+        self.invalid = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "invalid": self.invalid,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3)
+        }
+
+
+class InboundMessage:
+    """Message validé, prêt à être dispatché"""
+
+    __slots__ = ("route", "data")
+
+    def __init__(self, route: MessageRoute, data: Dict[str, Any]):
+        self.route = route
+        self.data = data
+
+    @property
+    def type(self) -> str:
+        return self.route.message_type
+
+
+class MessageDispatcher:
+    """Registre des types de messages d'un gestionnaire WebSocket"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.routes: Dict[str, MessageRoute] = {}
+        self._adapter: Optional[TypeAdapter] = None
+
+        # Trames rejetées avant tout handler
+        self.malformed = 0
+        self.unknown_types: Dict[str, int] = {}
+
+    # === ENREGISTREMENT ===
+
+    def add(self, message_type: str, handler: Handler, payload_type: Type = EmptyPayload,
+            requires_db: bool = False) -> MessageRoute:
+        """
+        Enregistre un type de message
+
+        Args:
+            message_type: Valeur du champ `type`
+            handler: Coroutine appelée par dispatch() avec `data` validé
+            payload_type: Schéma (TypedDict) du champ `data`
+            requires_db: Le handler a besoin d'une session de base de données
+        """
+        route = MessageRoute(str(message_type), handler, payload_type, requires_db)
+        self.routes[route.message_type] = route
+        self._adapter = None
+        return route
+
+    def compile(self) -> TypeAdapter:
+        """Construit l'union discriminée des enveloppes (une fois, au démarrage)"""
+        if self._adapter is None:
+            envelopes = tuple(
+                create_model(
+                    f"{self.name.title()}{index}Envelope",
+                    __config__=ConfigDict(extra="ignore"),
+                    type=(Literal[route.message_type], ...),
+                    # `data` absent = {} (validé : les champs obligatoires restent exigés)
+                    data=(route.payload_type, Field(default_factory=dict, validate_default=True))
+                )
+                for index, route in enumerate(self.routes.values())
+            )
+            if not envelopes:
+                raise RuntimeError(f"Aucun type de message enregistré pour {self.name}")
+            if len(envelopes) > 1:
+                self._adapter = TypeAdapter(Annotated[Union[envelopes], Field(discriminator="type")])
+            else:
+                self._adapter = TypeAdapter(envelopes[0])
+        return self._adapter
+
+    # === VALIDATION ===
+
+    def parse(self, frame: Frame, codec: MessageCodec = json_codec) -> InboundMessage:
+        """
+        Lit et valide une trame reçue
+
+        Les trames texte sont validées directement depuis le JSON (une seule passe) ;
+        les trames binaires sont décodées par le codec de la connexion puis validées.
+
+        Raises:
+            WebSocketMessageError: Trame illisible, type inconnu ou `data` invalide
+        """
+        adapter = self.compile()
+        try:
+            if isinstance(frame, str) or not codec.binary:
+                envelope = adapter.validate_json(frame)
+            else:
+                envelope = adapter.validate_python(codec.decode(frame))
+        except ValidationError as e:
+            raise self._rejection(e) from None
+        except Exception:
+            self.malformed += 1
+            raise WebSocketMessageError("frame", "Trame illisible") from None
+
+        return InboundMessage(self.routes[envelope.type], envelope.data)
+
+    def validate(self, message: Dict[str, Any]) -> InboundMessage:
+        """Valide un message déjà décodé (dict)"""
+        try:
+            envelope = self.compile().validate_python(message)
+        except ValidationError as e:
+            raise self._rejection(e) from None
+        return InboundMessage(self.routes[envelope.type], envelope.data)
+
+    def _rejection(self, error: ValidationError) -> WebSocketMessageError:
+        """Compte le rejet et construit une erreur lisible par le client"""
+        first = error.errors(include_url=False, include_context=False)[0]
+        kind, loc = first["type"], first["loc"]
+
+        if kind == "union_tag_invalid":
+            received = first.get("input")
+            message_type = str(received.get("type"))[:64] if isinstance(received, dict) else "?"
+            if message_type in self.unknown_types or len(self.unknown_types) < _MAX_UNKNOWN_TYPES:
+                self.unknown_types[message_type] = self.unknown_types.get(message_type, 0) + 1
+            return WebSocketMessageError(message_type, f"Type de message non supporté: {message_type}")
+
+        route = self.routes.get(loc[0]) if loc else None
+        if route is None and len(self.routes) == 1 and loc and loc[0] in ("type", "data"):
+            route = next(iter(self.routes.values()))
+            loc = (route.message_type,) + tuple(loc)
+        if route is None:
+            self.malformed += 1
+            reason = "Type de message manquant" if kind == "union_tag_not_found" else "Format de message invalide"
+            return WebSocketMessageError("frame", reason)
+
+        route.invalid += 1
+        field = ".".join(str(part) for part in loc[2:]) or "data"
+        return WebSocketMessageError(route.message_type, f"Champ '{field}' invalide: {first['msg']}")
+
+    # === EXÉCUTION ===
+
+    async def dispatch(self, message: InboundMessage, *args: Any, **kwargs: Any) -> Any:
+        """Appelle `handler(*args, data, **kwargs)` en mesurant sa durée"""
+        route = message.route
+        start = time.perf_counter()
+        try:
+            return await route.handler(*args, message.data, **kwargs)
+        except Exception:
+            route.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            route.count += 1
+            route.total_seconds += elapsed
+            if elapsed > route.max_seconds:
+                route.max_seconds = elapsed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "types": {message_type: route.get_stats() for message_type, route in self.routes.items()},
+            "malformed": self.malformed,
+            "unknown_types": dict(self.unknown_types)
+        }
+
+
+__all__ = ["MessageRoute", "InboundMessage", "MessageDispatcher"]
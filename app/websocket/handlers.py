@@ -2,7 +2,6 @@
 Handlers WebSocket pour Quantum Mastermind
 Traitement des messages et événements WebSocket
 """
-import json
 import asyncio
 import time
 from datetime import datetime, timezone
@@ -12,8 +11,12 @@ from uuid import UUID
 from fastapi import WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.services.auth import auth_service
+from app.core.config import settings, websocket_config
+from app.core.database import get_db, get_db_context
+from app.schemas.websocket import (
+    AuthenticatePayload, GamePayload, InvitationReplyPayload, InvitePlayerPayload,
+    MakeAttemptPayload, PingPayload, QuantumHintPayload, RoomChatPayload, RoomPayload
+)
 from app.services.game import game_service
 from app.services.multiplayer import multiplayer_service
 from app.services.quantum import quantum_service
@@ -24,6 +27,9 @@ from app.utils.exceptions import (
     WebSocketMessageError, GameError, EntityNotFoundError,
     AuthenticationError, logger, WebSocketAuthenticationError
 )
+from app.websocket.codec import Frame, json_codec
+from app.websocket.dispatch import MessageDispatcher
+from app.websocket.rate_limit import MessageRateLimiter
 
 
 
@@ -31,81 +37,107 @@ class WebSocketMessageHandler:
     """Gestionnaire des messages WebSocket entrants"""
 
     def __init__(self):
-        self.handlers = {
+        # NOUVEAU: Table de dispatch pré-validée (schéma de `data` et besoin d'une session par type)
+        self.dispatcher = MessageDispatcher("generic")
+        routes = (
             # Authentification
-            EventType.AUTHENTICATE: self._handle_authenticate,
+            (EventType.AUTHENTICATE, self._handle_authenticate, AuthenticatePayload, True),
 
             # Gestion des rooms
-            EventType.JOIN_GAME_ROOM: self._handle_join_game_room,
-            EventType.LEAVE_GAME_ROOM: self._handle_leave_game_room,
+            (EventType.JOIN_GAME_ROOM, self._handle_join_game_room, RoomPayload, True),
+            (EventType.LEAVE_GAME_ROOM, self._handle_leave_game_room, RoomPayload, False),
 
             # Chat
-            EventType.CHAT_MESSAGE: self._handle_chat_message,
+            (EventType.CHAT_MESSAGE, self._handle_chat_message, RoomChatPayload, False),
 
             # Système
-            EventType.HEARTBEAT: self._handle_heartbeat,
+            (EventType.HEARTBEAT, self._handle_heartbeat, PingPayload, False),
 
             # Gameplay (handlers personnalisés)
-            "make_attempt": self._handle_make_attempt,
-            "get_quantum_hint": self._handle_get_quantum_hint,
-            "start_game": self._handle_start_game,
-            "get_game_state": self._handle_get_game_state,
-            "pause_game": self._handle_pause_game,
-            "resume_game": self._handle_resume_game,
-            "surrender_game": self._handle_surrender_game,
+            ("make_attempt", self._handle_make_attempt, MakeAttemptPayload, True),
+            ("get_quantum_hint", self._handle_get_quantum_hint, QuantumHintPayload, True),
+            ("start_game", self._handle_start_game, GamePayload, True),
+            ("get_game_state", self._handle_get_game_state, GamePayload, True),
+            ("pause_game", self._handle_pause_game, GamePayload, True),
+            ("resume_game", self._handle_resume_game, GamePayload, False),
+            ("surrender_game", self._handle_surrender_game, GamePayload, False),
 
             # Invitations et social
-            "invite_player": self._handle_invite_player,
-            "accept_invitation": self._handle_accept_invitation,
-            "decline_invitation": self._handle_decline_invitation,
+            ("invite_player", self._handle_invite_player, InvitePlayerPayload, True),
+            ("accept_invitation", self._handle_accept_invitation, InvitationReplyPayload, False),
+            ("decline_invitation", self._handle_decline_invitation, InvitationReplyPayload, False),
 
             # Spectateur
-            "watch_game": self._handle_watch_game,
-            "unwatch_game": self._handle_unwatch_game,
-        }
+            ("watch_game", self._handle_watch_game, GamePayload, True),
+            ("unwatch_game", self._handle_unwatch_game, GamePayload, False),
+        )
+        for message_type, handler, payload_type, requires_db in routes:
+            self.dispatcher.add(message_type, handler, payload_type, requires_db)
+        self.dispatcher.compile()
+
+        # NOUVEAU: Seaux à jetons par connexion et par room / partie
+        self.rate_limiter = MessageRateLimiter.from_settings(settings, websocket_config.RATE_LIMIT_CATEGORIES)
 
     async def handle_message(
             self,
             connection_id: str,
-            raw_message: str,
-            db: AsyncSession
+            raw_message: Frame,
+            db: Optional[AsyncSession] = None
     ) -> None:
         """
         Traite un message WebSocket entrant
 
+        La trame est lue et validée avant tout le reste : un message invalide
+        est refusé sans mise à jour du heartbeat ni ouverture de session.
+
         Args:
             connection_id: ID de la connexion
-            raw_message: Message brut reçu
-            db: Session de base de données
+            raw_message: Trame brute reçue (texte ou binaire)
+            db: Session de base de données (ouverte à la demande si absente)
         """
-        try:
-            # Parse du message JSON
-            message_data = json.loads(raw_message)
-            message_type = message_data.get("type")
-            message_payload = message_data.get("data", {})
+        connection = websocket_manager.get_connection(connection_id)
+        codec = connection.codec if connection else json_codec
+        traffic = websocket_manager.traffic
+        traffic.received(raw_message)
 
-            if not message_type:
-                raise WebSocketMessageError("Type de message manquant")
+        try:
+            message = self.dispatcher.parse(raw_message, codec)
+        except WebSocketMessageError as e:
+            traffic.rejected_messages += 1
+            await self._send_error(connection_id, e.details.get("reason", str(e)))
+            return
 
+        try:
             # Mise à jour du heartbeat
             await websocket_manager.update_heartbeat(connection_id)
 
-            # Recherche du handler approprié
-            handler = self.handlers.get(message_type)
-            if not handler:
-                await self._handle_unknown_message(connection_id, message_type)
-                return
-
-            # Exécution du handler
-            await handler(connection_id, message_payload, db)
+            # Limitation de débit (seau de la room ou de la partie visée)
+            if connection is not None:
+                room = message.data.get("room_code") or message.data.get("game_id") or message.data.get("room_id")
+                retry_after = self.rate_limiter.check(connection, message.type, room)
+                if retry_after:
+                    traffic.rejected_messages += 1
+                    if self.rate_limiter.category_of(message.type) not in websocket_config.RATE_LIMIT_SILENT_CATEGORIES:
+                        await self._send_error(
+                            connection_id, f"Trop de messages, réessayez dans {retry_after:.1f} s"
+                        )
+                    return
+
+            if message.route.requires_db and db is None:
+                async with get_db_context() as session:
+                    await self.dispatcher.dispatch(message, connection_id, db=session)
+            else:
+                await self.dispatcher.dispatch(message, connection_id, db=db)
 
-        except json.JSONDecodeError:
-            await self._send_error(connection_id, "Message JSON invalide")
         except WebSocketMessageError as e:
-            await self._send_error(connection_id, str(e))
+            await self._send_error(connection_id, e.details.get("reason", str(e)))
         except Exception as e:
             await self._send_error(connection_id, f"Erreur de traitement: {str(e)}")
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de dispatch par type de message et de limitation de débit"""
+        return {**self.dispatcher.get_stats(), "rate_limit": self.rate_limiter.get_stats()}
+
     # === HANDLERS DE SYSTÈME ===
 
     async def _handle_authenticate(
@@ -115,10 +147,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère l'authentification d'une connexion WebSocket"""
-        token = data.get("token")
-        if not token:
-            await self._send_error(connection_id, "Token manquant")
-            return
+        token = data["token"]
 
         success = await websocket_manager.authenticate_connection(
             connection_id, token, db
@@ -166,10 +195,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère l'entrée dans une room de jeu"""
-        room_id = data.get("room_id")
-        if not room_id:
-            await self._send_error(connection_id, "ID de room manquant")
-            return
+        room_id = data["room_id"]
 
         # Vérifier que la connexion est authentifiée
         if not await self._require_authentication(connection_id):
@@ -213,10 +239,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère la sortie d'une room de jeu"""
-        room_id = data.get("room_id")
-        if not room_id:
-            await self._send_error(connection_id, "ID de room manquant")
-            return
+        room_id = data["room_id"]
 
         success = await websocket_manager.leave_game_room(connection_id, room_id)
 
@@ -241,12 +264,8 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        combination = data.get("combination")
-
-        if not game_id or not combination:
-            await self._send_error(connection_id, "Données de tentative manquantes")
-            return
+        game_id = data["game_id"]
+        combination = data["combination"]
 
         try:
             # Récupérer l'utilisateur
@@ -307,13 +326,9 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
+        game_id = data["game_id"]
         hint_type = data.get("hint_type", "grover")
 
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
-
         try:
             user_id = await self._get_user_id(connection_id)
             if not user_id:
@@ -352,10 +367,6 @@ class WebSocketMessageHandler:
         except Exception as e:
             await self._send_error(connection_id, f"Erreur lors du hint quantique: {str(e)}")
 
-    import time  # Ajoutez cet import en haut du fichier si pas déjà présent
-
-    # Ajoutez ces méthodes dans la classe WebSocketMessageHandler
-
     async def _handle_surrender_game(
             self,
             connection_id: str,
@@ -366,10 +377,7 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -413,12 +421,8 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        inviter_id = data.get("inviter_id")
-
-        if not game_id or not inviter_id:
-            await self._send_error(connection_id, "Données d'invitation manquantes")
-            return
+        game_id = data["game_id"]
+        inviter_id = data["inviter_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -473,12 +477,8 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        inviter_id = data.get("inviter_id")
-
-        if not game_id or not inviter_id:
-            await self._send_error(connection_id, "Données d'invitation manquantes")
-            return
+        game_id = data["game_id"]
+        inviter_id = data["inviter_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -519,10 +519,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère l'arrêt du mode spectateur"""
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             # Quitter la room de spectateur
@@ -551,10 +548,7 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -585,10 +579,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère la demande d'état de jeu"""
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             game_state = await game_service.get_game_state(db, UUID(game_id))
@@ -612,10 +603,7 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -644,10 +632,7 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             user_id = await self._get_user_id(connection_id)
@@ -691,10 +676,12 @@ class WebSocketMessageHandler:
     ) -> None:
         """CORRIGÉ: Chat qui marche vraiment"""
         try:
-            # Récupérer user et room comme avant...
+            # Le nom d'utilisateur est connu depuis l'authentification : pas de requête
             connection = websocket_manager.get_connection(connection_id)
-            user = await auth_service.get_user_by_id(db, connection.user_id)
-            room_code = message_data.get("room_code")
+            if not connection or not connection.is_authenticated:
+                await self._send_error(connection_id, "Authentification requise")
+                return
+            room_code = message_data["room_code"]
 
             # Message formaté
             chat_message = WebSocketMessage(
@@ -702,7 +689,7 @@ class WebSocketMessageHandler:
                 data={
                     "message_id": f"msg_{int(time.time() * 1000)}",
                     "user_id": str(connection.user_id),
-                    "username": user.username,
+                    "username": connection.username,
                     "message": message_data["message"],
                     "timestamp": datetime.now(timezone.utc).isoformat(),
                     "room_code": room_code,
@@ -711,11 +698,11 @@ class WebSocketMessageHandler:
             )
 
             # CORRECTION: Broadcast DIRECT à toutes les connexions de la room
-            if room_code in websocket_manager.game_rooms:
-                connections = websocket_manager.game_rooms[room_code]
+            connections = websocket_manager.get_room_connections(room_code)
+            if connections:
                 logger.info(f"💬 Broadcasting à {len(connections)} connexions dans {room_code}")
 
-                for conn_id in connections:
+                for conn_id in [conn.connection_id for conn in connections]:
                     try:
                         await websocket_manager.send_to_connection(conn_id, chat_message)
                         logger.info(f"✅ Message envoyé à {conn_id}")
@@ -730,14 +717,13 @@ class WebSocketMessageHandler:
 
     async def debug_room_connections(self, room_code: str) -> Dict[str, Any]:
         """Debug des connexions d'une room"""
-        connections = websocket_manager.room_connections.get(room_code, set())
+        connections = websocket_manager.get_room_connections(room_code)
         active_connections = []
 
-        for conn_id in connections:
-            connection = websocket_manager.get_connection(conn_id)
-            if connection:
+        for connection in connections:
+            if connection.is_alive:
                 active_connections.append({
-                    "connection_id": conn_id,
+                    "connection_id": connection.connection_id,
                     "user_id": str(connection.user_id) if connection.user_id else None,
                     "websocket_state": connection.websocket.client_state.name if hasattr(connection.websocket,
                                                                                          'client_state') else 'unknown'
@@ -761,12 +747,8 @@ class WebSocketMessageHandler:
         if not await self._require_authentication(connection_id):
             return
 
-        target_username = data.get("username")
-        game_id = data.get("game_id")
-
-        if not target_username or not game_id:
-            await self._send_error(connection_id, "Données d'invitation manquantes")
-            return
+        target_username = data["username"]
+        game_id = data["game_id"]
 
         try:
             from app.repositories.user import UserRepository
@@ -820,10 +802,7 @@ class WebSocketMessageHandler:
             db: AsyncSession
     ) -> None:
         """Gère le mode spectateur"""
-        game_id = data.get("game_id")
-        if not game_id:
-            await self._send_error(connection_id, "ID de jeu manquant")
-            return
+        game_id = data["game_id"]
 
         try:
             # Rejoindre comme spectateur
@@ -847,17 +826,6 @@ class WebSocketMessageHandler:
 
     # === HANDLERS D'ERREUR ===
 
-    async def _handle_unknown_message(
-            self,
-            connection_id: str,
-            message_type: str
-    ) -> None:
-        """Gère les messages de type inconnu"""
-        await self._send_error(
-            connection_id,
-            f"Type de message non supporté: {message_type}"
-        )
-
     async def _send_error(
             self,
             connection_id: str,
@@ -0,0 +1,133 @@
+"""
+Expiration des heartbeats WebSocket par roue temporelle (hashed timing wheel)
+NOUVEAU: Rafraîchir un heartbeat coûte O(1) et l'expiration ne parcourt que les
+cases échues, au lieu d'un balayage complet de toutes les connexions
+"""
+import math
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class HeartbeatWheel:
+    """
+    Roue temporelle à délai fixe
+
+    Chaque clé est rangée dans la case correspondant à son échéance
+    (dernier heartbeat + timeout). Le délai étant identique pour toutes les
+    clés, la roue couvre toujours l'horizon complet et chaque case échue ne
+    contient que des clés réellement expirées.
+    """
+
+    def __init__(
+            self,
+            timeout: float,
+            resolution: float = 1.0,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            timeout: Délai sans heartbeat avant expiration (secondes)
+            resolution: Granularité de la roue (secondes) ; une clé expire au plus
+                        `resolution` secondes après son échéance
+            clock: Horloge monotone
+        """
+        if timeout <= 0 or resolution <= 0:
+            raise ValueError("timeout et resolution doivent être positifs")
+
+        self.timeout = float(timeout)
+        self.resolution = float(resolution)
+        self.clock = clock
+
+        self.slot_count = int(math.ceil(self.timeout / self.resolution)) + 2
+        self._slots: List[Set[Hashable]] = [set() for _ in range(self.slot_count)]
+        self._entries: Dict[Hashable, Tuple[int, float]] = {}
+        self._cursor = self._tick(self.clock())
+
+    def _tick(self, instant: float) -> int:
+        return int(instant // self.resolution)
+
+    # === MISE À JOUR ===
+
+    def touch(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Enregistre ou rafraîchit le heartbeat d'une clé - O(1)
+
+        Args:
+            key: Identifiant de la connexion
+            now: Instant du heartbeat (horloge de la roue)
+
+        Returns:
+            Échéance de la clé
+        """
+        now = self.clock() if now is None else now
+        deadline = now + self.timeout
+        slot = self._tick(deadline) % self.slot_count
+
+        previous = self._entries.get(key)
+        if previous is not None and previous[0] != slot:
+            self._slots[previous[0]].discard(key)
+
+        self._slots[slot].add(key)
+        self._entries[key] = (slot, deadline)
+        return deadline
+
+    def remove(self, key: Hashable) -> bool:
+        """Retire une clé de la roue - O(1)"""
+        previous = self._entries.pop(key, None)
+        if previous is None:
+            return False
+        self._slots[previous[0]].discard(key)
+        return True
+
+    # === EXPIRATION ===
+
+    def expire(self, now: Optional[float] = None) -> List[Hashable]:
+        """
+        Retire et retourne les clés échues
+
+        Seules les cases dont la période est entièrement écoulée depuis le
+        dernier appel sont visitées.
+
+        Args:
+            now: Instant courant (horloge de la roue)
+
+        Returns:
+            Liste des clés expirées
+        """
+        now = self.clock() if now is None else now
+        current = self._tick(now)
+        if current <= self._cursor:
+            return []
+
+        start = max(self._cursor, current - self.slot_count)
+        expired: List[Hashable] = []
+
+        for tick in range(start, current):
+            slot = self._slots[tick % self.slot_count]
+            if not slot:
+                continue
+
+            for key in list(slot):
+                if self._entries[key][1] < now:
+                    slot.discard(key)
+                    del self._entries[key]
+                    expired.append(key)
+
+        self._cursor = current
+        return expired
+
+    # === INFORMATIONS ===
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        """Échéance courante d'une clé"""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+__all__ = ["HeartbeatWheel"]
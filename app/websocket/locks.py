@@ -0,0 +1,71 @@
+"""
+Verrous par clé pour les registres WebSocket
+NOUVEAU: Remplace le verrou global des gestionnaires par des verrous par room et par utilisateur,
+créés à la demande et libérés dès qu'ils ne sont plus utilisés
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable
+
+
+class _KeyedLockEntry:
+    """Verrou et nombre de coroutines qui l'utilisent ou l'attendent"""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedLock:
+    """
+    Ensemble de verrous asyncio indexés par clé (room_code, user_id...)
+
+    Deux clés différentes ne se bloquent jamais entre elles : les connexions
+    d'une room ne sont plus sérialisées derrière celles des autres rooms.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._entries: Dict[Hashable, _KeyedLockEntry] = {}
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        Acquiert le verrou associé à une clé
+
+        Args:
+            key: Clé du verrou (room, utilisateur...)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _KeyedLockEntry()
+        entry.users += 1
+
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def locked(self, key: Hashable) -> bool:
+        """Indique si le verrou d'une clé est actuellement détenu"""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Nombre de verrous actifs et de coroutines en attente"""
+        return {
+            "name": self.name,
+            "active_keys": len(self._entries),
+            "waiters": sum(max(0, entry.users - 1) for entry in self._entries.values())
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+__all__ = ["KeyedLock"]
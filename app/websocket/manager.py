@@ -2,10 +2,10 @@
 Gestionnaire WebSocket pour Quantum Mastermind
 Gestion des connexions temps réel, rooms, et événements de jeu
 """
-import asyncio
 import json
+import logging
 import time
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional
 from uuid import UUID, uuid4
 from dataclasses import dataclass, asdict
 from enum import Enum
@@ -13,14 +13,24 @@ from enum import Enum
 from fastapi import WebSocket, WebSocketDisconnect
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings, websocket_config
 from app.core.security import jwt_manager
 from app.models.user import User
 from app.models.game import Game, GameStatus
-from app.services.auth import auth_service
+from app.services.auth_cache import auth_cache
 from app.utils.exceptions import (
     WebSocketError, WebSocketAuthenticationError,
     WebSocketConnectionError, WebSocketMessageError
 )
+from app.websocket.broker import ChannelSubscriptions, MessageBroker, ws_broker
+from app.websocket.codec import EncodedFrames, Frame, MessageCodec, accept_with_codec
+from app.websocket.heartbeat import HeartbeatWheel
+from app.websocket.locks import KeyedLock
+from app.websocket.metrics import TrafficCounters
+from app.websocket.outbound import OutboundQueue, OutboundTotals, SlowConsumerPolicy
+from app.websocket.registry import SCOPE_GENERIC, ConnectionRecord, ConnectionRegistry, connection_registry
+
+logger = logging.getLogger(__name__)
 
 
 # === TYPES D'ÉVÉNEMENTS ===
@@ -83,51 +93,46 @@ class WebSocketMessage:
     def to_json(self) -> str:
         return json.dumps(self.to_dict())
 
+    def encode(self, codec: MessageCodec) -> Frame:
+        """Sérialise le message dans le format négocié par la connexion"""
+        return codec.encode(self.to_dict())
 
-@dataclass
-class WebSocketConnection:
-    """Représente une connexion WebSocket"""
-    connection_id: str
-    websocket: WebSocket
-    user_id: Optional[UUID] = None
-    username: Optional[str] = None
-    game_rooms: Set[str] = None
-    last_heartbeat: float = None
-    connected_at: float = None
-
-    def __post_init__(self):
-        if self.game_rooms is None:
-            self.game_rooms = set()
-        if self.last_heartbeat is None:
-            self.last_heartbeat = time.time()
-        if self.connected_at is None:
-            self.connected_at = time.time()
 
-    @property
-    def is_authenticated(self) -> bool:
-        return self.user_id is not None
-
-    @property
-    def is_alive(self) -> bool:
-        """Vérifie si la connexion est toujours vivante"""
-        return time.time() - self.last_heartbeat < 60  # 1 minute timeout
+# Une connexion est un enregistrement du registre partagé (rooms dans `record.rooms`)
+WebSocketConnection = ConnectionRecord
 
 
 class WebSocketManager:
     """Gestionnaire principal des connexions WebSocket"""
 
-    def __init__(self):
-        # Connexions actives par ID de connexion
-        self.connections: Dict[str, WebSocketConnection] = {}
+    def __init__(self, registry: Optional[ConnectionRegistry] = None):
+        # Registre partagé avec le gestionnaire multijoueur : index par ID de connexion,
+        # par utilisateur (plusieurs connexions possibles) et par room de jeu
+        self.registry = registry if registry is not None else connection_registry
+
+        # Verrous par utilisateur : les mutations des registres sont synchrones (atomiques
+        # pour la boucle asyncio) et les envois se font hors de toute section critique
+        self._user_locks = KeyedLock("websocket_users")
+
+        # Échéances des heartbeats (roue temporelle, rafraîchissement O(1))
+        self.heartbeats = HeartbeatWheel(
+            timeout=settings.WS_CONNECTION_TIMEOUT,
+            resolution=websocket_config.HEARTBEAT_WHEEL_RESOLUTION
+        )
 
-        # Connexions par utilisateur (un utilisateur peut avoir plusieurs connexions)
-        self.user_connections: Dict[UUID, Set[str]] = {}
+        # Files d'envoi par connexion (backpressure)
+        self.outbound_totals = OutboundTotals()
+        self.slow_consumer_policy = SlowConsumerPolicy.parse(settings.WS_SLOW_CONSUMER_POLICY)
 
-        # Rooms de jeu avec leurs connexions
-        self.game_rooms: Dict[str, Set[str]] = {}
+        # Courtier pub/sub entre workers (None = un seul worker)
+        self.broker: Optional[MessageBroker] = None
+        self.channels: Optional[ChannelSubscriptions] = None
 
-        # Lock pour les opérations concurrentes
-        self._lock = asyncio.Lock()
+        # Contrôle d'admission : connexions refusées (MAX_CONNECTIONS_PER_USER atteint)
+        self.rejected_connections = 0
+
+        # Trafic entrant et cycle de vie des connexions (compteurs O(1))
+        self.traffic = TrafficCounters()
 
     # === GESTION DES CONNEXIONS ===
 
@@ -141,33 +146,32 @@ class WebSocketManager:
         Returns:
             ID de connexion unique
         """
-        await websocket.accept()
-
-        async with self._lock:
-            connection_id = str(uuid4())
-            connection = WebSocketConnection(
-                connection_id=connection_id,
-                websocket=websocket
-            )
-
-            self.connections[connection_id] = connection
-
-            # Message de bienvenue
-            welcome_message = WebSocketMessage(
-                type=EventType.CONNECTION_ESTABLISHED,
-                data={
-                    "connection_id": connection_id,
-                    "timestamp": time.time(),
-                    "server_info": {
-                        "name": "Quantum Mastermind WebSocket Server",
-                        "version": "1.0.0"
-                    }
-                }
-            )
-
-            await self._send_to_connection(connection_id, welcome_message)
-
-            return connection_id
+        # Format des trames négocié via Sec-WebSocket-Protocol (JSON par défaut)
+        codec = await accept_with_codec(websocket)
+
+        connection = self.registry.add(websocket, SCOPE_GENERIC, codec, connection_id=str(uuid4()))
+        connection_id = connection.connection_id
+        connection.outbound = self._create_outbound_queue(connection_id, websocket)
+        self.heartbeats.touch(connection_id)
+        self.traffic.connects += 1
+
+        # Message de bienvenue
+        welcome_message = WebSocketMessage(
+            type=EventType.CONNECTION_ESTABLISHED,
+            data={
+                "connection_id": connection_id,
+                "timestamp": time.time(),
+                "server_info": {
+                    "name": "Quantum Mastermind WebSocket Server",
+                    "version": "1.0.0"
+                },
+                "codec": codec.describe()
+            }
+        )
+
+        await self._send_to_connection(connection_id, welcome_message)
+
+        return connection_id
 
     async def disconnect(self, connection_id: str) -> None:
         """
@@ -176,35 +180,35 @@ class WebSocketManager:
         Args:
             connection_id: ID de la connexion à fermer
         """
-        async with self._lock:
-            connection = self.connections.get(connection_id)
-            if not connection:
-                return
+        # Retrait atomique de tous les index (utilisateur, rooms) : un seul appelant
+        # peut gagner, les appels concurrents sortent ici
+        connection = self.registry.remove(self.get_connection(connection_id))
+        if not connection:
+            return
 
-            # Nettoyage des associations utilisateur
-            if connection.user_id and connection.user_id in self.user_connections:
-                self.user_connections[connection.user_id].discard(connection_id)
-                if not self.user_connections[connection.user_id]:
-                    del self.user_connections[connection.user_id]
+        self.heartbeats.remove(connection_id)
+        self.traffic.disconnects += 1
+        left_rooms = list(connection.rooms)
 
-            # Nettoyage des rooms de jeu
-            for room_id in connection.game_rooms.copy():
-                await self._leave_game_room(connection_id, room_id)
+        # Notifications hors de toute section critique
+        if connection.is_authenticated:
+            disconnect_message = WebSocketMessage(
+                type=EventType.USER_DISCONNECTED,
+                data={
+                    "user_id": str(connection.user_id),
+                    "username": connection.username,
+                    "connection_id": connection_id
+                }
+            )
+            for room_id in left_rooms:
+                await self._broadcast_to_room(room_id, self._player_left_message(connection, room_id))
+                await self._broadcast_to_room(room_id, disconnect_message)
 
-            # Suppression de la connexion
-            del self.connections[connection_id]
+        await self._sync_channels(left_rooms, [connection.user_id] if connection.user_id else [])
 
-            # Notification de déconnexion
-            if connection.is_authenticated:
-                disconnect_message = WebSocketMessage(
-                    type=EventType.USER_DISCONNECTED,
-                    data={
-                        "user_id": str(connection.user_id),
-                        "username": connection.username,
-                        "connection_id": connection_id
-                    }
-                )
-                await self._broadcast_to_user_rooms(connection, disconnect_message)
+        # Arrêt de la tâche d'écriture
+        if connection.outbound:
+            await connection.outbound.close(drain_timeout=websocket_config.OUTBOUND_DRAIN_TIMEOUT)
 
     async def authenticate_connection(
             self,
@@ -223,37 +227,60 @@ class WebSocketManager:
         Returns:
             True si authentification réussie
         """
-        connection = self.connections.get(connection_id)
+        connection = self.get_connection(connection_id)
         if not connection:
             return False
 
         try:
-            # Vérification du token et récupération de l'utilisateur
-            user = await auth_service.get_current_user(db, token)
-
-            async with self._lock:
-                # Mise à jour de la connexion avec les infos utilisateur
-                connection.user_id = user.id
-                connection.username = user.username
-
-                # Ajout à la map des connexions utilisateur
-                if user.id not in self.user_connections:
-                    self.user_connections[user.id] = set()
-                self.user_connections[user.id].add(connection_id)
-
-                # Message de confirmation d'authentification
-                auth_success_message = WebSocketMessage(
-                    type=EventType.AUTHENTICATION_SUCCESS,
-                    data={
-                        "user_id": str(user.id),
-                        "username": user.username,
-                        "authenticated_at": time.time()
-                    }
-                )
+            # Vérification du token et récupération de l'utilisateur (cache de courte durée)
+            user = await auth_cache.authenticate(db, token)
+
+            async with self._user_locks.acquire(user.id):
+                # La connexion a pu être fermée pendant la vérification du token
+                if self.get_connection(connection_id) is not connection:
+                    return False
+
+                # Contrôle d'admission : nombre de connexions simultanées par utilisateur
+                others = [other for other in self.registry.for_user(SCOPE_GENERIC, user.id) if other is not connection]
+                if len(others) >= websocket_config.MAX_CONNECTIONS_PER_USER:
+                    self.rejected_connections += 1
+                    raise WebSocketConnectionError(
+                        f"Nombre maximal de connexions atteint ({websocket_config.MAX_CONNECTIONS_PER_USER})"
+                    )
+
+                # Mise à jour de la connexion et de l'index des connexions utilisateur
+                self.registry.set_user(connection, user.id, user.username)
+
+            await self._sync_channels((), (user.id,))
+
+            # Message de confirmation d'authentification
+            auth_success_message = WebSocketMessage(
+                type=EventType.AUTHENTICATION_SUCCESS,
+                data={
+                    "user_id": str(user.id),
+                    "username": user.username,
+                    "authenticated_at": time.time()
+                }
+            )
 
-                await self._send_to_connection(connection_id, auth_success_message)
+            await self._send_to_connection(connection_id, auth_success_message)
 
-                return True
+            return True
+
+        except WebSocketConnectionError as e:
+            # Admission refusée : l'utilisateur est prévenu puis la connexion est fermée
+            await self._send_to_connection(connection_id, WebSocketMessage(
+                type=EventType.AUTHENTICATION_FAILED,
+                data={"error": "Too many connections", "reason": e.details["reason"]}
+            ))
+            await self.disconnect(connection_id)
+            try:
+                await connection.websocket.close(
+                    code=websocket_config.CONNECTION_LIMIT_CLOSE_CODE, reason="Too many connections"
+                )
+            except Exception:
+                pass
+            return False
 
         except Exception as e:
             # Envoi d'un message d'erreur d'authentification
@@ -280,31 +307,27 @@ class WebSocketManager:
         Returns:
             True si succès
         """
-        async with self._lock:
-            connection = self.connections.get(connection_id)
-            if not connection or not connection.is_authenticated:
-                return False
-
-            # Ajout à la room
-            if room_id not in self.game_rooms:
-                self.game_rooms[room_id] = set()
+        connection = self.get_connection(connection_id)
+        if not connection or not connection.is_authenticated:
+            return False
 
-            self.game_rooms[room_id].add(connection_id)
-            connection.game_rooms.add(room_id)
+        # Ajout à la room (mutation synchrone, sans verrou global)
+        self.registry.join(connection, room_id)
+        await self._sync_channels((room_id,), ())
 
-            # Notification aux autres membres de la room
-            join_message = WebSocketMessage(
-                type=EventType.PLAYER_JOINED,
-                data={
-                    "user_id": str(connection.user_id),
-                    "username": connection.username,
-                    "room_id": room_id,
-                    "joined_at": time.time()
-                }
-            )
-
-            await self._broadcast_to_room(room_id, join_message, exclude_connection=connection_id)
-            return True
+        # Notification aux autres membres de la room
+        join_message = WebSocketMessage(
+            type=EventType.PLAYER_JOINED,
+            data={
+                "user_id": str(connection.user_id),
+                "username": connection.username,
+                "room_id": room_id,
+                "joined_at": time.time()
+            }
+        )
+
+        await self._broadcast_to_room(room_id, join_message, exclude_connection=connection_id)
+        return True
 
     async def leave_game_room(self, connection_id: str, room_id: str) -> bool:
         """
@@ -321,34 +344,36 @@ class WebSocketManager:
 
     async def _leave_game_room(self, connection_id: str, room_id: str) -> bool:
         """Implémentation interne pour quitter une room"""
-        connection = self.connections.get(connection_id)
+        connection = self.get_connection(connection_id)
         if not connection:
             return False
 
-        # Retrait de la room
-        if room_id in self.game_rooms:
-            self.game_rooms[room_id].discard(connection_id)
-            if not self.game_rooms[room_id]:
-                del self.game_rooms[room_id]
-
-        connection.game_rooms.discard(room_id)
+        self.registry.leave(connection, room_id)
+        await self._sync_channels((room_id,), ())
 
         # Notification aux autres membres de la room
         if connection.is_authenticated:
-            leave_message = WebSocketMessage(
-                type=EventType.PLAYER_LEFT,
-                data={
-                    "user_id": str(connection.user_id),
-                    "username": connection.username,
-                    "room_id": room_id,
-                    "left_at": time.time()
-                }
+            await self._broadcast_to_room(
+                room_id,
+                self._player_left_message(connection, room_id),
+                exclude_connection=connection_id
             )
 
-            await self._broadcast_to_room(room_id, leave_message, exclude_connection=connection_id)
-
         return True
 
+    @staticmethod
+    def _player_left_message(connection: ConnectionRecord, room_id: str) -> WebSocketMessage:
+        """Construit la notification de départ d'un joueur"""
+        return WebSocketMessage(
+            type=EventType.PLAYER_LEFT,
+            data={
+                "user_id": str(connection.user_id),
+                "username": connection.username,
+                "room_id": room_id,
+                "left_at": time.time()
+            }
+        )
+
     # === ENVOI DE MESSAGES ===
 
     async def send_to_connection(self, connection_id: str, message: WebSocketMessage) -> bool:
@@ -365,19 +390,65 @@ class WebSocketManager:
         return await self._send_to_connection(connection_id, message)
 
     async def _send_to_connection(self, connection_id: str, message: WebSocketMessage) -> bool:
-        """Implémentation interne pour envoyer un message"""
-        connection = self.connections.get(connection_id)
-        if not connection:
-            return False
+        """Implémentation interne pour envoyer un message (mise en file, non bloquant)"""
+        return self._enqueue(connection_id, message.type, EncodedFrames(message.to_dict()))
 
-        try:
-            await connection.websocket.send_text(message.to_json())
-            return True
-        except Exception as e:
-            # Connexion fermée, nettoyer
-            await self.disconnect(connection_id)
+    def _enqueue(self, connection_id: str, message_type: str, frames: EncodedFrames) -> bool:
+        """
+        Met un message dans la file d'envoi d'une connexion, sérialisé selon son codec
+
+        Args:
+            connection_id: ID de la connexion
+            message_type: Type du message (coalescence)
+            frames: Message, sérialisé au plus une fois par codec
+
+        Returns:
+            True si le message a été accepté par la file
+        """
+        return self._enqueue_record(self.get_connection(connection_id), message_type, frames)
+
+    @staticmethod
+    def _enqueue_record(connection: Optional[ConnectionRecord], message_type: str, frames: EncodedFrames) -> bool:
+        """Mise en file sur un enregistrement déjà résolu (diffusions : aucune recherche par ID)"""
+        if not connection or not connection.outbound:
             return False
 
+        return connection.outbound.put(message_type, frames.for_codec(connection.codec))
+
+    def _create_outbound_queue(self, connection_id: str, websocket: WebSocket) -> OutboundQueue:
+        """Crée et démarre la file d'envoi d'une connexion"""
+
+        async def on_failure(queue: OutboundQueue, reason: str) -> None:
+            await self._handle_outbound_failure(connection_id, reason)
+
+        return OutboundQueue(
+            websocket,
+            max_size=settings.WS_OUTBOUND_QUEUE_SIZE,
+            policy=self.slow_consumer_policy,
+            coalesce_types=websocket_config.COALESCIBLE_MESSAGE_TYPES,
+            send_timeout=websocket_config.OUTBOUND_SEND_TIMEOUT,
+            on_failure=on_failure,
+            totals=self.outbound_totals,
+            label=connection_id
+        ).start()
+
+    async def _handle_outbound_failure(self, connection_id: str, reason: str) -> None:
+        """Ferme une connexion dont la file a débordé ou dont l'envoi a échoué"""
+        connection = self.get_connection(connection_id)
+        if not connection:
+            return
+
+        if reason == "slow_consumer":
+            try:
+                await connection.websocket.close(
+                    code=websocket_config.SLOW_CONSUMER_CLOSE_CODE,
+                    reason="Slow consumer"
+                )
+            except Exception:
+                pass
+
+        await self.disconnect(connection_id)
+
     async def send_to_user(self, user_id: UUID, message: WebSocketMessage) -> int:
         """
         Envoie un message à toutes les connexions d'un utilisateur
@@ -389,11 +460,21 @@ class WebSocketManager:
         Returns:
             Nombre de connexions qui ont reçu le message
         """
-        user_connections = self.user_connections.get(user_id, set())
+        # Les connexions de l'utilisateur sur les autres workers sont servies par le courtier
+        await self._publish(self._user_channel(user_id), {
+            "kind": "user",
+            "user_id": str(user_id),
+            "message": message.to_dict()
+        })
+        return await self._send_to_local_user(user_id, message)
+
+    async def _send_to_local_user(self, user_id: UUID, message: WebSocketMessage) -> int:
+        """Envoie un message aux connexions de l'utilisateur sur ce worker"""
+        frames = EncodedFrames(message.to_dict())
         sent_count = 0
 
-        for connection_id in user_connections.copy():
-            if await self._send_to_connection(connection_id, message):
+        for connection in list(self.registry.for_user(SCOPE_GENERIC, user_id)):
+            if self._enqueue_record(connection, message.type, frames):
                 sent_count += 1
 
         return sent_count
@@ -415,15 +496,26 @@ class WebSocketManager:
 
     async def _broadcast_to_room(self, room_id: str, message: WebSocketMessage,
                                exclude_connection: Optional[str] = None) -> int:
-        """Implémentation interne pour broadcaster à une room"""
-        room_connections = self.game_rooms.get(room_id, set())
+        """Implémentation interne pour broadcaster à une room (tous les workers)"""
+        # La connexion exclue est locale : les autres workers livrent toutes leurs connexions
+        await self._publish(self._room_channel(room_id), {
+            "kind": "room",
+            "room_id": room_id,
+            "message": message.to_dict()
+        })
+        return await self._broadcast_to_local_room(room_id, message, exclude_connection)
+
+    async def _broadcast_to_local_room(self, room_id: str, message: WebSocketMessage,
+                                       exclude_connection: Optional[str] = None) -> int:
+        """Diffuse un message aux membres de la room connectés à ce worker"""
+        frames = EncodedFrames(message.to_dict())  # Sérialisation unique par format pour toute la room
         sent_count = 0
 
-        for connection_id in room_connections.copy():
-            if connection_id == exclude_connection:
+        for connection in list(self.registry.in_room(SCOPE_GENERIC, room_id)):
+            if connection.connection_id == exclude_connection:
                 continue
 
-            if await self._send_to_connection(connection_id, message):
+            if self._enqueue_record(connection, message.type, frames):
                 sent_count += 1
 
         return sent_count
@@ -438,20 +530,85 @@ class WebSocketManager:
         Returns:
             Nombre de connexions qui ont reçu le message
         """
+        await self._publish(self._ALL_CHANNEL, {"kind": "all", "message": message.to_dict()})
+        return await self._broadcast_to_local(message)
+
+    async def _broadcast_to_local(self, message: WebSocketMessage) -> int:
+        """Diffuse un message à toutes les connexions de ce worker"""
+        frames = EncodedFrames(message.to_dict())
         sent_count = 0
 
-        for connection_id in list(self.connections.keys()):
-            if await self._send_to_connection(connection_id, message):
+        for connection in list(self.registry.connections(SCOPE_GENERIC)):
+            if self._enqueue_record(connection, message.type, frames):
                 sent_count += 1
 
         return sent_count
 
-    async def _broadcast_to_user_rooms(self, connection: WebSocketConnection,
+    async def _broadcast_to_user_rooms(self, connection: ConnectionRecord,
                                      message: WebSocketMessage) -> None:
         """Diffuse un message à toutes les rooms où l'utilisateur est présent"""
-        for room_id in connection.game_rooms:
+        for room_id in connection.rooms:
             await self._broadcast_to_room(room_id, message, exclude_connection=connection.connection_id)
 
+    # === DIFFUSION ENTRE WORKERS ===
+
+    _ALL_CHANNEL = "websocket:all"
+
+    async def attach_broker(self, broker: Optional[MessageBroker]) -> None:
+        """Branche le courtier pub/sub et s'abonne aux canaux des connexions existantes"""
+        self.broker = broker
+        self.channels = ChannelSubscriptions(broker, self._on_broker_message) if broker else None
+        if self.channels is not None:
+            await self.channels.sync(self._ALL_CHANNEL, lambda: True)
+        await self._sync_channels(list(self.registry.rooms(SCOPE_GENERIC)), list(self.registry.users(SCOPE_GENERIC)))
+
+    async def detach_broker(self) -> None:
+        """Se désabonne de tous les canaux"""
+        if self.channels is not None:
+            await self.channels.clear()
+        self.broker = None
+        self.channels = None
+
+    @staticmethod
+    def _room_channel(room_id: str) -> str:
+        return f"websocket:room:{room_id}"
+
+    @staticmethod
+    def _user_channel(user_id: UUID) -> str:
+        return f"websocket:user:{user_id}"
+
+    async def _publish(self, channel: str, payload: Dict[str, Any]) -> None:
+        """Publie un événement aux autres workers (aucun effet sans courtier)"""
+        if self.broker is not None:
+            await self.broker.publish(channel, payload)
+
+    async def _sync_channels(self, room_ids: Iterable[str], user_ids: Iterable[UUID]) -> None:
+        """Aligne les abonnements sur les rooms et utilisateurs présents sur ce worker"""
+        if self.channels is None:
+            return
+
+        try:
+            for room_id in set(room_ids):
+                await self.channels.sync(self._room_channel(room_id),
+                                         lambda: self.registry.has_room(SCOPE_GENERIC, room_id))
+            for user_id in set(user_ids):
+                await self.channels.sync(self._user_channel(user_id),
+                                         lambda: self.registry.has_user(SCOPE_GENERIC, user_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Erreur abonnement courtier: {e}")
+
+    async def _on_broker_message(self, channel: str, payload: Dict[str, Any]) -> None:
+        """Livre aux connexions locales un événement publié par un autre worker"""
+        kind = payload.get("kind")
+        message = WebSocketMessage(**payload["message"])
+
+        if kind == "room":
+            await self._broadcast_to_local_room(payload["room_id"], message)
+        elif kind == "user":
+            await self._send_to_local_user(UUID(payload["user_id"]), message)
+        elif kind == "all":
+            await self._broadcast_to_local(message)
+
     # === MAINTENANCE ET NETTOYAGE ===
 
     async def update_heartbeat(self, connection_id: str) -> bool:
@@ -464,9 +621,10 @@ class WebSocketManager:
         Returns:
             True si succès
         """
-        connection = self.connections.get(connection_id)
+        connection = self.get_connection(connection_id)
         if connection:
             connection.last_heartbeat = time.time()
+            self.heartbeats.touch(connection_id)
             return True
         return False
 
@@ -474,20 +632,28 @@ class WebSocketManager:
         """
         Nettoie les connexions inactives
 
+        Seules les échéances dépassées de la roue temporelle sont visitées,
+        sans parcourir l'ensemble des connexions.
+
         Returns:
             Nombre de connexions nettoyées
         """
-        current_time = time.time()
-        inactive_connections = []
-
-        # Identifier les connexions inactives
-        for connection_id, connection in self.connections.items():
-            if current_time - connection.last_heartbeat > 60:  # 1 minute timeout
-                inactive_connections.append(connection_id)
+        inactive_connections = self.heartbeats.expire()
 
         # Nettoyer les connexions inactives
         for connection_id in inactive_connections:
+            connection = self.get_connection(connection_id)
+            if connection is None:
+                continue
+
             await self.disconnect(connection_id)
+            try:
+                await connection.websocket.close(
+                    code=websocket_config.HEARTBEAT_TIMEOUT_CLOSE_CODE,
+                    reason="Heartbeat timeout"
+                )
+            except Exception:
+                pass
 
         return len(inactive_connections)
 
@@ -501,12 +667,10 @@ class WebSocketManager:
         Returns:
             Informations de la room
         """
-        room_connections = self.game_rooms.get(room_id, set())
         players = []
 
-        for connection_id in room_connections:
-            connection = self.connections.get(connection_id)
-            if connection and connection.is_authenticated:
+        for connection in self.registry.in_room(SCOPE_GENERIC, room_id):
+            if connection.is_authenticated:
                 players.append({
                     "user_id": str(connection.user_id),
                     "username": connection.username,
@@ -522,29 +686,38 @@ class WebSocketManager:
 
     # === MÉTHODES D'INFORMATION ===
 
+    def get_connection(self, connection_id: str) -> Optional[ConnectionRecord]:
+        """Retourne l'enregistrement d'une connexion de ce gestionnaire"""
+        connection = self.registry.get(connection_id)
+        return connection if connection is not None and connection.scope == SCOPE_GENERIC else None
+
+    def get_room_connections(self, room_id: str) -> List[ConnectionRecord]:
+        """Retourne les connexions locales d'une room (copie)"""
+        return list(self.registry.in_room(SCOPE_GENERIC, room_id))
+
     def get_connection_count(self) -> int:
         """Retourne le nombre de connexions actives"""
-        return len(self.connections)
+        return self.registry.count(SCOPE_GENERIC)
 
     def get_authenticated_count(self) -> int:
         """Retourne le nombre de connexions authentifiées"""
-        return sum(1 for conn in self.connections.values() if conn.is_authenticated)
+        return self.registry.authenticated_count(SCOPE_GENERIC)
 
     def get_room_count(self) -> int:
         """Retourne le nombre de rooms actives"""
-        return len(self.game_rooms)
+        return self.registry.room_count(SCOPE_GENERIC)
 
     def get_user_connection_count(self, user_id: UUID) -> int:
         """Retourne le nombre de connexions pour un utilisateur"""
-        return len(self.user_connections.get(user_id, set()))
+        return len(self.registry.for_user(SCOPE_GENERIC, user_id))
 
     def is_user_connected(self, user_id: UUID) -> bool:
         """Vérifie si un utilisateur est connecté"""
-        return user_id in self.user_connections and len(self.user_connections[user_id]) > 0
+        return self.registry.has_user(SCOPE_GENERIC, user_id)
 
     def get_connection_info(self, connection_id: str) -> Optional[Dict[str, Any]]:
         """Récupère les informations d'une connexion"""
-        connection = self.connections.get(connection_id)
+        connection = self.get_connection(connection_id)
         if not connection:
             return None
 
@@ -553,10 +726,25 @@ class WebSocketManager:
             "user_id": str(connection.user_id) if connection.user_id else None,
             "username": connection.username,
             "is_authenticated": connection.is_authenticated,
-            "game_rooms": list(connection.game_rooms),
+            "game_rooms": list(connection.rooms),
             "connected_at": connection.connected_at,
             "last_heartbeat": connection.last_heartbeat,
-            "is_alive": connection.is_alive
+            "is_alive": connection.is_alive,
+            "codec": connection.codec.name,
+            "outbound": connection.outbound.get_stats() if connection.outbound else None
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métriques de présence et de trafic, lues en O(1)"""
+        return {
+            "connections": self.registry.count(SCOPE_GENERIC),
+            "authenticated_connections": self.registry.authenticated_count(SCOPE_GENERIC),
+            "users": self.registry.user_count(SCOPE_GENERIC),
+            "rooms": self.registry.room_count(SCOPE_GENERIC),
+            "codecs": self.registry.codec_counts(SCOPE_GENERIC),
+            "rejected_connections": self.rejected_connections,
+            **self.traffic.to_dict(),
+            "outbound": self.outbound_totals.to_dict()
         }
 
     async def get_stats(self) -> Dict[str, Any]:
@@ -565,14 +753,31 @@ class WebSocketManager:
             "total_connections": self.get_connection_count(),
             "authenticated_connections": self.get_authenticated_count(),
             "active_rooms": self.get_room_count(),
-            "unique_users": len(self.user_connections),
+            "unique_users": self.registry.user_count(SCOPE_GENERIC),
             "rooms_info": {
-                room_id: len(connections)
-                for room_id, connections in self.game_rooms.items()
+                room_id: self.registry.room_size(SCOPE_GENERIC, room_id)
+                for room_id in self.registry.rooms(SCOPE_GENERIC)
             },
+            "outbound": self.outbound_totals.to_dict(),
+            "rejected_connections": self.rejected_connections,
+            "traffic": self.traffic.to_dict(),
+            "auth_cache": auth_cache.get_stats(),
             "timestamp": time.time()
         }
 
 
 # Instance globale du gestionnaire WebSocket
-websocket_manager = WebSocketManager()
\ No newline at end of file
+websocket_manager = WebSocketManager()
+
+
+async def initialize_websocket_manager() -> WebSocketManager:
+    """Branche le gestionnaire générique sur le courtier inter-workers (WS_BROKER_BACKEND)"""
+    if ws_broker is not None:
+        await ws_broker.start()
+        await websocket_manager.attach_broker(ws_broker)
+    return websocket_manager
+
+
+async def cleanup_websocket_manager() -> None:
+    """Désabonne le gestionnaire générique du courtier"""
+    await websocket_manager.detach_broker()
\ No newline at end of file
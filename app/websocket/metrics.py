@@ -0,0 +1,33 @@
+"""
+Compteurs de trafic WebSocket maintenus au fil des événements
+NOUVEAU: Les statistiques de présence (connexions, utilisateurs authentifiés, rooms,
+formats) sont des jauges du registre et le trafic sortant est compté par les files
+d'envoi ; ces compteurs complètent le trafic entrant et le cycle de vie des connexions.
+Lire les métriques coûte O(1), quel que soit le nombre de connexions.
+"""
+from typing import Dict, Union
+
+Frame = Union[str, bytes]
+
+
+class TrafficCounters:
+    """Trafic entrant et cycle de vie des connexions d'un gestionnaire"""
+
+    __slots__ = ("connects", "disconnects", "messages_received", "bytes_received", "rejected_messages")
+
+    def __init__(self):
+        self.connects = 0
+        self.disconnects = 0
+        self.messages_received = 0
+        self.bytes_received = 0  # octets des trames binaires, caractères des trames texte
+        self.rejected_messages = 0  # trames invalides ou limitées en débit
+
+    def received(self, frame: Frame) -> None:
+        self.messages_received += 1
+        self.bytes_received += len(frame)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+__all__ = ["TrafficCounters"]
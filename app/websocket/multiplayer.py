@@ -3,12 +3,29 @@ Gestionnaire WebSocket pour le multijoueur en temps réel - VERSION CORRIGÉE CO
 Résout tous les problèmes de connexion, chat et synchronisation
 """
 import asyncio
-import json
 import logging
 from datetime import datetime, timezone
-from typing import Dict, Optional, Set, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
 
 from fastapi import WebSocket
+from fastapi.websockets import WebSocketState
+
+from app.core.config import settings, websocket_config
+from app.schemas.websocket import ChatMessagePayload, PingPayload
+from app.utils.exceptions import WebSocketMessageError
+from app.websocket.broker import ChannelSubscriptions, MessageBroker, ws_broker
+from app.websocket.broadcast_scheduler import PendingEvent, RoomBroadcastScheduler, build_batch_frame
+from app.websocket.codec import EncodedFrames, Frame, MessageCodec, accept_with_codec, json_codec
+from app.websocket.dispatch import InboundMessage, MessageDispatcher
+from app.websocket.heartbeat import HeartbeatWheel
+from app.websocket.locks import KeyedLock
+from app.websocket.metrics import TrafficCounters
+from app.websocket.registry import SCOPE_MULTIPLAYER, ConnectionRecord, ConnectionRegistry, connection_registry
+from app.websocket.replay import ReplayRegistry, ResumeTokenStore
+from app.websocket.room_state import RoomStateRegistry, merge_state_deltas
+from app.websocket.outbound import OutboundQueue, OutboundTotals, SlowConsumerPolicy
+from app.websocket.rate_limit import MessageRateLimiter
+from app.websocket.sessions import SessionWriter, session_writer
 
 logger = logging.getLogger(__name__)
 
@@ -16,207 +33,465 @@ logger = logging.getLogger(__name__)
 class MultiplayerWebSocketManager:
     """Gestionnaire WebSocket pour les parties multijoueur - VERSION CORRIGÉE COMPLÈTE"""
 
-    def __init__(self):
-        # Connexions actives par room : room_code -> Set[WebSocket]
-        self.room_connections: Dict[str, Set[WebSocket]] = {}
-
-        # Mapping connexion -> room_code
-        self.connection_rooms: Dict[WebSocket, str] = {}
-
-        # Mapping connexion -> user_id
-        self.connection_users: Dict[WebSocket, str] = {}
-
-        # Mapping connexion -> username pour l'affichage
-        self.connection_usernames: Dict[WebSocket, str] = {}
-
-        # CORRECTION: Mapping user_id -> room_code (UN SEUL par user)
-        self.user_room_mapping: Dict[str, str] = {}
-
-        # CORRECTION: Mapping user_id -> websocket (UNE SEULE connexion par user)
-        self.user_websockets: Dict[str, WebSocket] = {}
+    def __init__(self, registry: Optional[ConnectionRegistry] = None):
+        # NOUVEAU: Registre partagé (un enregistrement par connexion : room, utilisateur,
+        # format des trames, file d'envoi, session) indexé par socket, utilisateur et room.
+        # CORRECTION: Une seule connexion par utilisateur, donc une seule room
+        self.registry = registry if registry is not None else connection_registry
 
         # Informations des rooms actives
         self.multiplayer_rooms: Dict[str, Dict[str, Any]] = {}
 
-        # Lock pour éviter les races conditions
-        self.connection_lock = asyncio.Lock()
+        # NOUVEAU: Verrou par utilisateur (remplacement d'une ancienne connexion) ; les mappings
+        # sont modifiés de façon synchrone et les envois ont lieu hors section critique
+        self.user_locks = KeyedLock("multiplayer_users")
+
+        # NOUVEAU: Totaux des files d'envoi bornées (une par connexion, portée par son enregistrement)
+        self.outbound_totals = OutboundTotals()
+        self.slow_consumer_policy = SlowConsumerPolicy.parse(settings.WS_SLOW_CONSUMER_POLICY)
+
+        # NOUVEAU: Détection des connexions muettes (roue temporelle + tâche de balayage)
+        self.heartbeats = HeartbeatWheel(
+            timeout=settings.WS_CONNECTION_TIMEOUT,
+            resolution=websocket_config.HEARTBEAT_WHEEL_RESOLUTION
+        )
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+        # NOUVEAU: Coalescence des diffusions par tick (activée room par room)
+        self.broadcast_scheduler = RoomBroadcastScheduler(
+            flush=self._flush_room_batch,
+            default_tick=settings.WS_BROADCAST_TICK_MS / 1000,
+            bypass_types=websocket_config.BROADCAST_BYPASS_TYPES,
+            flush_types=websocket_config.BROADCAST_FLUSH_TYPES,
+            supersede_keys={
+                message_type: (lambda message: message.get("type"))
+                for message_type in websocket_config.BROADCAST_SUPERSEDED_TYPES
+            },
+            merge_functions={"game_state_delta": merge_state_deltas}
+        )
+
+        # NOUVEAU: État versionné par room (deltas JSON Patch + séquence)
+        self.room_states = RoomStateRegistry()
+
+        # NOUVEAU: Reprise de session (tampon d'événements par room, jetons de reprise)
+        self.replay = ReplayRegistry(settings.WS_REPLAY_BUFFER_SIZE, settings.WS_RESUME_WINDOW_SECONDS)
+        self.resume_tokens = ResumeTokenStore(settings.WS_RESUME_WINDOW_SECONDS)
+        self.session_writer: SessionWriter = session_writer
+
+        # NOUVEAU: Courtier pub/sub entre workers (None = un seul worker)
+        self.broker: Optional[MessageBroker] = None
+        self.channels: Optional[ChannelSubscriptions] = None
+
+        # NOUVEAU: Table de dispatch des messages entrants (schémas compilés une seule fois)
+        self.dispatcher = MessageDispatcher("multiplayer")
+        self._register_message_handlers()
+
+        # NOUVEAU: Seaux à jetons par connexion et par room (le chat est diffusé à toute la room)
+        self.rate_limiter = MessageRateLimiter.from_settings(settings, websocket_config.RATE_LIMIT_CATEGORIES)
+
+        # NOUVEAU: Trafic entrant et cycle de vie des connexions (compteurs O(1))
+        self.traffic = TrafficCounters()
 
         # Statistiques
         self.stats = {
             "total_connections": 0,
             "active_rooms": 0,
-            "messages_sent": 0
+            "messages_sent": 0,
+            "heartbeat_timeouts": 0
         }
 
         logger.info("🌐 MultiplayerWebSocketManager initialisé (VERSION CORRIGÉE COMPLÈTE)")
 
-    async def connect(self, websocket: WebSocket, room_code: str, user_id: str, username: str = None):
-        """Connecte un client WebSocket - VERSION CORRIGÉE COMPLÈTE"""
-        async with self.connection_lock:
+    async def connect(self, websocket: WebSocket, room_code: str, user_id: str, username: str = None,
+                      game_id: Any = None, resume_token: Optional[str] = None,
+                      last_event_seq: Optional[int] = None):
+        """
+        Connecte un client WebSocket - accept() et envois hors de toute section critique
+
+        Args:
+            resume_token: Jeton reçu dans connection_established d'une connexion précédente
+            last_event_seq: Dernier event_seq reçu par le client avant la coupure
+        """
+        try:
+            codec = await accept_with_codec(websocket)
+            logger.info(f"🔌 Tentative connexion {user_id} à {room_code} ({codec.name})")
+
+            # Seules les connexions du même utilisateur sont sérialisées
+            async with self.user_locks.acquire(user_id):
+                # CORRECTION: Détacher l'ancienne connexion de cet utilisateur
+                previous = self._user_record(user_id)
+                previous_room = previous.room if previous else None
+                old_websocket, old_queue = self._detach_connection(previous.websocket if previous else None)
+
+                # Ajouter la nouvelle connexion (mutation synchrone)
+                self._register_connection(websocket, room_code, user_id, username, codec)
+                connected_players = self.registry.room_size(SCOPE_MULTIPLAYER, room_code)
+
+                # NOUVEAU: Confirmation et rattrapage mis en file avant tout événement diffusé ensuite
+                await self._start_session(websocket, room_code, user_id, username, connected_players, codec,
+                                          game_id, resume_token, last_event_seq)
+
+            logger.info(f"✅ User {username or user_id} connecté à {room_code} ({connected_players} joueurs)")
+
+            # Fermer l'ancienne connexion sans bloquer les autres utilisateurs
+            if old_websocket is not None:
+                await self._close_detached_connection(old_websocket, old_queue, code=1001, reason="New connection")
+
+            # NOUVEAU: Écouter la room et l'utilisateur, et fermer son ancienne connexion sur un autre worker
+            await self._sync_channels((room_code, previous_room), (user_id,))
+            await self._publish(self._user_channel(user_id), {"kind": "evict", "user_id": user_id})
+
+            # Notifier les autres dans la room
+            await self.broadcast_to_room(room_code, {
+                "type": "player_joined",
+                "data": {
+                    "user_id": user_id,
+                    "username": username or f"User {user_id}",
+                    "room_code": room_code,
+                    "connected_players": connected_players,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                }
+            }, exclude_websocket=websocket)
+
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Erreur connexion {user_id} à {room_code}: {e}")
+            await self._remove_connection_mappings(websocket)
             try:
-                await websocket.accept()
-                logger.info(f"🔌 Tentative connexion {user_id} à {room_code}")
+                await websocket.close(code=1011, reason="Connection error")
+            except:
+                pass
+            return False
+
+    def _record(self, websocket: Optional[WebSocket]) -> Optional[ConnectionRecord]:
+        """Enregistrement multijoueur d'une connexion - NOUVEAU"""
+        record = self.registry.for_socket(websocket) if websocket is not None else None
+        return record if record is not None and record.scope == SCOPE_MULTIPLAYER else None
+
+    def _user_record(self, user_id: Optional[str]) -> Optional[ConnectionRecord]:
+        """Connexion (unique) d'un utilisateur sur ce worker - NOUVEAU"""
+        for record in self.registry.for_user(SCOPE_MULTIPLAYER, user_id):
+            return record
+        return None
+
+    def _get_user_websocket(self, room_code: str, user_id: str) -> Optional[WebSocket]:
+        """WebSocket d'un utilisateur dans une room (exclusion des notifications) - NOUVEAU"""
+        record = self.registry.user_in_room(SCOPE_MULTIPLAYER, room_code, user_id)
+        return record.websocket if record else None
+
+    def _room_records(self, room_code: str) -> List[ConnectionRecord]:
+        """Copie des connexions d'une room (sûre à travers les points de suspension) - NOUVEAU"""
+        return list(self.registry.in_room(SCOPE_MULTIPLAYER, room_code))
+
+    def _has_room(self, room_code: Optional[str]) -> bool:
+        return self.registry.has_room(SCOPE_MULTIPLAYER, room_code)
+
+    def _register_connection(self, websocket: WebSocket, room_code: str, user_id: str, username: Optional[str],
+                             codec: MessageCodec = json_codec):
+        """Enregistre une connexion dans tous les index - synchrone"""
+        record = self.registry.add(websocket, SCOPE_MULTIPLAYER, codec)
+        self.registry.set_user(record, user_id, username or f"User {user_id}")
+        self.registry.join(record, room_code)
+        record.outbound = self._create_outbound_queue(websocket, user_id)
+        self.stats["active_rooms"] = self.registry.room_count(SCOPE_MULTIPLAYER)
+        self.heartbeats.touch(websocket)
+        self.replay.activate(room_code)
+
+        self.stats["total_connections"] += 1
+        self.traffic.connects += 1
+
+    async def _start_session(self, websocket: WebSocket, room_code: str, user_id: str, username: Optional[str],
+                             connected_players: int, codec: MessageCodec, game_id: Any,
+                             resume_token: Optional[str], last_event_seq: Optional[int]):
+        """
+        Ouvre ou reprend la session d'une connexion enregistrée - NOUVEAU
+
+        Appelé sans point de suspension après l'enregistrement : la confirmation puis le
+        rattrapage (événements manqués ou snapshot) précèdent dans la file d'envoi tout
+        événement diffusé ensuite dans la room.
+        """
+        resume = self.resume_tokens.claim(resume_token, user_id, room_code)
+        epoch, event_seq = self.replay.position(room_code)
+
+        if resume is not None:
+            session_id, previous_epoch = resume_token, resume["epoch"]
+            resume["epoch"] = epoch
+        else:
+            session_id, previous_epoch = self.resume_tokens.issue(user_id, room_code, epoch), None
+        self._record(websocket).session_id = session_id
+
+        client = getattr(websocket, "client", None)
+        headers = getattr(websocket, "headers", None) or {}
+        self.session_writer.open(
+            session_id, user_id, room_code, game_id,
+            ip_address=getattr(client, "host", None),
+            user_agent=headers.get("user-agent"),
+            resumes=resume["resumes"] if resume else 0
+        )
+
+        await self._send_to_connection(websocket, {
+            "type": "connection_established",
+            "data": {
+                "room_code": room_code,
+                "user_id": user_id,
+                "username": username,
+                "connected_players": connected_players,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "status": "connected",
+                "codec": codec.describe(),
+                "resume_token": session_id,
+                "resumed": resume is not None,
+                "event_seq": event_seq
+            }
+        })
 
-                # CORRECTION: Nettoyer les anciennes connexions de cet utilisateur
-                await self._cleanup_old_user_connections(user_id)
+        snapshot = self.room_states.snapshot(room_code)
+        if resume is None:
+            # Le nouvel arrivant part du dernier état connu
+            if snapshot is not None:
+                await self._send_state_snapshot(websocket, room_code, snapshot)
+            return
 
-                # Ajouter la nouvelle connexion
-                if room_code not in self.room_connections:
-                    self.room_connections[room_code] = set()
-                    self.stats["active_rooms"] = len(self.room_connections)
+        events = self.replay.replay(room_code, previous_epoch, last_event_seq, user_id)
+        if events is not None:
+            mode = "replay"
+        elif snapshot is not None:
+            mode = "snapshot"
+        else:
+            mode = "reload"  # Rien en mémoire : le client recharge la room via l'API REST
 
-                self.room_connections[room_code].add(websocket)
-                self.connection_rooms[websocket] = room_code
-                self.connection_users[websocket] = user_id
-                self.connection_usernames[websocket] = username or f"User {user_id}"
-                self.user_room_mapping[user_id] = room_code
-                self.user_websockets[user_id] = websocket
+        await self._send_to_connection(websocket, {
+            "type": "session_resumed",
+            "data": {
+                "room_code": room_code,
+                "mode": mode,
+                "replayed": len(events) if events else 0,
+                "event_seq": event_seq,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+        })
 
-                self.stats["total_connections"] += 1
+        if events:
+            timestamp = datetime.now(timezone.utc).isoformat()
+            await self._send_to_connection(websocket, build_batch_frame(events, room_code, timestamp))
+        elif mode == "snapshot":
+            await self._send_state_snapshot(websocket, room_code, snapshot)
+
+        logger.info(f"⏯️ Session reprise pour {username or user_id} dans {room_code} ({mode})")
+
+    def _detach_connection(self, websocket: Optional[WebSocket]):
+        """
+        Retire une connexion de tous les index - synchrone
+
+        Returns:
+            (websocket, file d'envoi) détachés, ou (None, None) si inconnue
+        """
+        # Retrait atomique de tous les index (room, utilisateur, socket) en une étape
+        record = self.registry.remove(self._record(websocket))
+        if record is None:
+            return None, None
+
+        room_code = record.room
+        queue = record.outbound
+        self.heartbeats.remove(websocket)
+        self.traffic.disconnects += 1
+
+        # NOUVEAU: La fenêtre de reprise de la session commence
+        self.resume_tokens.release(record.session_id)
+        self.session_writer.close(record.session_id, messages_sent=queue.sent if queue else 0)
+
+        # Supprimer la room si vide
+        if room_code and not self._has_room(room_code):
+            self.broadcast_scheduler.discard_room(room_code)
+            self.rate_limiter.forget_room(room_code)
+            # NOUVEAU: État et tampon conservés pendant la fenêtre de reprise
+            if not self.replay.release(room_code):
+                self.room_states.discard(room_code)
+            logger.info(f"🗑️ Room {room_code} supprimée (vide)")
+
+        self.stats["active_rooms"] = self.registry.room_count(SCOPE_MULTIPLAYER)
+        logger.debug(f"🧹 Connexion de {record.user_id} retirée du registre")
+
+        return websocket, queue
+
+    async def _close_detached_connection(self, websocket: WebSocket, queue: Optional[OutboundQueue],
+                                         code: int, reason: str, drain_timeout: float = 0.0):
+        """Arrête la file d'envoi et ferme une connexion déjà détachée"""
+        if queue is not None:
+            await queue.close(drain_timeout=drain_timeout)
 
-                logger.info(f"✅ User {username or user_id} connecté à {room_code} ({len(self.room_connections[room_code])} joueurs)")
+        try:
+            if not self._is_disconnected(websocket):
+                await websocket.close(code=code, reason=reason)
+        except Exception as close_error:
+            logger.warning(f"⚠️ Erreur fermeture ancienne connexion: {close_error}")
+
+    @staticmethod
+    def _is_disconnected(websocket: WebSocket) -> bool:
+        """CORRECTION: WebSocketState n'a pas d'attribut 'disconnected', on compare l'état"""
+        return (
+            websocket.client_state == WebSocketState.DISCONNECTED
+            or websocket.application_state == WebSocketState.DISCONNECTED
+        )
 
-                # Confirmer la connexion
-                await self._send_to_connection(websocket, {
-                    "type": "connection_established",
-                    "data": {
-                        "room_code": room_code,
-                        "user_id": user_id,
-                        "username": username,
-                        "connected_players": len(self.room_connections[room_code]),
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "status": "connected"
-                    }
-                })
+    async def disconnect(self, websocket: WebSocket):
+        """Déconnecte un client WebSocket - détachement synchrone puis notification"""
+        try:
+            record = self._record(websocket)
+            room_code = record.room if record else None
+            user_id = record.user_id if record else None
+            username = (record.username if record else None) or "Joueur inconnu"
+
+            # Retrait atomique : les appels concurrents pour la même connexion sortent ici
+            detached, queue = self._detach_connection(websocket)
+            if detached is None:
+                return
+
+            if queue is not None:
+                await queue.close()
+
+            await self._sync_channels((room_code,), (user_id,))
+
+            if room_code and user_id:
+                logger.info(f"🔌 Déconnexion {username} ({user_id}) de {room_code}")
 
-                # Notifier les autres dans la room
                 await self.broadcast_to_room(room_code, {
-                    "type": "player_joined",
+                    "type": "player_left",
                     "data": {
                         "user_id": user_id,
-                        "username": username or f"User {user_id}",
+                        "username": username,
                         "room_code": room_code,
-                        "connected_players": len(self.room_connections[room_code]),
                         "timestamp": datetime.now(timezone.utc).isoformat()
                     }
                 }, exclude_websocket=websocket)
 
-                return True
+        except Exception as e:
+            logger.error(f"❌ Erreur déconnexion: {e}")
 
-            except Exception as e:
-                logger.error(f"❌ Erreur connexion {user_id} à {room_code}: {e}")
-                try:
-                    await websocket.close(code=1011, reason="Connection error")
-                except:
-                    pass
-                return False
-
-    async def _cleanup_old_user_connections(self, user_id: str):
-        """Nettoie les anciennes connexions d'un utilisateur - CORRECTION COMPLÈTE"""
+    async def _remove_connection_mappings(self, websocket: WebSocket):
+        """Supprime tous les mappings pour une connexion - COMPLET"""
         try:
-            # Si l'utilisateur a déjà une connexion active
-            if user_id in self.user_websockets:
-                old_websocket = self.user_websockets[user_id]
-                old_room = self.connection_rooms.get(old_websocket)
-
-                if old_websocket:
-                    logger.info(f"🧹 Nettoyage ancienne connexion {user_id} (room: {old_room})")
+            record = self._record(websocket)
+            room_code = record.room if record else None
+            user_id = record.user_id if record else None
 
-                    # Fermer l'ancienne connexion
-                    try:
-                        if not old_websocket.client_state.disconnected:
-                            await old_websocket.close(code=1001, reason="New connection")
-                    except Exception as close_error:
-                        logger.warning(f"⚠️ Erreur fermeture ancienne connexion: {close_error}")
+            _, queue = self._detach_connection(websocket)
+            if queue is not None:
+                await queue.close()
 
-                    # Nettoyer les mappings
-                    await self._remove_connection_mappings(old_websocket)
+            await self._sync_channels((room_code,), (user_id,))
 
         except Exception as e:
-            logger.warning(f"⚠️ Erreur nettoyage {user_id}: {e}")
+            logger.warning(f"⚠️ Erreur suppression mappings: {e}")
 
-    async def disconnect(self, websocket: WebSocket):
-        """Déconnecte un client WebSocket - VERSION CORRIGÉE COMPLÈTE"""
-        async with self.connection_lock:
-            try:
-                room_code = self.connection_rooms.get(websocket)
-                user_id = self.connection_users.get(websocket)
-                username = self.connection_usernames.get(websocket, "Joueur inconnu")
+    async def broadcast_to_room(self, room_code: str, message: dict, exclude_websocket: Optional[WebSocket] = None):
+        """Diffuse un message à tous les clients d'une room - VERSION CORRIGÉE COMPLÈTE"""
+        # NOUVEAU: Les autres workers livrent leurs propres connexions (la connexion exclue est locale)
+        await self._publish(self._room_channel(room_code), {
+            "kind": "room",
+            "room_code": room_code,
+            "message": message
+        })
+        await self._broadcast_local(room_code, message, exclude_websocket)
 
-                if room_code and user_id:
-                    logger.info(f"🔌 Déconnexion {username} ({user_id}) de {room_code}")
+    async def _broadcast_local(self, room_code: str, message: dict, exclude_websocket: Optional[WebSocket] = None):
+        """Diffuse un message aux connexions de ce worker uniquement"""
+        # NOUVEAU: Numérotation (event_seq) et conservation pour la reprise de session
+        excluded = self._record(exclude_websocket)
+        message = self.replay.record(room_code, message, (excluded.user_id,) if excluded else ())
 
-                    # Notifier les autres AVANT de nettoyer
-                    await self.broadcast_to_room(room_code, {
-                        "type": "player_left",
-                        "data": {
-                            "user_id": user_id,
-                            "username": username,
-                            "room_code": room_code,
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                    }, exclude_websocket=websocket)
+        if not self._has_room(room_code) and self.replay.is_retained(room_code):
+            return  # Room vide en attente de reprise : l'événement reste seulement rejouable
 
-                # Nettoyer les mappings
-                await self._remove_connection_mappings(websocket)
+        # NOUVEAU: Les rooms volontaires accumulent les événements jusqu'au prochain tick
+        if await self.broadcast_scheduler.submit(room_code, message, exclude_websocket):
+            return
 
-            except Exception as e:
-                logger.error(f"❌ Erreur déconnexion: {e}")
+        await self._deliver_to_room(room_code, message, exclude_websocket)
 
-    async def _remove_connection_mappings(self, websocket: WebSocket):
-        """Supprime tous les mappings pour une connexion - COMPLET"""
-        try:
-            room_code = self.connection_rooms.get(websocket)
-            user_id = self.connection_users.get(websocket)
+    async def notify_room(self, room_code: str, message: dict, exclude_websocket: Optional[WebSocket] = None):
+        """Point d'entrée du NotificationService pour une notification isolée - NOUVEAU"""
+        await self.broadcast_to_room(room_code, message, exclude_websocket)
 
-            # Supprimer de la room
-            if room_code and room_code in self.room_connections:
-                self.room_connections[room_code].discard(websocket)
+    async def notify_room_batch(self, room_code: str, events: List[Tuple[dict, Optional[WebSocket]]]):
+        """
+        Diffuse plusieurs événements d'une room en une seule trame groupée - NOUVEAU
 
-                # Supprimer la room si vide
-                if not self.room_connections[room_code]:
-                    del self.room_connections[room_code]
-                    logger.info(f"🗑️ Room {room_code} supprimée (vide)")
+        Args:
+            room_code: Room cible
+            events: Couples (message, WebSocket exclue ou None), dans l'ordre d'émission
+        """
+        if not events:
+            return
 
-                self.stats["active_rooms"] = len(self.room_connections)
+        await self._publish(self._room_channel(room_code), {
+            "kind": "room_batch",
+            "room_code": room_code,
+            "messages": [message for message, _ in events]
+        })
+        await self._broadcast_local_batch(room_code, events)
 
-            # Supprimer les mappings
-            self.connection_rooms.pop(websocket, None)
-            self.connection_users.pop(websocket, None)
-            self.connection_usernames.pop(websocket, None)
+    async def _broadcast_local_batch(self, room_code: str, events: List[Tuple[dict, Optional[WebSocket]]]):
+        """Équivalent groupé de _broadcast_local (chaque événement reste numéroté et rejouable)"""
+        pending = []
+        for message, exclude_websocket in events:
+            excluded = self._record(exclude_websocket)
+            message = self.replay.record(room_code, message, (excluded.user_id,) if excluded else ())
+            pending.append(PendingEvent(message, exclude_websocket))
 
-            if user_id:
-                # CORRECTION: Seulement si c'est la bonne connexion
-                if self.user_websockets.get(user_id) == websocket:
-                    self.user_websockets.pop(user_id, None)
-                    self.user_room_mapping.pop(user_id, None)
-                    logger.debug(f"🧹 Mappings utilisateur {user_id} supprimés")
+        if not self._has_room(room_code):
+            return
 
-        except Exception as e:
-            logger.warning(f"⚠️ Erreur suppression mappings: {e}")
+        # Les rooms volontaires gardent leur propre cadence de tick
+        if self.broadcast_scheduler.is_enabled(room_code):
+            for event in pending:
+                await self.broadcast_scheduler.submit(room_code, event.message, event.exclude)
+            return
 
-    async def broadcast_to_room(self, room_code: str, message: dict, exclude_websocket: Optional[WebSocket] = None):
-        """Diffuse un message à tous les clients d'une room - VERSION CORRIGÉE COMPLÈTE"""
-        if room_code not in self.room_connections:
+        await self._flush_room_batch(room_code, pending)
+
+    async def _deliver_to_room(self, room_code: str, message: dict, exclude=None):
+        """
+        Envoie un message à tous les clients d'une room
+
+        Args:
+            room_code: Room cible
+            message: Message à diffuser
+            exclude: WebSocket ou ensemble de WebSockets à exclure
+        """
+        excluded = exclude if isinstance(exclude, (set, frozenset)) else {exclude}
+
+        if not self._has_room(room_code):
             logger.warning(f"⚠️ Room {room_code} non trouvée pour broadcast")
             return
 
-        connections = self.room_connections[room_code].copy()  # Copie pour éviter les modifications concurrentes
+        records = self._room_records(room_code)  # Copie pour éviter les modifications concurrentes
         disconnected_connections = []
         sent_count = 0
 
-        for websocket in connections:
-            if websocket == exclude_websocket:
+        # Sérialisation unique par format, puis simple mise en file par connexion (jamais bloquant)
+        message_type = message.get("type")
+        frames = EncodedFrames(message)
+
+        for record in records:
+            websocket = record.websocket
+            if websocket in excluded:
                 continue
 
             try:
                 # Vérifier que la connexion est toujours active
-                if websocket.client_state.disconnected:
+                if self._is_disconnected(websocket):
                     disconnected_connections.append(websocket)
                     continue
 
-                await self._send_to_connection(websocket, message)
-                sent_count += 1
+                payload = frames.for_codec(record.codec)
+                queue = record.outbound
+                if queue is None:
+                    await self._send_frame(websocket, payload)
+                    sent_count += 1
+                elif queue.put(message_type, payload):
+                    sent_count += 1
 
             except Exception as e:
                 logger.warning(f"⚠️ Erreur envoi à connexion dans {room_code}: {e}")
@@ -229,91 +504,324 @@ class MultiplayerWebSocketManager:
         self.stats["messages_sent"] += sent_count
         logger.debug(f"📡 Message diffusé à {sent_count} joueurs dans {room_code}")
 
+    async def _flush_room_batch(self, room_code: str, events: List[PendingEvent]):
+        """Envoie les événements d'un tick en une seule trame groupée - NOUVEAU"""
+        if len(events) == 1:
+            await self._deliver_to_room(room_code, events[0].message, events[0].exclude)
+            return
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        excluded = {event.exclude for event in events if event.exclude is not None}
+
+        # Trame commune, sérialisée une seule fois pour toute la room
+        frame = build_batch_frame([event.message for event in events], room_code, timestamp)
+        await self._deliver_to_room(room_code, frame, excluded)
+
+        # Les connexions exclues de certains événements reçoivent leur propre trame
+        for websocket in excluded:
+            own_events = [event.message for event in events if event.exclude is not websocket]
+            if len(own_events) == 1:
+                await self._send_to_connection(websocket, own_events[0])
+            elif own_events:
+                await self._send_to_connection(websocket, build_batch_frame(own_events, room_code, timestamp))
+
+    def enable_room_batching(self, room_code: str, tick_ms: Optional[int] = None):
+        """Active la coalescence par tick pour une room - NOUVEAU"""
+        self.broadcast_scheduler.enable_room(room_code, tick_ms / 1000 if tick_ms else None)
+
+    async def disable_room_batching(self, room_code: str):
+        """Désactive la coalescence pour une room (les événements en attente partent) - NOUVEAU"""
+        await self.broadcast_scheduler.disable_room(room_code)
+
     async def _send_to_connection(self, websocket: WebSocket, message: dict):
-        """Envoie un message à une connexion spécifique - COMPLET"""
+        """Envoie un message à une connexion spécifique - via sa file d'envoi si elle existe"""
         try:
-            message_json = json.dumps(message)
-            await websocket.send_text(message_json)
+            record = self._record(websocket)
+            payload = (record.codec if record else json_codec).encode(message)
+            queue = record.outbound if record else None
+            if queue is not None:
+                return queue.put(message.get("type"), payload)
+            await self._send_frame(websocket, payload)
+            return True
         except Exception as e:
             logger.warning(f"⚠️ Impossible d'envoyer à connexion: {e}")
             raise
 
-    async def handle_message(self, websocket: WebSocket, message_data: dict):
-        """Traite un message reçu d'un client - VERSION CORRIGÉE COMPLÈTE"""
+    @staticmethod
+    async def _send_frame(websocket: WebSocket, payload: Frame):
+        """Envoi direct d'une trame texte ou binaire (connexion sans file d'envoi)"""
+        if isinstance(payload, bytes):
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
+    def decode_message(self, websocket: WebSocket, frame: Frame) -> InboundMessage:
+        """
+        Lit et valide une trame reçue selon le format négocié par la connexion - NOUVEAU
+
+        Raises:
+            WebSocketMessageError: Trame illisible, type inconnu ou données invalides
+        """
+        record = self._record(websocket)
+        self.traffic.received(frame)
         try:
-            message_type = message_data.get("type")
-            data = message_data.get("data", {})
+            return self.dispatcher.parse(frame, record.codec if record else json_codec)
+        except WebSocketMessageError:
+            self.traffic.rejected_messages += 1
+            raise
 
-            user_id = self.connection_users.get(websocket)
-            username = self.connection_usernames.get(websocket, "Joueur inconnu")
-            room_code = self.connection_rooms.get(websocket)
+    async def send_error(self, websocket: WebSocket, message: str):
+        """Envoie un message d'erreur à une connexion, dans son format - NOUVEAU"""
+        try:
+            await self._send_to_connection(websocket, {
+                "type": "error",
+                "data": {"message": message}
+            })
+        except Exception:
+            pass
+
+    def _create_outbound_queue(self, websocket: WebSocket, user_id: str) -> OutboundQueue:
+        """Crée et démarre la file d'envoi d'une connexion - NOUVEAU"""
+        return OutboundQueue(
+            websocket,
+            max_size=settings.WS_OUTBOUND_QUEUE_SIZE,
+            policy=self.slow_consumer_policy,
+            coalesce_types=websocket_config.COALESCIBLE_MESSAGE_TYPES,
+            send_timeout=websocket_config.OUTBOUND_SEND_TIMEOUT,
+            on_failure=self._handle_outbound_failure,
+            totals=self.outbound_totals,
+            label=f"user {user_id}"
+        ).start()
+
+    async def _handle_outbound_failure(self, queue: OutboundQueue, reason: str):
+        """Ferme une connexion dont la file a débordé ou dont l'envoi a échoué - NOUVEAU"""
+        websocket = queue.websocket
+        record = self._record(websocket)
+        if record is None or record.outbound is not queue:
+            return
 
-            if not user_id or not room_code:
-                logger.warning("⚠️ Message sans user_id ou room_code")
-                await self._send_to_connection(websocket, {
-                    "type": "error",
-                    "data": {"message": "Session invalide, reconnectez-vous"}
-                })
-                return
+        if reason == "slow_consumer":
+            try:
+                await websocket.close(code=websocket_config.SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+            except Exception:
+                pass
 
-            logger.debug(f"📨 Message {message_type} de {username} dans {room_code}")
+        await self.disconnect(websocket)
+
+    def get_connection_outbound_stats(self, websocket: WebSocket) -> Optional[dict]:
+        """Statistiques de la file d'envoi d'une connexion - NOUVEAU"""
+        record = self._record(websocket)
+        return record.outbound.get_stats() if record and record.outbound else None
+
+    # === DIFFUSION ENTRE WORKERS (NOUVEAU) ===
+
+    async def attach_broker(self, broker: Optional[MessageBroker]):
+        """Branche le courtier pub/sub et s'abonne aux canaux des connexions existantes"""
+        self.broker = broker
+        self.channels = ChannelSubscriptions(broker, self._on_broker_message) if broker else None
+        await self._sync_channels(list(self.registry.rooms(SCOPE_MULTIPLAYER)),
+                                  list(self.registry.users(SCOPE_MULTIPLAYER)))
+
+    async def detach_broker(self):
+        """Se désabonne de tous les canaux"""
+        if self.channels is not None:
+            await self.channels.clear()
+        self.broker = None
+        self.channels = None
+
+    @staticmethod
+    def _room_channel(room_code: str) -> str:
+        return f"multiplayer:room:{room_code}"
+
+    @staticmethod
+    def _user_channel(user_id: str) -> str:
+        return f"multiplayer:user:{user_id}"
+
+    async def _publish(self, channel: str, payload: dict):
+        """Publie un événement aux autres workers (aucun effet sans courtier)"""
+        if self.broker is not None:
+            await self.broker.publish(channel, payload)
+
+    async def _sync_channels(self, room_codes: Iterable[Optional[str]], user_ids: Iterable[Optional[str]]):
+        """Aligne les abonnements sur les rooms occupées et les utilisateurs connectés localement"""
+        if self.channels is None:
+            return
 
-            if message_type == "chat_message":
-                # CORRECTION: Diffuser le message de chat à TOUS dans la room
-                chat_message = {
-                    "type": "chat_broadcast",
-                    "data": {
-                        "message_id": f"msg_{datetime.now().timestamp()}_{user_id}",
-                        "user_id": user_id,
-                        "username": username,
-                        "message": data.get("message", "").strip()[:500],  # Limite 500 caractères
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "type": "user",
-                        "room_code": room_code,
-                        "is_creator": data.get("is_creator", False)
-                    }
+        try:
+            for room_code in set(room_codes):
+                if room_code:
+                    await self.channels.sync(self._room_channel(room_code),
+                                             lambda: self._has_room(room_code)
+                                             or self.replay.is_retained(room_code))
+            for user_id in set(user_ids):
+                if user_id:
+                    await self.channels.sync(self._user_channel(user_id),
+                                             lambda: self.registry.has_user(SCOPE_MULTIPLAYER, user_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Erreur abonnement courtier: {e}")
+
+    async def _on_broker_message(self, channel: str, payload: dict):
+        """Livre aux connexions locales un événement publié par un autre worker"""
+        kind = payload.get("kind")
+
+        if kind == "room":
+            await self._broadcast_local(payload["room_code"], payload["message"])
+
+        elif kind == "room_batch":
+            await self._broadcast_local_batch(
+                payload["room_code"], [(message, None) for message in payload["messages"]]
+            )
+
+        elif kind == "state":
+            await self._apply_game_state(payload["room_code"], payload["state"])
+
+        elif kind == "user":
+            record = self._user_record(payload["user_id"])
+            if record is not None:
+                await self._send_to_connection(record.websocket, payload["message"])
+
+        elif kind == "evict":
+            # L'utilisateur s'est reconnecté sur un autre worker : une seule connexion par utilisateur
+            user_id = payload["user_id"]
+            async with self.user_locks.acquire(user_id):
+                record = self._user_record(user_id)
+                room_code = record.room if record else None
+                old_websocket, old_queue = self._detach_connection(record.websocket if record else None)
+
+            if old_websocket is not None:
+                await self._close_detached_connection(old_websocket, old_queue, code=1001, reason="New connection")
+                await self._sync_channels((room_code,), (user_id,))
+                logger.info(f"🔁 Ancienne connexion de {user_id} fermée (reconnexion sur un autre worker)")
+
+    # === AFFINITÉ DES ROOMS (NOUVEAU) ===
+
+    async def redirect_connection(self, websocket: WebSocket, room_code: str, owner_url: str):
+        """
+        Indique au client le worker propriétaire de la room puis ferme la connexion
+
+        Le client se reconnecte à `url` avec son token à la réception de room_redirect
+        (l'URL ne contient jamais le token).
+        """
+        codec = await accept_with_codec(websocket)
+        try:
+            frame = codec.encode({
+                "type": "room_redirect",
+                "data": {
+                    "room_code": room_code,
+                    "url": owner_url,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
                 }
+            })
+            await self._send_frame(websocket, frame)
+        finally:
+            await websocket.close(code=websocket_config.ROOM_REDIRECT_CLOSE_CODE, reason="Room owned by another worker")
+
+    async def release_foreign_rooms(self, cluster) -> int:
+        """
+        Transfert après un changement de topologie : les connexions des rooms que ce
+        worker ne possède plus sont redirigées vers le nouveau propriétaire
+
+        Args:
+            cluster: ClusterNode du worker
+
+        Returns:
+            Nombre de connexions redirigées
+        """
+        redirected = 0
+
+        for room_code in [room for room in self.registry.rooms(SCOPE_MULTIPLAYER) if not cluster.is_local(room)]:
+            owner_url = cluster.owner_url(room_code)
+            logger.info(f"🧭 Room {room_code} transférée à {cluster.owner_of(room_code)}")
+
+            for record in self._room_records(room_code):
+                websocket, user_id, codec = record.websocket, record.user_id, record.codec
+                async with self.user_locks.acquire(user_id):
+                    detached, queue = self._detach_connection(websocket)
+                if detached is None:
+                    continue
 
-                await self.broadcast_to_room(room_code, chat_message)
-                logger.info(f"💬 Message chat diffusé par {username} dans {room_code}")
+                # Le message part par la file avant la fermeture (pas de player_left : le joueur déménage)
+                if queue is not None:
+                    queue.put("room_redirect", codec.encode({
+                        "type": "room_redirect",
+                        "data": {
+                            "room_code": room_code,
+                            "url": cluster.websocket_url(room_code, f"/api/v1/multiplayer/rooms/{room_code}/ws"),
+                            "owner_url": owner_url,
+                            "timestamp": datetime.now(timezone.utc).isoformat()
+                        }
+                    }))
+                await self._close_detached_connection(
+                    websocket, queue,
+                    code=websocket_config.ROOM_REDIRECT_CLOSE_CODE,
+                    reason="Room moved to another worker",
+                    drain_timeout=websocket_config.OUTBOUND_DRAIN_TIMEOUT
+                )
+                await self._sync_channels((room_code,), (user_id,))
+                redirected += 1
+
+            # La reprise se fera auprès du nouveau propriétaire (snapshot)
+            self.room_states.discard(room_code)
+            self.replay.discard(room_code)
+            self.resume_tokens.revoke_room(room_code)
+            await self._sync_channels((room_code,), ())
+
+        return redirected
+
+    async def send_to_user(self, user_id: str, message: dict) -> bool:
+        """
+        Envoie un message direct à un utilisateur, quel que soit son worker - NOUVEAU
+
+        Returns:
+            True si l'utilisateur est connecté à ce worker (sinon le message est publié)
+        """
+        record = self._user_record(user_id)
+        if record is not None:
+            return await self._send_to_connection(record.websocket, message)
+
+        await self._publish(self._user_channel(user_id), {
+            "kind": "user",
+            "user_id": user_id,
+            "message": message
+        })
+        return False
 
-            elif message_type == "heartbeat":
-                # Répondre au heartbeat
-                await self._send_to_connection(websocket, {
-                    "type": "heartbeat_ack",
-                    "data": {
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "user_id": user_id,
-                        "room_code": room_code
-                    }
-                })
+    async def send_personal_message(self, room_code: str, user_id: str, message: dict) -> bool:
+        """Message direct à un joueur d'une room (NotificationService) - NOUVEAU"""
+        return await self.send_to_user(user_id, message)
 
-            elif message_type == "join_game_room":
-                # Déjà géré dans connect(), mais confirmer
+    async def handle_message(self, websocket: WebSocket, message: Union[InboundMessage, dict]):
+        """Traite un message reçu d'un client - NOUVEAU: table de dispatch (message déjà validé)"""
+        try:
+            if isinstance(message, dict):
+                message = self.dispatcher.validate(message)
+
+            record = self._record(websocket)
+            if record is None or not record.user_id or not record.room:
+                logger.warning("⚠️ Message sans user_id ou room_code")
                 await self._send_to_connection(websocket, {
-                    "type": "room_joined",
-                    "data": {
-                        "room_code": room_code,
-                        "status": "joined",
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }
+                    "type": "error",
+                    "data": {"message": "Session invalide, reconnectez-vous"}
                 })
+                return
 
-            elif message_type == "leave_game_room":
-                await self.disconnect(websocket)
+            logger.debug(f"📨 Message {message.type} de {record.username} dans {record.room}")
 
-            elif message_type == "ping":
-                # Répondre au ping pour mesurer la latence
-                await self._send_to_connection(websocket, {
-                    "type": "pong",
-                    "data": {
-                        "timestamp": data.get("timestamp", datetime.now().timestamp()),
-                        "server_timestamp": datetime.now().timestamp()
-                    }
-                })
+            # Tout message reçu prouve que la connexion est vivante
+            self.heartbeats.touch(websocket)
+            self.session_writer.heartbeat(record.session_id)
+
+            # NOUVEAU: Limitation de débit avant toute diffusion
+            retry_after = self.rate_limiter.check(record, message.type, record.room)
+            if retry_after:
+                self.traffic.rejected_messages += 1
+                await self._reject_throttled(websocket, message.type, retry_after)
+                return
 
-            else:
-                logger.info(f"📝 Message type non géré: {message_type}")
+            await self.dispatcher.dispatch(message, websocket, record)
+
+        except WebSocketMessageError as e:
+            await self.send_error(websocket, e.details.get("reason", str(e)))
 
         except Exception as e:
             logger.error(f"❌ Erreur traitement message: {e}")
@@ -325,6 +833,91 @@ class MultiplayerWebSocketManager:
             except:
                 pass
 
+    async def _reject_throttled(self, websocket: WebSocket, message_type: str, retry_after: float):
+        """Message refusé par la limitation de débit - NOUVEAU"""
+        if self.rate_limiter.category_of(message_type) in websocket_config.RATE_LIMIT_SILENT_CATEGORIES:
+            return
+        try:
+            await self._send_to_connection(websocket, {
+                "type": "error",
+                "data": {
+                    "message": "Trop de messages, veuillez ralentir",
+                    "code": "rate_limited",
+                    "message_type": message_type,
+                    "retry_after": round(retry_after, 3)
+                }
+            })
+        except Exception:
+            pass
+
+    # === HANDLERS DES MESSAGES CLIENT (NOUVEAU: un handler par type enregistré) ===
+
+    def _register_message_handlers(self):
+        """Types de messages acceptés et schéma de leur champ `data`"""
+        self.dispatcher.add("chat_message", self._on_chat_message, ChatMessagePayload)
+        self.dispatcher.add("heartbeat", self._on_heartbeat)
+        self.dispatcher.add("ping", self._on_ping, PingPayload)
+        self.dispatcher.add("join_game_room", self._on_join_game_room)
+        self.dispatcher.add("leave_game_room", self._on_leave_game_room)
+        self.dispatcher.add("game_state_request", self._on_game_state_request)
+        self.dispatcher.compile()
+
+    async def _on_chat_message(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        """CORRECTION: Diffuser le message de chat à TOUS dans la room (texte déjà nettoyé et tronqué)"""
+        await self.broadcast_to_room(record.room, {
+            "type": "chat_broadcast",
+            "data": {
+                "message_id": f"msg_{datetime.now().timestamp()}_{record.user_id}",
+                "user_id": record.user_id,
+                "username": record.username,
+                "message": data["message"],
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "type": "user",
+                "room_code": record.room,
+                "is_creator": data.get("is_creator", False)
+            }
+        })
+        logger.info(f"💬 Message chat diffusé par {record.username} dans {record.room}")
+
+    async def _on_heartbeat(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        await self._send_to_connection(websocket, {
+            "type": "heartbeat_ack",
+            "data": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "user_id": record.user_id,
+                "room_code": record.room
+            }
+        })
+
+    async def _on_ping(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        """Répondre au ping pour mesurer la latence"""
+        await self._send_to_connection(websocket, {
+            "type": "pong",
+            "data": {
+                "timestamp": data.get("timestamp", datetime.now().timestamp()),
+                "server_timestamp": datetime.now().timestamp()
+            }
+        })
+
+    async def _on_join_game_room(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        """Déjà géré dans connect(), mais confirmer"""
+        await self._send_to_connection(websocket, {
+            "type": "room_joined",
+            "data": {
+                "room_code": record.room,
+                "status": "joined",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+        })
+
+    async def _on_leave_game_room(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        await self.disconnect(websocket)
+
+    async def _on_game_state_request(self, websocket: WebSocket, record: ConnectionRecord, data: dict):
+        """Le client a détecté un trou de séquence"""
+        snapshot = self.room_states.snapshot(record.room) or {"seq": 0, "state": None}
+        await self._send_state_snapshot(websocket, record.room, snapshot)
+
     # NOUVELLES MÉTHODES: Pour diffuser les événements de jeu
 
     async def broadcast_attempt(self, room_code: str, attempt_data: dict):
@@ -339,15 +932,68 @@ class MultiplayerWebSocketManager:
         logger.info(f"🎯 Tentative diffusée dans {room_code}: {attempt_data.get('username', 'Joueur')}")
 
     async def broadcast_game_state(self, room_code: str, game_state: dict):
-        """Diffuse l'état du jeu mis à jour - NOUVEAU"""
-        await self.broadcast_to_room(room_code, {
-            "type": "game_state_update",
+        """
+        Diffuse l'état du jeu mis à jour sous forme de delta versionné
+
+        Les clients reçoivent un game_state_delta (opérations JSON Patch, seq, base_seq) ;
+        le tout premier état d'une room part en game_state_snapshot. Un client qui
+        constate base_seq différent de sa séquence envoie game_state_request.
+        """
+        # NOUVEAU: Chaque worker calcule ses deltas pour ses propres connexions
+        await self._publish(self._room_channel(room_code), {
+            "kind": "state",
+            "room_code": room_code,
+            "state": game_state
+        })
+        await self._apply_game_state(room_code, game_state)
+
+    async def _apply_game_state(self, room_code: str, game_state: dict):
+        """Met à jour l'état versionné local et diffuse le delta aux connexions du worker"""
+        # Seules les rooms avec des connexions locales (ou en attente de reprise) conservent un état
+        if not self._has_room(room_code) and not self.replay.is_retained(room_code):
+            self.room_states.discard(room_code)
+            return
+
+        delta = self.room_states.update(room_code, game_state)
+        if delta is None:
+            return
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+        if delta["ops"] is None:
+            await self._broadcast_local(room_code, {
+                "type": "game_state_snapshot",
+                "data": {
+                    "room_code": room_code,
+                    "seq": delta["seq"],
+                    "state": game_state,
+                    "timestamp": timestamp
+                }
+            })
+        else:
+            await self._broadcast_local(room_code, {
+                "type": "game_state_delta",
+                "data": {
+                    "room_code": room_code,
+                    "seq": delta["seq"],
+                    "base_seq": delta["base_seq"],
+                    "ops": delta["ops"],
+                    "timestamp": timestamp
+                }
+            })
+        logger.debug(f"🔄 État de jeu diffusé dans {room_code} (seq {delta['seq']})")
+
+    async def _send_state_snapshot(self, websocket: WebSocket, room_code: str, snapshot: dict):
+        """Envoie un snapshot complet de l'état à une connexion - NOUVEAU"""
+        await self._send_to_connection(websocket, {
+            "type": "game_state_snapshot",
             "data": {
-                **game_state,
+                "room_code": room_code,
+                "seq": snapshot["seq"],
+                "state": snapshot["state"],
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
         })
-        logger.info(f"🔄 État de jeu diffusé dans {room_code}")
 
     async def broadcast_game_started(self, room_code: str, game_data: dict):
         """Diffuse le démarrage d'une partie - NOUVEAU"""
@@ -382,29 +1028,120 @@ class MultiplayerWebSocketManager:
         })
         logger.info(f"🔄 Régénération mastermind diffusée dans {room_code}")
 
+    # EXPIRATION DES HEARTBEATS
+
+    def start_heartbeat_sweeper(self):
+        """Démarre la tâche de balayage des heartbeats - NOUVEAU"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_sweeper())
+
+    async def stop_heartbeat_sweeper(self):
+        """Arrête la tâche de balayage des heartbeats - NOUVEAU"""
+        task, self._heartbeat_task = self._heartbeat_task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat_sweeper(self):
+        """Ferme les connexions sans message depuis WS_CONNECTION_TIMEOUT - seules les échéances dues sont visitées"""
+        while True:
+            await asyncio.sleep(websocket_config.HEARTBEAT_WHEEL_RESOLUTION)
+            try:
+                await self._prune_resume_state()
+
+                for websocket in self.heartbeats.expire():
+                    record = self._record(websocket)
+                    if record is None:
+                        continue
+
+                    self.stats["heartbeat_timeouts"] += 1
+                    logger.info(f"💤 Connexion expirée (heartbeat): {record.username or 'Joueur'}")
+
+                    await self.disconnect(websocket)
+                    try:
+                        await websocket.close(
+                            code=websocket_config.HEARTBEAT_TIMEOUT_CLOSE_CODE,
+                            reason="Heartbeat timeout"
+                        )
+                    except Exception:
+                        pass
+            except Exception as e:
+                logger.error(f"❌ Erreur balayage heartbeats: {e}")
+
+    async def _prune_resume_state(self):
+        """Oublie les tampons et jetons dont la fenêtre de reprise est écoulée - NOUVEAU"""
+        self.resume_tokens.prune()
+        expired = self.replay.prune()
+        if not expired:
+            return
+
+        for room_code in expired:
+            if not self._has_room(room_code):
+                self.room_states.discard(room_code)
+        await self._sync_channels(expired, ())
+
     # MÉTHODES UTILITAIRES
 
     def get_room_stats(self, room_code: str) -> dict:
         """Statistiques d'une room - COMPLET"""
-        connections = self.room_connections.get(room_code, set())
-        users = [self.connection_users.get(ws, "unknown") for ws in connections]
-        usernames = [self.connection_usernames.get(ws, "Joueur") for ws in connections]
+        records = self._room_records(room_code)
 
         return {
             "room_code": room_code,
-            "connected_players": len(connections),
-            "users": users,
-            "usernames": usernames,
-            "is_active": len(connections) > 0
+            "connected_players": self.registry.room_size(SCOPE_MULTIPLAYER, room_code),
+            "users": [record.user_id or "unknown" for record in records],
+            "usernames": [record.username or "Joueur" for record in records],
+            "is_active": len(records) > 0,
+            "outbound": {
+                record.user_id or "unknown": record.outbound.get_stats() if record.outbound else None
+                for record in records
+            }
+        }
+
+    def get_metrics(self) -> dict:
+        """
+        Métriques de présence et de trafic - NOUVEAU: O(1)
+
+        Jauges du registre et compteurs maintenus au fil des événements : rien n'est
+        recalculé à la lecture, quel que soit le nombre de connexions ou de rooms.
+        """
+        return {
+            "connections": self.registry.count(SCOPE_MULTIPLAYER),
+            "authenticated_connections": self.registry.authenticated_count(SCOPE_MULTIPLAYER),
+            "users": self.registry.user_count(SCOPE_MULTIPLAYER),
+            "rooms": self.registry.room_count(SCOPE_MULTIPLAYER),
+            "codecs": self.registry.codec_counts(SCOPE_MULTIPLAYER),
+            "messages_broadcast": self.stats["messages_sent"],
+            "heartbeat_timeouts": self.stats["heartbeat_timeouts"],
+            **self.traffic.to_dict(),
+            "outbound": self.outbound_totals.to_dict()
         }
 
     def get_global_stats(self) -> dict:
         """Statistiques globales - NOUVEAU"""
+        codecs = self.registry.codec_counts(SCOPE_MULTIPLAYER)
+
         return {
             **self.stats,
-            "active_rooms": len(self.room_connections),
-            "total_active_connections": sum(len(conns) for conns in self.room_connections.values()),
-            "rooms": {room: len(conns) for room, conns in self.room_connections.items()}
+            "active_rooms": self.registry.room_count(SCOPE_MULTIPLAYER),
+            "total_active_connections": self.registry.count(SCOPE_MULTIPLAYER),
+            "rooms": {
+                room: self.registry.room_size(SCOPE_MULTIPLAYER, room)
+                for room in self.registry.rooms(SCOPE_MULTIPLAYER)
+            },
+            "outbound": self.outbound_totals.to_dict(),
+            "traffic": self.traffic.to_dict(),
+            "broadcast_batching": self.broadcast_scheduler.get_stats(),
+            "codecs": codecs,
+            "broker": self.broker.get_stats() if self.broker else None,
+            "replay": self.replay.get_stats(),
+            "dispatch": self.dispatcher.get_stats(),
+            "rate_limit": self.rate_limiter.get_stats(),
+            "resume_tokens": len(self.resume_tokens),
+            "sessions": self.session_writer.get_stats()
         }
 
     async def send_system_message(self, room_code: str, message: str):
@@ -430,7 +1167,15 @@ multiplayer_ws_manager = MultiplayerWebSocketManager()
 async def initialize_multiplayer_websocket():
     """Initialise le gestionnaire WebSocket multijoueur"""
     logger.info("🌐 Initialisation du gestionnaire WebSocket multijoueur")
-    # Toute initialisation spéciale si nécessaire
+    multiplayer_ws_manager.start_heartbeat_sweeper()
+    multiplayer_ws_manager.session_writer.start()
+
+    # NOUVEAU: Diffusion entre workers (WS_BROKER_BACKEND)
+    if ws_broker is not None:
+        await ws_broker.start()
+        await multiplayer_ws_manager.attach_broker(ws_broker)
+        logger.info(f"📮 Courtier WebSocket actif: {ws_broker.backend} (worker {ws_broker.worker_id})")
+
     return multiplayer_ws_manager
 
 
@@ -439,20 +1184,35 @@ async def cleanup_multiplayer_websocket():
     """Nettoie le gestionnaire WebSocket multijoueur"""
     logger.info("🧹 Nettoyage du gestionnaire WebSocket multijoueur")
 
-    # Fermer toutes les connexions actives
-    for room_code, connections in multiplayer_ws_manager.room_connections.items():
-        for websocket in connections.copy():
-            try:
-                await websocket.close(code=1001, reason="Server shutdown")
-            except:
-                pass
+    await multiplayer_ws_manager.stop_heartbeat_sweeper()
+    await multiplayer_ws_manager.broadcast_scheduler.flush_all()
+
+    if multiplayer_ws_manager.broker is not None:
+        await multiplayer_ws_manager.detach_broker()
+        await ws_broker.stop()
 
-    # Vider tous les mappings
-    multiplayer_ws_manager.room_connections.clear()
-    multiplayer_ws_manager.connection_rooms.clear()
-    multiplayer_ws_manager.connection_users.clear()
-    multiplayer_ws_manager.connection_usernames.clear()
-    multiplayer_ws_manager.user_room_mapping.clear()
-    multiplayer_ws_manager.user_websockets.clear()
+    records = list(multiplayer_ws_manager.registry.connections(SCOPE_MULTIPLAYER))
+
+    # Fermer toutes les connexions actives
+    for record in records:
+        try:
+            await record.websocket.close(code=1001, reason="Server shutdown")
+        except:
+            pass
+
+    # Arrêter les tâches d'écriture
+    for record in records:
+        if record.outbound is not None:
+            await record.outbound.close()
+
+    # NOUVEAU: Dernier lot de sessions (toutes marquées déconnectées)
+    for record in records:
+        multiplayer_ws_manager.session_writer.close(
+            record.session_id, messages_sent=record.outbound.sent if record.outbound else 0
+        )
+    await multiplayer_ws_manager.session_writer.stop()
+
+    # Vider le registre
+    multiplayer_ws_manager.registry.clear(SCOPE_MULTIPLAYER)
 
     logger.info("✅ Nettoyage WebSocket multijoueur terminé")
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""
+File de notifications temps réel vidée par un pool de tâches
+NOUVEAU: Les appels notify_* ne font plus la livraison eux-mêmes : ils déposent la
+notification dans une file bornée et rendent la main immédiatement. Les notifications
+en attente sont regroupées par destinataire (room ou utilisateur) ; une tâche du pool
+prend toutes celles d'un destinataire et les livre en une seule trame groupée.
+
+Un destinataire n'est jamais traité par deux tâches à la fois : l'ordre des
+notifications d'une même room est conservé. Sous charge, les notifications
+s'accumulent pendant que leur destinataire attend son tour, ce qui augmente
+naturellement la taille des lots.
+
+NOUVEAU: Chaque type de notification appartient à une voie de priorité (événements
+critiques, jeu, chat, informations). Les tâches choisissent la prochaine voie par
+tourniquet pondéré : un salon bavard ou une annonce envoyée à toutes les rooms ne
+retarde plus game_finished. Quand la file se remplit, les voies basses sont
+échantillonnées puis abandonnées en premier. L'ordre est garanti au sein d'une voie.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# File d'attente : (voie, "room" ou "user", room_code ou user_id)
+Key = Tuple[str, str, str]
+DeliverFunction = Callable[[str, List["QueuedNotification"]], Awaitable[None]]
+
+TARGET_ROOM = "room"
+TARGET_USER = "user"
+
+
+class OverflowPolicy(str, Enum):
+    """Comportement quand la file est pleine"""
+    DROP_OLDEST = "drop_oldest"  # la plus ancienne notification en attente est abandonnée
+    DROP_NEW = "drop_new"  # la nouvelle notification est refusée
+
+    @classmethod
+    def parse(cls, value: Any) -> "OverflowPolicy":
+        try:
+            return cls(value)
+        except ValueError:
+            logger.warning(f"⚠️ Politique de débordement inconnue '{value}', drop_oldest utilisée")
+            return cls.DROP_OLDEST
+
+
+class LaneConfig(NamedTuple):
+    """Voie de priorité"""
+    name: str
+    weight: int  # part des livraisons quand plusieurs voies attendent
+    shed_at: Optional[float] = None  # remplissage (0-1) à partir duquel la voie est échantillonnée
+    slo_ms: Optional[float] = None  # latence visée (mise en file -> livraison)
+
+
+# Voie unique utilisée quand aucune voie n'est configurée
+DEFAULT_LANES = (LaneConfig("default", 1),)
+
+
+class _Lane:
+    """État d'une voie : destinataires prêts, tourniquet pondéré et statistiques"""
+
+    __slots__ = (
+        "name", "rank", "weight", "shed_at", "slo", "ready", "current", "sample_credit", "depth",
+        "enqueued", "delivered", "dropped", "sampled_out", "batches", "errors",
+        "total_latency", "max_latency", "within_slo"
+    )
+
+    def __init__(self, config: LaneConfig, rank: int):
+        self.name = config.name
+        self.rank = rank  # 0 = plus prioritaire
+        self.weight = max(1, int(config.weight))
+        self.shed_at = config.shed_at
+        self.slo = config.slo_ms / 1000 if config.slo_ms else None
+        self.ready: Deque[Key] = deque()
+        self.current = 0
+        self.sample_credit = 0.0
+        self.depth = 0
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.batches = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.within_slo = 0
+
+    def admit(self, fill: float) -> bool:
+        """
+        Échantillonnage au-delà du seuil : la proportion conservée décroît
+        linéairement de 1 (au seuil) à 0 (file pleine). Déterministe (crédit cumulé).
+        """
+        if self.shed_at is None or fill < self.shed_at:
+            return True
+        keep = (1.0 - fill) / (1.0 - self.shed_at) if self.shed_at < 1.0 else 0.0
+        self.sample_credit += max(0.0, min(1.0, keep))
+        if self.sample_credit >= 1.0:
+            self.sample_credit -= 1.0
+            return True
+        self.sampled_out += 1
+        return False
+
+    def record_latency(self, latency: float) -> None:
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+        if self.slo is None or latency <= self.slo:
+            self.within_slo += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        processed = self.delivered + self.errors
+        return {
+            "weight": self.weight,
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "batches": self.batches,
+            "avg_latency_ms": round(self.total_latency / processed * 1000, 3) if processed else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+            "slo_ms": round(self.slo * 1000, 3) if self.slo else None,
+            "within_slo_ratio": round(self.within_slo / processed, 4) if processed else 1.0
+        }
+
+
+class QueuedNotification:
+    """Notification en attente de livraison"""
+
+    __slots__ = ("message", "exclude_user", "enqueued_at")
+
+    def __init__(self, message: Dict[str, Any], exclude_user: Optional[str] = None):
+        self.message = message
+        self.exclude_user = exclude_user
+        self.enqueued_at = time.monotonic()
+
+
+class NotificationDispatcher:
+    """File bornée regroupée par destinataire, vidée par `workers` tâches"""
+
+    def __init__(
+            self,
+            deliver_room: DeliverFunction,
+            deliver_user: DeliverFunction,
+            max_size: int = 10000,
+            workers: int = 4,
+            max_batch: int = 50,
+            policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+            lanes: Sequence[LaneConfig] = DEFAULT_LANES,
+            lane_types: Optional[Mapping[str, str]] = None,
+            default_lane: Optional[str] = None
+    ):
+        """
+        Args:
+            deliver_room: Livre un lot de notifications à une room
+            deliver_user: Livre un lot de notifications à un utilisateur
+            max_size: Nombre maximum de notifications en attente (toutes destinations)
+            workers: Nombre de tâches de livraison
+            max_batch: Nombre maximum de notifications par lot
+            policy: Politique appliquée quand la file est pleine
+            lanes: Voies de priorité, de la plus prioritaire à la moins prioritaire
+            lane_types: Voie de chaque type de notification
+            default_lane: Voie des types non listés (par défaut la dernière)
+        """
+        self._deliver = {TARGET_ROOM: deliver_room, TARGET_USER: deliver_user}
+        self.max_size = max(1, int(max_size))
+        self.worker_count = max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.policy = OverflowPolicy.parse(policy)
+
+        # Voies de priorité (ordre = priorité) et classement des types
+        self._lanes: List[_Lane] = [_Lane(config, rank) for rank, config in enumerate(lanes or DEFAULT_LANES)]
+        self._lanes_by_name: Dict[str, _Lane] = {lane.name: lane for lane in self._lanes}
+        self._lane_types: Dict[str, str] = dict(lane_types or {})
+        self._default_lane = self._lanes_by_name.get(default_lane) or self._lanes[-1]
+
+        # Notifications en attente par (voie, destinataire) ; chaque voie a ses destinataires prêts (FIFO)
+        self._pending: Dict[Key, Deque[QueuedNotification]] = {}
+        self._active: set = set()  # files en cours de livraison
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self.depth = 0
+
+        # Statistiques
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches = 0
+        self.delivery_errors = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    # === CYCLE DE VIE ===
+
+    def start(self) -> None:
+        """Démarre le pool de tâches (boucle asyncio requise)"""
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._run()))
+
+    async def stop(self, drain_timeout: float = 1.0) -> None:
+        """Laisse `drain_timeout` secondes pour vider la file puis arrête le pool"""
+        deadline = time.monotonic() + drain_timeout
+        while self.depth and self._workers and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        for task in workers:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._workers)
+
+    # === PRODUCTION (synchrone, jamais bloquante) ===
+
+    def lane_of(self, message_type: Optional[str]) -> str:
+        """Voie d'un type de notification"""
+        return self._lane_for(message_type).name
+
+    def _lane_for(self, message_type: Optional[str]) -> _Lane:
+        return self._lanes_by_name.get(self._lane_types.get(message_type), self._default_lane)
+
+    def submit_room(self, room_code: str, message: Dict[str, Any], exclude_user: Optional[str] = None) -> bool:
+        """Met en file une notification pour une room ; False si elle a été refusée"""
+        return self._submit(TARGET_ROOM, room_code, QueuedNotification(message, exclude_user))
+
+    def submit_user(self, user_id: str, message: Dict[str, Any]) -> bool:
+        """Met en file une notification personnelle ; False si elle a été refusée"""
+        return self._submit(TARGET_USER, user_id, QueuedNotification(message))
+
+    def _submit(self, kind: str, target_id: str, notification: QueuedNotification) -> bool:
+        lane = self._lane_for(notification.message.get("type"))
+
+        # Voies basses échantillonnées avant que la file ne soit pleine
+        if not lane.admit(self.depth / self.max_size):
+            return False
+
+        if self.depth >= self.max_size and not self._make_room(lane):
+            lane.dropped += 1
+            self.dropped += 1
+            return False
+
+        key = (lane.name, kind, target_id)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+            if key not in self._active:
+                lane.ready.append(key)
+        queue.append(notification)
+
+        lane.enqueued += 1
+        lane.depth += 1
+        self.enqueued += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+        if not self._workers:
+            try:
+                self.start()
+            except RuntimeError:
+                pass  # Pas de boucle active : le pool démarrera avec l'application
+        self._wakeup.set()
+        return True
+
+    def _make_room(self, incoming: _Lane) -> bool:
+        """
+        Libère une place pour une notification de la voie `incoming`
+
+        La plus ancienne notification de la voie la moins prioritaire est abandonnée ;
+        une voie plus prioritaire que `incoming` n'est jamais touchée, ni la voie
+        elle-même avec la politique drop_new.
+        """
+        for lane in reversed(self._lanes):
+            if lane.rank < incoming.rank or (lane is incoming and self.policy == OverflowPolicy.DROP_NEW):
+                return False
+            if lane.depth and self._drop_oldest(lane):
+                return True
+        return False
+
+    def _drop_oldest(self, lane: _Lane) -> bool:
+        """Abandonne la plus ancienne notification du premier destinataire prêt de la voie"""
+        key = next((ready for ready in lane.ready if self._pending.get(ready)), None)
+        if key is None:
+            return False
+        queue = self._pending[key]
+        queue.popleft()
+        if not queue:
+            del self._pending[key]
+            lane.ready.remove(key)
+        lane.depth -= 1
+        lane.dropped += 1
+        self.depth -= 1
+        self.dropped += 1
+        return True
+
+    def _next_lane(self) -> Optional[_Lane]:
+        """Tourniquet pondéré lissé entre les voies qui ont des destinataires prêts"""
+        best = None
+        total = 0
+        for lane in self._lanes:
+            if lane.ready:
+                lane.current += lane.weight
+                total += lane.weight
+                if best is None or lane.current > best.current:
+                    best = lane
+        if best is not None:
+            best.current -= total
+        return best
+
+    # === CONSOMMATION ===
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                lane = self._next_lane()
+                if lane is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                key = lane.ready.popleft()
+                queue = self._pending.get(key)
+                if not queue:
+                    self._pending.pop(key, None)
+                    continue
+
+                batch = [queue.popleft() for _ in range(min(self.max_batch, len(queue)))]
+                if not queue:
+                    del self._pending[key]
+                lane.depth -= len(batch)
+                self.depth -= len(batch)
+                self._active.add(key)
+
+                try:
+                    await self._deliver[key[1]](key[2], batch)
+                    lane.delivered += len(batch)
+                    self.delivered += len(batch)
+                except Exception as e:
+                    lane.errors += 1
+                    self.delivery_errors += 1
+                    logger.error(f"❌ Erreur livraison notifications {key[1]} {key[2]} ({lane.name}): {e}")
+                finally:
+                    self._active.discard(key)
+                    lane.batches += 1
+                    self.batches += 1
+                    now = time.monotonic()
+                    for notification in batch:
+                        latency = now - notification.enqueued_at
+                        lane.record_latency(latency)
+                        self.total_latency += latency
+                        if latency > self.max_latency:
+                            self.max_latency = latency
+
+                # Arrivées pendant la livraison : le destinataire repasse en fin de voie
+                if key in self._pending:
+                    lane.ready.append(key)
+                    self._wakeup.set()
+
+        except asyncio.CancelledError:
+            pass
+
+    # === STATISTIQUES ===
+
+    def get_stats(self) -> Dict[str, Any]:
+        processed = self.delivered + self.delivery_errors
+        return {
+            "running_workers": sum(1 for task in self._workers if not task.done()),
+            "policy": self.policy.value,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "capacity": self.max_size,
+            "pending_targets": len(self._pending),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "delivery_errors": self.delivery_errors,
+            "batches": self.batches,
+            "avg_batch_size": round(self.delivered / self.batches, 2) if self.batches else 0.0,
+            "avg_latency_ms": round(self.total_latency / processed * 1000, 3) if processed else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+            "lanes": {lane.name: lane.get_stats() for lane in self._lanes}
+        }
+
+
+__all__ = [
+    "OverflowPolicy",
+    "LaneConfig",
+    "DEFAULT_LANES",
+    "QueuedNotification",
+    "NotificationDispatcher",
+    "TARGET_ROOM",
+    "TARGET_USER"
+]
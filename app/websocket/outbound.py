@@ -0,0 +1,332 @@
+"""
+Files d'envoi WebSocket par connexion (backpressure)
+NOUVEAU: Chaque connexion possède une file bornée vidée par sa propre tâche d'écriture,
+un client lent ne bloque plus les broadcasts ni les sections critiques des gestionnaires
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+# === POLITIQUES CLIENT LENT ===
+
+class SlowConsumerPolicy(str, Enum):
+    """Politique appliquée quand la file d'envoi d'une connexion est pleine"""
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+    @classmethod
+    def parse(cls, value: Any) -> "SlowConsumerPolicy":
+        """Convertit une valeur de configuration, avec repli sur COALESCE"""
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls(str(value).strip().lower())
+        except ValueError:
+            logger.warning(f"⚠️ Politique client lent inconnue '{value}', utilisation de 'coalesce'")
+            return cls.COALESCE
+
+
+# === COMPTEURS AGRÉGÉS ===
+
+class OutboundTotals:
+    """Compteurs agrégés de toutes les files d'un gestionnaire (mis à jour en O(1))"""
+
+    __slots__ = (
+        "queues", "depth", "enqueued", "sent", "bytes_sent", "dropped", "coalesced",
+        "overflow_disconnects", "send_errors"
+    )
+
+    def __init__(self):
+        self.queues = 0
+        self.depth = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.bytes_sent = 0  # octets des trames binaires, caractères des trames texte
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflow_disconnects = 0
+        self.send_errors = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _OutboundEntry:
+    """Message en attente d'envoi (payload déjà sérialisé)"""
+
+    __slots__ = ("message_type", "payload", "enqueued_at")
+
+    def __init__(self, message_type: str, payload: Union[str, bytes]):
+        self.message_type = message_type
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+
+
+# === FILE D'ENVOI ===
+
+class OutboundQueue:
+    """
+    File d'envoi bornée d'une connexion WebSocket
+
+    Les producteurs appellent put() sans jamais attendre le réseau ; la tâche
+    d'écriture dédiée envoie les messages dans l'ordre. Quand la file est pleine,
+    la politique configurée s'applique (drop_oldest / coalesce / disconnect).
+    """
+
+    def __init__(
+            self,
+            websocket: Any,
+            max_size: int,
+            policy: SlowConsumerPolicy = SlowConsumerPolicy.COALESCE,
+            coalesce_types: Optional[Iterable[str]] = None,
+            send_timeout: float = 10.0,
+            on_failure: Optional[Callable[["OutboundQueue", str], Awaitable[None]]] = None,
+            totals: Optional[OutboundTotals] = None,
+            label: str = ""
+    ):
+        """
+        Args:
+            websocket: WebSocket cible (doit exposer send_text et send_bytes)
+            max_size: Nombre maximum de messages en attente
+            policy: Politique appliquée quand la file est pleine
+            coalesce_types: Types de messages remplaçables par une version plus récente
+            send_timeout: Délai maximum d'un envoi avant de considérer le client mort
+            on_failure: Callback appelé (hors de la tâche d'écriture) en cas d'échec ou de débordement
+            totals: Compteurs agrégés du gestionnaire propriétaire
+            label: Libellé pour les logs
+        """
+        self.websocket = websocket
+        self.max_size = max(1, int(max_size))
+        self.policy = SlowConsumerPolicy.parse(policy)
+        self.coalesce_types = frozenset(coalesce_types or ())
+        self.send_timeout = send_timeout
+        self.on_failure = on_failure
+        self.totals = totals or OutboundTotals()
+        self.label = label
+
+        self._queue: Deque[_OutboundEntry] = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closed = False
+        self._failed = False
+
+        # Compteurs par connexion
+        self.enqueued = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.send_errors = 0
+        self.max_depth = 0
+        self.last_send_latency = 0.0
+
+        self.totals.queues += 1
+
+    # === CYCLE DE VIE ===
+
+    def start(self) -> "OutboundQueue":
+        """Démarre la tâche d'écriture"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+        return self
+
+    async def close(self, drain_timeout: float = 0.0) -> None:
+        """
+        Ferme la file et arrête la tâche d'écriture
+
+        Args:
+            drain_timeout: Temps laissé au writer pour vider la file avant annulation
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+
+        writer = self._writer
+        if writer and not writer.done() and writer is not asyncio.current_task():
+            if drain_timeout > 0 and not self._failed:
+                try:
+                    await asyncio.wait_for(asyncio.shield(writer), timeout=drain_timeout)
+                except (asyncio.TimeoutError, Exception):
+                    pass
+            if not writer.done():
+                writer.cancel()
+                try:
+                    await writer
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+        self._discard_pending()
+        self.totals.queues -= 1
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    # === PRODUCTION ===
+
+    def put(self, message_type: str, payload: Union[str, bytes]) -> bool:
+        """
+        Ajoute un message sérialisé à la file (non bloquant)
+
+        Args:
+            message_type: Type du message (utilisé pour la coalescence)
+            payload: Message déjà sérialisé (texte JSON ou trame binaire)
+
+        Returns:
+            True si le message est en file, False s'il a été rejeté
+        """
+        if self._closed or self._failed:
+            return False
+
+        if len(self._queue) >= self.max_size:
+            outcome = self._make_room(message_type, payload)
+            if outcome != "append":
+                return outcome == "coalesced"
+
+        self._queue.append(_OutboundEntry(message_type, payload))
+        self.enqueued += 1
+        self.totals.enqueued += 1
+        self.totals.depth += 1
+
+        depth = len(self._queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        self._wakeup.set()
+        return True
+
+    def _make_room(self, message_type: str, payload: Union[str, bytes]) -> str:
+        """
+        Applique la politique client lent sur une file pleine
+
+        Returns:
+            "append" si une place a été libérée, "coalesced" si le message a remplacé
+            un état en attente, "rejected" si la connexion doit être fermée
+        """
+        if self.policy == SlowConsumerPolicy.DISCONNECT:
+            self.totals.overflow_disconnects += 1
+            self._fail("slow_consumer")
+            return "rejected"
+
+        if self.policy == SlowConsumerPolicy.COALESCE and message_type in self.coalesce_types:
+            # Remplacement sur place de l'état obsolète le plus récent du même type
+            for entry in reversed(self._queue):
+                if entry.message_type == message_type:
+                    entry.payload = payload
+                    self.coalesced += 1
+                    self.totals.coalesced += 1
+                    return "coalesced"
+
+        # DROP_OLDEST (et repli de COALESCE) : on privilégie d'abord les états remplaçables
+        victim = None
+        if self.coalesce_types:
+            for entry in self._queue:
+                if entry.message_type in self.coalesce_types:
+                    victim = entry
+                    break
+
+        if victim is not None:
+            self._queue.remove(victim)
+        else:
+            self._queue.popleft()
+
+        self.dropped += 1
+        self.totals.dropped += 1
+        self.totals.depth -= 1
+        return "append"
+
+    # === TÂCHE D'ÉCRITURE ===
+
+    async def _run(self) -> None:
+        """Vide la file vers le WebSocket, un message à la fois"""
+        try:
+            while True:
+                if not self._queue:
+                    if self._closed:
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                entry = self._queue.popleft()
+                self.totals.depth -= 1
+
+                if isinstance(entry.payload, bytes):
+                    send = self.websocket.send_bytes(entry.payload)
+                else:
+                    send = self.websocket.send_text(entry.payload)
+
+                try:
+                    await asyncio.wait_for(send, timeout=self.send_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.send_errors += 1
+                    self.totals.send_errors += 1
+                    logger.warning(f"⚠️ Échec envoi WebSocket {self.label}: {e!r}")
+                    self._fail("send_error")
+                    return
+
+                size = len(entry.payload)
+                self.sent += 1
+                self.bytes_sent += size
+                self.totals.sent += 1
+                self.totals.bytes_sent += size
+                self.last_send_latency = time.monotonic() - entry.enqueued_at
+
+        except asyncio.CancelledError:
+            pass
+
+    def _fail(self, reason: str) -> None:
+        """Marque la file en échec et délègue la déconnexion au gestionnaire"""
+        if self._failed:
+            return
+        self._failed = True
+        self._discard_pending()
+
+        if reason == "slow_consumer":
+            logger.warning(f"⚠️ Client lent déconnecté {self.label} (file pleine: {self.max_size})")
+
+        if self.on_failure is not None:
+            # Tâche séparée : le callback peut fermer cette file (et donc annuler le writer)
+            asyncio.get_running_loop().create_task(self.on_failure(self, reason))
+
+    def _discard_pending(self) -> None:
+        """Vide la file en maintenant les compteurs agrégés"""
+        if self._queue:
+            self.totals.depth -= len(self._queue)
+            self._queue.clear()
+
+    # === STATISTIQUES ===
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques de la file pour cette connexion"""
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "capacity": self.max_size,
+            "policy": self.policy.value,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "send_errors": self.send_errors,
+            "last_send_latency_ms": round(self.last_send_latency * 1000, 3),
+            "failed": self._failed
+        }
+
+
+__all__ = ["SlowConsumerPolicy", "OutboundTotals", "OutboundQueue"]
@@ -0,0 +1,238 @@
+"""
+Limitation de débit des messages WebSocket entrants (seaux à jetons)
+NOUVEAU: Chaque catégorie de message (chat, ping, tentatives...) dispose d'un seau
+par connexion et, pour les messages diffusés, d'un seau par room. Un seau se
+remplit paresseusement au moment du contrôle : vérifier un message coûte O(1),
+sans tâche de fond ni horodatage par message conservé.
+"""
+import time
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional
+
+# Catégorie des types de messages non listés
+DEFAULT_CATEGORY = "default"
+
+# Nombre de contrôles par room entre deux purges des seaux pleins
+_PRUNE_EVERY = 1024
+
+
+class RateLimit(NamedTuple):
+    """Débit soutenu (jetons par seconde) et rafale autorisée (capacité du seau)"""
+    rate: float
+    burst: float
+
+
+class CategoryLimits(NamedTuple):
+    """Limites d'une catégorie : par connexion et par room (None = pas de limite)"""
+    connection: Optional[RateLimit]
+    room: Optional[RateLimit] = None
+
+
+class TokenBucket:
+    """Seau à jetons rempli paresseusement"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, limit: RateLimit, now: float, cost: float = 1.0) -> float:
+        """
+        Consomme `cost` jetons si possible - O(1)
+
+        Returns:
+            0.0 si le message passe, sinon le délai (secondes) avant qu'il puisse passer
+        """
+        tokens = self.tokens + (now - self.updated) * limit.rate
+        if tokens > limit.burst:
+            tokens = limit.burst
+        self.updated = now
+
+        if tokens >= cost:
+            self.tokens = tokens - cost
+            return 0.0
+
+        self.tokens = tokens
+        return (cost - tokens) / limit.rate if limit.rate > 0 else float("inf")
+
+    def is_full(self, limit: RateLimit, now: float) -> bool:
+        return self.tokens + (now - self.updated) * limit.rate >= limit.burst
+
+
+class MessageRateLimiter:
+    """
+    Contrôle de débit par catégorie de message
+
+    Les seaux d'une connexion sont portés par son enregistrement (`rate_buckets`) et
+    disparaissent avec lui ; les seaux des rooms sont gardés ici et purgés dès
+    qu'ils sont pleins (un seau plein équivaut à un seau absent).
+    """
+
+    def __init__(
+            self,
+            limits: Mapping[str, CategoryLimits],
+            categories: Mapping[str, str],
+            enabled: bool = True,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            limits: Limites par catégorie
+            categories: Catégorie de chaque type de message (DEFAULT_CATEGORY sinon)
+            enabled: False = tout laisser passer (statistiques comprises)
+            clock: Horloge monotone
+        """
+        self.limits: Dict[str, CategoryLimits] = dict(limits)
+        self.categories: Dict[str, str] = dict(categories)
+        self.enabled = enabled
+        self.clock = clock
+
+        # catégorie -> room -> seau
+        self._room_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._room_checks = 0
+
+        # Statistiques par catégorie
+        self.allowed: Dict[str, int] = {}
+        self.throttled_connection: Dict[str, int] = {}
+        self.throttled_room: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Any, categories: Mapping[str, str]) -> "MessageRateLimiter":
+        """Construit le limiteur à partir de la configuration (WS_RATE_*)"""
+
+        def limit(rate: float, burst: float) -> Optional[RateLimit]:
+            return RateLimit(float(rate), float(burst)) if rate > 0 and burst > 0 else None
+
+        return cls(
+            limits={
+                "chat": CategoryLimits(
+                    limit(settings.WS_RATE_CHAT_PER_SECOND, settings.WS_RATE_CHAT_BURST),
+                    limit(settings.WS_RATE_CHAT_ROOM_PER_SECOND, settings.WS_RATE_CHAT_ROOM_BURST)
+                ),
+                "ping": CategoryLimits(
+                    limit(settings.WS_RATE_PING_PER_SECOND, settings.WS_RATE_PING_BURST)
+                ),
+                "attempt": CategoryLimits(
+                    limit(settings.WS_RATE_ATTEMPT_PER_SECOND, settings.WS_RATE_ATTEMPT_BURST),
+                    limit(settings.WS_RATE_ATTEMPT_ROOM_PER_SECOND, settings.WS_RATE_ATTEMPT_ROOM_BURST)
+                ),
+                DEFAULT_CATEGORY: CategoryLimits(
+                    limit(settings.WS_RATE_DEFAULT_PER_SECOND, settings.WS_RATE_DEFAULT_BURST)
+                ),
+            },
+            categories=categories,
+            enabled=settings.WS_RATE_LIMIT_ENABLED
+        )
+
+    def category_of(self, message_type: str) -> str:
+        return self.categories.get(message_type, DEFAULT_CATEGORY)
+
+    # === CONTRÔLE ===
+
+    def check(self, record: Any, message_type: str, room: Optional[str] = None) -> float:
+        """
+        Contrôle un message avant son traitement - O(1)
+
+        Args:
+            record: Enregistrement de la connexion (porte ses seaux)
+            message_type: Type du message
+            room: Room touchée par le message (seau partagé), si la catégorie en a un
+
+        Returns:
+            0.0 si le message passe, sinon le délai conseillé avant de réessayer (secondes)
+        """
+        category = self.categories.get(message_type, DEFAULT_CATEGORY)
+        if not self.enabled:
+            self.allowed[category] = self.allowed.get(category, 0) + 1
+            return 0.0
+
+        limits = self.limits.get(category)
+        if limits is None:
+            self.allowed[category] = self.allowed.get(category, 0) + 1
+            return 0.0
+
+        now = self.clock()
+        connection_bucket = None
+
+        if limits.connection is not None:
+            buckets = record.rate_buckets
+            if buckets is None:
+                buckets = record.rate_buckets = {}
+            connection_bucket = buckets.get(category)
+            if connection_bucket is None:
+                connection_bucket = buckets[category] = TokenBucket(limits.connection.burst, now)
+
+            retry_after = connection_bucket.take(limits.connection, now)
+            if retry_after:
+                self.throttled_connection[category] = self.throttled_connection.get(category, 0) + 1
+                return retry_after
+
+        if limits.room is not None and room is not None:
+            retry_after = self._take_room(category, room, limits.room, now)
+            if retry_after:
+                # Le jeton de la connexion est rendu : seule la room est saturée
+                if connection_bucket is not None:
+                    connection_bucket.tokens += 1.0
+                self.throttled_room[category] = self.throttled_room.get(category, 0) + 1
+                return retry_after
+
+        self.allowed[category] = self.allowed.get(category, 0) + 1
+        return 0.0
+
+    def _take_room(self, category: str, room: str, limit: RateLimit, now: float) -> float:
+        rooms = self._room_buckets.get(category)
+        if rooms is None:
+            rooms = self._room_buckets[category] = {}
+        bucket = rooms.get(room)
+        if bucket is None:
+            bucket = rooms[room] = TokenBucket(limit.burst, now)
+
+        self._room_checks += 1
+        if self._room_checks >= _PRUNE_EVERY:
+            self._room_checks = 0
+            self.prune(now)
+
+        return bucket.take(limit, now)
+
+    # === MAINTENANCE ===
+
+    def forget_room(self, room: str) -> None:
+        """Oublie les seaux d'une room supprimée"""
+        for rooms in self._room_buckets.values():
+            rooms.pop(room, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Supprime les seaux de room pleins ; retourne le nombre de seaux supprimés"""
+        now = self.clock() if now is None else now
+        removed = 0
+        for category, rooms in self._room_buckets.items():
+            limit = self.limits[category].room
+            full = [room for room, bucket in rooms.items() if limit is None or bucket.is_full(limit, now)]
+            for room in full:
+                del rooms[room]
+            removed += len(full)
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        categories = set(self.allowed) | set(self.throttled_connection) | set(self.throttled_room)
+        return {
+            "enabled": self.enabled,
+            "categories": {
+                category: {
+                    "allowed": self.allowed.get(category, 0),
+                    "throttled_connection": self.throttled_connection.get(category, 0),
+                    "throttled_room": self.throttled_room.get(category, 0)
+                }
+                for category in sorted(categories)
+            },
+            "room_buckets": sum(len(rooms) for rooms in self._room_buckets.values())
+        }
+
+
+__all__ = [
+    "DEFAULT_CATEGORY",
+    "RateLimit",
+    "CategoryLimits",
+    "TokenBucket",
+    "MessageRateLimiter"
+]
@@ -0,0 +1,264 @@
+"""
+Registre unique des connexions WebSocket
+NOUVEAU: Un enregistrement compact (__slots__) par connexion et des index O(1) par
+identifiant de connexion, par objet WebSocket, par utilisateur et par room. Les deux
+gestionnaires (générique et multijoueur) partagent le même registre ; chacun indexe
+ses connexions dans son propre espace (`scope`) afin que les noms de rooms ne se
+mélangent pas. Toutes les mutations sont synchrones : un connect ou un disconnect
+met à jour l'ensemble des index en une seule étape atomique pour la boucle asyncio.
+"""
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from app.websocket.codec import MessageCodec, json_codec
+
+SCOPE_GENERIC = "generic"
+SCOPE_MULTIPLAYER = "multiplayer"
+
+_EMPTY: frozenset = frozenset()
+_NO_INDEX: Dict[Any, Any] = {}
+
+
+class ConnectionRecord:
+    """État d'une connexion : identité, rooms, format des trames et file d'envoi"""
+
+    __slots__ = (
+        "connection_id", "websocket", "scope", "user_id", "username", "rooms",
+        "codec", "outbound", "session_id", "connected_at", "last_heartbeat", "rate_buckets"
+    )
+
+    def __init__(self, connection_id: Optional[str], websocket: Any, scope: str, codec: MessageCodec = json_codec):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.scope = scope
+        self.user_id: Any = None
+        self.username: Optional[str] = None
+        # Tuple : une seule room en multijoueur, quelques-unes au plus pour le gestionnaire générique
+        self.rooms: Tuple[str, ...] = ()
+        self.codec = codec
+        self.outbound = None
+        self.session_id: Optional[str] = None
+        self.connected_at = time.time()
+        self.last_heartbeat = self.connected_at
+        # Seaux à jetons par catégorie de message (créés au premier message limité)
+        self.rate_buckets: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.user_id is not None
+
+    @property
+    def is_alive(self) -> bool:
+        """Vérifie si la connexion est toujours vivante"""
+        return time.time() - self.last_heartbeat < 60  # 1 minute timeout
+
+    @property
+    def room(self) -> Optional[str]:
+        """Room courante (connexions multijoueur : une seule room)"""
+        return self.rooms[0] if self.rooms else None
+
+    def __repr__(self) -> str:
+        return f"<ConnectionRecord {self.scope}:{self.connection_id} user={self.user_id} rooms={self.rooms}>"
+
+
+class ConnectionRegistry:
+    """Index partagés des connexions de ce worker"""
+
+    def __init__(self):
+        # Index de référence : une connexion est enregistrée tant qu'elle figure dans by_socket.
+        # by_id ne contient que les connexions adressées par identifiant (gestionnaire générique)
+        self.by_socket: Dict[Any, ConnectionRecord] = {}
+        self.by_id: Dict[str, ConnectionRecord] = {}
+        # scope -> user_id -> connexions (tuple : une connexion par utilisateur en multijoueur,
+        # quelques-unes au plus en générique ; bien plus compact qu'un set par utilisateur)
+        self._users: Dict[str, Dict[Any, Tuple[ConnectionRecord, ...]]] = {}
+        # scope -> room -> connexions
+        self._rooms: Dict[str, Dict[str, Set[ConnectionRecord]]] = {}
+
+        # Jauges maintenues à chaque mutation : les lire coûte O(1)
+        self._counts: Dict[str, int] = {}
+        self._authenticated: Dict[str, int] = {}
+        self._codecs: Dict[str, Dict[str, int]] = {}
+
+    # === CYCLE DE VIE ===
+
+    def add(self, websocket: Any, scope: str, codec: MessageCodec = json_codec,
+            connection_id: Optional[str] = None) -> ConnectionRecord:
+        """Enregistre une nouvelle connexion (sans utilisateur ni room)"""
+        record = ConnectionRecord(connection_id, websocket, scope, codec)
+        if connection_id is not None:
+            self.by_id[connection_id] = record
+        self.by_socket[websocket] = record
+        self._counts[scope] = self._counts.get(scope, 0) + 1
+        codecs = self._codecs.setdefault(scope, {})
+        codecs[codec.name] = codecs.get(codec.name, 0) + 1
+        return record
+
+    def remove(self, record: Optional[ConnectionRecord]) -> Optional[ConnectionRecord]:
+        """
+        Retire une connexion de tous les index
+
+        Returns:
+            L'enregistrement retiré, ou None s'il l'était déjà (appels concurrents)
+        """
+        if record is None or not self._is_registered(record):
+            return None
+
+        del self.by_socket[record.websocket]
+        if record.connection_id is not None:
+            self.by_id.pop(record.connection_id, None)
+
+        self._unindex_user(record)
+        for room in record.rooms:
+            self._discard_room(record, room)
+        self._counts[record.scope] -= 1
+        self._codecs[record.scope][record.codec.name] -= 1
+        if record.user_id is not None:
+            self._authenticated[record.scope] -= 1
+        return record
+
+    def set_user(self, record: ConnectionRecord, user_id: Any, username: Optional[str] = None) -> None:
+        """Associe la connexion à un utilisateur"""
+        self._unindex_user(record)
+        registered = self._is_registered(record)
+        if registered and (record.user_id is None) != (user_id is None):
+            delta = 1 if user_id is not None else -1
+            self._authenticated[record.scope] = self._authenticated.get(record.scope, 0) + delta
+        record.user_id = user_id
+        record.username = username
+        if user_id is not None and registered:
+            users = self._users.setdefault(record.scope, {})
+            users[user_id] = users.get(user_id, ()) + (record,)
+
+    def join(self, record: ConnectionRecord, room: str) -> bool:
+        """Ajoute la connexion à une room ; False si elle y était déjà"""
+        if room in record.rooms or not self._is_registered(record):
+            return False
+        record.rooms = record.rooms + (room,)
+        rooms = self._rooms.setdefault(record.scope, {})
+        members = rooms.get(room)
+        if members is None:
+            members = rooms[room] = set()
+        members.add(record)
+        return True
+
+    def leave(self, record: ConnectionRecord, room: str) -> bool:
+        """Retire la connexion d'une room ; False si elle n'en était pas membre"""
+        if room not in record.rooms:
+            return False
+        record.rooms = tuple(name for name in record.rooms if name != room)
+        self._discard_room(record, room)
+        return True
+
+    # === RECHERCHES O(1) ===
+
+    def get(self, connection_id: str) -> Optional[ConnectionRecord]:
+        return self.by_id.get(connection_id)
+
+    def for_socket(self, websocket: Any) -> Optional[ConnectionRecord]:
+        return self.by_socket.get(websocket)
+
+    def in_room(self, scope: str, room: str) -> Set[ConnectionRecord]:
+        """Connexions d'une room (ensemble vivant : copier avant d'attendre)"""
+        return self._rooms.get(scope, _NO_INDEX).get(room, _EMPTY)
+
+    def for_user(self, scope: str, user_id: Any) -> Tuple[ConnectionRecord, ...]:
+        """Connexions d'un utilisateur (tuple immuable : sûr à travers les points de suspension)"""
+        return self._users.get(scope, _NO_INDEX).get(user_id, ())
+
+    def user_in_room(self, scope: str, room: str, user_id: Any) -> Optional[ConnectionRecord]:
+        """Connexion d'un utilisateur dans une room donnée"""
+        for record in self.for_user(scope, user_id):
+            if room in record.rooms:
+                return record
+        return None
+
+    def has_room(self, scope: str, room: Optional[str]) -> bool:
+        return room in self._rooms.get(scope, _NO_INDEX)
+
+    def has_user(self, scope: str, user_id: Any) -> bool:
+        return user_id in self._users.get(scope, _NO_INDEX)
+
+    def room_size(self, scope: str, room: str) -> int:
+        return len(self.in_room(scope, room))
+
+    def rooms(self, scope: str) -> Iterator[str]:
+        return iter(list(self._rooms.get(scope, _NO_INDEX)))
+
+    def users(self, scope: str) -> Iterator[Any]:
+        return iter(list(self._users.get(scope, _NO_INDEX)))
+
+    def connections(self, scope: str) -> Iterator[ConnectionRecord]:
+        return (record for record in list(self.by_socket.values()) if record.scope == scope)
+
+    def count(self, scope: Optional[str] = None) -> int:
+        if scope is None:
+            return len(self.by_socket)
+        return self._counts.get(scope, 0)
+
+    def authenticated_count(self, scope: str) -> int:
+        """Connexions associées à un utilisateur"""
+        return self._authenticated.get(scope, 0)
+
+    def codec_counts(self, scope: str) -> Dict[str, int]:
+        """Connexions par format de trames (copie, quelques entrées)"""
+        return {name: count for name, count in self._codecs.get(scope, _NO_INDEX).items() if count}
+
+    def room_count(self, scope: str) -> int:
+        return len(self._rooms.get(scope, _NO_INDEX))
+
+    def user_count(self, scope: str) -> int:
+        return len(self._users.get(scope, _NO_INDEX))
+
+    def clear(self, scope: str) -> None:
+        """Oublie toutes les connexions d'un espace (arrêt du serveur)"""
+        for record in list(self.connections(scope)):
+            self.remove(record)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.by_socket),
+            "by_scope": dict(self._counts),
+            "authenticated_by_scope": dict(self._authenticated),
+            "rooms_by_scope": {scope: len(rooms) for scope, rooms in self._rooms.items()},
+            "users_by_scope": {scope: len(users) for scope, users in self._users.items()}
+        }
+
+    # === INTERNE ===
+
+    def _is_registered(self, record: ConnectionRecord) -> bool:
+        return self.by_socket.get(record.websocket) is record
+
+    def _unindex_user(self, record: ConnectionRecord) -> None:
+        if record.user_id is None:
+            return
+        users = self._users.get(record.scope)
+        if users is None:
+            return
+        remaining = tuple(other for other in users.get(record.user_id, ()) if other is not record)
+        if remaining:
+            users[record.user_id] = remaining
+        else:
+            users.pop(record.user_id, None)
+
+    def _discard_room(self, record: ConnectionRecord, room: str) -> None:
+        rooms = self._rooms.get(record.scope)
+        members = rooms.get(room) if rooms is not None else None
+        if members is None:
+            return
+        members.discard(record)
+        if not members:
+            del rooms[room]
+
+
+# Instance globale partagée par les gestionnaires WebSocket du worker
+connection_registry = ConnectionRegistry()
+
+__all__ = [
+    "ConnectionRecord",
+    "ConnectionRegistry",
+    "connection_registry",
+    "SCOPE_GENERIC",
+    "SCOPE_MULTIPLAYER"
+]
+
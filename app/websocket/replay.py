@@ -0,0 +1,249 @@
+"""
+Reprise de session WebSocket : tampon circulaire d'événements par room
+NOUVEAU: Chaque diffusion de room reçoit un numéro `event_seq` croissant et reste
+rejouable dans un tampon borné. Un client qui se reconnecte présente son jeton de
+reprise et le dernier `event_seq` reçu : il ne reçoit que les événements manqués,
+ou un snapshot si le trou dépasse le tampon. Le tampon d'une room vidée est conservé
+pendant la fenêtre de reprise (coupure réseau de tous les joueurs).
+"""
+import secrets
+import time
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+
+# === TAMPON D'UNE ROOM ===
+
+class RoomReplayBuffer:
+    """
+    Derniers événements diffusés dans une room
+
+    `event_seq` est croissant mais pas forcément contigu côté client (événements
+    remplacés par la coalescence) : c'est un curseur de reprise, pas un détecteur
+    de trou. `epoch` change à chaque recréation du tampon (redémarrage, autre worker).
+    """
+
+    __slots__ = ("room_code", "epoch", "last_seq", "events")
+
+    def __init__(self, room_code: str, capacity: int):
+        self.room_code = room_code
+        self.epoch = uuid4().hex[:12]
+        self.last_seq = 0
+        # (event_seq, message, utilisateurs exclus)
+        self.events: deque = deque(maxlen=capacity)
+
+    def append(self, message: Dict[str, Any], excluded_users: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+        """Numérote un événement et le conserve ; retourne le message numéroté"""
+        self.last_seq += 1
+        stamped = {**message, "event_seq": self.last_seq}
+        self.events.append((self.last_seq, stamped, excluded_users))
+        return stamped
+
+    def since(self, last_seq: int, user_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Événements postérieurs à `last_seq` destinés à `user_id`
+
+        Returns:
+            Liste (éventuellement vide), ou None si le tampon ne couvre plus le trou
+        """
+        if last_seq < 0 or last_seq > self.last_seq:
+            return None
+
+        first_seq = self.events[0][0] if self.events else self.last_seq + 1
+        if last_seq < first_seq - 1:
+            return None
+
+        return [
+            message
+            for event_seq, message, excluded_users in self.events
+            if event_seq > last_seq and user_id not in excluded_users
+        ]
+
+
+# === REGISTRE DES TAMPONS ===
+
+class ReplayRegistry:
+    """Tampons de toutes les rooms du worker, avec rétention des rooms vidées"""
+
+    def __init__(self, capacity: int = 256, retention: float = 120.0):
+        self.capacity = max(0, capacity)
+        self.retention = max(0.0, retention)
+        self.buffers: Dict[str, RoomReplayBuffer] = {}
+        # room_code -> instant (monotonic) où la room s'est vidée
+        self.idle_since: Dict[str, float] = {}
+
+        # Statistiques
+        self.replayed_events = 0
+        self.replays = 0
+        self.snapshot_fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def activate(self, room_code: str) -> Optional[RoomReplayBuffer]:
+        """Une connexion locale rejoint la room : tampon créé ou rétention annulée"""
+        if not self.enabled:
+            return None
+
+        self.idle_since.pop(room_code, None)
+        buffer = self.buffers.get(room_code)
+        if buffer is None:
+            buffer = self.buffers[room_code] = RoomReplayBuffer(room_code, self.capacity)
+        return buffer
+
+    def release(self, room_code: str, now: Optional[float] = None) -> bool:
+        """
+        La dernière connexion locale a quitté la room
+
+        Returns:
+            True si le tampon est conservé pendant la fenêtre de reprise
+        """
+        if room_code not in self.buffers:
+            return False
+
+        if self.retention <= 0:
+            self.discard(room_code)
+            return False
+
+        self.idle_since[room_code] = time.monotonic() if now is None else now
+        return True
+
+    def is_retained(self, room_code: str) -> bool:
+        return room_code in self.buffers
+
+    def record(self, room_code: str, message: Dict[str, Any],
+               excluded_users: Iterable[str] = ()) -> Dict[str, Any]:
+        """Numérote un événement de room (inchangé si la room n'a pas de tampon)"""
+        buffer = self.buffers.get(room_code)
+        if buffer is None:
+            return message
+        return buffer.append(message, frozenset(excluded_users))
+
+    def position(self, room_code: str) -> Tuple[Optional[str], int]:
+        """(epoch, dernier event_seq) de la room"""
+        buffer = self.buffers.get(room_code)
+        if buffer is None:
+            return None, 0
+        return buffer.epoch, buffer.last_seq
+
+    def replay(self, room_code: str, epoch: Optional[str], last_seq: Optional[int],
+               user_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Événements manqués depuis `last_seq` dans la même époque du tampon
+
+        Returns:
+            Liste des événements à renvoyer, ou None si un snapshot est nécessaire
+        """
+        buffer = self.buffers.get(room_code)
+        if buffer is None or last_seq is None or epoch != buffer.epoch:
+            self.snapshot_fallbacks += 1
+            return None
+
+        events = buffer.since(last_seq, user_id)
+        if events is None:
+            self.snapshot_fallbacks += 1
+            return None
+
+        self.replays += 1
+        self.replayed_events += len(events)
+        return events
+
+    def discard(self, room_code: str) -> None:
+        self.buffers.pop(room_code, None)
+        self.idle_since.pop(room_code, None)
+
+    def prune(self, now: Optional[float] = None) -> List[str]:
+        """Supprime les tampons des rooms vides depuis plus que la fenêtre de reprise"""
+        now = time.monotonic() if now is None else now
+        expired = [room for room, since in self.idle_since.items() if now - since >= self.retention]
+        for room_code in expired:
+            self.discard(room_code)
+        return expired
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "retention_seconds": self.retention,
+            "rooms": len(self.buffers),
+            "idle_rooms": len(self.idle_since),
+            "buffered_events": sum(len(buffer.events) for buffer in self.buffers.values()),
+            "replays": self.replays,
+            "replayed_events": self.replayed_events,
+            "snapshot_fallbacks": self.snapshot_fallbacks
+        }
+
+
+# === JETONS DE REPRISE ===
+
+class ResumeTokenStore:
+    """
+    Jetons de reprise émis à la connexion (un par session utilisateur/room)
+
+    Un jeton reste valable tant que sa connexion est ouverte, puis pendant la
+    fenêtre de reprise après la déconnexion.
+    """
+
+    def __init__(self, window: float = 120.0):
+        self.window = max(0.0, window)
+        # jeton -> {"user_id", "room_code", "epoch", "resumes", "expires_at"}
+        self.tokens: Dict[str, Dict[str, Any]] = {}
+
+    def issue(self, user_id: str, room_code: str, epoch: Optional[str]) -> str:
+        token = secrets.token_urlsafe(24)
+        self.tokens[token] = {"user_id": user_id, "room_code": room_code, "epoch": epoch,
+                              "resumes": 0, "expires_at": None}
+        return token
+
+    def claim(self, token: Optional[str], user_id: str, room_code: str,
+              now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Reprend une session : le jeton doit appartenir au même utilisateur et à la même room
+
+        Returns:
+            L'entrée du jeton (epoch d'origine), ou None si la reprise est impossible
+        """
+        entry = self.tokens.get(token) if token else None
+        if entry is None or entry["user_id"] != user_id or entry["room_code"] != room_code:
+            return None
+
+        now = time.monotonic() if now is None else now
+        if entry["expires_at"] is not None and entry["expires_at"] <= now:
+            self.tokens.pop(token, None)
+            return None
+
+        entry["expires_at"] = None
+        entry["resumes"] += 1
+        return entry
+
+    def release(self, token: Optional[str], now: Optional[float] = None) -> None:
+        """La connexion du jeton est fermée : la fenêtre de reprise commence"""
+        entry = self.tokens.get(token) if token else None
+        if entry is None:
+            return
+        if self.window <= 0:
+            self.tokens.pop(token, None)
+            return
+        entry["expires_at"] = (time.monotonic() if now is None else now) + self.window
+
+    def revoke_room(self, room_code: str) -> None:
+        """Oublie les jetons d'une room transférée à un autre worker"""
+        for token in [token for token, entry in self.tokens.items() if entry["room_code"] == room_code]:
+            del self.tokens[token]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        expired = [
+            token for token, entry in self.tokens.items()
+            if entry["expires_at"] is not None and entry["expires_at"] <= now
+        ]
+        for token in expired:
+            del self.tokens[token]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+__all__ = ["RoomReplayBuffer", "ReplayRegistry", "ResumeTokenStore"]
@@ -0,0 +1,195 @@
+"""
+État de room versionné et encodage différentiel (JSON Patch)
+NOUVEAU: Le serveur conserve la dernière version de l'état de chaque room ; les clients
+WebSocket reçoivent des deltas (opérations RFC 6902 add/remove/replace) numérotés par
+une séquence monotone et ne demandent un snapshot complet qu'en cas de trou.
+"""
+import copy
+from typing import Any, Dict, List, Optional
+
+PatchOperation = Dict[str, Any]
+
+
+# === JSON PATCH (SOUS-ENSEMBLE RFC 6902) ===
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> List[PatchOperation]:
+    """
+    Calcule les opérations transformant `old` en `new`
+
+    Les dictionnaires sont comparés clé par clé, les listes élément par élément
+    (ajouts/retraits en fin de liste) ; toute autre différence produit un `replace`.
+
+    Args:
+        old: Document d'origine
+        new: Document cible
+        path: Pointeur JSON du nœud courant
+
+    Returns:
+        Liste d'opérations JSON Patch
+    """
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations: List[PatchOperation] = []
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child_path = f"{path}/{_escape(key)}"
+            if key not in old:
+                operations.append({"op": "add", "path": child_path, "value": value})
+            else:
+                operations.extend(make_patch(old[key], value, child_path))
+        return operations
+
+    if isinstance(old, list) and isinstance(new, list):
+        operations = []
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            operations.extend(make_patch(old_item, new_item, f"{path}/{index}"))
+        # Éléments ajoutés en fin de liste, ou retirés depuis la fin
+        for index in range(len(old), len(new)):
+            operations.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        for index in range(len(old) - 1, len(new) - 1, -1):
+            operations.append({"op": "remove", "path": f"{path}/{index}"})
+        return operations
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(document: Any, operations: List[PatchOperation]) -> Any:
+    """
+    Applique des opérations JSON Patch (add/remove/replace) à une copie du document
+
+    Args:
+        document: Document d'origine (non modifié)
+        operations: Opérations produites par make_patch
+
+    Returns:
+        Nouveau document
+    """
+    result = copy.deepcopy(document)
+
+    for operation in operations:
+        path = operation["path"]
+        if path == "":
+            result = copy.deepcopy(operation.get("value"))
+            continue
+
+        tokens = [_unescape(token) for token in path.split("/")[1:]]
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+        last = tokens[-1]
+        op = operation["op"]
+
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op == "add":
+                parent.insert(index, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                del parent[index]
+            else:
+                parent[index] = copy.deepcopy(operation["value"])
+        else:
+            if op == "remove":
+                parent.pop(last, None)
+            else:
+                parent[last] = copy.deepcopy(operation["value"])
+
+    return result
+
+
+# === ÉTAT VERSIONNÉ ===
+
+class VersionedRoomState:
+    """Dernier état connu d'une room et son numéro de séquence"""
+
+    __slots__ = ("room_code", "seq", "state")
+
+    def __init__(self, room_code: str):
+        self.room_code = room_code
+        self.seq = 0
+        self.state: Optional[Dict[str, Any]] = None
+
+    def update(self, new_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Enregistre un nouvel état
+
+        Returns:
+            Delta {"seq", "base_seq", "ops"} ; `ops` vaut None pour le tout premier état
+            (le client doit alors recevoir un snapshot) ; None si rien n'a changé
+        """
+        if self.state is None:
+            self.state = copy.deepcopy(new_state)
+            self.seq += 1
+            return {"seq": self.seq, "base_seq": self.seq - 1, "ops": None}
+
+        operations = make_patch(self.state, new_state)
+        if not operations:
+            return None
+
+        self.state = copy.deepcopy(new_state)
+        self.seq += 1
+        return {"seq": self.seq, "base_seq": self.seq - 1, "ops": operations}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Snapshot complet pour un client désynchronisé"""
+        return {"seq": self.seq, "state": self.state}
+
+
+class RoomStateRegistry:
+    """États versionnés de toutes les rooms du processus"""
+
+    def __init__(self):
+        self._rooms: Dict[str, VersionedRoomState] = {}
+
+    def update(self, room_code: str, new_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        room_state = self._rooms.get(room_code)
+        if room_state is None:
+            room_state = self._rooms[room_code] = VersionedRoomState(room_code)
+        return room_state.update(new_state)
+
+    def snapshot(self, room_code: str) -> Optional[Dict[str, Any]]:
+        room_state = self._rooms.get(room_code)
+        return room_state.snapshot() if room_state and room_state.state is not None else None
+
+    def get_seq(self, room_code: str) -> int:
+        room_state = self._rooms.get(room_code)
+        return room_state.seq if room_state else 0
+
+    def discard(self, room_code: str) -> None:
+        self._rooms.pop(room_code, None)
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+
+def merge_state_deltas(previous: Dict[str, Any], latest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fusionne deux messages game_state_delta consécutifs en attente (coalescence par tick)
+
+    Le delta résultant part de la base du plus ancien et mène à la séquence du plus récent.
+    """
+    merged_data = dict(latest["data"])
+    merged_data["base_seq"] = previous["data"]["base_seq"]
+    merged_data["ops"] = list(previous["data"]["ops"]) + list(latest["data"]["ops"])
+    return {**latest, "data": merged_data}
+
+
+__all__ = [
+    "make_patch",
+    "apply_patch",
+    "VersionedRoomState",
+    "RoomStateRegistry",
+    "merge_state_deltas"
+]
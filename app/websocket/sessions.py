@@ -0,0 +1,200 @@
+"""
+Persistance groupée des sessions WebSocket (table websocket_sessions)
+NOUVEAU: Les connexions, heartbeats et déconnexions ne déclenchent aucune requête
+SQL : l'état de chaque session est tenu en mémoire et écrit par lots (un INSERT
+... ON CONFLICT par lot) à intervalle régulier. Plusieurs heartbeats d'une même
+session entre deux écritures n'en produisent qu'une seule.
+"""
+import asyncio
+import ipaddress
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+from uuid import UUID, uuid4
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Colonnes mises à jour quand la session existe déjà (reprise, heartbeat, déconnexion)
+UPDATED_COLUMNS = (
+    "connection_id", "user_id", "game_id", "status", "ip_address", "user_agent",
+    "disconnected_at", "last_heartbeat", "messages_sent", "messages_received", "session_data"
+)
+
+
+def _as_uuid(value: Any) -> Optional[UUID]:
+    if value is None or isinstance(value, UUID):
+        return value
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _as_ip(value: Optional[str]) -> Optional[str]:
+    try:
+        return str(ipaddress.ip_address(value)) if value else None
+    except ValueError:
+        return None
+
+
+class SessionWriter:
+    """Tampon d'écriture des sessions WebSocket, vidé par lots"""
+
+    def __init__(self, flush_interval: float = 2.0, batch_size: int = 500, enabled: bool = True):
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.enabled = enabled
+
+        # session_id (jeton de reprise) -> ligne complète ; seules les lignes modifiées sont écrites
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Statistiques
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_errors = 0
+
+    # === ÉVÉNEMENTS DE SESSION ===
+
+    def open(self, session_id: str, user_id: str, room_code: str, game_id: Any = None,
+             ip_address: Optional[str] = None, user_agent: Optional[str] = None, resumes: int = 0) -> None:
+        """Connexion (ou reprise, `resumes` > 0) d'une session"""
+        if not self.enabled:
+            return
+
+        now = datetime.now(timezone.utc)
+        previous = self.rows.get(session_id)
+
+        self.rows[session_id] = {
+            "id": previous["id"] if previous else uuid4(),
+            "session_id": session_id,
+            "connection_id": uuid4().hex,
+            "user_id": _as_uuid(user_id),
+            "game_id": _as_uuid(game_id),
+            "status": "connected",
+            "ip_address": _as_ip(ip_address),
+            "user_agent": user_agent[:500] if user_agent else None,
+            "connected_at": previous["connected_at"] if previous else now,
+            "disconnected_at": None,
+            "last_heartbeat": now,
+            "messages_sent": 0,
+            "messages_received": 0,
+            "session_data": {"room_code": room_code, "resumes": resumes}
+        }
+        self.dirty.add(session_id)
+
+    def heartbeat(self, session_id: Optional[str]) -> None:
+        """Message reçu : seul l'horodatage en mémoire change jusqu'au prochain lot"""
+        row = self.rows.get(session_id) if session_id else None
+        if row is None:
+            return
+        row["last_heartbeat"] = datetime.now(timezone.utc)
+        row["messages_received"] += 1
+        self.dirty.add(session_id)
+
+    def close(self, session_id: Optional[str], status: str = "disconnected", messages_sent: int = 0) -> None:
+        """Déconnexion d'une session (la ligne quitte la mémoire après écriture)"""
+        row = self.rows.get(session_id) if session_id else None
+        if row is None:
+            return
+        row["status"] = status
+        row["disconnected_at"] = datetime.now(timezone.utc)
+        row["messages_sent"] = messages_sent
+        self.dirty.add(session_id)
+
+    # === ÉCRITURE PAR LOTS ===
+
+    async def flush(self) -> int:
+        """Écrit les sessions modifiées ; retourne le nombre de lignes écrites"""
+        async with self._flush_lock:
+            if not self.dirty:
+                return 0
+
+            session_ids = list(self.dirty)
+            self.dirty.clear()
+            # Copie : les modifications pendant l'écriture partiront au lot suivant
+            rows = [dict(self.rows[session_id]) for session_id in session_ids if session_id in self.rows]
+
+            written = 0
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    await self._write_batch(rows[start:start + self.batch_size])
+                    written += len(rows[start:start + self.batch_size])
+            except Exception as e:
+                self.flush_errors += 1
+                self.dirty.update(row["session_id"] for row in rows[written:])
+                logger.warning(f"⚠️ Échec écriture sessions WebSocket ({len(rows) - written} en attente): {e}")
+
+            # Les sessions terminées et écrites quittent la mémoire
+            for row in rows[:written]:
+                session_id = row["session_id"]
+                current = self.rows.get(session_id)
+                if current is not None and current["status"] != "connected" and session_id not in self.dirty:
+                    del self.rows[session_id]
+
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    async def _write_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """Un seul INSERT ... ON CONFLICT (session_id) DO UPDATE pour tout le lot"""
+        from sqlalchemy.dialects.postgresql import insert
+
+        from app.core.database import get_db_context
+        from app.models.multijoueur import WebSocketSession
+
+        statement = insert(WebSocketSession).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[WebSocketSession.session_id],
+            set_={column: statement.excluded[column] for column in UPDATED_COLUMNS}
+        )
+        async with get_db_context() as db:
+            await db.execute(statement)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erreur vidage sessions WebSocket: {e}")
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche périodique puis écrit les dernières sessions"""
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.enabled:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tracked_sessions": len(self.rows),
+            "pending_rows": len(self.dirty),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "flush_errors": self.flush_errors
+        }
+
+
+# Instance globale
+session_writer = SessionWriter(
+    flush_interval=settings.WS_SESSION_FLUSH_SECONDS,
+    batch_size=settings.WS_SESSION_FLUSH_BATCH,
+    enabled=settings.WS_SESSION_PERSISTENCE
+)
+
+__all__ = ["SessionWriter", "session_writer"]
@@ -480,6 +480,41 @@ CREATE TABLE IF NOT EXISTS websocket_sessions (
     CONSTRAINT ck_websocket_messages CHECK (messages_sent >= 0 AND messages_received >= 0)
 );
 
+-- === TABLE GAME_EVENT_OUTBOX (événements de jeu relayés après commit) ===
+CREATE TABLE IF NOT EXISTS game_event_outbox (
+    -- Clé primaire séquentielle : ordre de diffusion
+    id BIGSERIAL PRIMARY KEY,
+
+    -- Événement
+    room_code VARCHAR(10) NOT NULL,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+
+    -- Métadonnées temporelles
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+);
+
+-- === TABLE GAME_PLAYER_SOLUTIONS (mastermind en cours de chaque joueur) ===
+CREATE TABLE IF NOT EXISTS game_player_solutions (
+    -- Une ligne par joueur et par partie
+    game_id UUID NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    player_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+
+    -- Progression
+    mastermind_number INTEGER NOT NULL DEFAULT 1,
+    solution JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_solution JSONB DEFAULT NULL,  -- Mastermind suivant pré-généré
+
+    -- Métadonnées temporelles
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (game_id, player_id),
+    CONSTRAINT ck_player_solutions_mastermind_positive CHECK (mastermind_number >= 1),
+    CONSTRAINT ck_player_solutions_attempts_positive CHECK (attempts >= 0)
+);
+
 -- === TABLE AUDIT_LOG (identique à l'original) ===
 CREATE TABLE IF NOT EXISTS audit_log (
     -- Clé primaire UUID
@@ -596,6 +631,13 @@ CREATE INDEX IF NOT EXISTS idx_websocket_status ON websocket_sessions(status);
 CREATE INDEX IF NOT EXISTS idx_websocket_connected_at ON websocket_sessions(connected_at);
 CREATE INDEX IF NOT EXISTS idx_websocket_session_id ON websocket_sessions(session_id);
 
+-- Index Outbox des événements de jeu
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON game_event_outbox(id) WHERE delivered_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_outbox_delivered_at ON game_event_outbox(delivered_at);
+
+-- Index Solutions des joueurs
+CREATE INDEX IF NOT EXISTS idx_player_solutions_player ON game_player_solutions(player_id);
+
 -- Index Audit Log
 CREATE INDEX IF NOT EXISTS idx_audit_user_id ON audit_log(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action);
@@ -752,6 +794,9 @@ CREATE TRIGGER update_multiplayer_games_updated_at BEFORE UPDATE ON multiplayer_
 CREATE TRIGGER update_player_progress_updated_at BEFORE UPDATE ON player_progress
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_game_player_solutions_updated_at BEFORE UPDATE ON game_player_solutions
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 -- =====================================================
 -- DONNÉES INITIALES
 -- =====================================================
@@ -0,0 +1,30 @@
+-- =====================================================
+-- MIGRATION 000 : outbox des événements de jeu
+-- =====================================================
+-- game_event_outbox reçoit les événements de jeu dans la transaction de la
+-- mutation ; le relais les diffuse après commit. Précède 001 : make_attempt,
+-- start_game et leave_room_by_code y écrivent dès cette version.
+-- Idempotente : peut être rejouée sans effet de bord.
+--
+-- Usage : psql "$DATABASE_URL" -f migrations/000_game_event_outbox.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS game_event_outbox (
+    -- Clé primaire séquentielle : ordre de diffusion
+    id BIGSERIAL PRIMARY KEY,
+
+    -- Événement
+    room_code VARCHAR(10) NOT NULL,
+    event_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+
+    -- Métadonnées temporelles
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON game_event_outbox(id) WHERE delivered_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_outbox_delivered_at ON game_event_outbox(delivered_at);
+
+COMMIT;
@@ -0,0 +1,53 @@
+-- =====================================================
+-- MIGRATION 001 : settings["player_solutions"] -> game_player_solutions
+-- =====================================================
+-- Les solutions des joueurs quittent le document JSONB games.settings pour une
+-- ligne par joueur. Idempotente : peut être rejouée sans effet de bord.
+--
+-- Usage : psql "$DATABASE_URL" -f migrations/001_game_player_solutions.sql
+-- (à appliquer avec l'application arrêtée pour ne perdre aucune tentative)
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS game_player_solutions (
+    game_id UUID NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    player_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+
+    mastermind_number INTEGER NOT NULL DEFAULT 1,
+    solution JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (game_id, player_id),
+    CONSTRAINT ck_player_solutions_mastermind_positive CHECK (mastermind_number >= 1),
+    CONSTRAINT ck_player_solutions_attempts_positive CHECK (attempts >= 0)
+);
+
+CREATE INDEX IF NOT EXISTS idx_player_solutions_player ON game_player_solutions(player_id);
+
+DROP TRIGGER IF EXISTS update_game_player_solutions_updated_at ON game_player_solutions;
+CREATE TRIGGER update_game_player_solutions_updated_at BEFORE UPDATE ON game_player_solutions
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Conversion des rooms existantes (joueurs supprimés et entrées sans solution ignorés)
+INSERT INTO game_player_solutions (game_id, player_id, mastermind_number, solution, attempts)
+SELECT
+    g.id,
+    u.id,
+    GREATEST(COALESCE((entry.value ->> 'mastermind_number')::INTEGER, 1), 1),
+    entry.value -> 'solution',
+    GREATEST(COALESCE((entry.value ->> 'attempts')::INTEGER, 0), 0)
+FROM games g
+CROSS JOIN LATERAL jsonb_each(g.settings -> 'player_solutions') AS entry
+JOIN users u ON u.id::TEXT = entry.key
+WHERE jsonb_typeof(g.settings -> 'player_solutions') = 'object'
+  AND jsonb_typeof(entry.value -> 'solution') = 'array'
+ON CONFLICT (game_id, player_id) DO NOTHING;
+
+-- Le document settings ne contient plus de solutions
+UPDATE games
+SET settings = settings - 'player_solutions'
+WHERE settings ? 'player_solutions';
+
+COMMIT;
@@ -0,0 +1,10 @@
+-- =====================================================
+-- MIGRATION 002 : solution suivante pré-générée
+-- =====================================================
+-- game_player_solutions.next_solution reçoit le mastermind suivant de chaque joueur,
+-- généré en tâche de fond. Les joueurs existants sont complétés par le balayage de
+-- rattrapage (PREGEN_SWEEP_SECONDS) au démarrage de l'application.
+--
+-- Usage : psql "$DATABASE_URL" -f migrations/002_pregenerated_solutions.sql
+
+ALTER TABLE game_player_solutions ADD COLUMN IF NOT EXISTS next_solution JSONB DEFAULT NULL;
@@ -0,0 +1,178 @@
+"""
+Banc d'essai du stockage des solutions par joueur (document JSONB vs lignes étroites)
+
+Rejoue une partie multijoueur simulée (12 joueurs par défaut) et compare, pour le
+même déroulement de tentatives :
+- avant : settings["player_solutions"] dans games.settings, document entier réécrit
+  à chaque tentative (lecture-modification-écriture)
+- après : une ligne game_player_solutions par joueur, UPDATE ciblé quand la solution
+  change, compteur `attempts` écrit en différé (un lot par intervalle de flush)
+
+Mesures : nombre d'instructions d'écriture, octets de données réécrits (taille JSON
+des valeurs modifiées, hors en-têtes de tuple et index), et mises à jour perdues
+quand deux joueurs soumettent en même temps (fenêtre de concurrence simulée).
+
+Usage:
+    python scripts/bench_player_solutions.py --players 12 --attempts 15
+    python scripts/bench_player_solutions.py --json
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Dict, List, Tuple
+from uuid import uuid4
+
+COMBINATION_LENGTH = 4
+AVAILABLE_COLORS = 6
+MAX_ATTEMPTS = 10
+TOTAL_MASTERMINDS = 3
+
+
+def _solution(rng: random.Random) -> List[int]:
+    return [rng.randint(1, AVAILABLE_COLORS) for _ in range(COMBINATION_LENGTH)]
+
+
+def _base_settings() -> dict:
+    """settings d'une partie créée par MultiplayerService.create_game (hors solutions)"""
+    return {
+        "total_masterminds": TOTAL_MASTERMINDS,
+        "items_enabled": True,
+        "items_per_mastermind": 1,
+        "initial_solution": [1, 2, 3, 4],
+        "broadcast_batching": True
+    }
+
+
+def build_timeline(players: int, attempts: int, win_rate: float, seed: int) -> List[Tuple[float, str, bool]]:
+    """
+    Tentatives de la partie : (instant en secondes, joueur, tentative gagnante)
+
+    Chaque joueur soumet `attempts` tentatives espacées de 2 à 8 secondes.
+    """
+    rng = random.Random(seed)
+    timeline = []
+    for _ in range(players):
+        player_id = str(uuid4())
+        instant = rng.uniform(0, 3)
+        for _ in range(attempts):
+            instant += rng.uniform(2, 8)
+            timeline.append((instant, player_id, rng.random() < win_rate))
+    timeline.sort()
+    return timeline
+
+
+def _advance(entry: dict, is_winning: bool, rng: random.Random) -> bool:
+    """Applique une tentative à la progression du joueur ; retourne True si la solution change"""
+    entry["attempts"] += 1
+    if is_winning and entry["mastermind_number"] < TOTAL_MASTERMINDS:
+        entry.update(mastermind_number=entry["mastermind_number"] + 1, solution=_solution(rng), attempts=0)
+        return True
+    if not is_winning and entry["attempts"] >= MAX_ATTEMPTS and entry["mastermind_number"] < TOTAL_MASTERMINDS:
+        entry.update(solution=_solution(rng), attempts=0)
+        return True
+    return False
+
+
+def run_document(timeline, seed: int, window: float) -> Dict[str, int]:
+    """Avant : document settings réécrit à chaque tentative"""
+    rng = random.Random(seed)
+    settings = _base_settings()
+    settings["player_solutions"] = {
+        player_id: {"mastermind_number": 1, "solution": _solution(rng), "attempts": 0}
+        for _, player_id, _ in timeline
+    }
+
+    statements = 0
+    written = 0
+    lost = 0
+    last_write: Tuple[float, str] = (-1.0, "")
+    for instant, player_id, is_winning in timeline:
+        _advance(settings["player_solutions"][player_id], is_winning, rng)
+        statements += 1
+        written += len(json.dumps(settings))
+
+        # Deux joueurs différents dans la fenêtre : le second a lu le document avant
+        # l'écriture du premier et l'écrase (la modification du premier est perdue)
+        if instant - last_write[0] < window and last_write[1] != player_id:
+            lost += 1
+        last_write = (instant, player_id)
+
+    return {"statements": statements, "bytes": written, "lost_updates": lost}
+
+
+def run_rows(timeline, seed: int, flush_interval: float) -> Dict[str, int]:
+    """Après : lignes game_player_solutions, solutions en écriture immédiate, compteurs différés"""
+    rng = random.Random(seed)
+    rows = {
+        player_id: {"mastermind_number": 1, "solution": _solution(rng), "attempts": 0}
+        for _, player_id, _ in timeline
+    }
+
+    statements = 0
+    written = 0
+    dirty: Dict[str, int] = {}
+    next_flush = flush_interval
+
+    def flush() -> None:
+        nonlocal statements, written
+        if dirty:
+            # Un UPDATE par clé primaire (executemany) pour tout le lot
+            statements += 1
+            written += sum(len(json.dumps({"attempts": count})) for count in dirty.values())
+            dirty.clear()
+
+    for instant, player_id, is_winning in timeline:
+        while instant >= next_flush:
+            flush()
+            next_flush += flush_interval
+
+        entry = rows[player_id]
+        if _advance(entry, is_winning, rng):
+            statements += 1
+            written += len(json.dumps(entry))
+            dirty.pop(player_id, None)
+        else:
+            dirty[player_id] = entry["attempts"]
+    flush()
+
+    # Chaque joueur ne modifie que sa ligne : aucune mise à jour perdue
+    return {"statements": statements, "bytes": written, "lost_updates": 0}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai des solutions par joueur")
+    parser.add_argument("--players", type=int, default=12)
+    parser.add_argument("--attempts", type=int, default=15, help="Tentatives par joueur")
+    parser.add_argument("--win-rate", type=float, default=0.15)
+    parser.add_argument("--window", type=float, default=0.05,
+                        help="Durée lecture→écriture d'une tentative (secondes)")
+    parser.add_argument("--flush-interval", type=float, default=5.0, help="ROOM_STATE_FLUSH_SECONDS")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON brute")
+    args = parser.parse_args()
+
+    timeline = build_timeline(args.players, args.attempts, args.win_rate, args.seed)
+    results = {
+        "document": run_document(timeline, args.seed, args.window),
+        "rows": run_rows(timeline, args.seed, args.flush_interval)
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{len(timeline)} tentatives, {args.players} joueurs, fenêtre {args.window * 1000:.0f} ms\n")
+    print(f"{'stockage':<12}{'écritures':>12}{'octets':>12}{'perdues':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['statements']:>12}{result['bytes']:>12}{result['lost_updates']:>10}")
+
+    before, after = results["document"], results["rows"]
+    print(f"\nOctets réécrits : {before['bytes']} → {after['bytes']} "
+          f"({1 - after['bytes'] / before['bytes']:.0%} de moins), "
+          f"écritures : {before['statements']} → {after['statements']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
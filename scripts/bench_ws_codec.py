@@ -0,0 +1,192 @@
+"""
+Banc d'essai des codecs WebSocket (JSON texte vs MessagePack compact)
+
+Sérialise des messages représentatifs du multijoueur (tentative, chat, heartbeat,
+delta et snapshot d'état, enveloppe WebSocketMessage) avec chaque codec disponible
+et mesure, par message :
+- la taille de la trame envoyée (octets)
+- le temps CPU d'encodage (microsecondes)
+
+Usage:
+    PYTHONPATH=. python scripts/bench_ws_codec.py --iterations 20000
+    PYTHONPATH=. python scripts/bench_ws_codec.py --json
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.websocket.codec import MSGPACK_AVAILABLE, json_codec, msgpack_codec
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _participant(index: int) -> dict:
+    return {
+        "user_id": str(uuid4()),
+        "username": f"joueur_{index}",
+        "status": "active",
+        "score": 120 * index,
+        "attempts_count": index + 2,
+        "joined_at": _now(),
+        "is_ready": True,
+        "is_creator": index == 0,
+        "is_winner": False
+    }
+
+
+def build_messages() -> dict:
+    """Messages construits comme dans app/websocket/multiplayer.py et manager.py"""
+    room_code = "QX7K2P"
+    user_id = str(uuid4())
+
+    room_state = {
+        "id": str(uuid4()),
+        "room_code": room_code,
+        "name": f"Partie {room_code}",
+        "game_type": "quantum",
+        "difficulty": "medium",
+        "status": "active",
+        "max_players": 4,
+        "current_players": 4,
+        "combination_length": 4,
+        "available_colors": 6,
+        "max_attempts": 12,
+        "quantum_enabled": True,
+        "total_masterminds": 3,
+        "created_at": _now(),
+        "started_at": _now(),
+        "creator": {"id": user_id, "username": "joueur_0"},
+        "participants": [_participant(index) for index in range(4)],
+        "can_start": False,
+        "creator_present": True
+    }
+
+    return {
+        "attempt_submitted": {
+            "type": "attempt_submitted",
+            "data": {
+                "user_id": user_id,
+                "username": "joueur_0",
+                "attempt_number": 3,
+                "combination": [1, 4, 2, 6],
+                "exact_matches": 2,
+                "position_matches": 1,
+                "is_solution": False,
+                "score": 240,
+                "mastermind_number": 1,
+                "game_finished": False,
+                "player_eliminated": False,
+                "quantum_enabled": True,
+                "quantum_data": {
+                    "quantum_calculated": True,
+                    "shots_used": 1024,
+                    "position_probabilities": [0.91, 0.12, 0.48, 0.87]
+                },
+                "timestamp": _now()
+            }
+        },
+        "chat_broadcast": {
+            "type": "chat_broadcast",
+            "data": {
+                "message_id": f"msg_{time.time()}_{user_id}",
+                "user_id": user_id,
+                "username": "joueur_0",
+                "message": "Bien joué, plus que deux couleurs !",
+                "timestamp": _now(),
+                "type": "user",
+                "room_code": room_code,
+                "is_creator": True
+            }
+        },
+        "heartbeat_ack": {
+            "type": "heartbeat_ack",
+            "data": {"timestamp": _now(), "user_id": user_id, "room_code": room_code}
+        },
+        "game_state_delta": {
+            "type": "game_state_delta",
+            "data": {
+                "room_code": room_code,
+                "seq": 42,
+                "base_seq": 41,
+                "ops": [
+                    {"op": "replace", "path": "/participants/2/score", "value": 360},
+                    {"op": "replace", "path": "/participants/2/attempts_count", "value": 5}
+                ],
+                "timestamp": _now()
+            }
+        },
+        "game_state_snapshot": {
+            "type": "game_state_snapshot",
+            "data": {"room_code": room_code, "seq": 42, "state": room_state, "timestamp": _now()}
+        },
+        "envelope": {
+            # Forme de WebSocketMessage.to_dict() (gestionnaire générique)
+            "type": "player_joined",
+            "data": {"user_id": user_id, "username": "joueur_0", "room_id": room_code},
+            "timestamp": time.time(),
+            "message_id": str(uuid4())
+        }
+    }
+
+
+def measure(codec, message: dict, iterations: int) -> dict:
+    frame = codec.encode(message)
+    size = len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+
+    start = time.process_time()
+    for _ in range(iterations):
+        codec.encode(message)
+    elapsed = time.process_time() - start
+
+    return {"bytes": size, "encode_us": round(elapsed / iterations * 1e6, 2)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai des codecs WebSocket")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON brute")
+    args = parser.parse_args()
+
+    codecs = [json_codec]
+    if MSGPACK_AVAILABLE:
+        codecs.append(msgpack_codec)
+    else:
+        print("⚠️ msgpack non installé : seul le codec JSON est mesuré", file=sys.stderr)
+
+    results = {}
+    for name, message in build_messages().items():
+        results[name] = {codec.name: measure(codec, message, args.iterations) for codec in codecs}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    header = f"{'message':<22}" + "".join(f"{codec.name + ' octets':>16}{codec.name + ' µs':>14}" for codec in codecs)
+    if len(codecs) > 1:
+        header += f"{'gain':>8}"
+    print(header)
+
+    totals = {codec.name: 0 for codec in codecs}
+    for name, by_codec in results.items():
+        line = f"{name:<22}"
+        for codec in codecs:
+            line += f"{by_codec[codec.name]['bytes']:>16}{by_codec[codec.name]['encode_us']:>14}"
+            totals[codec.name] += by_codec[codec.name]["bytes"]
+        if len(codecs) > 1:
+            saving = 1 - by_codec["msgpack"]["bytes"] / by_codec["json"]["bytes"]
+            line += f"{saving:>8.0%}"
+        print(line)
+
+    if len(codecs) > 1:
+        print(f"\nTotal : {totals['json']} octets JSON → {totals['msgpack']} octets MessagePack "
+              f"({1 - totals['msgpack'] / totals['json']:.0%} de moins)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Banc d'essai du registre des connexions WebSocket (avant / après consolidation)
+
+Compare, pour N connexions réparties dans des rooms :
+- l'ancien modèle multijoueur : neuf dictionnaires parallèles indexés par WebSocket
+- l'ancien modèle générique : dataclass WebSocketConnection + trois dictionnaires
+- le registre unique (ConnectionRecord à __slots__, index par socket/utilisateur/room)
+
+Mesures :
+- mémoire retenue par connexion (tracemalloc, octets)
+- coût d'un connect (enregistrement utilisateur + room) et d'un disconnect (µs)
+
+Les WebSockets et les files d'envoi sont des objets factices créés hors mesure :
+seul le coût des structures d'indexation est compté.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_ws_registry.py --connections 20000 --room-size 4
+    PYTHONPATH=. python scripts/bench_ws_registry.py --json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+from uuid import UUID, uuid4
+
+from app.websocket.codec import json_codec
+from app.websocket.registry import SCOPE_GENERIC, SCOPE_MULTIPLAYER, ConnectionRegistry
+
+
+class _Socket:
+    """WebSocket factice (hashable par identité)"""
+
+
+# === ANCIENS MODÈLES (reproduits tels qu'avant la consolidation) ===
+
+class LegacyMultiplayer:
+    """Mappings parallèles de l'ancien MultiplayerWebSocketManager"""
+
+    def __init__(self):
+        self.room_connections: Dict[str, Set[Any]] = {}
+        self.connection_rooms: Dict[Any, str] = {}
+        self.connection_users: Dict[Any, str] = {}
+        self.connection_usernames: Dict[Any, str] = {}
+        self.user_room_mapping: Dict[str, str] = {}
+        self.user_websockets: Dict[str, Any] = {}
+        self.outbound_queues: Dict[Any, Any] = {}
+        self.connection_codecs: Dict[Any, Any] = {}
+        self.connection_sessions: Dict[Any, str] = {}
+
+    def connect(self, websocket, room_code: str, user_id: str, username: str, outbound, session_id: str):
+        if room_code not in self.room_connections:
+            self.room_connections[room_code] = set()
+        self.room_connections[room_code].add(websocket)
+        self.connection_rooms[websocket] = room_code
+        self.connection_users[websocket] = user_id
+        self.connection_usernames[websocket] = username
+        self.connection_codecs[websocket] = json_codec
+        self.user_room_mapping[user_id] = room_code
+        self.user_websockets[user_id] = websocket
+        self.outbound_queues[websocket] = outbound
+        self.connection_sessions[websocket] = session_id
+
+    def disconnect(self, websocket):
+        if websocket not in self.connection_users:
+            return
+        room_code = self.connection_rooms.pop(websocket, None)
+        user_id = self.connection_users.pop(websocket, None)
+        self.connection_usernames.pop(websocket, None)
+        self.connection_codecs.pop(websocket, None)
+        self.outbound_queues.pop(websocket, None)
+        self.connection_sessions.pop(websocket, None)
+        if room_code in self.room_connections:
+            self.room_connections[room_code].discard(websocket)
+            if not self.room_connections[room_code]:
+                del self.room_connections[room_code]
+        if self.user_websockets.get(user_id) is websocket:
+            self.user_websockets.pop(user_id, None)
+            self.user_room_mapping.pop(user_id, None)
+
+
+@dataclass
+class LegacyConnection:
+    """Ancienne dataclass WebSocketConnection (sans __slots__)"""
+    connection_id: str
+    websocket: Any
+    user_id: Optional[UUID] = None
+    username: Optional[str] = None
+    game_rooms: Set[str] = None
+    last_heartbeat: float = None
+    connected_at: float = None
+    outbound: Any = None
+    codec: Any = None
+
+    def __post_init__(self):
+        if self.game_rooms is None:
+            self.game_rooms = set()
+        if self.codec is None:
+            self.codec = json_codec
+        if self.last_heartbeat is None:
+            self.last_heartbeat = time.time()
+        if self.connected_at is None:
+            self.connected_at = time.time()
+
+
+class LegacyGeneric:
+    """Dictionnaires de l'ancien WebSocketManager"""
+
+    def __init__(self):
+        self.connections: Dict[str, LegacyConnection] = {}
+        self.user_connections: Dict[UUID, Set[str]] = {}
+        self.game_rooms: Dict[str, Set[str]] = {}
+
+    def connect(self, websocket, room_id: str, user_id: UUID, username: str, outbound) -> str:
+        connection_id = str(uuid4())
+        connection = LegacyConnection(connection_id=connection_id, websocket=websocket, outbound=outbound)
+        self.connections[connection_id] = connection
+        connection.user_id = user_id
+        connection.username = username
+        self.user_connections.setdefault(user_id, set()).add(connection_id)
+        self.game_rooms.setdefault(room_id, set()).add(connection_id)
+        connection.game_rooms.add(room_id)
+        return connection_id
+
+    def disconnect(self, connection_id: str):
+        connection = self.connections.pop(connection_id, None)
+        if not connection:
+            return
+        if connection.user_id in self.user_connections:
+            self.user_connections[connection.user_id].discard(connection_id)
+            if not self.user_connections[connection.user_id]:
+                del self.user_connections[connection.user_id]
+        for room_id in list(connection.game_rooms):
+            members = self.game_rooms.get(room_id)
+            if members is not None:
+                members.discard(connection_id)
+                if not members:
+                    del self.game_rooms[room_id]
+            connection.game_rooms.discard(room_id)
+
+
+# === SCÉNARIOS ===
+
+def _fixtures(count: int, room_size: int) -> list:
+    """(socket, room, user_id, username, file d'envoi, session) créés hors mesure"""
+    return [
+        (_Socket(), f"ROOM{index // room_size:05d}", uuid4(), f"joueur_{index}", object(), f"session_{index}")
+        for index in range(count)
+    ]
+
+
+def _scenarios():
+    """(nom, fabrique, connect(state, fixture) -> clé, disconnect(state, clé))"""
+
+    def registry_connect(scope):
+        def connect(registry, fixture):
+            websocket, room, user_id, username, outbound, session_id = fixture
+            if scope == SCOPE_GENERIC:
+                # Le gestionnaire générique adresse ses connexions par identifiant (UUID)
+                record = registry.add(websocket, scope, json_codec, connection_id=str(uuid4()))
+                registry.set_user(record, user_id, username)
+            else:
+                record = registry.add(websocket, scope, json_codec)
+                registry.set_user(record, str(user_id), username)
+            registry.join(record, room)
+            record.outbound = outbound
+            record.session_id = session_id
+            return record
+        return connect
+
+    return [
+        ("legacy_multiplayer", LegacyMultiplayer,
+         lambda state, f: state.connect(f[0], f[1], str(f[2]), f[3], f[4], f[5]) or f[0],
+         lambda state, key: state.disconnect(key)),
+        ("registry_multiplayer", ConnectionRegistry, registry_connect(SCOPE_MULTIPLAYER),
+         lambda state, record: state.remove(record)),
+        ("legacy_generic", LegacyGeneric,
+         lambda state, f: state.connect(f[0], f[1], f[2], f[3], f[4]),
+         lambda state, key: state.disconnect(key)),
+        ("registry_generic", ConnectionRegistry, registry_connect(SCOPE_GENERIC),
+         lambda state, record: state.remove(record)),
+    ]
+
+
+def measure_memory(factory, connect, fixtures: list) -> float:
+    """Octets retenus par connexion une fois toutes les connexions enregistrées"""
+    gc.collect()
+    tracemalloc.start()
+    state = factory()
+    before = tracemalloc.get_traced_memory()[0]
+    keys = [connect(state, fixture) for fixture in fixtures]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # La liste des clés appartient au banc, pas au registre
+    retained = after - before - sys.getsizeof(keys)
+    return round(retained / len(fixtures), 1)
+
+
+def measure_time(factory, connect, disconnect, fixtures: list, rounds: int) -> dict:
+    """Meilleur temps par opération sur `rounds` passages (µs)"""
+    best_connect = best_disconnect = float("inf")
+    for _ in range(rounds):
+        state = factory()
+        gc.disable()
+        start = time.perf_counter()
+        keys = [connect(state, fixture) for fixture in fixtures]
+        middle = time.perf_counter()
+        for key in keys:
+            disconnect(state, key)
+        end = time.perf_counter()
+        gc.enable()
+        best_connect = min(best_connect, middle - start)
+        best_disconnect = min(best_disconnect, end - middle)
+    return {
+        "connect_us": round(best_connect / len(fixtures) * 1e6, 3),
+        "disconnect_us": round(best_disconnect / len(fixtures) * 1e6, 3)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai du registre des connexions WebSocket")
+    parser.add_argument("--connections", type=int, default=20000)
+    parser.add_argument("--room-size", type=int, default=4, help="Connexions par room")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    fixtures = _fixtures(args.connections, args.room_size)
+    results = {}
+    for name, factory, connect, disconnect in _scenarios():
+        results[name] = {
+            "bytes_per_connection": measure_memory(factory, connect, fixtures),
+            **measure_time(factory, connect, disconnect, fixtures, args.rounds)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{args.connections} connexions, {args.room_size} par room\n")
+    print(f"{'modèle':<22}{'octets/conn':>14}{'connect µs':>14}{'disconnect µs':>16}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['bytes_per_connection']:>14}{result['connect_us']:>14}{result['disconnect_us']:>16}")
+
+    for kind in ("multiplayer", "generic"):
+        before, after = results[f"legacy_{kind}"], results[f"registry_{kind}"]
+        print(f"\n{kind} : {before['bytes_per_connection']} → {after['bytes_per_connection']} octets/conn, "
+              f"connect {before['connect_us']} → {after['connect_us']} µs, "
+              f"disconnect {before['disconnect_us']} → {after['disconnect_us']} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
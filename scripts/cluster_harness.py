@@ -0,0 +1,234 @@
+"""
+Harness multi-processus de l'affinité des rooms (anneau de hachage cohérent)
+
+Lance N processus workers qui partagent un registre FileMembership (répertoire
+temporaire), puis enchaîne :
+1. convergence : tous les workers s'accordent sur le propriétaire de chaque room
+2. panne : un worker est tué (SIGKILL) ; après expiration de son heartbeat, seules
+   ses rooms changent de propriétaire
+3. arrivée : un nouveau worker rejoint ; seules les rooms qu'il récupère bougent (~1/N)
+4. départ propre : un worker quitte le registre ; transfert sans attendre le TTL
+
+Chaque worker compte les rooms reçues / cédées à chaque changement de topologie
+(c'est là que le gestionnaire WebSocket redirige les connexions en production).
+
+Usage:
+    PYTHONPATH=. python scripts/cluster_harness.py --workers 4 --rooms 2000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import string
+import sys
+import tempfile
+import time
+
+from app.core.cluster import ClusterNode, FileMembership
+
+
+# === PROCESSUS WORKER ===
+
+async def _worker_loop(worker_id: str, directory: str, connection, room_codes, heartbeat: float, ttl: float,
+                       vnodes: int):
+    node = ClusterNode(
+        worker_id=worker_id,
+        advertise_url=f"http://{worker_id}.local:8000",
+        membership=FileMembership(directory, ttl),
+        vnodes=vnodes,
+        heartbeat_interval=heartbeat
+    )
+    owned = set()
+    handoffs = {"acquired": 0, "released": 0}
+
+    async def on_topology_change(cluster: ClusterNode):
+        nonlocal owned
+        now_owned = {room for room in room_codes if cluster.is_local(room)}
+        handoffs["acquired"] += len(now_owned - owned)
+        handoffs["released"] += len(owned - now_owned)
+        owned = now_owned
+
+    await node.start()
+    owned = {room for room in room_codes if node.is_local(room)}
+    node.add_listener(on_topology_change)
+
+    while True:
+        await asyncio.sleep(0.02)
+        if not connection.poll():
+            continue
+
+        command = connection.recv()
+        if command == "view":
+            connection.send({
+                "worker_id": worker_id,
+                "members": sorted(node.members),
+                "owners": {room: node.owner_of(room) for room in room_codes},
+                "owned": len(owned),
+                "handoffs": dict(handoffs)
+            })
+        elif command == "stop":
+            await node.stop()
+            connection.send("stopped")
+            return
+
+
+def _worker_main(*args):
+    asyncio.run(_worker_loop(*args))
+
+
+# === ORCHESTRATION ===
+
+class Harness:
+    def __init__(self, rooms, heartbeat: float, ttl: float, vnodes: int):
+        self.directory = tempfile.mkdtemp(prefix="mastermind-cluster-")
+        self.rooms = rooms
+        self.heartbeat = heartbeat
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.workers = {}
+        self._counter = 0
+
+    def spawn(self) -> str:
+        worker_id = f"worker-{self._counter}"
+        self._counter += 1
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(worker_id, self.directory, child, self.rooms, self.heartbeat, self.ttl, self.vnodes),
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = (process, parent)
+        return worker_id
+
+    def kill(self, worker_id: str) -> None:
+        process, _ = self.workers.pop(worker_id)
+        process.kill()
+        process.join()
+
+    def stop(self, worker_id: str) -> None:
+        process, connection = self.workers.pop(worker_id)
+        connection.send("stop")
+        connection.recv()
+        process.join()
+
+    def views(self) -> dict:
+        result = {}
+        for worker_id, (_, connection) in self.workers.items():
+            connection.send("view")
+            result[worker_id] = connection.recv()
+        return result
+
+    def converge(self, timeout: float) -> tuple:
+        """Attend que tous les workers vivants voient les mêmes membres et les mêmes propriétaires"""
+        expected_members = sorted(self.workers)
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            views = self.views()
+            if all(view["members"] == expected_members for view in views.values()):
+                owner_maps = [view["owners"] for view in views.values()]
+                if all(owners == owner_maps[0] for owners in owner_maps):
+                    return owner_maps[0], views, round(time.monotonic() - start, 2)
+            time.sleep(self.heartbeat / 2)
+        raise TimeoutError(f"pas de convergence en {timeout}s")
+
+    def shutdown(self) -> None:
+        for worker_id in list(self.workers):
+            self.kill(worker_id)
+
+
+def _distribution(owners: dict) -> dict:
+    counts = {}
+    for owner in owners.values():
+        counts[owner] = counts.get(owner, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def _moved(before: dict, after: dict) -> dict:
+    return {room: (before[room], after[room]) for room in before if before[room] != after[room]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Harness multi-processus de l'affinité des rooms")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--heartbeat", type=float, default=0.2, help="Intervalle de heartbeat (s)")
+    parser.add_argument("--ttl", type=float, default=1.0, help="Expiration d'un worker sans heartbeat (s)")
+    parser.add_argument("--vnodes", type=int, default=128)
+    args = parser.parse_args()
+
+    rooms = sorted({
+        "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        for _ in range(args.rooms)
+    })
+    harness = Harness(rooms, args.heartbeat, args.ttl, args.vnodes)
+    timeout = args.ttl * 10 + 5
+    report = {"rooms": len(rooms)}
+    failures = []
+
+    try:
+        for _ in range(args.workers):
+            harness.spawn()
+        owners, _, elapsed = harness.converge(timeout)
+        report["initial"] = {"converged_in_s": elapsed, "distribution": _distribution(owners)}
+
+        # 1. Panne d'un worker : seules ses rooms bougent
+        victim = sorted(harness.workers)[-1]
+        harness.kill(victim)
+        after_crash, _, elapsed = harness.converge(timeout)
+        moved = _moved(owners, after_crash)
+        victim_rooms = sum(1 for owner in owners.values() if owner == victim)
+        if any(previous != victim for previous, _ in moved.values()) or len(moved) != victim_rooms:
+            failures.append("crash: des rooms d'un worker vivant ont changé de propriétaire")
+        report["crash"] = {
+            "killed": victim,
+            "converged_in_s": elapsed,
+            "moved": len(moved),
+            "moved_fraction": round(len(moved) / len(rooms), 3),
+            "distribution": _distribution(after_crash)
+        }
+
+        # 2. Arrivée d'un worker : seules les rooms qu'il récupère bougent
+        newcomer = harness.spawn()
+        after_join, views, elapsed = harness.converge(timeout)
+        moved = _moved(after_crash, after_join)
+        if any(new_owner != newcomer for _, new_owner in moved.values()):
+            failures.append("join: des rooms ont bougé entre workers existants")
+        report["join"] = {
+            "joined": newcomer,
+            "converged_in_s": elapsed,
+            "moved": len(moved),
+            "moved_fraction": round(len(moved) / len(rooms), 3),
+            "ideal_fraction": round(1 / len(harness.workers), 3),
+            "distribution": _distribution(after_join)
+        }
+
+        # 3. Départ propre : transfert immédiat (pas d'attente du TTL)
+        leaving = sorted(harness.workers)[0]
+        harness.stop(leaving)
+        after_leave, views, elapsed = harness.converge(timeout)
+        moved = _moved(after_join, after_leave)
+        if any(previous != leaving for previous, _ in moved.values()):
+            failures.append("leave: des rooms d'un worker vivant ont changé de propriétaire")
+        report["leave"] = {
+            "left": leaving,
+            "converged_in_s": elapsed,
+            "moved": len(moved),
+            "distribution": _distribution(after_leave),
+            "handoffs": {worker_id: view["handoffs"] for worker_id, view in views.items()}
+        }
+
+    except TimeoutError as e:
+        failures.append(str(e))
+    finally:
+        harness.shutdown()
+
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn", force=True)
+    sys.exit(main())
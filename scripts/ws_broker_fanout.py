@@ -0,0 +1,157 @@
+"""
+Vérification de la diffusion WebSocket entre workers (courtier en mémoire)
+
+Simule N workers, chacun avec son MultiplayerWebSocketManager branché sur un
+InMemoryBroker partageant le même bus, répartit des clients de plusieurs rooms
+sur ces workers puis diffuse des événements depuis des workers tirés au hasard.
+Vérifie :
+- que chaque socket reçoit chaque événement de sa room exactement une fois
+- qu'aucun événement ne fuit vers une autre room
+- qu'une reconnexion sur un autre worker ferme l'ancienne connexion de l'utilisateur
+
+Usage:
+    PYTHONPATH=. python scripts/ws_broker_fanout.py --workers 4 --rooms 20 --clients-per-room 6
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from collections import Counter
+from uuid import uuid4
+
+from fastapi.websockets import WebSocketState
+
+from app.websocket.broker import InMemoryBroker, InMemoryBus
+from app.websocket.multiplayer import MultiplayerWebSocketManager
+from app.websocket.registry import SCOPE_MULTIPLAYER, ConnectionRegistry
+
+
+class RecordingWebSocket:
+    """WebSocket simulé qui mémorise les événements de test reçus"""
+
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTING
+        self.application_state = WebSocketState.CONNECTING
+        self.events = Counter()
+        self.close_code = None
+
+    async def accept(self, subprotocol=None, headers=None):
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, data: str):
+        message = json.loads(data)
+        frames = message["data"]["events"] if message.get("type") == "batch" else [message]
+        for frame in frames:
+            event_id = frame.get("data", {}).get("event_id")
+            if event_id:
+                self.events[event_id] += 1
+
+    async def send_bytes(self, data: bytes):
+        raise AssertionError("codec JSON attendu")
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.close_code = code
+        self.client_state = WebSocketState.DISCONNECTED
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+async def run(worker_count: int, rooms: int, clients_per_room: int, events_per_room: int) -> dict:
+    bus = InMemoryBus()
+    workers = []
+    for index in range(worker_count):
+        broker = InMemoryBroker(bus, worker_id=f"worker-{index}")
+        await broker.start()
+        # Un registre par worker simulé (chaque processus a le sien en production)
+        manager = MultiplayerWebSocketManager(ConnectionRegistry())
+        await manager.attach_broker(broker)
+        workers.append((manager, broker))
+
+    async def settle():
+        # Livraison du courtier puis vidage des files d'envoi
+        for _ in range(3):
+            for _, broker in workers:
+                await broker.drain()
+            await asyncio.sleep(0.01)
+
+    # Répartition des clients sur les workers
+    sockets = {}
+    for room in range(rooms):
+        room_code = f"R{room:04d}"
+        for _ in range(clients_per_room):
+            manager, _ = random.choice(workers)
+            websocket = RecordingWebSocket()
+            await manager.connect(websocket, room_code, str(uuid4()), "fanout")
+            sockets.setdefault(room_code, []).append(websocket)
+    await settle()
+
+    # Diffusion depuis des workers au hasard (y compris sans connexion locale dans la room)
+    expected = {}
+    for room_code in sockets:
+        for _ in range(events_per_room):
+            event_id = uuid4().hex
+            expected.setdefault(room_code, []).append(event_id)
+            manager, _ = random.choice(workers)
+            await manager.broadcast_to_room(room_code, {
+                "type": "chat_broadcast",
+                "data": {"event_id": event_id, "room_code": room_code}
+            })
+    await settle()
+
+    missing = duplicated = leaked = 0
+    for room_code, room_sockets in sockets.items():
+        room_events = set(expected[room_code])
+        for websocket in room_sockets:
+            for event_id in room_events:
+                count = websocket.events.get(event_id, 0)
+                missing += count == 0
+                duplicated += count > 1
+            leaked += sum(1 for event_id in websocket.events if event_id not in room_events)
+
+    # Reconnexion d'un utilisateur sur un autre worker
+    evicted = None
+    if worker_count > 1:
+        first, second = workers[0][0], workers[1][0]
+        user_id = str(uuid4())
+        old_socket, new_socket = RecordingWebSocket(), RecordingWebSocket()
+        await first.connect(old_socket, "EVICT", user_id, "fanout")
+        await settle()
+        await second.connect(new_socket, "EVICT", user_id, "fanout")
+        await settle()
+        evicted = old_socket.close_code == 1001 and not first.registry.has_user(SCOPE_MULTIPLAYER, user_id)
+
+    for manager, broker in workers:
+        await manager.detach_broker()
+        await broker.stop()
+
+    return {
+        "workers": worker_count,
+        "rooms": rooms,
+        "sockets": sum(len(room_sockets) for room_sockets in sockets.values()),
+        "events": sum(len(events) for events in expected.values()),
+        "missing": missing,
+        "duplicated": duplicated,
+        "leaked": leaked,
+        "cross_worker_eviction": evicted,
+        "brokers": [broker.get_stats() for _, broker in workers]
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Diffusion WebSocket entre workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--clients-per-room", type=int, default=6)
+    parser.add_argument("--events-per-room", type=int, default=10)
+    args = parser.parse_args()
+
+    result = await run(args.workers, args.rooms, args.clients_per_room, args.events_per_room)
+    print(json.dumps(result, indent=2))
+
+    ok = not (result["missing"] or result["duplicated"] or result["leaked"]) and result["cross_worker_eviction"] is not False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
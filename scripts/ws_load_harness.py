@@ -0,0 +1,552 @@
+"""
+Harness de charge WebSocket multijoueur : capacité d'un worker et latence de diffusion
+
+Démarre l'application ASGI dans le processus (uvicorn sur un port libre) ou vise un
+serveur local déjà lancé, crée des utilisateurs de charge et des rooms, ouvre des
+milliers de clients WebSocket authentifiés sur /api/v1/multiplayer/rooms/{room_code}/ws
+puis génère du trafic chat, heartbeat et tentatives pendant la durée demandée.
+
+Mesures (écrites en JSON pour comparer les exécutions) :
+- latence de diffusion serveur → clients (p50/p90/p99/max) : chat et tentatives
+- messages par seconde envoyés / reçus (événements dépliés des trames groupées)
+- mémoire par connexion (delta RSS entre avant et après l'ouverture des sockets)
+- retard de la boucle d'événements (sonde de sommeil de 10 ms)
+- connexions : durée d'établissement, échecs par code de fermeture
+
+En mode intégré, le serveur et les clients partagent le processus : le RSS et le
+retard de boucle incluent le coût des clients. Avec --url, passer --server-pid pour
+mesurer la mémoire du serveur ; le retard de boucle est alors celui du harness.
+
+Prérequis : PostgreSQL configuré comme pour l'application (.env). Les utilisateurs
+de charge sont insérés directement en base (préfixe lt<run>_) avec un token JWT
+signé localement ; les rooms sont créées, rejointes et démarrées via l'API REST.
+
+Usage:
+    PYTHONPATH=. python scripts/ws_load_harness.py --rooms 100 --clients-per-room 8 --duration 60 --output run.json
+    PYTHONPATH=. python scripts/ws_load_harness.py --url http://127.0.0.1:8000 --server-pid 4242 --rooms 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import socket
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from app.websocket.codec import MSGPACK_AVAILABLE, SUBPROTOCOL_JSON, SUBPROTOCOL_MSGPACK, json_codec
+
+API_PREFIX = "/api/v1"
+LOAD_PASSWORD = "LoadTest!2024"
+
+
+# === MESURES ===
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Percentiles en millisecondes d'une série de durées (secondes)"""
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+
+    def percentile(rank: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(rank * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1] * 1000, 3)
+    }
+
+
+def read_rss(pid: Optional[int] = None) -> Optional[int]:
+    """RSS en octets (/proc, Linux) ; None si indisponible"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class LoopLagProbe:
+    """Mesure le retard de la boucle d'événements : écart entre sommeil demandé et réel"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class Metrics:
+    """Compteurs partagés par tous les clients"""
+
+    def __init__(self):
+        self.connect_times: List[float] = []
+        self.connect_failures: Dict[str, int] = {}
+        self.latencies: Dict[str, List[float]] = {"chat": [], "attempt": []}
+        self.sent: Dict[str, int] = {"chat_message": 0, "heartbeat": 0, "attempt": 0}
+        self.received: Dict[str, int] = {}
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.attempt_errors = 0
+        self.unexpected_closes: Dict[str, int] = {}
+        # (room, user_id) -> instant d'envoi de la dernière tentative (une seule en vol par joueur)
+        self.attempts_in_flight: Dict[tuple, float] = {}
+        self.measuring = False
+
+    def count_failure(self, table: Dict[str, int], reason: Any):
+        key = str(reason)
+        table[key] = table.get(key, 0) + 1
+
+
+# === CLIENT DE CHARGE ===
+
+class LoadClient:
+    """Un joueur (ou spectateur) connecté en WebSocket"""
+
+    def __init__(self, user: Dict[str, Any], room_code: str, is_player: bool, codec_name: str, metrics: Metrics):
+        self.user = user
+        self.room_code = room_code
+        self.is_player = is_player
+        self.codec_name = codec_name
+        self.metrics = metrics
+        self.websocket = None
+        self.codec = json_codec
+        self.attempts = 0
+        self._reader: Optional[asyncio.Task] = None
+
+    async def open(self, ws_base: str, timeout: float) -> bool:
+        subprotocols = [SUBPROTOCOL_MSGPACK, SUBPROTOCOL_JSON] if self.codec_name == "msgpack" else [SUBPROTOCOL_JSON]
+        uri = f"{ws_base}{API_PREFIX}/multiplayer/rooms/{self.room_code}/ws?token={self.user['token']}"
+
+        start = time.perf_counter()
+        try:
+            self.websocket = await connect(uri, subprotocols=subprotocols, open_timeout=timeout,
+                                           ping_interval=None, max_size=None)
+            if self.websocket.subprotocol == SUBPROTOCOL_MSGPACK:
+                from app.websocket.codec import msgpack_codec
+                self.codec = msgpack_codec
+
+            # La connexion n'est utilisable qu'après connection_established
+            while True:
+                message = self.codec.decode(await asyncio.wait_for(self.websocket.recv(), timeout))
+                if message.get("type") == "connection_established":
+                    break
+        except ConnectionClosed as e:
+            self.metrics.count_failure(self.metrics.connect_failures, e.rcvd.code if e.rcvd else "closed")
+            return False
+        except Exception as e:
+            self.metrics.count_failure(self.metrics.connect_failures, type(e).__name__)
+            return False
+
+        self.metrics.connect_times.append(time.perf_counter() - start)
+        self._reader = asyncio.create_task(self._read())
+        return True
+
+    async def send(self, message: Dict[str, Any]):
+        await self.websocket.send(self.codec.encode(message))
+        if self.metrics.measuring:
+            self.metrics.sent[message["type"]] += 1
+
+    async def _read(self):
+        metrics = self.metrics
+        try:
+            async for frame in self.websocket:
+                received_at = time.perf_counter()
+                if not metrics.measuring:
+                    continue
+
+                metrics.frames_received += 1
+                metrics.bytes_received += len(frame)
+                message = self.codec.decode(frame)
+                events = message["data"]["events"] if message.get("type") == "batch" else [message]
+
+                for event in events:
+                    event_type = event.get("type")
+                    metrics.received[event_type] = metrics.received.get(event_type, 0) + 1
+                    data = event.get("data") or {}
+
+                    if event_type == "chat_broadcast" and data.get("user_id") != self.user["id"]:
+                        text = data.get("message", "")
+                        if text.startswith("lt:"):
+                            metrics.latencies["chat"].append(received_at - int(text[3:]) / 1e9)
+
+                    elif event_type == "attempt_submitted" and data.get("user_id") != self.user["id"]:
+                        sent_at = metrics.attempts_in_flight.get((self.room_code, data.get("user_id")))
+                        if sent_at is not None:
+                            metrics.latencies["attempt"].append(received_at - sent_at)
+
+        except ConnectionClosed as e:
+            if metrics.measuring:
+                metrics.count_failure(metrics.unexpected_closes, e.rcvd.code if e.rcvd else "closed")
+
+    async def close(self):
+        if self.websocket is not None:
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+# === TRAFIC ===
+
+async def heartbeat_loop(client: LoadClient, interval: float, deadline: float):
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.perf_counter() < deadline:
+        try:
+            await client.send({"type": "heartbeat", "data": {}})
+        except ConnectionClosed:
+            return
+        await asyncio.sleep(interval)
+
+
+async def chat_loop(client: LoadClient, rate: float, deadline: float):
+    """Messages de chat (processus de Poisson) portant l'instant d'envoi"""
+    if rate <= 0:
+        return
+    while True:
+        await asyncio.sleep(random.expovariate(rate))
+        if time.perf_counter() >= deadline:
+            return
+        try:
+            await client.send({"type": "chat_message", "data": {"message": f"lt:{time.perf_counter_ns()}"}})
+        except ConnectionClosed:
+            return
+
+
+async def attempt_loop(client: LoadClient, http: httpx.AsyncClient, rate: float, deadline: float,
+                       colors: int, length: int):
+    """Tentatives via l'API REST ; la diffusion attempt_submitted sert à mesurer la latence"""
+    if rate <= 0 or not client.is_player:
+        return
+    metrics = client.metrics
+    while True:
+        await asyncio.sleep(random.expovariate(rate))
+        if time.perf_counter() >= deadline:
+            return
+
+        key = (client.room_code, client.user["id"])
+        metrics.attempts_in_flight[key] = time.perf_counter()
+        try:
+            response = await http.post(
+                f"{API_PREFIX}/multiplayer/rooms/{client.room_code}/attempt",
+                json={"combination": [random.randint(1, colors) for _ in range(length)]},
+                headers={"Authorization": f"Bearer {client.user['token']}"}
+            )
+        except httpx.HTTPError:
+            response = None
+
+        if response is None or response.status_code != 200:
+            metrics.attempts_in_flight.pop(key, None)
+            metrics.attempt_errors += 1
+            continue
+
+        client.attempts += 1
+        metrics.sent["attempt"] += 1
+
+
+# === PRÉPARATION DES DONNÉES ===
+
+async def create_users(count: int, run_id: str) -> List[Dict[str, Any]]:
+    """Insère les utilisateurs de charge en un lot et signe leurs tokens"""
+    from app.core import database
+    from app.core.security import jwt_manager, password_manager
+    from app.models.user import User
+
+    if database.AsyncSessionLocal is None:
+        await database.init_db()
+
+    hashed_password = password_manager.get_password_hash(LOAD_PASSWORD)
+    users = [
+        User(
+            username=f"lt{run_id}_{index}",
+            email=f"lt{run_id}_{index}@load.test",
+            hashed_password=hashed_password,
+            is_active=True,
+            is_verified=True
+        )
+        for index in range(count)
+    ]
+
+    async with database.get_db_context() as db:
+        db.add_all(users)
+        await db.flush()
+        identities = [(str(user.id), user.username) for user in users]
+
+    return [
+        {"id": user_id, "username": username, "token": jwt_manager.create_access_token({"sub": user_id})}
+        for user_id, username in identities
+    ]
+
+
+async def create_rooms(http: httpx.AsyncClient, groups: List[List[Dict[str, Any]]], players_per_room: int,
+                       start_games: bool, concurrency: int) -> List[Dict[str, Any]]:
+    """Crée une room par groupe (créateur = premier utilisateur), fait rejoindre les joueurs et démarre"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def setup(group: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            creator, players = group[0], group[1:players_per_room]
+            response = await http.post(
+                f"{API_PREFIX}/multiplayer/rooms/create",
+                json={"name": f"Charge {creator['username']}", "max_players": max(2, players_per_room)},
+                headers={"Authorization": f"Bearer {creator['token']}"}
+            )
+            if response.status_code != 200:
+                return None
+            room_code = response.json()["data"]["room_code"]
+
+            for player in players:
+                await http.post(f"{API_PREFIX}/multiplayer/rooms/{room_code}/join",
+                                headers={"Authorization": f"Bearer {player['token']}"})
+
+            started = False
+            if start_games and players:
+                response = await http.post(f"{API_PREFIX}/multiplayer/rooms/{room_code}/start",
+                                           headers={"Authorization": f"Bearer {creator['token']}"})
+                started = response.status_code == 200
+
+            return {"room_code": room_code, "users": group, "players": players_per_room, "started": started}
+
+    rooms = await asyncio.gather(*(setup(group) for group in groups))
+    return [room for room in rooms if room is not None]
+
+
+# === SERVEUR INTÉGRÉ ===
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def start_inprocess_server():
+    """Lance app.main:app avec uvicorn dans la boucle courante"""
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+def _raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(needed, soft)), hard))
+
+
+# === EXÉCUTION ===
+
+async def run(args) -> Dict[str, Any]:
+    run_id = uuid4().hex[:6]
+    total_clients = args.rooms * args.clients_per_room
+    _raise_fd_limit(total_clients * 3 + 1024)
+
+    server = server_task = None
+    base_url = args.url
+    if base_url is None:
+        server, server_task, base_url = await start_inprocess_server()
+    ws_base = base_url.replace("http://", "ws://").replace("https://", "wss://")
+
+    metrics = Metrics()
+    probe = LoopLagProbe()
+    probe.start()
+    memory_pid = args.server_pid if args.url else None
+
+    report: Dict[str, Any] = {
+        "run_id": run_id,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": "inprocess" if args.url is None else base_url,
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "url")
+        }
+    }
+    clients: List[LoadClient] = []
+
+    limits = httpx.Limits(max_connections=args.setup_concurrency, max_keepalive_connections=args.setup_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as http:
+        try:
+            # 1. Utilisateurs et rooms
+            setup_start = time.perf_counter()
+            users = await create_users(total_clients, run_id)
+            groups = [users[index:index + args.clients_per_room] for index in range(0, total_clients, args.clients_per_room)]
+            rooms = await create_rooms(http, groups, min(args.players_per_room, args.clients_per_room),
+                                       args.attempt_rate > 0, args.setup_concurrency)
+            report["setup"] = {
+                "users": len(users),
+                "rooms": len(rooms),
+                "rooms_started": sum(1 for room in rooms if room["started"]),
+                "seconds": round(time.perf_counter() - setup_start, 2)
+            }
+
+            # 2. Ouverture des sockets (concurrence bornée)
+            rss_before = read_rss(memory_pid)
+            semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+            async def open_client(client: LoadClient) -> Optional[LoadClient]:
+                async with semaphore:
+                    return client if await client.open(ws_base, args.connect_timeout) else None
+
+            candidates = [
+                LoadClient(user, room["room_code"], index < room["players"] and room["started"], args.codec, metrics)
+                for room in rooms
+                for index, user in enumerate(room["users"])
+            ]
+            ramp_start = time.perf_counter()
+            clients = [client for client in await asyncio.gather(*(open_client(c) for c in candidates)) if client]
+            ramp_seconds = time.perf_counter() - ramp_start
+            await asyncio.sleep(1.0)
+            rss_after = read_rss(memory_pid)
+
+            report["connections"] = {
+                "requested": len(candidates),
+                "open": len(clients),
+                "failures": metrics.connect_failures,
+                "ramp_seconds": round(ramp_seconds, 2),
+                "connect_latency_ms": summarize(metrics.connect_times)
+            }
+            report["memory"] = {
+                "scope": f"pid {memory_pid}" if memory_pid else ("processus (serveur + clients)" if args.url is None else "harness"),
+                "rss_before_bytes": rss_before,
+                "rss_after_bytes": rss_after,
+                "bytes_per_connection": (
+                    round((rss_after - rss_before) / len(clients)) if clients and rss_before and rss_after else None
+                )
+            }
+
+            # 3. Trafic pendant la durée demandée
+            probe.samples.clear()
+            metrics.measuring = True
+            traffic_start = time.perf_counter()
+            deadline = traffic_start + args.duration
+            tasks = []
+            for client in clients:
+                tasks.append(heartbeat_loop(client, args.heartbeat_interval, deadline))
+                tasks.append(chat_loop(client, args.chat_rate, deadline))
+                tasks.append(attempt_loop(client, http, args.attempt_rate, deadline,
+                                          colors=6, length=4))
+            await asyncio.gather(*tasks)
+            await asyncio.sleep(args.drain_seconds)
+            metrics.measuring = False
+            elapsed = time.perf_counter() - traffic_start
+
+            sent_total = sum(metrics.sent.values())
+            received_total = sum(metrics.received.values())
+            report["traffic"] = {
+                "seconds": round(elapsed, 2),
+                "sent": metrics.sent,
+                "received": metrics.received,
+                "sent_per_second": round(sent_total / elapsed, 1),
+                "received_events_per_second": round(received_total / elapsed, 1),
+                "received_frames_per_second": round(metrics.frames_received / elapsed, 1),
+                "received_bytes_per_second": round(metrics.bytes_received / elapsed, 1),
+                "attempt_errors": metrics.attempt_errors,
+                "unexpected_closes": metrics.unexpected_closes
+            }
+            report["fanout_latency_ms"] = {kind: summarize(samples) for kind, samples in metrics.latencies.items()}
+            report["event_loop_lag_ms"] = {
+                "scope": "serveur + clients" if args.url is None else "harness",
+                **summarize(probe.samples)
+            }
+
+            # Statistiques côté serveur (mode intégré uniquement)
+            if args.url is None:
+                from app.websocket.multiplayer import multiplayer_ws_manager
+                stats = multiplayer_ws_manager.get_global_stats()
+                report["server"] = {
+                    "total_active_connections": stats["total_active_connections"],
+                    "active_rooms": stats["active_rooms"],
+                    "outbound": stats["outbound"]
+                }
+
+        finally:
+            await asyncio.gather(*(client.close() for client in clients))
+            await probe.stop()
+            if server is not None:
+                server.should_exit = True
+                await server_task
+
+    report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Harness de charge WebSocket multijoueur")
+    parser.add_argument("--url", default=None, help="Serveur local (ex: http://127.0.0.1:8000) ; sinon app lancée dans le processus")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID du serveur pour mesurer sa mémoire (avec --url)")
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--clients-per-room", type=int, default=8)
+    parser.add_argument("--players-per-room", type=int, default=4, help="Participants REST (les autres sont spectateurs)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée du trafic (s)")
+    parser.add_argument("--chat-rate", type=float, default=0.2, help="Messages de chat par client et par seconde")
+    parser.add_argument("--attempt-rate", type=float, default=0.05, help="Tentatives par joueur et par seconde (0 = aucune)")
+    parser.add_argument("--heartbeat-interval", type=float, default=15.0)
+    parser.add_argument("--codec", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--connect-timeout", type=float, default=15.0)
+    parser.add_argument("--setup-concurrency", type=int, default=50)
+    parser.add_argument("--drain-seconds", type=float, default=2.0, help="Attente des derniers messages après le trafic")
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    if args.codec == "msgpack" and not MSGPACK_AVAILABLE:
+        print("❌ msgpack non installé", file=sys.stderr)
+        return 1
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output)
+        print(f"📄 Résultats écrits dans {args.output}")
+    else:
+        print(output)
+
+    return 0 if report.get("connections", {}).get("open") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
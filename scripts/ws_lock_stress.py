@@ -0,0 +1,185 @@
+"""
+Test de charge des registres WebSocket (verrouillage fin)
+
+Connecte en parallèle des clients simulés répartis sur N rooms, avec une latence
+d'accept()/send simulée, puis les déconnecte. Vérifie :
+- que le débit de connexion augmente avec le nombre de rooms (pas de verrou global)
+- qu'aucune opération ne reste bloquée (interblocage) au-delà du délai imparti
+- que les échecs d'envoi (qui déclenchent disconnect()) ne provoquent pas de réentrance
+
+Usage:
+    PYTHONPATH=. python scripts/ws_lock_stress.py --rooms 1 10 50 --clients-per-room 12
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from uuid import uuid4
+
+from fastapi.websockets import WebSocketState
+
+from app.websocket.manager import WebSocketManager, WebSocketMessage
+from app.websocket.multiplayer import MultiplayerWebSocketManager
+from app.websocket.registry import SCOPE_MULTIPLAYER, ConnectionRegistry
+
+
+class FakeWebSocket:
+    """WebSocket simulé : latence réseau configurable et échecs d'envoi aléatoires"""
+
+    def __init__(self, latency: float, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.client_state = WebSocketState.CONNECTING
+        self.application_state = WebSocketState.CONNECTING
+        self.received = 0
+
+    async def accept(self, subprotocol=None, headers=None):
+        await asyncio.sleep(self.latency)
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise ConnectionResetError("simulated reset")
+        self.received += 1
+
+    async def send_bytes(self, data: bytes):
+        await self.send_text(data)
+
+    async def close(self, code: int = 1000, reason: str = None):
+        await asyncio.sleep(self.latency)
+        self.client_state = WebSocketState.DISCONNECTED
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+async def _run_multiplayer(rooms: int, clients_per_room: int, latency: float, failure_rate: float,
+                           timeout: float) -> dict:
+    """Scénario sur MultiplayerWebSocketManager"""
+    manager = MultiplayerWebSocketManager(ConnectionRegistry())
+    sockets = []
+
+    async def one_client(room_code: str):
+        user_id = str(uuid4())
+        websocket = FakeWebSocket(latency, failure_rate)
+        sockets.append(websocket)
+        await manager.connect(websocket, room_code, user_id, "stress")
+
+        # Un utilisateur sur quatre se reconnecte (remplacement de l'ancienne connexion)
+        if random.random() < 0.25:
+            websocket = FakeWebSocket(latency, failure_rate)
+            sockets.append(websocket)
+            await manager.connect(websocket, room_code, user_id, "stress")
+
+    start = time.perf_counter()
+    connect_tasks = [
+        one_client(f"ROOM{room:04d}")
+        for room in range(rooms)
+        for _ in range(clients_per_room)
+    ]
+    await asyncio.wait_for(asyncio.gather(*connect_tasks), timeout=timeout)
+    connect_elapsed = time.perf_counter() - start
+
+    # Diffusion concurrente dans toutes les rooms
+    for room in range(rooms):
+        await manager.broadcast_game_state(f"ROOM{room:04d}", {"round": 1})
+
+    start = time.perf_counter()
+    await asyncio.wait_for(
+        asyncio.gather(*(manager.disconnect(websocket) for websocket in sockets)),
+        timeout=timeout
+    )
+    disconnect_elapsed = time.perf_counter() - start
+
+    # Laisser les callbacks d'échec se terminer
+    await asyncio.sleep(latency * 2)
+
+    return {
+        "manager": "multiplayer",
+        "rooms": rooms,
+        "connections": len(sockets),
+        "connect_seconds": round(connect_elapsed, 4),
+        "connects_per_second": round(len(sockets) / connect_elapsed, 1),
+        "disconnect_seconds": round(disconnect_elapsed, 4),
+        "leftover_connections": manager.registry.count(SCOPE_MULTIPLAYER),
+        "outbound": manager.outbound_totals.to_dict()
+    }
+
+
+async def _run_generic(rooms: int, clients_per_room: int, latency: float, failure_rate: float,
+                       timeout: float) -> dict:
+    """Scénario sur WebSocketManager (authentification simulée sans base de données)"""
+    manager = WebSocketManager(ConnectionRegistry())
+    connection_ids = []
+
+    async def one_client(room_id: str):
+        websocket = FakeWebSocket(latency, failure_rate)
+        connection_id = await manager.connect(websocket)
+        manager.registry.set_user(manager.get_connection(connection_id), uuid4(), "stress")
+        await manager.join_game_room(connection_id, room_id)
+        connection_ids.append(connection_id)
+
+    start = time.perf_counter()
+    await asyncio.wait_for(
+        asyncio.gather(*(
+            one_client(f"room-{room}")
+            for room in range(rooms)
+            for _ in range(clients_per_room)
+        )),
+        timeout=timeout
+    )
+    connect_elapsed = time.perf_counter() - start
+
+    for room in range(rooms):
+        await manager.broadcast_to_room(f"room-{room}", WebSocketMessage(type="game_state_update", data={}))
+
+    start = time.perf_counter()
+    await asyncio.wait_for(
+        asyncio.gather(*(manager.disconnect(connection_id) for connection_id in connection_ids)),
+        timeout=timeout
+    )
+    disconnect_elapsed = time.perf_counter() - start
+    await asyncio.sleep(latency * 2)
+
+    return {
+        "manager": "generic",
+        "rooms": rooms,
+        "connections": len(connection_ids),
+        "connect_seconds": round(connect_elapsed, 4),
+        "connects_per_second": round(len(connection_ids) / connect_elapsed, 1),
+        "disconnect_seconds": round(disconnect_elapsed, 4),
+        "leftover_connections": manager.get_connection_count(),
+        "outbound": manager.outbound_totals.to_dict()
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Stress test des verrous WebSocket")
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--clients-per-room", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence réseau simulée (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Probabilité d'échec d'un envoi")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Délai au-delà duquel on conclut à un interblocage")
+    args = parser.parse_args()
+
+    results = []
+    deadlocks = 0
+
+    for rooms in args.rooms:
+        for scenario in (_run_multiplayer, _run_generic):
+            try:
+                results.append(await scenario(
+                    rooms, args.clients_per_room, args.latency, args.failure_rate, args.timeout
+                ))
+            except asyncio.TimeoutError:
+                deadlocks += 1
+                results.append({"manager": scenario.__name__, "rooms": rooms, "deadlock": True})
+
+    print(json.dumps({"results": results, "deadlocks": deadlocks}, indent=2))
+    return 1 if deadlocks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))